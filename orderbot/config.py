@@ -56,6 +56,11 @@ TOCHKA_JWT_TOKEN = os.environ.get('TOCHKA_JWT_TOKEN')
 TOCHKA_CLIENT_ID = os.environ.get('TOCHKA_CLIENT_ID')
 TOCHKA_ACCOUNT_ID = os.environ.get('TOCHKA_ACCOUNT_ID')
 TOCHKA_MERCHANT_ID = os.environ.get('TOCHKA_MERCHANT_ID')
+# Секрет в адресе уведомлений банка об оплате (/payment-webhook/<секрет>)
+PAYMENT_WEBHOOK_SECRET = os.environ.get('PAYMENT_WEBHOOK_SECRET')
+
+# Файл локального журнала заказов, ожидающих записи в Google Sheets
+ORDER_JOURNAL_PATH = os.environ.get('ORDER_JOURNAL_PATH', 'order_journal.sqlite3')
 
 # Логгируем только при отсутствии важных переменных окружения
 if not TOCHKA_JWT_TOKEN:
@@ -35,7 +35,7 @@ async def setup_commands_for_user(bot, user_id=None, is_cook=False, is_admin=Fal
         admin_commands = [
             BotCommand("kitchen", "Сводка для кухни"),
             BotCommand("update", "Обновить кэши меню"),
-            BotCommand("recount", "Пересчитать учёт заказов за последние 3 дня"),
+            BotCommand("recount", "Пересчитать учёт заказов (по умолчанию за 3 дня)"),
             BotCommand("stats", "Статистика производительности"),
             BotCommand("clearstats", "Очистить статистику производительности")
         ]
@@ -92,10 +92,10 @@ async def handle_phone(update, context):
         phone = phone[1:]
     
     # Проверяем номер телефона
-    if check_phone(phone):
+    if await check_phone(phone):
         # Сохраняем user_id
         user_id = str(update.effective_user.id)
-        if save_user_id(phone, user_id):
+        if await save_user_id(phone, user_id):
             # Обновляем информацию о пользователе
             await update_user_info(update.effective_user)
             
@@ -1,11 +1,29 @@
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.constants import ParseMode
-from telegram.ext import ContextTypes
-from ..services.kitchen import get_orders_summary
-from ..services.sheets import is_user_cook, is_user_admin, get_orders_sheet
+from telegram.ext import ContextTypes, ConversationHandler
+from ..services.kitchen import get_orders_summary, get_today_snapshot, ensure_loaded
+from ..services.sheets import is_user_cook, is_user_admin
+from ..services.order_store import order_store
+from ..services.order_record import OrderStatus, CREATED_AT_FORMAT
 from .. import translations
+from ..utils.rendering import escape_fields, escape_markdown_v2, pack_messages
 from ..utils.auth_decorator import require_auth
+from .states import KITCHEN_ORDER_NUMBER
 from datetime import datetime
+import logging
+
+# Настройка логгера
+logger = logging.getLogger(__name__)
+
+# Через сколько секунд без ответа завершается диалог поиска заказа по номеру
+ORDER_NUMBER_SEARCH_TIMEOUT = 300
+
+# Разделы сводки для кухни: ключ в сводке, значок и название приёма пищи
+MEAL_SECTIONS = (
+    ('breakfast', '🍳', 'Завтрак'),
+    ('lunch', '🍲', 'Обед'),
+    ('dinner', '🍽', 'Ужин'),
+)
 
 @require_auth
 async def kitchen_summary(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -15,52 +33,31 @@ async def kitchen_summary(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await update.message.reply_text("У вас нет доступа к этой команде.")
         return
     
-    # Получаем сводку по заказам
+    # Получаем сводку по заказам; она ведётся в памяти по событиям заказов
+    await ensure_loaded()
     summary = get_orders_summary()
     
-    # Отправляем общую информацию
-    general_message = f"📊 Заказы на *{summary['date']}*:\n\n"
+    # Отправляем общую информацию; сообщения сводки оформлены в MarkdownV2
+    general_message = f"📊 Заказы на *{escape_markdown_v2(summary['date'])}*:\n\n"
     general_message += f"📝 Всего заказов: {summary['total_orders']}\n"
-    await update.message.reply_text(general_message, parse_mode=ParseMode.MARKDOWN)
-    
-    # Отправляем информацию о завтраке
-    breakfast_message = f"🍳 *Завтрак* (всего заказов: {summary['breakfast']['count']}):\n\n"
-    if summary['breakfast']['dishes']:
-        breakfast_message += "Блюда:\n"
-        for dish, count in sorted(summary['breakfast']['dishes'].items()):
-            breakfast_message += f"- {dish}: {count} шт.\n"
-        breakfast_message += "\nЗаказы:\n\n"
-        for order in summary['breakfast']['orders']:
-            breakfast_message += f"{order}\n"
-    else:
-        breakfast_message += "Нет заказов\n"
-    await update.message.reply_text(breakfast_message, parse_mode=ParseMode.MARKDOWN)
+    await update.message.reply_text(general_message, parse_mode=ParseMode.MARKDOWN_V2)
     
-    # Отправляем информацию об обеде
-    lunch_message = f"🍲 *Обед* (всего заказов: {summary['lunch']['count']}):\n\n"
-    if summary['lunch']['dishes']:
-        lunch_message += "Блюда:\n"
-        for dish, count in sorted(summary['lunch']['dishes'].items()):
-            lunch_message += f"- {dish}: {count} шт.\n"
-        lunch_message += "\nЗаказы:\n\n"
-        for order in summary['lunch']['orders']:
-            lunch_message += f"{order}\n"
-    else:
-        lunch_message += "Нет заказов\n"
-    await update.message.reply_text(lunch_message, parse_mode=ParseMode.MARKDOWN)
-    
-    # Отправляем информацию об ужине
-    dinner_message = f"🍽 *Ужин* (всего заказов: {summary['dinner']['count']}):\n\n"
-    if summary['dinner']['dishes']:
-        dinner_message += "Блюда:\n"
-        for dish, count in sorted(summary['dinner']['dishes'].items()):
-            dinner_message += f"- {dish}: {count} шт.\n"
-        dinner_message += "\nЗаказы:\n\n"
-        for order in summary['dinner']['orders']:
-            dinner_message += f"{order}\n"
-    else:
-        dinner_message += "Нет заказов\n"
-    await update.message.reply_text(dinner_message, parse_mode=ParseMode.MARKDOWN)
+    # Отправляем информацию по каждому приёму пищи; длинный список заказов
+    # упаковывается в несколько сообщений, не разрывая описания заказов
+    for key, emoji, title in MEAL_SECTIONS:
+        meal = summary[key]
+        blocks = [f"{emoji} *{title}* \\(всего заказов: {meal['count']}\\):\n\n"]
+        if meal['dishes']:
+            dishes_block = "Блюда:\n"
+            for dish, count in sorted(meal['dishes'].items()):
+                dishes_block += f"\\- {escape_markdown_v2(dish)}: {count} шт\\.\n"
+            blocks.append(dishes_block)
+            blocks.append("\nЗаказы:\n\n")
+            blocks.extend(f"{order}\n" for order in meal['orders'])
+        else:
+            blocks.append("Нет заказов\n")
+        for message in pack_messages(blocks):
+            await update.message.reply_text(message, parse_mode=ParseMode.MARKDOWN_V2)
     
     # Добавляем сообщение с кнопками для поиска заказов
     search_message = "Найти заказы"
@@ -97,73 +94,74 @@ async def search_orders_by_room(update: Update, context: ContextTypes.DEFAULT_TY
     await query.edit_message_text("Выберите номер комнаты:", reply_markup=reply_markup)
 
 @require_auth
-async def search_orders_by_number(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """Показывает запрос на ввод номера заказа."""
+async def search_orders_by_number(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    """Показывает запрос на ввод номера заказа.
+    
+    Returns:
+        int: Состояние ожидания номера заказа или конец диалога, если нет доступа
+    """
     query = update.callback_query
     await query.answer()
     
     # Проверяем, является ли пользователь поваром или администратором
     if not (is_user_cook(str(update.effective_user.id)) or is_user_admin(str(update.effective_user.id))):
         await query.edit_message_text("У вас нет доступа к этой функции.")
-        return
-    
-    # Сохраняем состояние, что ожидаем ввод номера заказа
-    context.user_data['awaiting_order_number'] = True
+        return ConversationHandler.END
     
     # Добавляем кнопку "Назад"
     keyboard = [[InlineKeyboardButton("Назад", callback_data="back_to_kitchen")]]
     reply_markup = InlineKeyboardMarkup(keyboard)
     
     await query.edit_message_text("Введите номер заказа:", reply_markup=reply_markup)
+    return KITCHEN_ORDER_NUMBER
 
 @require_auth
-async def handle_order_number_input(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """Обрабатывает ввод номера заказа."""
-    # Проверяем, ожидаем ли ввод номера заказа
-    if not context.user_data.get('awaiting_order_number'):
-        return
+async def handle_order_number_input(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    """Обрабатывает ввод номера заказа.
     
+    Вызывается только в диалоге поиска по номеру, поэтому обычные
+    числовые сообщения (например, номер комнаты) сюда не попадают.
+    
+    Returns:
+        int: Конец диалога поиска
+    """
     # Проверяем, является ли пользователь поваром или администратором
     if not (is_user_cook(str(update.effective_user.id)) or is_user_admin(str(update.effective_user.id))):
         await update.message.reply_text("У вас нет доступа к этой функции.")
-        return
-    
-    # Получаем введенный номер заказа
-    order_number = update.message.text.strip()
+        return ConversationHandler.END
     
-    # Сбрасываем флаг ожидания ввода
-    context.user_data['awaiting_order_number'] = False
-    
-    # Ищем заказ по номеру
+    await _reply_with_order(update, update.message.text.strip())
+    return ConversationHandler.END
+
+async def end_order_number_search(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    """Возвращает к поиску заказов и завершает диалог поиска по номеру."""
+    await back_to_kitchen(update, context)
+    return ConversationHandler.END
+
+async def restart_kitchen_summary(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    """Показывает сводку по команде /kitchen и завершает диалог поиска по номеру."""
+    await kitchen_summary(update, context)
+    return ConversationHandler.END
+
+async def _reply_with_order(update: Update, order_number: str) -> None:
+    """Отправляет информацию о заказе с указанным номером."""
+    # Ищем заказ по индексу номеров заказов; лист дочитывается, только если номера нет в копии
     try:
-        orders_sheet = get_orders_sheet()
-        all_orders = orders_sheet.get_all_values()
-        order_found = None
-        
-        for order in all_orders[1:]:  # Пропускаем заголовок
-            if order[0] == order_number:
-                order_found = order
-                break
+        record = order_store.record(order_number)
+        if record is None:
+            await order_store.ensure_fresh()
+            record = order_store.record(order_number)
         
-        if order_found:
-            # Получаем текущую дату
-            today = datetime.now().date()
-            is_today_order = False
-            
+        if record:
             # Проверяем, является ли заказ на сегодня
-            if order_found[11]:
-                try:
-                    delivery_date = datetime.strptime(order_found[11], "%d.%m.%y").date()
-                    is_today_order = (delivery_date == today)
-                except ValueError:
-                    is_today_order = False
+            is_today_order = record.delivery_date == datetime.now().date()
             
             # Проверяем статус заказа
-            is_accepted = order_found[2] == 'Принят'
-            is_awaiting_payment = order_found[2] == 'Ожидает оплаты'
-            is_paid = order_found[2] == 'Оплачен'
-            is_cancelled = order_found[2] == 'Отменён'
-            is_active = order_found[2] == 'Активен'
+            is_accepted = record.status is OrderStatus.ACCEPTED
+            is_awaiting_payment = record.status is OrderStatus.AWAITING_PAYMENT
+            is_paid = record.status is OrderStatus.PAID
+            is_cancelled = record.status is OrderStatus.CANCELLED
+            is_active = record.status is OrderStatus.ACTIVE
             
             # Добавляем эмодзи для разных статусов заказов
             status_emoji = ""
@@ -178,85 +176,52 @@ async def handle_order_number_input(update: Update, context: ContextTypes.DEFAUL
             elif is_accepted:
                 status_emoji = "🛎"
             
-            # Формируем сообщение с информацией о заказе в новом формате с эмодзи
-            message = f"Заказ №*{order_found[0]}*\n\n"
-            message += f"⏰ Статус: *{status_emoji} {order_found[2]}*\n\n"
-            message += f"🏠 Комната: *{order_found[6]}*\n"
-            message += f"👤 Имя: *{order_found[7]}*\n"
-            message += f"🍽 Время: *{translations.get_meal_type(order_found[8])}* ({order_found[11]})\n"
+            # Формируем сообщение с информацией о заказе в MarkdownV2; данные заказа экранируются
+            created_at = record.created_at
+            order_id, status_text, room, name, meal_type, delivery_date, wishes, created = escape_fields(
+                record.order_id, record.status_text, record.room, record.name,
+                translations.get_meal_type(record.meal_type),
+                record.delivery_date.strftime('%d.%m.%y') if record.delivery_date else '-',
+                record.wishes or '-',
+                created_at.strftime(CREATED_AT_FORMAT) if created_at else '-'
+            )
+            message = f"Заказ №*{order_id}*\n\n"
+            message += f"⏰ Статус: *{status_emoji} {status_text}*\n\n"
+            message += f"🏠 Комната: *{room}*\n"
+            message += f"👤 Имя: *{name}*\n"
+            message += f"🍽 Время: *{meal_type}* \\({delivery_date}\\)\n"
             
             # Подготавливаем блюда для отображения
-            dishes_list = []
-            if order_found[9]:
-                dishes = order_found[9].split(',')
+            if record.dishes:
                 dishes_text = "🍲 Блюда:\n\n"
-                for dish in dishes:
-                    dish = dish.strip()
-                    dishes_text += f"- {dish}\n"
-                dishes_list.append(dishes_text)
+                for dish, quantity in record.dishes:
+                    dishes_text += f"\\- {escape_markdown_v2(dish)} x{quantity}\n"
             else:
-                dishes_list.append("🍲 Блюда: -\n")
+                dishes_text = "🍲 Блюда: \\-\n"
             
             # Добавляем пожелания и дату выдачи
-            additional_info = f"\n📝 Пожелания: *{order_found[10] if order_found[10] and order_found[10] != '—' else '-'}*\n"
-            additional_info += f"📅 Дата выдачи: *{order_found[11]}*\n\n"
-            additional_info += f"_📨 Время заказа: {order_found[1]}_"
+            additional_info = f"\n📝 Пожелания: *{wishes}*\n"
+            additional_info += f"📅 Дата выдачи: *{delivery_date}*\n\n"
+            additional_info += f"_📨 Время заказа: {created}_"
             
             # Добавляем информацию, относится ли заказ к текущей сводке
             if not is_today_order:
-                additional_info += "\n\n⚠️ Этот заказ НЕ на сегодня, и не включен в текущую сводку."
+                additional_info += "\n\n⚠️ Этот заказ НЕ на сегодня, и не включен в текущую сводку\\."
             elif not (is_accepted or is_awaiting_payment or is_paid):
-                additional_info += "\n\n⚠️ Этот заказ НЕ имеет статус 'Принят', 'Ожидает оплаты' или 'Оплачен', и не включен в текущую сводку."
+                additional_info += "\n\n⚠️ Этот заказ НЕ имеет статус 'Принят', 'Ожидает оплаты' или 'Оплачен', и не включен в текущую сводку\\."
             
-            # Максимальная длина сообщения в Telegram
-            MAX_MESSAGE_LENGTH = 4000
+            # Упаковываем карточку в как можно меньшее число сообщений: длинный список блюд делится по строкам
+            messages = pack_messages([message, dishes_text, additional_info])
+            for part in messages[:-1]:
+                await update.message.reply_text(part, parse_mode=ParseMode.MARKDOWN_V2)
             
-            # Проверяем общую длину сообщения
-            dishes_total_length = sum(len(dish) for dish in dishes_list)
-            
-            if len(message) + dishes_total_length + len(additional_info) > MAX_MESSAGE_LENGTH:
-                # Если всё сообщение слишком длинное, разбиваем на части
-                
-                # Отправляем первую часть сообщения
-                first_message = message
-                await update.message.reply_text(first_message, parse_mode=ParseMode.MARKDOWN)
-                
-                # Отправляем списки блюд частями
-                current_dishes = "🍲 Блюда:\n"
-                dishes = order_found[9].split(',')
-                
-                for i, dish in enumerate(dishes):
-                    dish = dish.strip()
-                    dish_line = f"- {dish}\n"
-                    
-                    if len(current_dishes) + len(dish_line) > MAX_MESSAGE_LENGTH:
-                        await update.message.reply_text(current_dishes, parse_mode=ParseMode.MARKDOWN)
-                        current_dishes = "🍲 Блюда (продолжение):\n" + dish_line
-                    else:
-                        current_dishes += dish_line
-                
-                if current_dishes and current_dishes != "🍲 Блюда:\n" and current_dishes != "🍲 Блюда (продолжение):\n":
-                    await update.message.reply_text(current_dishes, parse_mode=ParseMode.MARKDOWN)
-                
-                # Отправляем дополнительную информацию
-                keyboard = [[
-                    InlineKeyboardButton("По комнате", callback_data="search_by_room"),
-                    InlineKeyboardButton("По номеру", callback_data="search_by_number")
-                ]]
-                reply_markup = InlineKeyboardMarkup(keyboard)
-                await update.message.reply_text(additional_info, reply_markup=reply_markup, parse_mode=ParseMode.MARKDOWN)
-            else:
-                # Если сообщение нормальной длины, отправляем всё вместе
-                complete_message = message + dishes_list[0] + additional_info
-                
-                # Добавляем кнопку "Назад к поиску"
-                keyboard = [[
-                    InlineKeyboardButton("По комнате", callback_data="search_by_room"),
-                    InlineKeyboardButton("По номеру", callback_data="search_by_number")
-                ]]
-                reply_markup = InlineKeyboardMarkup(keyboard)
-                
-                await update.message.reply_text(complete_message, reply_markup=reply_markup, parse_mode=ParseMode.MARKDOWN)
+            # К последнему сообщению добавляем кнопки поиска
+            keyboard = [[
+                InlineKeyboardButton("По комнате", callback_data="search_by_room"),
+                InlineKeyboardButton("По номеру", callback_data="search_by_number")
+            ]]
+            reply_markup = InlineKeyboardMarkup(keyboard)
+            await update.message.reply_text(messages[-1], reply_markup=reply_markup, parse_mode=ParseMode.MARKDOWN_V2)
         else:
             # Если заказ не найден
             keyboard = [[
@@ -264,7 +229,7 @@ async def handle_order_number_input(update: Update, context: ContextTypes.DEFAUL
                 InlineKeyboardButton("По номеру", callback_data="search_by_number")
             ]]
             reply_markup = InlineKeyboardMarkup(keyboard)
-            await update.message.reply_text(f"Заказ с номером {order_number} не найден.", reply_markup=reply_markup, parse_mode=ParseMode.MARKDOWN)
+            await update.message.reply_text(f"Заказ с номером {escape_markdown_v2(order_number)} не найден\\.", reply_markup=reply_markup, parse_mode=ParseMode.MARKDOWN_V2)
     
     except Exception as e:
         keyboard = [[
@@ -272,9 +237,8 @@ async def handle_order_number_input(update: Update, context: ContextTypes.DEFAUL
             InlineKeyboardButton("По номеру", callback_data="search_by_number")
         ]]
         reply_markup = InlineKeyboardMarkup(keyboard)
-        await update.message.reply_text(f"Ошибка при поиске заказа: {e}", reply_markup=reply_markup, parse_mode=ParseMode.MARKDOWN)
-        # Логирование ошибки для отладки
-        print(f"Ошибка при поиске заказа номер {order_number}: {e}")
+        await update.message.reply_text(f"Ошибка при поиске заказа: {escape_markdown_v2(e)}", reply_markup=reply_markup, parse_mode=ParseMode.MARKDOWN_V2)
+        logger.error(f"Ошибка при поиске заказа номер {order_number}: {e}")
 
 @require_auth
 async def find_orders_by_room(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -291,92 +255,55 @@ async def find_orders_by_room(update: Update, context: ContextTypes.DEFAULT_TYPE
     room_number = query.data.split(':')[1]
     
     try:
-        # Ищем заказы по комнате
-        orders_sheet = get_orders_sheet()
-        all_orders = orders_sheet.get_all_values()
-        
-        # Получаем текущую дату
-        today = datetime.now().date()
-        
-        # Фильтруем заказы: только те, что на сегодня и со статусом "Принят", "Ожидает оплаты" или "Оплачен"
-        room_orders = []
-        for order in all_orders[1:]:
-            if order[6] == room_number and (order[2] == 'Принят' or order[2] == 'Ожидает оплаты' or order[2] == 'Оплачен') and order[11]:
-                try:
-                    delivery_date = datetime.strptime(order[11], "%d.%m.%y").date()
-                    if delivery_date == today:
-                        room_orders.append(order)
-                except ValueError:
-                    # Если дата в неправильном формате, пропускаем
-                    continue
+        # Ищем заказы по комнате в сводке на сегодня: в ней только заказы со статусом
+        # "Принят", "Ожидает оплаты" или "Оплачен", отсортированные по типу еды
+        await ensure_loaded()
+        snapshot = get_today_snapshot()
+        today = snapshot.day
+        room_orders = snapshot.rooms.get(room_number, ())
         
         if room_orders:
-            # Сортируем заказы по типу еды (завтрак - обед - ужин)
-            def meal_type_priority(order):
-                meal_type = order[8]  # Тип еды в колонке 8
-                if meal_type == 'Завтрак':
-                    return 0
-                elif meal_type == 'Обед':
-                    return 1
-                elif meal_type == 'Ужин':
-                    return 2
-                return 3  # Для других типов (если есть)
-            
-            # Сортируем список заказов
-            room_orders.sort(key=meal_type_priority)
             
             # Формируем заголовок для сообщений
-            header = f"📋 Заказы для комнаты {room_number} на сегодня ({today.strftime('%d.%m.%Y')}):\n\n"
+            header = (f"📋 Заказы для комнаты {escape_markdown_v2(room_number)} на сегодня "
+                      f"\\({escape_markdown_v2(today.strftime('%d.%m.%Y'))}\\):\n\n")
             
-            # Создаем список сообщений
-            messages = []
-            current_message = header
-            
-            # Максимальная длина сообщения в Telegram
-            MAX_MESSAGE_LENGTH = 4000
-            
-            # Формируем сообщения с заказами в новом формате
+            # Формируем блоки с заказами в новом формате
+            blocks = []
             for order in room_orders:
                 # Добавляем отметку для заказов в зависимости от статуса
                 status_mark = ""
-                if order[2] == 'Ожидает оплаты':
+                if order.status is OrderStatus.AWAITING_PAYMENT:
                     status_mark = "💰 "
-                elif order[2] == 'Оплачен':
+                elif order.status is OrderStatus.PAID:
                     status_mark = "✅ "
-                elif order[2] == 'Принят':
+                elif order.status is OrderStatus.ACCEPTED:
                     status_mark = "🛎 "
                 
                 # Изменяем порядок отображения информации о заказе
-                order_text = f"{status_mark}Заказ №*{order[0]}*\n"
-                order_text += f"👤 Имя: *{order[7]}*\n"
-                order_text += f"🍽 Время: *{translations.get_meal_type(order[8])}*\n"
+                order_id, name, meal_type, wishes = escape_fields(
+                    order.order_id, order.name, translations.get_meal_type(order.meal_type), order.wishes or '-'
+                )
+                order_text = f"{status_mark}Заказ №*{order_id}*\n"
+                order_text += f"👤 Имя: *{name}*\n"
+                order_text += f"🍽 Время: *{meal_type}*\n"
                 
                 # Добавляем блюда с разбивкой на отдельные строки
-                if order[9]:
+                if order.dishes:
                     order_text += "🍲 Блюда:\n"
-                    dishes = order[9].split(',')
-                    for dish in dishes:
-                        dish = dish.strip()
-                        order_text += f"- {dish}\n"
+                    for dish, quantity in order.dishes:
+                        order_text += f"\\- {escape_markdown_v2(dish)} x{quantity}\n"
                 else:
-                    order_text += "🍲 Блюда: -\n"
+                    order_text += "🍲 Блюда: \\-\n"
                 
                 # Добавляем пожелания
-                order_text += f"📝 Пожелания: *{order[10] if order[10] and order[10] != '—' else '-'}*\n"
+                order_text += f"📝 Пожелания: *{wishes}*\n"
                 order_text += "─" * 30 + "\n"
                 
-                # Проверяем, поместится ли заказ в текущее сообщение
-                if len(current_message) + len(order_text) > MAX_MESSAGE_LENGTH:
-                    # Если не поместится, добавляем текущее сообщение в список и начинаем новое
-                    messages.append(current_message)
-                    current_message = header + order_text
-                else:
-                    # Если поместится, добавляем заказ к текущему сообщению
-                    current_message += order_text
+                blocks.append(order_text)
             
-            # Добавляем последнее сообщение в список
-            if current_message and current_message != header:
-                messages.append(current_message)
+            # Упаковываем заказы в как можно меньшее число сообщений, каждое начинается с заголовка
+            messages = pack_messages(blocks, header=header)
             
             # Отправляем сообщения
             if messages:
@@ -387,7 +314,7 @@ async def find_orders_by_room(update: Update, context: ContextTypes.DEFAULT_TYPE
                 ]]
                 reply_markup = InlineKeyboardMarkup(keyboard)
                 
-                await query.edit_message_text(messages[0], reply_markup=reply_markup, parse_mode=ParseMode.MARKDOWN)
+                await query.edit_message_text(messages[0], reply_markup=reply_markup, parse_mode=ParseMode.MARKDOWN_V2)
                 
                 # Отправляем остальные сообщения, если они есть
                 for i in range(1, len(messages)):
@@ -397,14 +324,14 @@ async def find_orders_by_room(update: Update, context: ContextTypes.DEFAULT_TYPE
                             chat_id=query.message.chat_id,
                             text=messages[i],
                             reply_markup=reply_markup,
-                            parse_mode=ParseMode.MARKDOWN
+                            parse_mode=ParseMode.MARKDOWN_V2
                         )
                     else:
                         # Промежуточные сообщения без кнопок
                         await context.bot.send_message(
                             chat_id=query.message.chat_id,
                             text=messages[i],
-                            parse_mode=ParseMode.MARKDOWN
+                            parse_mode=ParseMode.MARKDOWN_V2
                         )
         else:
             # Если заказы не найдены
@@ -413,7 +340,7 @@ async def find_orders_by_room(update: Update, context: ContextTypes.DEFAULT_TYPE
                 InlineKeyboardButton("По номеру", callback_data="search_by_number")
             ]]
             reply_markup = InlineKeyboardMarkup(keyboard)
-            await query.edit_message_text(f"Заказы для комнаты {room_number} на сегодня не найдены.", reply_markup=reply_markup, parse_mode=ParseMode.MARKDOWN)
+            await query.edit_message_text(f"Заказы для комнаты {escape_markdown_v2(room_number)} на сегодня не найдены\\.", reply_markup=reply_markup, parse_mode=ParseMode.MARKDOWN_V2)
     
     except Exception as e:
         keyboard = [[
@@ -421,9 +348,8 @@ async def find_orders_by_room(update: Update, context: ContextTypes.DEFAULT_TYPE
             InlineKeyboardButton("По номеру", callback_data="search_by_number")
         ]]
         reply_markup = InlineKeyboardMarkup(keyboard)
-        await query.edit_message_text(f"Ошибка при поиске заказов: {e}", reply_markup=reply_markup, parse_mode=ParseMode.MARKDOWN)
-        # Логирование ошибки для отладки
-        print(f"Ошибка при поиске заказов по комнате {room_number}: {e}")
+        await query.edit_message_text(f"Ошибка при поиске заказов: {escape_markdown_v2(e)}", reply_markup=reply_markup, parse_mode=ParseMode.MARKDOWN_V2)
+        logger.error(f"Ошибка при поиске заказов по комнате {room_number}: {e}")
 
 @require_auth
 async def back_to_kitchen(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -445,4 +371,4 @@ async def back_to_kitchen(update: Update, context: ContextTypes.DEFAULT_TYPE):
         ]
     ]
     reply_markup = InlineKeyboardMarkup(keyboard)
-    await query.edit_message_text(search_message, reply_markup=reply_markup, parse_mode=ParseMode.MARKDOWN) 
\ No newline at end of file
+    await query.edit_message_text(search_message, reply_markup=reply_markup, parse_mode=ParseMode.MARKDOWN_V2) 
\ No newline at end of file
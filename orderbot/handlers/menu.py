@@ -401,7 +401,7 @@ async def show_today_menu(update: telegram.Update, context: telegram.ext.Context
         
         try:
             # Получаем блюда из кэша меню на сегодня
-            dishes_by_meal = get_today_menu_dishes()
+            dishes_by_meal = await get_today_menu_dishes()
             
             # Проверяем, есть ли блюда в меню
             has_dishes = any(dishes for dishes in dishes_by_meal.values())
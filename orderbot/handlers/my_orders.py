@@ -5,12 +5,14 @@ from datetime import datetime, timedelta
 import logging
 from .. import translations
 from ..services.sheets import get_orders_sheet, is_user_authorized
+from ..services.order_store import order_store
+from ..services.order_record import OrderStatus
 from ..services.user import update_user_stats, get_user_data
 from ..utils.auth_decorator import require_auth
 from .states import MENU, EDIT_ORDER
 from typing import List, Dict, Optional
 from ..utils.profiler import profile_time
-from ..utils.markdown_utils import escape_markdown_v2
+from ..utils.rendering import escape_markdown_v2, render_order_card, pack_messages
 from .order import get_order_info, show_order_form, ask_meal_type, process_order_save
 
 # Настройка логгера
@@ -34,18 +36,14 @@ async def show_user_orders(update: telegram.Update, context: telegram.ext.Contex
         context.user_data['state'] = MENU
     
     # Получаем дату на завтрашний день
-    tomorrow_date = (datetime.now() + timedelta(days=1)).strftime("%d.%m.%y")
+    tomorrow_date = (datetime.now() + timedelta(days=1)).date()
     
-    from orderbot.services.sheets import get_orders_sheet
-    orders_sheet = get_orders_sheet()
-    all_orders = orders_sheet.get_all_values()
+    await order_store.ensure_fresh()
     
     # Фильтруем заказы пользователя со статусами "Активен" и "Оплачен" на завтрашний день
     user_orders = [
-        row for row in all_orders[1:] 
-        if row[3] == user_id and 
-           row[2] in ['Активен', 'Оплачен'] and 
-           row[11] == tomorrow_date  # Проверяем дату выдачи на завтра
+        record for record in order_store.records_by_user(user_id, [OrderStatus.ACTIVE, OrderStatus.PAID])
+        if record.delivery_date == tomorrow_date  # Проверяем дату выдачи на завтра
     ]
     
     if not user_orders:
@@ -64,94 +62,15 @@ async def show_user_orders(update: telegram.Update, context: telegram.ext.Contex
             await update.callback_query.edit_message_text(message, reply_markup=reply_markup, parse_mode=ParseMode.MARKDOWN_V2)
     else:
         # Сортируем активные заказы по типу еды: Завтрак - Обед - Ужин
-        def meal_type_priority(meal_type):
-            if meal_type == 'Завтрак':
-                return 0
-            elif meal_type == 'Обед':
-                return 1
-            elif meal_type == 'Ужин':
-                return 2
-            return 3  # Для других значений
-            
-        user_orders.sort(key=lambda x: meal_type_priority(x[8]))
-        
-        messages = []
-        current_message = ""
+        user_orders.sort(key=lambda record: record.meal_priority)
         
-        # Добавляем активные заказы
-        messages.append(escape_markdown_v2("Ваши заказы на завтра:"))
+        # Формируем карточки заказов и упаковываем их в как можно меньшее число сообщений
+        blocks = [escape_markdown_v2("Ваши заказы на завтра:") + "\n\n"]
         for order in user_orders:
-            # Формируем информацию о заказе
-            delivery_date = order[11] if order[11] else None
-            meal_type = order[8]
-            meal_type_with_date = f"{translations.get_meal_type(meal_type)} ({delivery_date})" if delivery_date else translations.get_meal_type(meal_type)
-            
-            # Экранируем специальные символы для Markdown V2
-            escaped_order_id = escape_markdown_v2(order[0])
-            escaped_status = escape_markdown_v2(order[2])
-            escaped_timestamp = escape_markdown_v2(order[1])
-            escaped_room = escape_markdown_v2(order[6])
-            escaped_name = escape_markdown_v2(order[7])
-            escaped_meal_type = escape_markdown_v2(meal_type_with_date)
-            
             # Выбираем эмодзи в зависимости от статуса
-            status_emoji = "✏️"  # По умолчанию для "Активен"
-            if order[2] == 'Оплачен':
-                status_emoji = "✅"
-            
-            order_info = (
-                f"{status_emoji} Заказ *{escaped_order_id}* \\({escaped_status}\\)\n"
-                f"🍽 Время дня: {escaped_meal_type}\n"
-                f"🍲 Блюда:\n"
-            )
-            
-            # Разбиваем строку с блюдами на отдельные блюда и форматируем каждое
-            dishes = order[9].split(', ')
-            
-            # Получаем количества, если они доступны
-            has_quantities = False
-            quantities = {}
-            
-            # Проверяем, есть ли дополнительная колонка с количествами (12-я колонка)
-            if len(order) > 12 and order[12]:
-                try:
-                    # Парсим JSON строку с количествами
-                    import json
-                    quantities = json.loads(order[12].replace("'", '"'))
-                    has_quantities = True
-                except Exception as e:
-                    logger.error(f"Ошибка при парсинге количеств блюд: {e}")
-            
-            for dish in dishes:
-                # Проверяем, содержит ли блюдо уже информацию о количестве
-                if ' x' in dish:
-                    # Блюдо уже содержит количество, просто экранируем и отображаем как есть
-                    escaped_dish = escape_markdown_v2(dish)
-                    order_info += f"  • {escaped_dish}\n"
-                else:
-                    # Блюдо не содержит количество, добавляем из quantities или по умолчанию 1
-                    escaped_dish = escape_markdown_v2(dish)
-                    quantity = quantities.get(dish, 1) if has_quantities else 1
-                    order_info += f"  • {escaped_dish} x{quantity}\n"
-            
-            escaped_wishes = escape_markdown_v2(order[10])
-            order_info += f"📝 Пожелания: {escaped_wishes}\n"
-            
-            order_sum = int(float(order[5])) if order[5] else 0
-            escaped_sum = escape_markdown_v2(str(order_sum))
-            order_info += f"💰 Сумма заказа: {escaped_sum} р\\.\n"
-            order_info += translations.get_message('active_orders_separator')
-            
-            # Если текущее сообщение станет слишком длинным, начинаем новое
-            if len(current_message + order_info) > 3000:  # Оставляем запас для доп. текста
-                messages.append(current_message)
-                current_message = order_info
-            else:
-                current_message += order_info
-        
-        # Добавляем последнее сообщение со списком заказов, если оно есть
-        if current_message:
-            messages.append(current_message)
+            status_emoji = "✅" if order.status is OrderStatus.PAID else "✏️"
+            blocks.append(render_order_card(order, status_emoji))
+        messages = pack_messages(blocks)
         
         # Логирование для отладки
         logger.info(f"Всего найдено заказов на завтра: {len(user_orders)}")
@@ -229,20 +148,16 @@ async def show_today_orders(update: telegram.Update, context: telegram.ext.Conte
     if 'state' not in context.user_data:
         context.user_data['state'] = MENU
     
-    # Получаем текущую дату в формате "ДД.ММ.ГГ"
-    today_date = datetime.now()
-    today_date_str = today_date.strftime("%d.%m.%y")
+    # Получаем текущую дату
+    today_date = datetime.now().date()
     
-    from orderbot.services.sheets import get_orders_sheet
-    orders_sheet = get_orders_sheet()
-    all_orders = orders_sheet.get_all_values()
+    await order_store.ensure_fresh()
     
     # Фильтруем заказы пользователя на сегодняшний день со статусами "Принят", "Ожидает оплаты", "Оплачен"
     today_orders = [
-        row for row in all_orders[1:] 
-        if row[3] == user_id and 
-           row[2] in ['Принят', 'Ожидает оплаты', 'Оплачен'] and 
-           row[11] == today_date_str  # Проверяем дату выдачи
+        record for record in order_store.records_by_user(
+            user_id, [OrderStatus.ACCEPTED, OrderStatus.AWAITING_PAYMENT, OrderStatus.PAID])
+        if record.delivery_date == today_date  # Проверяем дату выдачи
     ]
     
     if not today_orders:
@@ -255,98 +170,16 @@ async def show_today_orders(update: telegram.Update, context: telegram.ext.Conte
         await query.edit_message_text(message, reply_markup=reply_markup, parse_mode=ParseMode.MARKDOWN_V2)
     else:
         # Сортируем заказы по типу еды: Завтрак - Обед - Ужин
-        def meal_type_priority(meal_type):
-            if meal_type == 'Завтрак':
-                return 0
-            elif meal_type == 'Обед':
-                return 1
-            elif meal_type == 'Ужин':
-                return 2
-            return 3  # Для других значений
-            
-        today_orders.sort(key=lambda x: meal_type_priority(x[8]))
-        
-        messages = []
-        current_message = ""
+        today_orders.sort(key=lambda record: record.meal_priority)
         
-        # Добавляем заголовок
-        messages.append(escape_markdown_v2("Ваши заказы на сегодня:"))
+        # Выбираем эмодзи в зависимости от статуса
+        status_emojis = {OrderStatus.ACCEPTED: "🛎", OrderStatus.AWAITING_PAYMENT: "💸"}
         
+        # Формируем карточки заказов и упаковываем их в как можно меньшее число сообщений
+        blocks = [escape_markdown_v2("Ваши заказы на сегодня:") + "\n\n"]
         for order in today_orders:
-            # Формируем информацию о заказе
-            delivery_date = order[11] if order[11] else None
-            meal_type = order[8]
-            meal_type_with_date = f"{translations.get_meal_type(meal_type)} ({delivery_date})" if delivery_date else translations.get_meal_type(meal_type)
-            
-            # Экранируем специальные символы для Markdown V2
-            escaped_order_id = escape_markdown_v2(order[0])
-            escaped_status = escape_markdown_v2(order[2])
-            escaped_room = escape_markdown_v2(order[6])
-            escaped_name = escape_markdown_v2(order[7])
-            escaped_meal_type = escape_markdown_v2(meal_type_with_date)
-            
-            # Выбираем эмодзи в зависимости от статуса
-            status_emoji = "✅"  # По умолчанию для "Оплачен"
-            if order[2] == 'Принят':
-                status_emoji = "🛎"
-            elif order[2] == 'Ожидает оплаты':
-                status_emoji = "💸"
-            
-            order_info = (
-                f"{status_emoji} Заказ *{escaped_order_id}* \\({escaped_status}\\)\n"
-                f"🏠 Комната: {escaped_room}\n"
-                f"👤 Имя: {escaped_name}\n"
-                f"🍽 Время дня: {escaped_meal_type}\n"
-                f"🍲 Блюда:\n"
-            )
-            
-            # Разбиваем строку с блюдами на отдельные блюда и форматируем каждое
-            dishes = order[9].split(', ')
-            
-            # Получаем количества, если они доступны
-            has_quantities = False
-            quantities = {}
-            
-            # Проверяем, есть ли дополнительная колонка с количествами (12-я колонка)
-            if len(order) > 12 and order[12]:
-                try:
-                    # Парсим JSON строку с количествами
-                    import json
-                    quantities = json.loads(order[12].replace("'", '"'))
-                    has_quantities = True
-                except Exception as e:
-                    logger.error(f"Ошибка при парсинге количеств блюд: {e}")
-            
-            for dish in dishes:
-                # Проверяем, содержит ли блюдо уже информацию о количестве
-                if ' x' in dish:
-                    # Блюдо уже содержит количество, просто экранируем и отображаем как есть
-                    escaped_dish = escape_markdown_v2(dish)
-                    order_info += f"  • {escaped_dish}\n"
-                else:
-                    # Блюдо не содержит количество, добавляем из quantities или по умолчанию 1
-                    escaped_dish = escape_markdown_v2(dish)
-                    quantity = quantities.get(dish, 1) if has_quantities else 1
-                    order_info += f"  • {escaped_dish} x{quantity}\n"
-            
-            escaped_wishes = escape_markdown_v2(order[10])
-            order_info += f"📝 Пожелания: {escaped_wishes}\n"
-            
-            order_sum = int(float(order[5])) if order[5] else 0
-            escaped_sum = escape_markdown_v2(str(order_sum))
-            order_info += f"💰 Сумма заказа: {escaped_sum} р\\.\n"
-            order_info += translations.get_message('active_orders_separator')
-            
-            # Если текущее сообщение станет слишком длинным, начинаем новое
-            if len(current_message + order_info) > 3000:  # Оставляем запас для доп. текста
-                messages.append(current_message)
-                current_message = order_info
-            else:
-                current_message += order_info
-        
-        # Добавляем последнее сообщение со списком заказов, если оно есть
-        if current_message:
-            messages.append(current_message)
+            blocks.append(render_order_card(order, status_emojis.get(order.status, "✅"), with_guest=True))
+        messages = pack_messages(blocks)
         
         # Логирование для отладки
         logger.info(f"Всего найдено заказов на сегодня: {len(today_orders)}")
@@ -402,11 +235,9 @@ async def show_orders_to_pay(update: telegram.Update, context: telegram.ext.Cont
     if 'state' not in context.user_data:
         context.user_data['state'] = MENU
     
-    from orderbot.services.sheets import get_orders_sheet
-    orders_sheet = get_orders_sheet()
-    all_orders = orders_sheet.get_all_values()
+    await order_store.ensure_fresh()
     # Фильтруем заказы пользователя со статусами "Принят" и "Ожидает оплаты"
-    user_orders = [row for row in all_orders[1:] if row[3] == user_id and row[2] in ['Принят', 'Ожидает оплаты']]
+    user_orders = order_store.records_by_user(user_id, [OrderStatus.ACCEPTED, OrderStatus.AWAITING_PAYMENT])
     
     if not user_orders:
         message = escape_markdown_v2("У вас нет заказов на оплату.")
@@ -418,132 +249,30 @@ async def show_orders_to_pay(update: telegram.Update, context: telegram.ext.Cont
         reply_markup = InlineKeyboardMarkup(keyboard)
         await query.edit_message_text(message, reply_markup=reply_markup, parse_mode=ParseMode.MARKDOWN_V2)
     else:
-        # Сортируем заказы по приоритету статуса и времени
-        # Приоритет: "Ожидает оплаты", "Принят"
-        def order_status_priority(status):
-            if status == 'Ожидает оплаты':
-                return 0
-            elif status == 'Принят':
-                return 1
-            return 2  # Для других значений
-        
-        user_orders.sort(key=lambda x: (order_status_priority(x[2]), x[1]))
-        
-        # Разделяем заказы по статусам
-        awaiting_payment_orders = [order for order in user_orders if order[2] == 'Ожидает оплаты']
-        processing_orders = [order for order in user_orders if order[2] == 'Принят']
-        
-        messages = []
-        current_message = ""
-        total_sum = 0
+        # Разделяем заказы по статусам; внутри раздела заказы идут в порядке строк листа
+        awaiting_payment_orders = [order for order in user_orders if order.status is OrderStatus.AWAITING_PAYMENT]
+        processing_orders = [order for order in user_orders if order.status is OrderStatus.ACCEPTED]
         
-        # Добавляем заказы, ожидающие оплаты
+        # Формируем карточки заказов по разделам и упаковываем их в как можно меньшее число сообщений
+        blocks = []
         if awaiting_payment_orders:
-            messages.append(escape_markdown_v2("Приготовленные заказы, ожидающие оплаты:"))
-            for order in awaiting_payment_orders:
-                # Формируем информацию о заказе
-                delivery_date = order[11] if order[11] else None
-                meal_type = order[8]
-                meal_type_with_date = f"{translations.get_meal_type(meal_type)} ({delivery_date})" if delivery_date else translations.get_meal_type(meal_type)
-                
-                # Экранируем специальные символы для Markdown V2
-                escaped_order_id = escape_markdown_v2(order[0])
-                escaped_status = escape_markdown_v2(order[2])
-                escaped_timestamp = escape_markdown_v2(order[1])
-                escaped_room = escape_markdown_v2(order[6])
-                escaped_name = escape_markdown_v2(order[7])
-                escaped_meal_type = escape_markdown_v2(meal_type_with_date)
-                
-                order_info = (
-                    f"💸 Заказ *{escaped_order_id}* \\({escaped_status}\\)\n"
-                    f"🍽 Время дня: {escaped_meal_type}\n"
-                    f"🍲 Блюда:\n"
-                )
-                
-                # Разбиваем строку с блюдами на отдельные блюда и форматируем каждое
-                dishes = order[9].split(', ')
-                for dish in dishes:
-                    escaped_dish = escape_markdown_v2(dish)
-                    order_info += f"  • {escaped_dish}\n"
-                
-                escaped_wishes = escape_markdown_v2(order[10])
-                order_info += f"📝 Пожелания: {escaped_wishes}\n"
-                
-                order_sum = int(float(order[5])) if order[5] else 0
-                total_sum += order_sum
-                escaped_sum = escape_markdown_v2(str(order_sum))
-                order_info += f"💰 Сумма заказа: {escaped_sum} р\\.\n"
-                order_info += translations.get_message('active_orders_separator')
-                
-                # Если текущее сообщение станет слишком длинным, начинаем новое
-                if len(current_message + order_info) > 3000:  # Оставляем запас для доп. текста
-                    messages.append(current_message)
-                    current_message = order_info
-                else:
-                    current_message += order_info
-        
-        # Добавляем заказы в обработке
+            blocks.append(escape_markdown_v2("Приготовленные заказы, ожидающие оплаты:") + "\n\n")
+            blocks.extend(render_order_card(order, "💸") for order in awaiting_payment_orders)
         if processing_orders:
-            if current_message:  # Если есть предыдущие сообщения, добавляем разделитель
-                messages.append(current_message)
-                current_message = ""
-            
-            messages.append(escape_markdown_v2("Принятые заказы, переданные повару:"))
-            for order in processing_orders:
-                # Формируем информацию о заказе
-                delivery_date = order[11] if order[11] else None
-                meal_type = order[8]
-                meal_type_with_date = f"{translations.get_meal_type(meal_type)} ({delivery_date})" if delivery_date else translations.get_meal_type(meal_type)
-                
-                # Экранируем специальные символы для Markdown V2
-                escaped_order_id = escape_markdown_v2(order[0])
-                escaped_status = escape_markdown_v2(order[2])
-                escaped_timestamp = escape_markdown_v2(order[1])
-                escaped_room = escape_markdown_v2(order[6])
-                escaped_name = escape_markdown_v2(order[7])
-                escaped_meal_type = escape_markdown_v2(meal_type_with_date)
-                
-                order_info = (
-                    f"🛎 Заказ *{escaped_order_id}* \\({escaped_status}\\)\n"
-                    f"🍽 Время дня: {escaped_meal_type}\n"
-                    f"🍲 Блюда:\n"
-                )
-                
-                # Разбиваем строку с блюдами на отдельные блюда и форматируем каждое
-                dishes = order[9].split(', ')
-                for dish in dishes:
-                    escaped_dish = escape_markdown_v2(dish)
-                    order_info += f"  • {escaped_dish}\n"
-                
-                escaped_wishes = escape_markdown_v2(order[10])
-                order_info += f"📝 Пожелания: {escaped_wishes}\n"
-                
-                order_sum = int(float(order[5])) if order[5] else 0
-                total_sum += order_sum
-                escaped_sum = escape_markdown_v2(str(order_sum))
-                order_info += f"💰 Сумма заказа: {escaped_sum} р\\.\n"
-                order_info += translations.get_message('active_orders_separator')
-                
-                # Если текущее сообщение станет слишком длинным, начинаем новое
-                if len(current_message + order_info) > 3000:  # Оставляем запас для доп. текста
-                    messages.append(current_message)
-                    current_message = order_info
-                else:
-                    current_message += order_info
+            blocks.append(escape_markdown_v2("Принятые заказы, переданные повару:") + "\n\n")
+            blocks.extend(render_order_card(order, "🛎") for order in processing_orders)
         
-        # Добавляем последнее сообщение со списком заказов, если оно есть
-        if current_message:
-            messages.append(current_message)
-        
-        # Добавляем общую сумму в последнее сообщение
+        # Добавляем общую сумму в конец последнего сообщения
+        total_sum = sum(order.total for order in user_orders)
         escaped_total_sum = escape_markdown_v2(str(total_sum))
         total_sum_message = translations.get_message('total_sum', sum=escaped_total_sum)
+        blocks.append(total_sum_message)
         
         # Логирование для отладки
         logger.info(f"Итоговая сумма заказов на оплату: {total_sum}, экранированная: {escaped_total_sum}")
         logger.info(f"Сообщение о сумме: {total_sum_message}")
         
-        messages[-1] += total_sum_message
+        messages = pack_messages(blocks)
         
         try:
             # Отправляем первое сообщение
@@ -598,11 +327,9 @@ async def show_paid_orders(update: telegram.Update, context: telegram.ext.Contex
     if 'state' not in context.user_data:
         context.user_data['state'] = MENU
     
-    from orderbot.services.sheets import get_orders_sheet
-    orders_sheet = get_orders_sheet()
-    all_orders = orders_sheet.get_all_values()
+    await order_store.ensure_fresh()
     # Фильтруем заказы пользователя со статусом "Оплачен"
-    user_orders = [row for row in all_orders[1:] if row[3] == user_id and row[2] == 'Оплачен']
+    user_orders = order_store.records_by_user(user_id, [OrderStatus.PAID])
     
     if not user_orders:
         message = escape_markdown_v2("У вас нет оплаченных заказов.")
@@ -614,83 +341,13 @@ async def show_paid_orders(update: telegram.Update, context: telegram.ext.Contex
         reply_markup = InlineKeyboardMarkup(keyboard)
         await query.edit_message_text(message, reply_markup=reply_markup, parse_mode=ParseMode.MARKDOWN_V2)
     else:
-        # Сортируем заказы по дате
-        user_orders.sort(key=lambda x: x[1], reverse=True)  # Сортировка по времени создания, сначала новые
-        
-        messages = []
-        current_message = ""
-        
-        # Заголовок
-        messages.append(escape_markdown_v2("Ваши оплаченные заказы:"))
-        
-        # Формируем сообщения для каждого заказа
-        for order in user_orders:
-            # Формируем информацию о заказе
-            delivery_date = order[11] if order[11] else None
-            meal_type = order[8]
-            meal_type_with_date = f"{translations.get_meal_type(meal_type)} ({delivery_date})" if delivery_date else translations.get_meal_type(meal_type)
-            
-            # Экранируем специальные символы для Markdown V2
-            escaped_order_id = escape_markdown_v2(order[0])
-            escaped_status = escape_markdown_v2(order[2])
-            escaped_timestamp = escape_markdown_v2(order[1])
-            escaped_room = escape_markdown_v2(order[6])
-            escaped_name = escape_markdown_v2(order[7])
-            escaped_meal_type = escape_markdown_v2(meal_type_with_date)
-            
-            order_info = (
-                f"✅ Заказ *{escaped_order_id}* \\({escaped_status}\\)\n"
-                f"🍽 Время дня: {escaped_meal_type}\n"
-                f"🍲 Блюда:\n"
-            )
-            
-            # Разбиваем строку с блюдами на отдельные блюда и форматируем каждое
-            dishes = order[9].split(', ')
-            
-            # Получаем количества, если они доступны
-            has_quantities = False
-            quantities = {}
-            
-            # Проверяем, есть ли дополнительная колонка с количествами (12-я колонка)
-            if len(order) > 12 and order[12]:
-                try:
-                    # Парсим JSON строку с количествами
-                    import json
-                    quantities = json.loads(order[12].replace("'", '"'))
-                    has_quantities = True
-                except Exception as e:
-                    logger.error(f"Ошибка при парсинге количеств блюд: {e}")
-            
-            for dish in dishes:
-                # Проверяем, содержит ли блюдо уже информацию о количестве
-                if ' x' in dish:
-                    # Блюдо уже содержит количество, просто экранируем и отображаем как есть
-                    escaped_dish = escape_markdown_v2(dish)
-                    order_info += f"  • {escaped_dish}\n"
-                else:
-                    # Блюдо не содержит количество, добавляем из quantities или по умолчанию 1
-                    escaped_dish = escape_markdown_v2(dish)
-                    quantity = quantities.get(dish, 1) if has_quantities else 1
-                    order_info += f"  • {escaped_dish} x{quantity}\n"
-            
-            escaped_wishes = escape_markdown_v2(order[10])
-            order_info += f"📝 Пожелания: {escaped_wishes}\n"
-            
-            order_sum = int(float(order[5])) if order[5] else 0
-            escaped_sum = escape_markdown_v2(str(order_sum))
-            order_info += f"💰 Сумма заказа: {escaped_sum} р\\.\n"
-            order_info += translations.get_message('active_orders_separator')
-            
-            # Если текущее сообщение станет слишком длинным, начинаем новое
-            if len(current_message + order_info) > 3000:  # Оставляем запас для доп. текста
-                messages.append(current_message)
-                current_message = order_info
-            else:
-                current_message += order_info
+        # Сначала новые заказы: записи идут в порядке строк листа, то есть создания
+        user_orders.reverse()
         
-        # Добавляем последнее сообщение со списком заказов, если оно есть
-        if current_message:
-            messages.append(current_message)
+        # Формируем карточки заказов и упаковываем их в как можно меньшее число сообщений
+        blocks = [escape_markdown_v2("Ваши оплаченные заказы:") + "\n\n"]
+        blocks.extend(render_order_card(order, "✅") for order in user_orders)
+        messages = pack_messages(blocks)
         
         # Логирование для отладки
         logger.info(f"Всего найдено оплаченных заказов: {len(user_orders)}")
@@ -744,18 +401,14 @@ async def show_edit_active_orders(update: telegram.Update, context: telegram.ext
     user_id = str(update.effective_user.id)
     
     # Получаем дату на завтрашний день
-    tomorrow_date = (datetime.now() + timedelta(days=1)).strftime("%d.%m.%y")
+    tomorrow_date = (datetime.now() + timedelta(days=1)).date()
     
-    from orderbot.services.sheets import get_orders_sheet
-    orders_sheet = get_orders_sheet()
-    all_orders = orders_sheet.get_all_values()
+    await order_store.ensure_fresh()
     
     # Фильтруем только активные заказы на завтрашний день
     editable_orders = [
-        row for row in all_orders[1:] 
-        if row[3] == user_id and 
-           row[2] == 'Активен' and 
-           row[11] == tomorrow_date  # Проверяем дату выдачи на завтра
+        record for record in order_store.records_by_user(user_id, [OrderStatus.ACTIVE])
+        if record.delivery_date == tomorrow_date  # Проверяем дату выдачи на завтра
     ]
     
     if not editable_orders:
@@ -776,12 +429,11 @@ async def show_edit_active_orders(update: telegram.Update, context: telegram.ext
     keyboard = []
     for order in editable_orders:
         # Формируем текст кнопки с информацией о заказе
-        delivery_date = order[11] if order[11] else None
-        meal_type = order[8]
-        meal_type_with_date = f"{translations.get_meal_type(meal_type)} ({delivery_date})" if delivery_date else translations.get_meal_type(meal_type)
+        meal_type = translations.get_meal_type(order.meal_type)
+        meal_type_with_date = f"{meal_type} ({order.delivery_date.strftime('%d.%m.%y')})"
         
-        button_text = f"Заказ {order[0]} - {meal_type_with_date}"
-        keyboard.append([InlineKeyboardButton(button_text, callback_data=f"edit_order:{order[0]}")])
+        button_text = f"Заказ {order.order_id} - {meal_type_with_date}"
+        keyboard.append([InlineKeyboardButton(button_text, callback_data=f"edit_order:{order.order_id}")])
     
     # Добавляем кнопку возврата
     keyboard.append([InlineKeyboardButton(translations.get_button('back'), callback_data="my_orders")])
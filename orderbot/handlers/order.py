@@ -4,7 +4,10 @@ from telegram.constants import ParseMode
 from datetime import datetime, timedelta, date
 import logging
 from .. import translations
-from ..services import sheets
+from ..services import sheets, gateway
+from ..services.order_store import order_store
+from ..services.journal import journal, OP_STATUS
+from ..services.dishes import decode_dishes, split_quantities
 from ..services.sheets import (
     orders_sheet, get_dishes_for_meal, get_next_order_id, 
     save_order, update_order, is_user_authorized
@@ -349,7 +352,7 @@ async def process_order_save(update: telegram.Update, context: telegram.ext.Cont
         order['user_id'] = str(update.effective_user.id)
     
     if 'order_id' not in order:
-        order['order_id'] = get_next_order_id()
+        order['order_id'] = await gateway.call(get_next_order_id)
     
     # Формируем ссылку на профиль пользователя
     username = update.effective_user.username or '-'
@@ -417,29 +420,26 @@ async def process_order_save(update: telegram.Update, context: telegram.ext.Cont
     if not context.user_data.get('editing'):
         success = await save_order(order_data)
     else:
-        # Получаем все заказы и ищем нужный для обновления
-        from orderbot.services.sheets import get_orders_sheet
-        orders_sheet = get_orders_sheet()
-        all_orders = orders_sheet.get_all_values()
+        # Ищем нужный заказ для обновления по индексу номеров заказов
+        await order_store.ensure_fresh()
+        row = order_store.get(order['order_id'])
         order_found = False
         
-        for idx, row in enumerate(all_orders):
-            if (row[0] == order['order_id'] and  # Проверяем ID заказа
-                row[2] == 'Активен' and          # Проверяем что заказ активен
-                row[3] == order['user_id']):     # Проверяем ID пользователя
-                
-                try:
-                    # Обновляем ячейку с суммой заказа отдельно, чтобы избежать проблем с форматированием
-                    orders_sheet.update_cell(idx + 1, 6, float(total))  # Колонка F (индекс 5) содержит сумму заказа
-                    success = await update_order(order['order_id'], idx + 1, order_data)
-                    order_found = True
-                except Exception as e:
-                    print(f"Ошибка при обновлении заказа: {e}")
-                    success = False
-                break
+        if (row is not None and
+            row[2] == 'Активен' and          # Проверяем что заказ активен
+            row[3] == order['user_id']):     # Проверяем ID пользователя
+            
+            row_number = order_store.row_number(order['order_id'])
+            try:
+                # Сумма заказа записывается вместе со строкой (колонка F)
+                success = await update_order(order['order_id'], row_number, order_data)
+                order_found = True
+            except Exception as e:
+                logger.error(f"Ошибка при обновлении заказа: {e}")
+                success = False
         
         if not order_found:
-            print(f"Ошибка: заказ с ID {order['order_id']} не найден или не активен")
+            logger.error(f"Ошибка: заказ с ID {order['order_id']} не найден или не активен")
             message = translations.get_message('order_not_found')
             keyboard = [
                 [InlineKeyboardButton(translations.get_button('new_order'), callback_data='new_order')],
@@ -555,21 +555,8 @@ async def cancel_order(update: telegram.Update, context: telegram.ext.ContextTyp
     user_id = str(update.effective_user.id)
     
     try:
-        # Получаем все заказы и ищем нужный для отмены
-        from orderbot.services.sheets import get_orders_sheet
-        orders_sheet = get_orders_sheet()
-        all_orders = orders_sheet.get_all_values()
-        order_found = False
-        
-        for idx, row in enumerate(all_orders):
-            if (row[0] == order['order_id'] and  # Проверяем ID заказа
-                row[2] in ['Активен', 'Принят', 'Ожидает оплаты'] and  # Проверяем статус
-                row[3] == user_id):              # Проверяем ID пользователя
-                
-                # Меняем статус заказа на "Отменён"
-                orders_sheet.update_cell(idx + 1, 3, 'Отменён')
-                order_found = True
-                break
+        # Ищем нужный заказ для отмены по индексу номеров заказов
+        order_found = await _cancel_user_order(order['order_id'], user_id)
         
         if not order_found:
             message = translations.get_message('order_cancel_error')
@@ -591,7 +578,7 @@ async def cancel_order(update: telegram.Update, context: telegram.ext.ContextTyp
         return MENU
         
     except Exception as e:
-        print(f"Ошибка при отмене заказа: {e}")
+        logger.error(f"Ошибка при отмене заказа: {e}")
         message = translations.get_message('order_cancel_error')
         keyboard = [
             [InlineKeyboardButton(translations.get_button('new_order'), callback_data='new_order')],
@@ -602,42 +589,50 @@ async def cancel_order(update: telegram.Update, context: telegram.ext.ContextTyp
         await query.edit_message_text(message, reply_markup=reply_markup)
         return MENU
 
+async def _cancel_user_order(order_id: str, user_id: str) -> bool:
+    """Меняет статус заказа пользователя на "Отменён".
+    
+    Returns:
+        bool: True, если заказ найден и отменён
+    """
+    await order_store.ensure_fresh()
+    row = order_store.get(order_id)
+    if (row is None or
+        row[2] not in ['Активен', 'Принят', 'Ожидает оплаты'] or  # Проверяем статус
+        row[3] != user_id):                                       # Проверяем ID пользователя
+        return False
+    
+    # Меняем статус заказа на "Отменён"
+    journal.record(OP_STATUS, order_id, 'Отменён')
+    return True
+
 async def get_order_info(order_id: str) -> dict:
     """Получение информации о заказе из таблицы."""
-    from orderbot.services.sheets import get_orders_sheet
-    orders_sheet = get_orders_sheet()
-    all_orders = orders_sheet.get_all_values()
-    for row in all_orders[1:]:  # Пропускаем заголовок
-        if row[0] == order_id:
-            # Пытаемся получить информацию о количествах блюд
-            quantities = {}
-            # Проверяем, есть ли дополнительная колонка с количествами (12-я колонка)
-            if len(row) > 12 and row[12]:
-                try:
-                    # Парсим JSON строку с количествами
-                    import json
-                    quantities = json.loads(row[12].replace("'", '"'))
-                except Exception as e:
-                    logger.error(f"Ошибка при парсинге количеств блюд в get_order_info: {e}")
-            
-            # Формируем словарь с информацией о заказе
-            order_info = {
-                'order_id': row[0],
-                'timestamp': row[1],
-                'status': row[2],
-                'user_id': row[3],
-                'username': row[4],
-                'total_price': row[5],
-                'room': row[6],
-                'name': row[7],
-                'meal_type': row[8],
-                'dishes': row[9].split(', ') if row[9] else [],
-                'wishes': row[10],
-                'delivery_date': row[11],
-                'quantities': quantities  # Добавляем информацию о количествах
-            }
-            return order_info
-    return None
+    await order_store.ensure_fresh()
+    row = order_store.get(order_id)
+    if row is None:
+        return None
+    
+    # Блюда и их количества из строки блюд заказа
+    dishes, quantities = split_quantities(decode_dishes(row[9]))
+    
+    # Формируем словарь с информацией о заказе
+    order_info = {
+        'order_id': row[0],
+        'timestamp': row[1],
+        'status': row[2],
+        'user_id': row[3],
+        'username': row[4],
+        'total_price': row[5],
+        'room': row[6],
+        'name': row[7],
+        'meal_type': row[8],
+        'dishes': dishes,
+        'wishes': row[10],
+        'delivery_date': row[11],
+        'quantities': quantities  # Добавляем информацию о количествах
+    }
+    return order_info
 
 async def handle_order_update(update: telegram.Update, context: telegram.ext.ContextTypes.DEFAULT_TYPE):
     """Обработка всех изменений в заказе."""
@@ -711,7 +706,7 @@ async def handle_order_update(update: telegram.Update, context: telegram.ext.Con
         
         # Добавляем список блюд
         for dish in order_info['dishes']:
-            message += f"  • {dish}\n"
+            message += f"  • {dish} x{order_info['quantities'].get(dish, 1)}\n"
         
         message += f"📝 Пожелания: {order_info['wishes']}\n"
         message += f"💰 Сумма заказа: {order_info['total_price']} р.\n"
@@ -768,21 +763,8 @@ async def handle_order_update(update: telegram.Update, context: telegram.ext.Con
         user_id = str(update.effective_user.id)
         
         try:
-            # Получаем все заказы и ищем нужный для отмены
-            from orderbot.services.sheets import get_orders_sheet
-            orders_sheet = get_orders_sheet()
-            all_orders = orders_sheet.get_all_values()
-            order_found = False
-            
-            for idx, row in enumerate(all_orders):
-                if (row[0] == order['order_id'] and  # Проверяем ID заказа
-                    row[2] in ['Активен', 'Принят', 'Ожидает оплаты'] and  # Проверяем статус
-                    row[3] == user_id):              # Проверяем ID пользователя
-                    
-                    # Меняем статус заказа на "Отменён"
-                    orders_sheet.update_cell(idx + 1, 3, 'Отменён')
-                    order_found = True
-                    break
+            # Ищем нужный заказ для отмены по индексу номеров заказов
+            order_found = await _cancel_user_order(order['order_id'], user_id)
             
             if not order_found:
                 message = translations.get_message('order_cancel_error')
@@ -804,7 +786,7 @@ async def handle_order_update(update: telegram.Update, context: telegram.ext.Con
             return MENU
             
         except Exception as e:
-            print(f"Ошибка при отмене заказа: {e}")
+            logger.error(f"Ошибка при отмене заказа: {e}")
             message = translations.get_message('order_cancel_error')
             keyboard = [
                 [InlineKeyboardButton(translations.get_button('new_order'), callback_data='new_order')],
@@ -5,13 +5,15 @@ import logging
 import asyncio
 from typing import List, Dict, Any, Optional, Union, Tuple
 from datetime import datetime, timedelta
-import io
-import base64
-from PIL import Image
 
 from ..services import sbp
+from ..services.media import decode_base64_image, send_image
 from .. import translations
 from ..services.sheets import get_orders_sheet, update_order, save_payment_info, get_payments_sheet
+from ..services import gateway
+from ..services.payment_poller import payment_poller, PendingPayment, STATUS_EXPIRED, STATUS_EXHAUSTED
+from ..services.order_store import order_store
+from ..services.journal import journal, OP_STATUS
 from ..config import TOCHKA_ACCOUNT_ID, TOCHKA_MERCHANT_ID, TOCHKA_JWT_TOKEN
 from ..utils.auth_decorator import require_auth
 from .states import MENU, PAYMENT
@@ -20,10 +22,22 @@ from ..services.user import get_user_data, update_user_stats
 # Настройка логгера
 logger = logging.getLogger(__name__)
 
-# Максимальное число попыток проверки статуса
-MAX_STATUS_CHECKS = 20
-# Интервал между проверками в секундах
-STATUS_CHECK_INTERVAL = 15
+# Статусы заказов, которые можно оплатить
+PAYABLE_STATUSES = ['Принят', 'Активен', 'Ожидает оплаты']
+
+async def mark_orders_paid(order_ids: List[str]) -> None:
+    """
+    Меняет статус оплаченных заказов на "Оплачен"
+    
+    Args:
+        order_ids: Номера оплаченных заказов
+    """
+    await order_store.ensure_fresh()
+    for order_id in order_ids:
+        record = order_store.record(order_id)
+        if record is not None and record.status_text in PAYABLE_STATUSES:
+            # Обновляем статус заказа на "Оплачен", в таблицу статусы попадут одним пакетом
+            journal.record(OP_STATUS, order_id, 'Оплачен')
 
 @require_auth
 async def create_payment(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
@@ -60,9 +74,8 @@ async def create_payment(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
     # Получаем сумму всех активных заказов пользователя
     user_id = str(update.effective_user.id)
     
-    orders_sheet = get_orders_sheet()
-    all_orders = orders_sheet.get_all_values()
-    user_orders = [row for row in all_orders[1:] if row[3] == user_id and row[2] in ['Принят', 'Активен', 'Ожидает оплаты']]
+    await order_store.ensure_fresh()
+    user_orders = order_store.records_by_user(user_id, PAYABLE_STATUSES)
     
     if not user_orders:
         keyboard = [
@@ -77,7 +90,7 @@ async def create_payment(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
         return MENU
     
     # Рассчитываем общую сумму заказов
-    total_sum = sum(int(float(order[5])) for order in user_orders if order[5])
+    total_sum = sum(order.total for order in user_orders)
     
     # Получаем номер комнаты из таблицы пользователей через функцию get_user_data
     user_data = await get_user_data(user_id)
@@ -102,7 +115,7 @@ async def create_payment(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
     
     try:
         # Создаем QR-код
-        qr_data = sbp.register_qr_code(
+        qr_data = await sbp.register_qr_code(
             account_id=TOCHKA_ACCOUNT_ID,
             merchant_id=TOCHKA_MERCHANT_ID,
             amount=amount_kopecks,
@@ -121,15 +134,15 @@ async def create_payment(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
             )
             return MENU
         
-        # Сохраняем информацию об оплате в таблицу
-        payment_saved = await save_payment_info(
+        # Сохраняем информацию об оплате в таблицу и получаем её номер
+        payment_id = await save_payment_info(
             user_id=str(update.effective_user.id),
             amount=total_sum,
             status="ожидает",
             room=room_number
         )
         
-        if not payment_saved:
+        if not payment_id:
             logger.error("Не удалось сохранить информацию об оплате в таблицу")
             keyboard = [
                 [InlineKeyboardButton(translations.get_button('my_orders'), callback_data='my_orders')]
@@ -141,44 +154,28 @@ async def create_payment(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
             )
             return MENU
         
-        # Получаем ID последней сохраненной оплаты
-        payments_sheet = get_payments_sheet()
-        all_payments = payments_sheet.get_all_values()
-        last_payment_id = all_payments[-1][0] if len(all_payments) > 1 else "1"
-        
         # Сохраняем данные о платеже в контексте
         context.user_data['payment'] = {
             'qrc_id': qr_data['qrcId'],
             'amount': total_sum,
-            'orders': [order[0] for order in user_orders],  # Список ID заказов
+            'orders': [order.order_id for order in user_orders],  # Список ID заказов
             'created_at': datetime.now().isoformat(),
             'payload': qr_data.get('payload', ''),
-            'status_checks': 0,  # Счетчик проверок статуса
-            'payment_id': last_payment_id,  # ID оплаты в таблице
+            'payment_id': payment_id,  # ID оплаты в таблице
             'chat_id': update.effective_chat.id,  # Сохраняем ID чата
             'room': room_number,  # Сохраняем номер комнаты
             'user_id': str(update.effective_user.id)  # Важно: сохраняем ID пользователя
         }
         
         # Логируем данные платежа для отладки
-        logger.info(f"Создан платеж с данными: qrc_id={qr_data['qrcId']}, amount={total_sum}, payment_id={last_payment_id}, user_id={update.effective_user.id}")
+        logger.info(f"Создан платеж с данными: qrc_id={qr_data['qrcId']}, amount={total_sum}, payment_id={payment_id}, user_id={update.effective_user.id}")
         
         # Декодируем изображение QR-кода из base64
         qr_image_data = qr_data.get('image', {}).get('content', '')
         if qr_image_data:
             try:
-                # Удаляем префикс data:image/png;base64, если он есть
-                if isinstance(qr_image_data, str) and ',' in qr_image_data:
-                    qr_image_data = qr_image_data.split(',', 1)[1]
-                
-                # Декодируем base64 в бинарные данные
-                image_bytes = base64.b64decode(qr_image_data)
-                image = Image.open(io.BytesIO(image_bytes))
-                
-                # Сохраняем изображение во временный файл
-                buffer = io.BytesIO()
-                image.save(buffer, format='PNG')
-                buffer.seek(0)
+                # Декодируем base64 в бинарные данные; PNG банка отправляется без перекодирования
+                image_bytes = decode_base64_image(qr_image_data)
                 
                 # Формируем сообщение с QR-кодом и суммой (выделенной жирным)
                 message_text = (
@@ -198,9 +195,11 @@ async def create_payment(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
                 
                 # 1. Отправляем сообщение с QR-кодом и информацией о платеже (без кнопок)
                 # Используем parse_mode=MarkdownV2 для выделения суммы жирным шрифтом
-                qr_message = await context.bot.send_photo(
-                    chat_id=update.effective_chat.id,
-                    photo=buffer,
+                qr_message = await send_image(
+                    context.bot,
+                    update.effective_chat.id,
+                    image_bytes,
+                    f"{qr_data['qrcId']}.png",
                     caption=message_text,
                     parse_mode='Markdown'  # Используем Markdown для выделения жирным
                 )
@@ -225,7 +224,7 @@ async def create_payment(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
                 
                 # Запускаем автоматическую проверку статуса платежа
                 try:
-                    auto_check_success = start_auto_check_payment(context, update.effective_chat.id, context.user_data)
+                    auto_check_success = start_auto_check_payment(update.effective_chat.id, context.user_data)
                     if not auto_check_success:
                         logger.info(f"Не удалось запустить автоматическую проверку платежа при создании")
                 except Exception as e:
@@ -276,7 +275,7 @@ async def create_payment(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
                 
                 # Запускаем автоматическую проверку статуса платежа
                 try:
-                    auto_check_success = start_auto_check_payment(context, update.effective_chat.id, context.user_data)
+                    auto_check_success = start_auto_check_payment(update.effective_chat.id, context.user_data)
                     if not auto_check_success:
                         logger.info(f"Не удалось запустить автоматическую проверку платежа при создании")
                 except Exception as e:
@@ -324,7 +323,7 @@ async def create_payment(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
         
         # Запускаем автоматическую проверку статуса платежа
         try:
-            auto_check_success = start_auto_check_payment(context, update.effective_chat.id, context.user_data)
+            auto_check_success = start_auto_check_payment(update.effective_chat.id, context.user_data)
             if not auto_check_success:
                 logger.info(f"Не удалось запустить автоматическую проверку платежа при создании")
         except Exception as e:
@@ -344,345 +343,138 @@ async def create_payment(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
         )
         return MENU
 
-# Функция для автоматической проверки статуса платежа
-async def auto_check_payment_status(context: ContextTypes.DEFAULT_TYPE) -> None:
+async def _recover_user_id(payment: Dict[str, Any]) -> str:
+    """Возвращает ID пользователя из данных платежа, при отсутствии - из его заказов."""
+    user_id = str(payment.get('user_id', '')).strip()
+    if user_id:
+        return user_id
+    logger.warning(f"В данных платежа отсутствует user_id! Попытка восстановить из заказов.")
+    try:
+        await order_store.ensure_fresh()
+        for order_id in payment.get('orders', []):
+            order = order_store.record(order_id)
+            if order is not None:
+                payment['user_id'] = order.user_id
+                logger.info(f"Восстановлен user_id={order.user_id} из заказа {order.order_id}")
+                return order.user_id
+    except Exception as e:
+        logger.error(f"Ошибка при попытке восстановить user_id из заказов: {e}")
+    return ''
+
+def _auto_check_result_message(payment_status: str, payment_message: str) -> Tuple[str, InlineKeyboardMarkup]:
+    """Текст и кнопки сообщения с итогом автоматической проверки оплаты."""
+    if payment_status == 'accepted':
+        text = translations.get_message('payment_success')
+        keyboard = [
+            [InlineKeyboardButton(translations.get_button('my_orders'), callback_data='my_orders')],
+            [InlineKeyboardButton(translations.get_button('new_order'), callback_data='new_order')]
+        ]
+    elif payment_status == STATUS_EXHAUSTED:
+        text = "Автоматическая проверка завершена. Нажмите кнопку для ручной проверки статуса."
+        keyboard = [
+            [InlineKeyboardButton(translations.get_button('check_payment'), callback_data='payment:check')],
+            [InlineKeyboardButton(translations.get_button('cancel_payment'), callback_data='payment:cancel')]
+        ]
+    else:
+        if payment_status == 'rejected':
+            text = (
+                f"Платеж отклонен.\n"
+                f"Причина: {payment_message}\n\n"
+                f"Попробуйте создать новый платеж или выберите другой способ оплаты."
+            )
+        else:
+            text = translations.get_message('payment_expired')
+        keyboard = [
+            [InlineKeyboardButton(translations.get_button('pay_orders'), callback_data='pay_orders')],
+            [InlineKeyboardButton(translations.get_button('my_orders'), callback_data='my_orders')]
+        ]
+    return text, InlineKeyboardMarkup(keyboard)
+
+# Статусы оплаты в таблице по итогам автоматической проверки
+AUTO_CHECK_PAYMENT_STATUSES = {
+    'accepted': "оплачено",
+    'rejected': "отклонено",
+    STATUS_EXPIRED: "истек срок",
+}
+
+async def apply_payment_results(bot, results: List[Tuple[PendingPayment, Dict[str, Any]]]) -> None:
     """
-    Автоматически проверяет статус оплаты с заданным интервалом
-    
+    Применяет итоги автоматической проверки оплат одним пакетом
+
+    Статусы всех оплаченных заказов записываются в журнал разом и уходят
+    в таблицу одним batch_update, статусы оплат - одним чтением и одной
+    записью листа оплат. Затем каждому пользователю показывается итог.
+
     Args:
-        context: Контекст бота
+        bot: Бот для отправки сообщений
+        results: Завершившиеся оплаты и ответы банка
     """
-    job = context.job
-    chat_id = job.data['chat_id']
-    user_data = job.data['user_data']
-    
-    try:
-        # Проверяем, есть ли данные о платеже
-        if 'payment' not in user_data or 'qrc_id' not in user_data['payment']:
-            # Платеж не найден, отменяем задачу
-            logger.info(f"Автопроверка: данные о платеже не найдены")
-            # Останавливаем задачу автопроверки
-            try:
-                job_name = f"payment_check_{chat_id}"
-                current_jobs = context.job_queue.get_jobs_by_name(job_name)
-                for job in current_jobs:
-                    job.schedule_removal()
-                logger.info(f"Автопроверка: задача остановлена из-за отсутствия данных о платеже")
-            except Exception as e:
-                logger.error(f"Ошибка при остановке задачи автопроверки: {e}")
-            return
-        
-        # Логируем данные платежа для отладки
-        logger.info(f"Данные платежа: {user_data['payment']}")
-        
-        # Проверяем наличие ID пользователя в данных платежа
-        if 'user_id' not in user_data['payment']:
-            logger.warning(f"В данных платежа отсутствует user_id! Попытка восстановить из заказов.")
-            
-            # Попытка получить user_id из заказов
-            try:
-                if 'orders' in user_data['payment']:
-                    orders = user_data['payment']['orders']
-                    if orders:
-                        orders_sheet = get_orders_sheet()
-                        all_orders = orders_sheet.get_all_values()
-                        
-                        # Ищем заказ по ID и извлекаем user_id
-                        for order in all_orders[1:]:  # Пропускаем заголовок
-                            if order[0] in orders:  # ID заказа в первом столбце
-                                user_id = order[3]  # User ID в четвертом столбце
-                                # Сохраняем ID пользователя в данных платежа
-                                user_data['payment']['user_id'] = user_id
-                                logger.info(f"Восстановлен user_id={user_id} из заказа {order[0]}")
-                                break
-            except Exception as e:
-                logger.error(f"Ошибка при попытке восстановить user_id из заказов: {e}")
-        
-        # Увеличиваем счетчик проверок
-        user_data['payment']['status_checks'] += 1
-        
-        # Проверяем наличие ID сообщения с кнопками
-        if 'buttons_message_id' not in user_data['payment']:
-            logger.warning(f"Автопроверка: не найден ID сообщения с кнопками")
-            return
-            
-        buttons_message_id = user_data['payment']['buttons_message_id']
-        
-        # Проверяем, не превышено ли максимальное число попыток
-        if user_data['payment']['status_checks'] > MAX_STATUS_CHECKS:
-            logger.info(f"Автопроверка: достигнуто максимальное число попыток ({MAX_STATUS_CHECKS})")
-            
-            # Отправляем сообщение о превышении числа попыток
-            keyboard = [
-                [InlineKeyboardButton(translations.get_button('check_payment'), callback_data='payment:check')],
-                [InlineKeyboardButton(translations.get_button('cancel_payment'), callback_data='payment:cancel')]
-            ]
-            reply_markup = InlineKeyboardMarkup(keyboard)
-            
-            # Обновляем сообщение с кнопками
-            try:
-                await context.bot.edit_message_text(
-                    chat_id=chat_id,
-                    message_id=buttons_message_id,
-                    text="Автоматическая проверка завершена. Нажмите кнопку для ручной проверки статуса.",
-                    reply_markup=reply_markup
-                )
-            except Exception as e:
-                logger.error(f"Ошибка при автоматической проверке статуса оплаты: {e}")
-            
-            # Останавливаем задачу автопроверки - ВАЖНО!
-            try:
-                job_name = f"payment_check_{chat_id}"
-                current_jobs = context.job_queue.get_jobs_by_name(job_name)
-                for job in current_jobs:
-                    job.schedule_removal()
-                logger.info(f"Автопроверка: задача остановлена после достижения максимального числа попыток")
-            except Exception as e:
-                logger.error(f"Ошибка при остановке задачи автопроверки: {e}")
-                
-            # Отменяем задачу
-            return
-        
-        # Проверяем статус оплаты
-        qrc_id = user_data['payment']['qrc_id']
-        logger.info(f"Автопроверка: запрос статуса QR-кода {qrc_id}, попытка {user_data['payment']['status_checks']}")
-        
-        status_data = sbp.get_qr_code_status(qrc_id)
-        
-        if not status_data:
-            logger.warning(f"Автопроверка: не удалось получить статус оплаты")
-            return
-        
-        # Проверяем статус платежа
+    paid_orders = []
+    payment_statuses = {}
+    paid_users = []
+    for pending, status_data in results:
+        if not pending.active:
+            continue
+        payment = pending.payment
         payment_status = status_data.get('status', '').lower()
-        payment_message = status_data.get('message', '')
-        
-        logger.info(f"Автопроверка: статус платежа {payment_status}, сообщение: {payment_message}")
-        
-        # Проверяем время жизни QR-кода (обычно 5 минут = 300 секунд)
-        # Если прошло больше 5 минут с момента создания и статус все еще notstarted,
-        # считаем QR-код истекшим и завершаем проверку
-        if payment_status == 'notstarted' and 'created_at' in user_data['payment']:
-            try:
-                created_at = datetime.fromisoformat(user_data['payment']['created_at'])
-                now = datetime.now()
-                delta = now - created_at
-                
-                # Проверяем, прошло ли 10 минут (600 секунд) с момента создания QR-кода
-                if delta.total_seconds() > 600:
-                    logger.info(f"Автопроверка: QR-код истек по времени (прошло {delta.total_seconds()} секунд)")
-                    
-                    # Обновляем статус оплаты в таблице
-                    payments_sheet = get_payments_sheet()
-                    await update_payment_status(payments_sheet, user_data['payment'].get('payment_id', ''), "истек срок")
-                    
-                    # Отправляем сообщение об истечении срока
-                    keyboard = [
-                        [InlineKeyboardButton(translations.get_button('pay_orders'), callback_data='pay_orders')],
-                        [InlineKeyboardButton(translations.get_button('my_orders'), callback_data='my_orders')]
-                    ]
-                    reply_markup = InlineKeyboardMarkup(keyboard)
-                    
-                    try:
-                        await context.bot.edit_message_text(
-                            chat_id=chat_id,
-                            message_id=buttons_message_id,
-                            text=translations.get_message('payment_expired'),
-                            reply_markup=reply_markup
-                        )
-                    except Exception as e:
-                        logger.error(f"Ошибка при обновлении сообщения об истечении срока QR-кода: {e}")
-                    
-                    # Останавливаем задачу автопроверки
-                    try:
-                        job_name = f"payment_check_{chat_id}"
-                        current_jobs = context.job_queue.get_jobs_by_name(job_name)
-                        for job in current_jobs:
-                            job.schedule_removal()
-                        logger.info(f"Автопроверка: задача остановлена, QR-код истек по времени")
-                    except Exception as e:
-                        logger.error(f"Ошибка при остановке задачи автопроверки: {e}")
-                    
-                    # Очищаем данные о платеже
-                    if 'payment' in user_data:
-                        del user_data['payment']
-                    
-                    # Отменяем задачу
-                    return
-            except Exception as e:
-                logger.error(f"Ошибка при проверке времени жизни QR-кода: {e}")
-            
         if payment_status == 'accepted':
-            # Оплата успешна, обновляем статусы заказов
-            orders_sheet = get_orders_sheet()
-            all_orders = orders_sheet.get_all_values()
-            
-            for order_id in user_data['payment']['orders']:
-                for idx, row in enumerate(all_orders):
-                    if row[0] == order_id and row[2] in ['Принят', 'Активен', 'Ожидает оплаты']:
-                        # Обновляем статус заказа на "Оплачен"
-                        orders_sheet.update_cell(idx + 1, 3, 'Оплачен')
-            
-            # Обновляем статус оплаты в таблице
-            payments_sheet = get_payments_sheet()
-            await update_payment_status(payments_sheet, user_data['payment'].get('payment_id', ''), "оплачено")
-            
-            # Обновляем статистику пользователя
-            try:
-                # Получаем user_id из контекста платежа
-                payment_user_id = str(user_data['payment'].get('user_id', ''))
-                
-                # Проверяем, что user_id не пустой
-                if not payment_user_id:
-                    logger.error(f"ID пользователя отсутствует в данных платежа. Невозможно обновить статистику.")
-                else:
-                    logger.info(f"Получен ID пользователя для обновления статистики: '{payment_user_id}' (тип: {type(payment_user_id)})")
-                    # Убеждаемся, что user_id - строка и удаляем возможные окружающие пробелы
-                    payment_user_id = payment_user_id.strip()
-                    # Вызываем функцию обновления статистики
-                    update_result = await update_user_stats(payment_user_id)
-                    if update_result:
-                        logger.info(f"Статистика пользователя с ID {payment_user_id} успешно обновлена после оплаты")
-                    else:
-                        logger.error(f"Ошибка при обновлении статистики пользователя с ID {payment_user_id} после оплаты")
-            except Exception as e:
-                logger.error(f"Ошибка при обновлении статистики пользователя: {e}")
-            
-            # Удаляем сообщение с QR-кодом, если оно есть
+            paid_orders.extend(payment.get('orders', []))
+            paid_users.append(await _recover_user_id(payment))
+        if payment_status in AUTO_CHECK_PAYMENT_STATUSES and payment.get('payment_id'):
+            payment_statuses[payment['payment_id']] = AUTO_CHECK_PAYMENT_STATUSES[payment_status]
+
+    if paid_orders:
+        await mark_orders_paid(paid_orders)
+    if payment_statuses:
+        await update_payment_statuses(get_payments_sheet(), payment_statuses)
+
+    # Обновляем статистику пользователей
+    for payment_user_id in dict.fromkeys(paid_users):
+        if not payment_user_id:
+            logger.error(f"ID пользователя отсутствует в данных платежа. Невозможно обновить статистику.")
+            continue
+        try:
+            if await update_user_stats(payment_user_id):
+                logger.info(f"Статистика пользователя с ID {payment_user_id} успешно обновлена после оплаты")
+            else:
+                logger.error(f"Ошибка при обновлении статистики пользователя с ID {payment_user_id} после оплаты")
+        except Exception as e:
+            logger.error(f"Ошибка при обновлении статистики пользователя: {e}")
+
+    for pending, status_data in results:
+        if not pending.active:
+            continue
+        payment = pending.payment
+        payment_status = status_data.get('status', '').lower()
+        chat_id = pending.chat_id
+        logger.info(f"Автопроверка: итог оплаты {pending.qrc_id} для chat_id={chat_id}: {payment_status}")
+
+        # Удаляем сообщение с QR-кодом после успешной оплаты
+        if payment_status == 'accepted' and 'qr_message_id' in payment:
             try:
-                if 'qr_message_id' in user_data['payment']:
-                    qr_message_id = user_data['payment']['qr_message_id']
-                    await context.bot.delete_message(
-                        chat_id=chat_id,
-                        message_id=qr_message_id
-                    )
-                    logger.info(f"Сообщение с QR-кодом {qr_message_id} успешно удалено после успешной оплаты")
+                await bot.delete_message(chat_id=chat_id, message_id=payment['qr_message_id'])
             except Exception as e:
                 logger.warning(f"Не удалось удалить сообщение с QR-кодом после успешной оплаты: {e}")
-            
-            # Отправляем сообщение об успешной оплате
-            keyboard = [
-                [InlineKeyboardButton(translations.get_button('my_orders'), callback_data='my_orders')],
-                [InlineKeyboardButton(translations.get_button('new_order'), callback_data='new_order')]
-            ]
-            reply_markup = InlineKeyboardMarkup(keyboard)
-            
-            # Обновляем сообщение с кнопками
-            try:
-                await context.bot.edit_message_text(
-                    chat_id=chat_id,
-                    message_id=buttons_message_id,
-                    text=translations.get_message('payment_success'),
-                    reply_markup=reply_markup
-                )
-            except Exception as e:
-                logger.error(f"Ошибка при обновлении сообщения об успешной оплате: {e}")
-            
-            # Останавливаем задачу автопроверки
-            try:
-                job_name = f"payment_check_{chat_id}"
-                current_jobs = context.job_queue.get_jobs_by_name(job_name)
-                for job in current_jobs:
-                    job.schedule_removal()
-                logger.info(f"Автопроверка: задача остановлена, платеж успешно выполнен")
-            except Exception as e:
-                logger.error(f"Ошибка при остановке задачи автопроверки: {e}")
-            
-            # Очищаем данные о платеже
-            if 'payment' in user_data:
-                del user_data['payment']
-            
-            # Отменяем задачу
-            return
-            
-        elif payment_status == 'rejected':
-            # Платеж отклонен
-            message_text = (
-                f"Платеж отклонен.\n"
-                f"Причина: {payment_message}\n\n"
-                f"Попробуйте создать новый платеж или выберите другой способ оплаты."
-            )
-            
-            # Обновляем статус оплаты в таблице
-            payments_sheet = get_payments_sheet()
-            await update_payment_status(payments_sheet, user_data['payment'].get('payment_id', ''), "отклонено")
-            
-            keyboard = [
-                [InlineKeyboardButton(translations.get_button('pay_orders'), callback_data='pay_orders')],
-                [InlineKeyboardButton(translations.get_button('my_orders'), callback_data='my_orders')]
-            ]
-            reply_markup = InlineKeyboardMarkup(keyboard)
-            
-            # Обновляем сообщение с кнопками
-            try:
-                await context.bot.edit_message_text(
-                    chat_id=chat_id,
-                    message_id=buttons_message_id,
-                    text=message_text,
-                    reply_markup=reply_markup
-                )
-            except Exception as e:
-                logger.error(f"Ошибка при обновлении сообщения об отклонении платежа: {e}")
-            
-            # Останавливаем задачу автопроверки
-            try:
-                job_name = f"payment_check_{chat_id}"
-                current_jobs = context.job_queue.get_jobs_by_name(job_name)
-                for job in current_jobs:
-                    job.schedule_removal()
-                logger.info(f"Автопроверка: задача остановлена, платеж отклонен")
-            except Exception as e:
-                logger.error(f"Ошибка при остановке задачи автопроверки: {e}")
-            
-            # Очищаем данные о платеже
-            if 'payment' in user_data:
-                del user_data['payment']
-            
-            # Отменяем задачу
-            return
-            
-        elif payment_status == 'expired':
-            # Время действия QR-кода истекло
-            keyboard = [
-                [InlineKeyboardButton(translations.get_button('pay_orders'), callback_data='pay_orders')],
-                [InlineKeyboardButton(translations.get_button('my_orders'), callback_data='my_orders')]
-            ]
-            reply_markup = InlineKeyboardMarkup(keyboard)
-            
-            # Обновляем сообщение с кнопками
+
+        if 'buttons_message_id' in payment:
+            text, reply_markup = _auto_check_result_message(payment_status, status_data.get('message', ''))
             try:
-                await context.bot.edit_message_text(
+                await bot.edit_message_text(
                     chat_id=chat_id,
-                    message_id=buttons_message_id,
-                    text=translations.get_message('payment_expired'),
+                    message_id=payment['buttons_message_id'],
+                    text=text,
                     reply_markup=reply_markup
                 )
             except Exception as e:
-                logger.error(f"Ошибка при обновлении сообщения об истечении срока QR-кода: {e}")
-            
-            # Останавливаем задачу автопроверки
-            try:
-                job_name = f"payment_check_{chat_id}"
-                current_jobs = context.job_queue.get_jobs_by_name(job_name)
-                for job in current_jobs:
-                    job.schedule_removal()
-                logger.info(f"Автопроверка: задача остановлена, QR-код истек")
-            except Exception as e:
-                logger.error(f"Ошибка при остановке задачи автопроверки: {e}")
-            
-            # Очищаем данные о платеже
-            if 'payment' in user_data:
-                del user_data['payment']
-            
-            # Отменяем задачу
-            return
-            
-        # Для других статусов (pending, notstarted и т.д.) просто продолжаем проверку
-        # Не перезапускаем check_payment, продолжаем текущий цикл проверки
-            
-    except Exception as e:
-        logger.error(f"Ошибка при автоматической проверке статуса оплаты: {e}")
-        # При ошибке просто продолжаем, следующая проверка будет по расписанию
+                logger.error(f"Ошибка при обновлении сообщения с итогом оплаты: {e}")
+        else:
+            logger.warning(f"Автопроверка: не найден ID сообщения с кнопками")
+
+        # После автопроверки без итога платёж остаётся для ручной проверки
+        if payment_status != STATUS_EXHAUSTED:
+            del pending.user_data['payment']
+
+payment_poller.set_result_handler(apply_payment_results)
 
 @require_auth
 async def check_payment_status(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
@@ -738,7 +530,7 @@ async def check_payment_status(update: Update, context: ContextTypes.DEFAULT_TYP
     try:
         # Проверяем статус оплаты
         qrc_id = context.user_data['payment']['qrc_id']
-        status_data = sbp.get_qr_code_status(qrc_id)
+        status_data = await sbp.get_qr_code_status(qrc_id)
         
         # Логируем полный ответ для отладки
         logger.info(f"Получен ответ о статусе платежа: {status_data}")
@@ -767,14 +559,7 @@ async def check_payment_status(update: Update, context: ContextTypes.DEFAULT_TYP
         if payment_status == 'accepted':
             # Оплата успешна
             # Обновляем статусы заказов
-            orders_sheet = get_orders_sheet()
-            all_orders = orders_sheet.get_all_values()
-            
-            for order_id in context.user_data['payment']['orders']:
-                for idx, row in enumerate(all_orders):
-                    if row[0] == order_id and row[2] in ['Принят', 'Активен', 'Ожидает оплаты']:
-                        # Обновляем статус заказа на "Оплачен"
-                        orders_sheet.update_cell(idx + 1, 3, 'Оплачен')
+            await mark_orders_paid(context.user_data['payment']['orders'])
             
             # Обновляем статус оплаты в таблице
             payments_sheet = get_payments_sheet()
@@ -831,7 +616,7 @@ async def check_payment_status(update: Update, context: ContextTypes.DEFAULT_TYP
                 logger.error(f"Ошибка при обновлении сообщения об успешной оплате: {e}")
             
             # Останавливаем автоматическую проверку статуса платежа
-            stop_auto_check_payment(context, update.effective_chat.id)
+            stop_auto_check_payment(update.effective_chat.id)
             
             return MENU
             
@@ -858,7 +643,7 @@ async def check_payment_status(update: Update, context: ContextTypes.DEFAULT_TYP
                 del context.user_data['payment']
                 
             # Останавливаем автоматическую проверку статуса платежа
-            stop_auto_check_payment(context, update.effective_chat.id)
+            stop_auto_check_payment(update.effective_chat.id)
             
             return MENU
         
@@ -880,22 +665,9 @@ async def check_payment_status(update: Update, context: ContextTypes.DEFAULT_TYP
                 reply_markup=reply_markup
             )
             
-            # Пробуем запустить автоматическую проверку, если job_queue доступен
-            try:
-                # Проверяем, не запущена ли уже задача автопроверки
-                job_name = f"payment_check_{update.effective_chat.id}"
-                current_jobs = context.job_queue.get_jobs_by_name(job_name)
-                
-                if not current_jobs:
-                    # Задача не запущена, запускаем новую
-                    auto_check_success = start_auto_check_payment(context, update.effective_chat.id, context.user_data)
-                    if not auto_check_success:
-                        logger.info("Автоматическая проверка не запущена. Пользователь должен проверить статус вручную.")
-                else:
-                    logger.info(f"Задача автопроверки уже запущена для chat_id={update.effective_chat.id}, не запускаем повторно")
-            except Exception as e:
-                logger.warning(f"Не удалось запустить автоматическую проверку: {e}")
-                # При ошибке просто продолжаем, пользователь может проверить статус вручную
+            # Продолжаем автоматическую проверку; если QR-код уже проверяется, его расписание сохранится
+            if not start_auto_check_payment(update.effective_chat.id, context.user_data):
+                logger.info("Автоматическая проверка не запущена. Пользователь должен проверить статус вручную.")
             
             return PAYMENT
             
@@ -928,7 +700,7 @@ async def check_payment_status(update: Update, context: ContextTypes.DEFAULT_TYP
                 logger.error(f"Ошибка при обновлении сообщения об отклонении платежа: {e}")
             
             # Останавливаем автоматическую проверку статуса платежа
-            stop_auto_check_payment(context, update.effective_chat.id)
+            stop_auto_check_payment(update.effective_chat.id)
             
             return MENU
         
@@ -951,22 +723,9 @@ async def check_payment_status(update: Update, context: ContextTypes.DEFAULT_TYP
                 reply_markup=reply_markup
             )
             
-            # Пробуем запустить автоматическую проверку, если job_queue доступен
-            try:
-                # Проверяем, не запущена ли уже задача автопроверки
-                job_name = f"payment_check_{update.effective_chat.id}"
-                current_jobs = context.job_queue.get_jobs_by_name(job_name)
-                
-                if not current_jobs:
-                    # Задача не запущена, запускаем новую
-                    auto_check_success = start_auto_check_payment(context, update.effective_chat.id, context.user_data)
-                    if not auto_check_success:
-                        logger.info("Автоматическая проверка не запущена. Пользователь должен проверить статус вручную.")
-                else:
-                    logger.info(f"Задача автопроверки уже запущена для chat_id={update.effective_chat.id}, не запускаем повторно")
-            except Exception as e:
-                logger.warning(f"Не удалось запустить автоматическую проверку: {e}")
-                # При ошибке просто продолжаем, пользователь может проверить статус вручную
+            # Продолжаем автоматическую проверку; если QR-код уже проверяется, его расписание сохранится
+            if not start_auto_check_payment(update.effective_chat.id, context.user_data):
+                logger.info("Автоматическая проверка не запущена. Пользователь должен проверить статус вручную.")
             
             return PAYMENT
             
@@ -990,22 +749,9 @@ async def check_payment_status(update: Update, context: ContextTypes.DEFAULT_TYP
                 reply_markup=reply_markup
             )
             
-            # Пробуем запустить автоматическую проверку, если job_queue доступен
-            try:
-                # Проверяем, не запущена ли уже задача автопроверки
-                job_name = f"payment_check_{update.effective_chat.id}"
-                current_jobs = context.job_queue.get_jobs_by_name(job_name)
-                
-                if not current_jobs:
-                    # Задача не запущена, запускаем новую
-                    auto_check_success = start_auto_check_payment(context, update.effective_chat.id, context.user_data)
-                    if not auto_check_success:
-                        logger.info("Автоматическая проверка не запущена. Пользователь должен проверить статус вручную.")
-                else:
-                    logger.info(f"Задача автопроверки уже запущена для chat_id={update.effective_chat.id}, не запускаем повторно")
-            except Exception as e:
-                logger.warning(f"Не удалось запустить автоматическую проверку: {e}")
-                # При ошибке просто продолжаем, пользователь может проверить статус вручную
+            # Продолжаем автоматическую проверку; если QR-код уже проверяется, его расписание сохранится
+            if not start_auto_check_payment(update.effective_chat.id, context.user_data):
+                logger.info("Автоматическая проверка не запущена. Пользователь должен проверить статус вручную.")
             
             return PAYMENT
             
@@ -1035,78 +781,38 @@ async def check_payment_status(update: Update, context: ContextTypes.DEFAULT_TYP
             
         return PAYMENT
 
-def start_auto_check_payment(context, chat_id, user_data):
+def start_auto_check_payment(chat_id, user_data):
     """
-    Запускает автоматическую проверку статуса платежа
+    Ставит платеж на автоматическую проверку статуса
     
     Args:
-        context: Контекст бота
         chat_id: ID чата
         user_data: Данные пользователя
         
     Returns:
-        bool: True если задача успешно запущена, False в противном случае
+        bool: True если платеж проверяется, False в противном случае
     """
-    # Проверяем, доступна ли job_queue в контексте
-    if not context.job_queue:
-        logger.warning(f"job_queue недоступен в контексте, автоматическая проверка невозможна для chat_id={chat_id}")
-        return False
-        
-    # Сначала остановим предыдущие задачи с этим именем, если они есть
     try:
-        job_name = f"payment_check_{chat_id}"
-        current_jobs = context.job_queue.get_jobs_by_name(job_name)
-        for job in current_jobs:
-            job.schedule_removal()
-        
-        # Запускаем новую задачу
-        context.job_queue.run_repeating(
-            auto_check_payment_status,
-            interval=STATUS_CHECK_INTERVAL,
-            first=STATUS_CHECK_INTERVAL,
-            data={
-                'chat_id': chat_id,
-                'user_data': user_data
-            },
-            name=job_name
-        )
-        logger.info(f"Запущена автоматическая проверка статуса платежа для chat_id={chat_id}")
-        return True
+        return payment_poller.register(chat_id, user_data)
     except Exception as e:
         logger.error(f"Ошибка при настройке автоматической проверки статуса: {e}")
         return False
 
-def stop_auto_check_payment(context, chat_id):
+def stop_auto_check_payment(chat_id):
     """
-    Останавливает автоматическую проверку статуса платежа
+    Снимает платеж чата с автоматической проверки статуса
     
     Args:
-        context: Контекст бота
         chat_id: ID чата
         
     Returns:
-        bool: True если задача успешно остановлена, False в противном случае
+        bool: True если платеж проверялся, False в противном случае
     """
-    # Проверяем, доступна ли job_queue в контексте
-    if not context.job_queue:
-        logger.warning(f"job_queue недоступен в контексте, невозможно остановить автопроверку для chat_id={chat_id}")
-        return False
-        
-    try:
-        job_name = f"payment_check_{chat_id}"
-        current_jobs = context.job_queue.get_jobs_by_name(job_name)
-        if not current_jobs:
-            logger.info(f"Нет активных задач автопроверки для chat_id={chat_id}")
-            return True
-            
-        for job in current_jobs:
-            job.schedule_removal()
-        
-        logger.info(f"Остановлена автоматическая проверка статуса платежа для chat_id={chat_id}")
-        return True
-    except Exception as e:
-        logger.error(f"Ошибка при остановке автоматической проверки статуса: {e}")
+    if not payment_poller.unregister(chat_id):
+        logger.info(f"Нет активной автопроверки для chat_id={chat_id}")
         return False
+    logger.info(f"Остановлена автоматическая проверка статуса платежа для chat_id={chat_id}")
+    return True
 
 @require_auth
 async def cancel_payment(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
@@ -1137,7 +843,7 @@ async def cancel_payment(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
         return MENU
     
     # Останавливаем автоматическую проверку статуса платежа
-    stop_auto_check_payment(context, update.effective_chat.id)
+    stop_auto_check_payment(update.effective_chat.id)
     
     # Обновляем статус оплаты в таблице
     try:
@@ -1225,20 +931,37 @@ async def update_payment_status(payments_sheet, payment_id: str, new_status: str
     Returns:
         bool: True в случае успешного обновления, False в противном случае
     """
+    return await update_payment_statuses(payments_sheet, {payment_id: new_status})
+
+async def update_payment_statuses(payments_sheet, statuses: Dict[str, str]) -> bool:
+    """Обновляет статусы нескольких оплат одним чтением и одной записью листа.
+    
+    Args:
+        payments_sheet: Лист с оплатами
+        statuses: Новые статусы по номерам оплат
+        
+    Returns:
+        bool: True, если все оплаты найдены и обновлены, False в противном случае
+    """
     try:
         # Получаем все значения из таблицы
-        all_payments = payments_sheet.get_all_values()
+        all_payments = await gateway.get_all_values(payments_sheet)
         
-        # Ищем строку с нужным номером оплаты
-        for idx, row in enumerate(all_payments[1:], start=2):  # Пропускаем заголовок
-            if row[0] == payment_id:
-                # Обновляем статус в столбце 6 (F)
-                payments_sheet.update_cell(idx, 6, new_status)
-                logging.info(f"Статус оплаты {payment_id} обновлен на '{new_status}'")
-                return True
-                
-        logging.warning(f"Оплата с номером {payment_id} не найдена в таблице")
-        return False
+        # Ищем строки с нужными номерами оплат, статус в столбце 6 (F)
+        updates = [
+            {'range': f'F{idx}', 'values': [[statuses[row[0]]]]}
+            for idx, row in enumerate(all_payments[1:], start=2)  # Пропускаем заголовок
+            if row and row[0] in statuses
+        ]
+        if updates:
+            await gateway.batch_update(payments_sheet, updates)
+            logging.info(f"Обновлены статусы оплат: {statuses}")
+        
+        if len(updates) < len(statuses):
+            found = {row[0] for row in all_payments[1:] if row}
+            logging.warning(f"Оплаты с номерами {[payment_id for payment_id in statuses if payment_id not in found]} не найдены в таблице")
+            return False
+        return True
     except Exception as e:
         logging.error(f"Ошибка при обновлении статуса оплаты: {e}")
         return False
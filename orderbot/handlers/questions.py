@@ -5,35 +5,16 @@ from datetime import datetime
 import logging
 import os
 from .. import translations
-from ..services import sheets
+from ..services import sheets, gateway
+from ..services.media import media_cache
 from ..utils.time_utils import is_order_time
 from ..utils.auth_decorator import require_auth
+from ..utils.rendering import escape_markdown_v2
 from .states import MENU, QUESTION
 
 # Настройка логгера
 logger = logging.getLogger(__name__)
 
-def escape_markdown_v2(text):
-    """
-    Экранирует специальные символы Markdown V2 в тексте.
-    
-    Args:
-        text: Исходный текст
-        
-    Returns:
-        str: Текст с экранированными специальными символами
-    """
-    if not text:
-        return ""
-    
-    special_chars = ['_', '*', '[', ']', '(', ')', '~', '`', '>', '#', '+', 
-                    '-', '=', '|', '{', '}', '.', '!']
-    
-    for char in special_chars:
-        text = text.replace(char, f"\\{char}")
-    
-    return text
-
 @require_auth
 async def ask_command(update: telegram.Update, context: telegram.ext.ContextTypes.DEFAULT_TYPE):
     """Обработка команды /ask."""
@@ -75,7 +56,7 @@ async def save_question(update: telegram.Update, context: telegram.ext.ContextTy
     await sheets.save_question(user_id, question_text)
     
     # Получаем информацию о пользователе для отправки администраторам
-    users_data = sheets.get_users_sheet().get_all_values()
+    users_data = await gateway.get_all_values(sheets.get_users_sheet())
     phone = '-'
     for row in users_data[1:]:  # Пропускаем заголовок
         if row[0] == user_id:
@@ -106,14 +87,14 @@ async def save_question(update: telegram.Update, context: telegram.ext.ContextTy
         try:
             # Проверяем существование файла изображения
             if os.path.exists(image_path):
-                # Отправляем изображение с подписью
-                with open(image_path, 'rb') as photo:
-                    await context.bot.send_photo(
-                        chat_id=admin_id,
-                        photo=photo,
-                        caption=admin_message,
-                        parse_mode=ParseMode.MARKDOWN_V2
-                    )
+                # Отправляем изображение с подписью; файл загружается один раз, дальше по file_id
+                await media_cache.send_file(
+                    context.bot,
+                    admin_id,
+                    image_path,
+                    caption=admin_message,
+                    parse_mode=ParseMode.MARKDOWN_V2
+                )
             else:
                 # Если изображение не найдено, отправляем только текст
                 await context.bot.send_message(
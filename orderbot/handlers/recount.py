@@ -1,59 +1,118 @@
 """
-Обработчик команды /recount для пересчета данных в таблице Rec за последние 3 дня.
+Обработчик команды /recount для пересчета данных в таблице Rec.
+
+Без аргументов пересчитываются последние 3 дня, с одной датой - этот день,
+с двумя датами - весь диапазон, например: /recount 01.06.25 30.06.25
 """
 
+from datetime import date, datetime, timedelta
+from typing import List, Optional, Tuple
 from telegram import Update
 from telegram.ext import ContextTypes
 import logging
 from ..services.sheets import is_user_admin
-from ..services.records import recount_last_three_days
+from ..services.records import recount_days
 from ..utils.auth_decorator import require_auth
 
+# Дней пересчета по умолчанию
+DEFAULT_RECOUNT_DAYS = 3
+# Наибольшая длина диапазона пересчета (в днях)
+MAX_RECOUNT_DAYS = 366
+
+DATE_FORMATS = ("%d.%m.%y", "%d.%m.%Y")
+
+
+def _parse_date(value: str) -> Optional[date]:
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(value, fmt).date()
+        except ValueError:
+            continue
+    return None
+
+
+def parse_recount_range(args: List[str], today: Optional[date] = None) -> Optional[Tuple[date, date]]:
+    """Разбирает аргументы команды /recount в диапазон дат.
+
+    Args:
+        args: Аргументы команды: ничего, одна дата или две даты в формате DD.MM.YY
+        today: Текущая дата, по умолчанию date.today()
+
+    Returns:
+        Optional[Tuple[date, date]]: Первая и последняя дата или None, если аргументы неверны
+    """
+    today = today or date.today()
+    if not args:
+        return today - timedelta(days=DEFAULT_RECOUNT_DAYS - 1), today
+    if len(args) > 2:
+        return None
+    dates = [_parse_date(arg) for arg in args]
+    if None in dates:
+        return None
+    start, end = dates[0], dates[-1]
+    if start > end:
+        start, end = end, start
+    if (end - start).days + 1 > MAX_RECOUNT_DAYS:
+        return None
+    return start, end
+
 
 @require_auth
 async def recount_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """
-    Команда для пересчета данных в таблице Rec за последние 3 дня.
-    
+    Команда для пересчета данных в таблице Rec за диапазон дат.
+
     Только для администраторов.
-    
+
     Args:
         update: Объект обновления Telegram
         context: Контекст бота
     """
     user_id = str(update.effective_user.id)
-    
+
     # Проверяем права доступа (только для администраторов)
     if not is_user_admin(user_id):
         await update.message.reply_text("У вас нет доступа к этой команде.")
         return
-    
+
+    date_range = parse_recount_range(context.args or [])
+    if date_range is None:
+        await update.message.reply_text(
+            "Неверный формат команды.\n\n"
+            "Используйте `/recount` для последних 3 дней, `/recount ДД.ММ.ГГ` для одного дня "
+            f"или `/recount ДД.ММ.ГГ ДД.ММ.ГГ` для диапазона (не более {MAX_RECOUNT_DAYS} дней).",
+            parse_mode="Markdown"
+        )
+        return
+    start, end = date_range
+    period = start.strftime('%d.%m.%y') if start == end else f"{start.strftime('%d.%m.%y')} - {end.strftime('%d.%m.%y')}"
+
     # Отправляем сообщение о начале пересчета
     processing_message = await update.message.reply_text(
-        "⏳ Начинаю пересчет данных в таблице Rec за последние 3 дня...\n"
+        f"⏳ Начинаю пересчет данных в таблице Rec за {period}...\n"
         "Это может занять некоторое время."
     )
-    
+
     try:
         # Выполняем пересчет
-        success = await recount_last_three_days()
-        
+        success = await recount_days(start, end)
+
         if success:
             await processing_message.edit_text(
                 "✅ Пересчет данных успешно завершен!\n\n"
-                "Данные в таблице Rec за последние 3 дня были обновлены."
+                f"Данные в таблице Rec за {period} были обновлены."
             )
-            logging.info(f"Администратор {user_id} успешно выполнил пересчет данных за последние 3 дня")
+            logging.info(f"Администратор {user_id} успешно выполнил пересчет данных за {period}")
         else:
             await processing_message.edit_text(
                 "❌ Произошла ошибка при пересчете данных.\n\n"
                 "Проверьте логи для получения подробной информации."
             )
             logging.error(f"Ошибка при выполнении пересчета данных администратором {user_id}")
-            
+
     except Exception as e:
         await processing_message.edit_text(
             "❌ Произошла неожиданная ошибка при пересчете данных.\n\n"
             "Обратитесь к разработчику."
         )
-        logging.error(f"Неожиданная ошибка при выполнении команды /recount администратором {user_id}: {e}") 
\ No newline at end of file
+        logging.error(f"Неожиданная ошибка при выполнении команды /recount администратором {user_id}: {e}")
@@ -1,4 +1,7 @@
 """Константы состояний для ConversationHandler."""
 
 # Состояния
-PHONE, MENU, ROOM, NAME, MEAL_TYPE, DISH_SELECTION, WISHES, QUESTION, EDIT_ORDER, PAYMENT = range(10)
\ No newline at end of file
+PHONE, MENU, ROOM, NAME, MEAL_TYPE, DISH_SELECTION, WISHES, QUESTION, EDIT_ORDER, PAYMENT = range(10)
+
+# Состояние диалога поиска заказа по номеру на кухне
+KITCHEN_ORDER_NUMBER = 10
\ No newline at end of file
@@ -3,7 +3,8 @@ from telegram.ext import ContextTypes
 from datetime import datetime
 import logging
 from ..utils.profiler import get_execution_stats, clear_stats
-from ..services.sheets import is_user_admin
+from ..services import gateway, sbp
+from ..services.sheets import is_user_admin, role_directory, menu_cache, composition_cache, today_menu_cache
 from ..utils.auth_decorator import require_auth
 
 @require_auth
@@ -85,6 +86,34 @@ async def performance_stats(update: Update, context: ContextTypes.DEFAULT_TYPE):
     # Добавляем навигацию
     message += f"_Показаны {start_idx + 1}-{end_idx} из {total_funcs} функций_\n\n"
     
+    # Счётчики кэшей меню
+    for cache in (menu_cache, composition_cache, today_menu_cache):
+        cache_stats = cache.get_stats()
+        message += (f"🗂 Кэш {cache.name}: {cache_stats['hits']} попаданий, {cache_stats['misses']} промахов, "
+                    f"обновление {cache_stats['avg_refresh_time']:.2f} сек\n")
+    
+    # Очереди запросов к Google Sheets
+    quota_stats = gateway.get_stats()
+    for kind, title in (('read', 'чтение'), ('write', 'запись')):
+        if kind in quota_stats:
+            bucket = quota_stats[kind]
+            message += (f"📶 Очередь ({title}): {bucket['queue_interactive']} польз., "
+                        f"{bucket['queue_background']} фон., ожиданий квоты {bucket['throttled']}\n")
+    coalescing = quota_stats.get('coalescing', {})
+    if coalescing.get('requests'):
+        message += (f"🔗 Чтения листов: {coalescing['requests']}, из них общих {coalescing['shared']}, "
+                    f"из снимка {coalescing['snapshot_hits']}\n")
+
+    # Запросы к API СБП
+    for operation, sbp_stats in sbp.client.get_stats().items():
+        message += (f"🏦 СБП {operation}: {sbp_stats['calls']} запросов, ошибок {sbp_stats['errors']}, "
+                    f"повторов {sbp_stats['retries']}, в среднем {sbp_stats['avg_time']:.2f} сек, "
+                    f"макс. {sbp_stats['max_time']:.2f} сек\n")
+
+    # Счётчики справочника ролей
+    role_stats = role_directory.get_stats()
+    message += f"🔑 Проверки прав: {role_stats['hits']} из памяти, {role_stats['misses']} загрузок, {role_stats['refreshes']} обновлений\n\n"
+    
     if total_pages > 1:
         message += "Используйте `/stats номер_страницы` для навигации между страницами"
     
@@ -110,5 +139,6 @@ async def clear_performance_stats(update: Update, context: ContextTypes.DEFAULT_
     
     # Очищаем статистику
     clear_stats()
+    sbp.client.clear_stats()
     
     await update.message.reply_text("Статистика производительности очищена.") 
\ No newline at end of file
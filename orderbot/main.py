@@ -30,14 +30,14 @@ from .handlers.my_orders import (
     show_edit_active_orders,
     show_today_orders
 )
-from .handlers.states import PAYMENT
+from .handlers.states import PAYMENT, KITCHEN_ORDER_NUMBER
 from .handlers import handle_question, save_question, ask_command
 from .handlers.auth import start as auth_start, handle_phone, setup_commands_for_user
-from .handlers.kitchen import kitchen_summary, search_orders_by_room, search_orders_by_number, find_orders_by_room, back_to_kitchen, handle_order_number_input
+from .handlers.kitchen import kitchen_summary, search_orders_by_room, search_orders_by_number, find_orders_by_room, back_to_kitchen, handle_order_number_input, end_order_number_search, restart_kitchen_summary, ORDER_NUMBER_SEARCH_TIMEOUT
 from .handlers.stats import performance_stats, clear_performance_stats
 from .handlers.recount import recount_command
 from .handlers.payment import create_payment, check_payment_status, cancel_payment, handle_payment_action
-from .tasks import start_status_update_task, stop_status_update_task, schedule_daily_tasks
+from .tasks import start_status_update_task, stop_status_update_task, schedule_daily_tasks, watch_menu_changes, watch_daily_totals
 import os
 import asyncio
 import sys
@@ -47,7 +47,12 @@ from aiohttp import web, ClientSession
 from datetime import datetime
 import pytz
 from .services.records import process_daily_orders
-from .services.sheets import auth_sheet, is_user_cook, is_user_admin, force_update_menu_cache, force_update_composition_cache, force_update_today_menu_cache
+from .services.journal import journal
+from .services.order_store import order_store
+from .services.payment_poller import payment_poller, TICK_INTERVAL, FALLBACK_POLL_SCHEDULE
+from .services.payment_webhook import PaymentWebhook
+from .services import startup, sbp
+from .services.sheets import auth_sheet, is_user_cook, is_user_admin, force_update_menu_cache, force_update_composition_cache, force_update_today_menu_cache, seed_id_counters, role_directory, refresh_menu_caches_if_changed
 
 # Включаем tracemalloc для диагностики
 tracemalloc.start()
@@ -93,6 +98,17 @@ async def main() -> None:
             logging.warning("Для включения JobQueue установите: pip install \"python-telegram-bot[job-queue]\"")
             HAVE_JOB_QUEUE = False
             # Не пытаемся создать его вручную, так как это вызовет ошибку
+        else:
+            # Одна общая задача проверяет оплаты всех чатов
+            application.job_queue.run_repeating(
+                payment_poller.run_job,
+                interval=TICK_INTERVAL,
+                first=TICK_INTERVAL,
+                name='payment_poller'
+            )
+
+        # Запускаем запись журнала заказов, незаписанные операции прошлого запуска уйдут первыми
+        journal.start_flusher()
 
         # Запускаем задачу обновления статусов заказов
         start_status_update_task()
@@ -100,30 +116,41 @@ async def main() -> None:
         # Запускаем задачу поддержания активности
         keep_alive_task = asyncio.create_task(keep_alive())
 
-        # Принудительно обновляем кэш меню и составов при запуске
-        try:
-            logging.info("Обновление кэшей при запуске бота")
-            await force_update_menu_cache()
-            await force_update_composition_cache()
-            await force_update_today_menu_cache()
-            logging.info("Все кэши успешно обновлены при запуске")
-        except Exception as e:
-            logging.error(f"Ошибка при обновлении кэшей при запуске: {e}")
+        # Прогреваем кэши параллельно в фоне, чтобы бот сразу начал принимать обновления
+        logging.info("Обновление кэшей при запуске бота")
+        warm_up_task = asyncio.create_task(startup.warm_up({
+            'Счётчики номеров': seed_id_counters,
+            'Кэши меню': refresh_menu_caches_if_changed,
+            'Справочник ролей': role_directory.refresh_all,
+            'Копия листа заказов': order_store.load,
+            'Обработка заказов за день': process_daily_orders,
+        }))
 
         # Добавляем обработчик команды /kitchen для повара
         application.add_handler(CommandHandler('kitchen', kitchen_summary))
         
         # Добавляем обработчики для поиска заказов
         application.add_handler(CallbackQueryHandler(search_orders_by_room, pattern="search_by_room"))
-        application.add_handler(CallbackQueryHandler(search_orders_by_number, pattern="search_by_number"))
         application.add_handler(CallbackQueryHandler(find_orders_by_room, pattern="^find_room:[0-9]+$"))
-        application.add_handler(CallbackQueryHandler(back_to_kitchen, pattern="back_to_kitchen"))
         
-        # Добавляем обработчик для текстового ввода номера заказа
-        application.add_handler(MessageHandler(
-            filters.TEXT & ~filters.COMMAND & ~filters.Regex(r'^\/.*') & filters.Regex(r'^\d+$'),
-            handle_order_number_input
-        ), group=1)
+        # Поиск заказа по номеру - отдельный диалог: числовые сообщения ждём только
+        # от повара, нажавшего "По номеру", остальные сообщения его не затрагивают
+        kitchen_conv_handler = ConversationHandler(
+            entry_points=[CallbackQueryHandler(search_orders_by_number, pattern="search_by_number")],
+            states={
+                KITCHEN_ORDER_NUMBER: [
+                    MessageHandler(filters.TEXT & ~filters.COMMAND & filters.Regex(r'^\d+$'), handle_order_number_input),
+                    CallbackQueryHandler(end_order_number_search, pattern="back_to_kitchen")
+                ]
+            },
+            fallbacks=[CommandHandler('kitchen', restart_kitchen_summary)],
+            allow_reentry=True,
+            per_message=False,
+            # Повар, не введший номер, не должен навсегда остаться в диалоге
+            conversation_timeout=ORDER_NUMBER_SEARCH_TIMEOUT
+        )
+        application.add_handler(kitchen_conv_handler)
+        application.add_handler(CallbackQueryHandler(back_to_kitchen, pattern="back_to_kitchen"))
         
         # Добавляем обработчик команды /today для просмотра меню на сегодня
         application.add_handler(CommandHandler('today', show_today_menu))
@@ -226,8 +253,11 @@ async def main() -> None:
         # Запуск планировщика задач
         asyncio.create_task(schedule_daily_tasks())
         
-        # Обработка заказов за текущий день при старте
-        await process_daily_orders()
+        # Отслеживание правок в таблице меню
+        asyncio.create_task(watch_menu_changes())
+        
+        # Запись в Rec итогов, изменившихся после событий заказов
+        asyncio.create_task(watch_daily_totals())
         
         # Запуск бота в соответствующем режиме
         webhook_url = os.getenv('RENDER_EXTERNAL_URL')
@@ -262,6 +292,12 @@ async def main() -> None:
             
             app.router.add_get('/', handle_ping)
             
+            # Уведомления банка об оплате; опрос статусов остаётся запасным путём
+            if config.PAYMENT_WEBHOOK_SECRET:
+                PaymentWebhook(application.bot, config.PAYMENT_WEBHOOK_SECRET).add_routes(app)
+                payment_poller.set_schedule(FALLBACK_POLL_SCHEDULE)
+                logging.info("Уведомления банка об оплате принимаются на сервере бота")
+            
             # Запускаем приложение
             logging.info(f"Запуск вебхука на порту {port}")
             runner = web.AppRunner(app)
@@ -283,6 +319,8 @@ async def main() -> None:
         sys.exit(1)
     finally:
         stop_status_update_task()
+        await journal.stop_flusher()
+        await sbp.client.close()
         await application.shutdown()
 
 def main_sync():
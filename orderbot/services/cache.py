@@ -0,0 +1,145 @@
+"""Кэш с фоновым обновлением для данных из Google Sheets.
+
+Пока кэш обновляется, пользователи получают предыдущее значение.
+Одновременные обращения к незагруженному или устаревшему кэшу приводят
+к одной загрузке, а не к нескольким одинаковым запросам в таблицу.
+"""
+import asyncio
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, Generic, Optional, TypeVar
+
+from . import gateway
+
+T = TypeVar('T')
+
+
+def is_expired(loaded_at: Optional[float], ttl: float) -> bool:
+    """Проверяет, истёк ли срок жизни значения.
+
+    None означает, что значение сброшено через invalidate() и должно
+    обновиться при следующем обращении независимо от времени работы хоста.
+    """
+    return loaded_at is None or time.monotonic() - loaded_at >= ttl
+
+
+class SWRCache(Generic[T]):
+    """Кэш значения, которое загружается синхронной функцией через шлюз Google Sheets."""
+
+    def __init__(self, name: str, loader: Callable[[], T], ttl: float):
+        """
+        Args:
+            name: Название кэша для логов и статистики
+            loader: Синхронная функция загрузки значения из таблицы
+            ttl: Время, после которого значение считается устаревшим (в секундах)
+        """
+        self.name = name
+        self._loader = loader
+        self._ttl = ttl
+        self._value: Optional[T] = None
+        self._loaded = False
+        self._loaded_at: Optional[float] = None
+        self._sync_lock = threading.Lock()
+        self._inflight: Optional[asyncio.Task] = None
+        self._stats = {'hits': 0, 'misses': 0, 'stale': 0, 'refreshes': 0, 'errors': 0,
+                       'last_refresh_time': 0.0, 'total_refresh_time': 0.0}
+
+    def _load(self) -> T:
+        """Загружает значение и сохраняет его в кэш."""
+        started = time.monotonic()
+        try:
+            value = self._loader()
+        except Exception as e:
+            self._stats['errors'] += 1
+            logging.error(f"Ошибка при загрузке кэша {self.name}: {e}")
+            raise
+        elapsed = time.monotonic() - started
+        self._value = value
+        self._loaded = True
+        self._loaded_at = time.monotonic()
+        self._stats['refreshes'] += 1
+        self._stats['last_refresh_time'] = elapsed
+        self._stats['total_refresh_time'] += elapsed
+        logging.info(f"Кэш {self.name} обновлён за {elapsed:.2f} с")
+        return value
+
+    def _load_once(self) -> T:
+        """Синхронная загрузка, одновременные вызовы из разных потоков ждут одну загрузку."""
+        loaded_at = self._loaded_at
+        with self._sync_lock:
+            if self._loaded and self._loaded_at != loaded_at:
+                # Пока ждали блокировку, значение уже загрузил другой поток
+                return self._value
+            return self._load()
+
+    def peek(self) -> Optional[T]:
+        """Возвращает текущее значение без загрузки и учёта в статистике."""
+        return self._value
+
+    def is_stale(self) -> bool:
+        """Проверяет, устарело ли значение."""
+        return not self._loaded or is_expired(self._loaded_at, self._ttl)
+
+    def get(self) -> T:
+        """Возвращает значение из кэша.
+
+        Если значение ещё не загружено, оно загружается сразу. Устаревшее
+        значение возвращается без ожидания, а обновление запускается в фоне.
+        """
+        if not self._loaded:
+            self._stats['misses'] += 1
+            return self._load_once()
+        if self.is_stale():
+            self._stats['stale'] += 1
+            self._refresh_in_background()
+        else:
+            self._stats['hits'] += 1
+        return self._value
+
+    def reload(self) -> T:
+        """Синхронно перезагружает значение, например при смене дня."""
+        self._stats['misses'] += 1
+        return self._load_once()
+
+    def _refresh_in_background(self) -> None:
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            # Вне event loop обновляем сразу
+            try:
+                self._load_once()
+            except Exception:
+                pass
+            return
+        task = self._start_refresh()
+        task.add_done_callback(lambda t: t.cancelled() or t.exception())
+
+    def _start_refresh(self) -> asyncio.Task:
+        """Запускает загрузку, если она ещё не выполняется, и возвращает её задачу."""
+        if self._inflight is None or self._inflight.done():
+            self._inflight = asyncio.get_running_loop().create_task(gateway.call(self._load_once))
+        return self._inflight
+
+    async def refresh(self) -> T:
+        """Загружает свежее значение; одновременные вызовы ждут одну загрузку."""
+        return await asyncio.shield(self._start_refresh())
+
+    async def aget(self) -> T:
+        """Асинхронно возвращает значение, не блокируя event loop при первой загрузке."""
+        if not self._loaded:
+            self._stats['misses'] += 1
+            return await self.refresh()
+        return self.get()
+
+    def invalidate(self) -> None:
+        """Помечает значение устаревшим, следующее обращение запустит обновление."""
+        self._loaded_at = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Возвращает статистику обращений к кэшу."""
+        stats = dict(self._stats)
+        stats['avg_refresh_time'] = (
+            stats['total_refresh_time'] / stats['refreshes'] if stats['refreshes'] else 0.0
+        )
+        return stats
@@ -0,0 +1,166 @@
+"""Итоги заказов по датам выдачи для таблицы Rec.
+
+Итоги (число заказов и отмен, сумма, количество блюд по приёмам пищи)
+пересчитываются по событиям копии листа заказов: создание, изменение,
+отмена и оплата заказа меняют только итог его даты. Полный пересчёт по
+всем заказам нужен лишь для сверки.
+"""
+from collections import Counter
+from datetime import date
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from .dishes import EMPTY, add_dishes, encode_dishes
+from .order_record import OrderRecord, OrderStatus
+from .order_store import order_store
+
+# Статусы, при которых заказ учитывается в итогах
+ACCEPTED_STATUSES = (OrderStatus.ACTIVE, OrderStatus.ACCEPTED, OrderStatus.AWAITING_PAYMENT, OrderStatus.PAID)
+MEAL_TYPES = ('Завтрак', 'Обед', 'Ужин')
+
+# Заголовок листа Rec
+REC_HEADER = [
+    'Дата выдачи',
+    'Количество заказов',
+    'Количество отмен',
+    'Общая сумма',
+    'Завтрак',
+    'Обед',
+    'Ужин'
+]
+
+
+def rec_date(day: date) -> str:
+    """Переводит дату в формат листа Rec (DD.MM.YY)."""
+    return day.strftime("%d.%m.%y")
+
+
+class DayTotals:
+    """Итоги заказов за одну дату выдачи."""
+
+    __slots__ = ('orders', 'cancelled', 'amount', 'dishes')
+
+    def __init__(self):
+        self.orders = 0
+        self.cancelled = 0
+        self.amount = 0
+        self.dishes: Dict[str, Counter] = {meal: Counter() for meal in MEAL_TYPES}
+
+    def apply(self, record: OrderRecord, sign: int = 1) -> None:
+        """Добавляет заказ в итоги (sign=1) или убирает его (sign=-1)."""
+        if record.status is OrderStatus.CANCELLED:
+            self.cancelled += sign
+            return
+        if record.status not in ACCEPTED_STATUSES:
+            return
+        self.orders += sign
+        self.amount += sign * record.total
+        dishes = self.dishes.get(record.meal_type)
+        if dishes is not None:
+            add_dishes(dishes, record.dishes, sign)
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, DayTotals):
+            return NotImplemented
+        return (self.orders == other.orders and self.cancelled == other.cancelled
+                and self.amount == other.amount and self.dishes == other.dishes)
+
+    def copy(self) -> 'DayTotals':
+        totals = DayTotals()
+        totals.orders = self.orders
+        totals.cancelled = self.cancelled
+        totals.amount = self.amount
+        totals.dishes = {meal: Counter(dishes) for meal, dishes in self.dishes.items()}
+        return totals
+
+    def to_rec_row(self, day: date) -> List[str]:
+        """Возвращает строку листа Rec для даты."""
+        meals = [
+            encode_dishes(self.dishes[meal].items()) or EMPTY
+            for meal in MEAL_TYPES
+        ]
+        return [rec_date(day), str(self.orders), str(self.cancelled), str(self.amount)] + meals
+
+
+def _contribution(record: OrderRecord) -> Tuple:
+    """Поля заказа, от которых зависят итоги."""
+    return (record.delivery_date, record.status, record.total, record.meal_type, record.dishes)
+
+
+def compute(records: Iterable[OrderRecord], days: Optional[Iterable[date]] = None) -> Dict[date, DayTotals]:
+    """Полностью пересчитывает итоги за один проход по заказам.
+
+    Args:
+        records: Разобранные заказы
+        days: Даты выдачи; если не указаны, считаются все даты
+
+    Returns:
+        Dict[date, DayTotals]: Итоги по датам
+    """
+    wanted = set(days) if days is not None else None
+    totals: Dict[date, DayTotals] = {}
+    for record in records:
+        day = record.delivery_date
+        if day is None or (wanted is not None and day not in wanted):
+            continue
+        day_totals = totals.get(day)
+        if day_totals is None:
+            day_totals = totals[day] = DayTotals()
+        day_totals.apply(record)
+    return totals
+
+
+class DailyTotals:
+    """Итоги по датам выдачи, которые обновляются по событиям копии листа заказов."""
+
+    def __init__(self):
+        self._days: Dict[date, DayTotals] = {}
+        self._dirty: Set[date] = set()
+        self._loaded = False
+
+    @property
+    def loaded(self) -> bool:
+        return self._loaded
+
+    def rebuild(self, records: Iterable[OrderRecord]) -> None:
+        """Пересчитывает итоги после полной загрузки листа заказов."""
+        self._days = compute(records)
+        self._loaded = True
+
+    def apply_change(self, old_record: Optional[OrderRecord], new_record: Optional[OrderRecord]) -> None:
+        """Учитывает изменение заказа и отмечает затронутые даты."""
+        if old_record is not None and new_record is not None and _contribution(old_record) == _contribution(new_record):
+            return
+        for record, sign in ((old_record, -1), (new_record, 1)):
+            if record is None or record.delivery_date is None:
+                continue
+            day = record.delivery_date
+            day_totals = self._days.get(day)
+            if day_totals is None:
+                day_totals = self._days[day] = DayTotals()
+            day_totals.apply(record, sign)
+            self._dirty.add(day)
+
+    def get(self, day: date) -> DayTotals:
+        """Возвращает итоги даты выдачи."""
+        return self._days.get(day) or DayTotals()
+
+    def pop_dirty(self) -> Set[date]:
+        """Возвращает и сбрасывает даты, итоги которых изменились."""
+        dirty, self._dirty = self._dirty, set()
+        return dirty
+
+    def mark_dirty(self, days: Iterable[date]) -> None:
+        """Снова отмечает даты, например если их не удалось записать."""
+        self._dirty.update(days)
+
+    def verify(self, records: Iterable[OrderRecord], days: Iterable[date]) -> List[date]:
+        """Сверяет итоги с полным пересчётом и возвращает расходящиеся даты."""
+        days = list(days)
+        expected = compute(records, days)
+        return [day for day in days if expected.get(day, DayTotals()) != self.get(day)]
+
+
+# Общие итоги по датам для всего процесса
+daily_totals = DailyTotals()
+
+order_store.add_listener(daily_totals)
@@ -0,0 +1,64 @@
+"""Строка блюд заказа вида 'Каша x2, Чай x1'.
+
+Единственное место, где строка блюд собирается и разбирается: её пишут
+save_order и update_order, а читают копия листа заказов, сводка для кухни
+и итоги для таблицы Rec. Одинаковые строки встречаются в заказах часто,
+поэтому разбор запоминается.
+"""
+import functools
+from collections import Counter
+from typing import Dict, Iterable, List, Mapping, Tuple
+
+DISH_SEPARATOR = ', '
+QUANTITY_MARK = ' x'
+# Так в таблице записывается пустое значение
+EMPTY = '—'
+
+DishLine = Tuple[Tuple[str, int], ...]
+
+
+def encode_dishes(dishes: Iterable[Tuple[str, int]]) -> str:
+    """Собирает строку блюд из пар (блюдо, количество)."""
+    return DISH_SEPARATOR.join(f"{dish}{QUANTITY_MARK}{quantity}" for dish, quantity in dishes)
+
+
+def encode_order_dishes(dishes: Iterable[str], quantities: Mapping[str, int]) -> str:
+    """Собирает строку блюд из списка блюд заказа и их количеств (по умолчанию 1)."""
+    return encode_dishes((dish, quantities.get(dish, 1)) for dish in dishes)
+
+
+def _decode_item(item: str) -> Tuple[str, int]:
+    dish, mark, quantity = item.rpartition(QUANTITY_MARK)
+    if mark and quantity.isdigit():
+        return dish, int(quantity)
+    return item, 1
+
+
+@functools.lru_cache(maxsize=8192)
+def decode_dishes(line: str) -> DishLine:
+    """Разбирает строку блюд в кортеж пар (блюдо, количество).
+
+    Блюдо без количества считается одной порцией. Результат неизменяемый
+    и запоминается, поэтому одинаковые строки разбираются один раз.
+    """
+    if not line or line == EMPTY:
+        return ()
+    if ',' not in line:
+        return (_decode_item(line.strip()),)
+    return tuple(_decode_item(item) for item in map(str.strip, line.split(',')) if item)
+
+
+def split_quantities(dishes: DishLine) -> Tuple[List[str], Dict[str, int]]:
+    """Переводит пары (блюдо, количество) в список блюд и словарь количеств, как в данных заказа."""
+    quantities: Dict[str, int] = {}
+    for dish, quantity in dishes:
+        quantities[dish] = quantities.get(dish, 0) + quantity
+    return list(quantities), quantities
+
+
+def add_dishes(counter: Counter, dishes: DishLine, sign: int = 1) -> None:
+    """Прибавляет (sign=1) или вычитает (sign=-1) порции блюд; обнулившиеся блюда удаляются."""
+    for dish, quantity in dishes:
+        counter[dish] += sign * quantity
+        if counter[dish] == 0:
+            del counter[dish]
@@ -0,0 +1,286 @@
+"""Асинхронный шлюз к Google Sheets.
+
+gspread работает синхронно, поэтому любой вызов из обработчика блокирует
+event loop на время HTTP-запроса. Шлюз выполняет вызовы в отдельном пуле
+потоков, ограничивает число одновременных запросов, соблюдает квоту API
+(см. quota.py) и использует общий пул HTTP-соединений клиента.
+
+Одинаковые чтения одного листа объединяются: одновременные вызовы ждут
+один запрос, а вызовы в течение READ_SNAPSHOT_TTL после ответа получают
+его копию. Любая запись через шлюз сбрасывает снимки этого листа.
+"""
+import asyncio
+import functools
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+
+from requests.adapters import HTTPAdapter
+
+from . import quota
+
+# Максимальное количество одновременных запросов к Google Sheets
+MAX_CONCURRENT_REQUESTS = 8
+# Сколько секунд ответ на чтение листа отдаётся повторным читателям (0 - только одновременным)
+READ_SNAPSHOT_TTL = 1.5
+
+_executor: Optional[ThreadPoolExecutor] = None
+_semaphore: Optional[asyncio.Semaphore] = None
+_semaphore_loop: Optional[asyncio.AbstractEventLoop] = None
+_scheduler: Optional[quota.QuotaScheduler] = None
+_scheduler_loop: Optional[asyncio.AbstractEventLoop] = None
+# Обработчики ошибок вызовов, например сброс кэша объектов листов
+_error_handlers: List[Callable[[Exception], None]] = []
+# Выполняющиеся чтения и последние ответы по ключу (лист, запрос)
+_inflight_reads: Dict[Tuple, asyncio.Task] = {}
+_read_snapshots: Dict[Tuple, Tuple[float, Any]] = {}
+# Номер поколения листа увеличивается при каждой записи в него
+_sheet_generations: Dict[Hashable, int] = {}
+_read_stats = {'requests': 0, 'shared': 0, 'snapshot_hits': 0}
+
+
+def configure_session(client, pool_size: int = MAX_CONCURRENT_REQUESTS) -> None:
+    """Настраивает общий пул keep-alive соединений для клиента gspread.
+
+    Args:
+        client: Клиент gspread
+        pool_size: Размер пула соединений
+    """
+    try:
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        client.http_client.session.mount('https://', adapter)
+    except Exception as e:
+        logging.error(f"Не удалось настроить пул соединений Google Sheets: {e}")
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    """Возвращает пул потоков для вызовов gspread."""
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=MAX_CONCURRENT_REQUESTS,
+            thread_name_prefix='sheets'
+        )
+    return _executor
+
+
+def _get_semaphore() -> asyncio.Semaphore:
+    """Возвращает семафор, привязанный к текущему event loop."""
+    global _semaphore, _semaphore_loop
+    loop = asyncio.get_running_loop()
+    if _semaphore is None or _semaphore_loop is not loop:
+        _semaphore = asyncio.Semaphore(MAX_CONCURRENT_REQUESTS)
+        _semaphore_loop = loop
+    return _semaphore
+
+
+def _get_scheduler() -> quota.QuotaScheduler:
+    """Возвращает планировщик квоты, привязанный к текущему event loop."""
+    global _scheduler, _scheduler_loop
+    loop = asyncio.get_running_loop()
+    if _scheduler is None or _scheduler_loop is not loop:
+        _scheduler = quota.QuotaScheduler()
+        _scheduler_loop = loop
+    return _scheduler
+
+
+async def _execute(func: Callable, args, kwargs) -> Any:
+    async with _get_semaphore():
+        loop = asyncio.get_running_loop()
+        try:
+            return await loop.run_in_executor(_get_executor(), functools.partial(func, *args, **kwargs))
+        except Exception as e:
+            _notify_error(e)
+            raise
+
+
+async def call(func: Callable, *args, **kwargs) -> Any:
+    """Выполняет синхронный вызов gspread на чтение, не блокируя event loop.
+
+    Вызов учитывается в квоте чтения; при ответе 429 или 5xx повторяется
+    с экспоненциальной паузой.
+
+    Args:
+        func: Синхронная функция или метод листа
+        *args: Позиционные аргументы вызова
+        **kwargs: Именованные аргументы вызова
+
+    Returns:
+        Any: Результат вызова
+    """
+    return await _get_scheduler().run(quota.READ, lambda: _execute(func, args, kwargs))
+
+
+async def call_write(func: Callable, *args, **kwargs) -> Any:
+    """Выполняет синхронный вызов gspread на запись с учётом квоты записи."""
+    return await _get_scheduler().run(quota.WRITE, lambda: _execute(func, args, kwargs))
+
+
+def _sheet_key(worksheet) -> Hashable:
+    """Возвращает ключ листа: ID таблицы и ID листа."""
+    try:
+        return (worksheet.spreadsheet_id, worksheet.id)
+    except Exception:
+        return id(worksheet)
+
+
+def _copy(value: Any) -> Any:
+    """Копирует ответ, чтобы читатели не изменяли общий снимок."""
+    if isinstance(value, list):
+        return [_copy(item) for item in value]
+    return value
+
+
+async def _read_shared(worksheet, request: Hashable, func: Callable, *args, **kwargs) -> Any:
+    """Выполняет чтение листа, объединяя его с такими же чтениями.
+
+    Args:
+        worksheet: Лист, из которого читаются данные
+        request: Описание запроса (метод и диапазон) для ключа объединения
+        func: Синхронный метод листа
+        *args: Позиционные аргументы вызова
+        **kwargs: Именованные аргументы вызова
+
+    Returns:
+        Any: Копия ответа
+    """
+    sheet = _sheet_key(worksheet)
+    key = (sheet, request)
+    _read_stats['requests'] += 1
+
+    snapshot = _read_snapshots.get(key)
+    if snapshot is not None and time.monotonic() - snapshot[0] < READ_SNAPSHOT_TTL:
+        _read_stats['snapshot_hits'] += 1
+        return _copy(snapshot[1])
+
+    task = _inflight_reads.get(key)
+    if task is not None and task.get_loop() is asyncio.get_running_loop():
+        _read_stats['shared'] += 1
+    else:
+        # Чтение выполняется в отдельной задаче: отмена вызвавшего его обработчика
+        # не прерывает чтение для остальных ожидающих
+        generation = _sheet_generations.get(sheet, 0)
+        task = asyncio.ensure_future(_run_shared_read(key, sheet, generation, func, args, kwargs))
+        task.add_done_callback(_retrieve_exception)
+        _inflight_reads[key] = task
+    return _copy(await asyncio.shield(task))
+
+
+async def _run_shared_read(key: Tuple, sheet: Hashable, generation: int,
+                           func: Callable, args, kwargs) -> Any:
+    """Выполняет общее чтение и сохраняет снимок ответа."""
+    try:
+        value = await call(func, *args, **kwargs)
+        # Запись во время чтения делает ответ устаревшим, его не сохраняем
+        if READ_SNAPSHOT_TTL > 0 and _sheet_generations.get(sheet, 0) == generation:
+            _read_snapshots[key] = (time.monotonic(), value)
+        return value
+    finally:
+        if _inflight_reads.get(key) is asyncio.current_task():
+            del _inflight_reads[key]
+
+
+def _retrieve_exception(task: asyncio.Task) -> None:
+    """Забирает ошибку общего чтения, если все ожидавшие его уже отменены."""
+    if not task.cancelled():
+        task.exception()
+
+
+def invalidate_reads(worksheet) -> None:
+    """Сбрасывает снимки чтений листа после записи в него.
+
+    Шлюз вызывает её сам для своих методов записи; вызывать вручную нужно
+    только после записи в лист в обход шлюза.
+    """
+    sheet = _sheet_key(worksheet)
+    _sheet_generations[sheet] = _sheet_generations.get(sheet, 0) + 1
+    for key in [key for key in list(_read_snapshots) if key[0] == sheet]:
+        _read_snapshots.pop(key, None)
+    # Новые читатели не должны присоединяться к чтению, начатому до записи
+    for key in [key for key in list(_inflight_reads) if key[0] == sheet]:
+        _inflight_reads.pop(key, None)
+
+
+async def _write(worksheet, func: Callable, *args, **kwargs) -> Any:
+    """Выполняет запись в лист и сбрасывает снимки его чтений."""
+    invalidate_reads(worksheet)
+    try:
+        return await call_write(func, *args, **kwargs)
+    finally:
+        invalidate_reads(worksheet)
+
+
+def get_stats() -> dict:
+    """Возвращает глубину очередей, состояние квоты и счётчики объединения чтений."""
+    stats = _scheduler.get_stats() if _scheduler is not None else {}
+    stats['coalescing'] = dict(_read_stats)
+    return stats
+
+
+def add_error_handler(handler: Callable[[Exception], None]) -> None:
+    """Регистрирует обработчик ошибок вызовов gspread."""
+    if handler not in _error_handlers:
+        _error_handlers.append(handler)
+
+
+def _notify_error(error: Exception) -> None:
+    for handler in _error_handlers:
+        try:
+            handler(error)
+        except Exception as e:
+            logging.error(f"Ошибка в обработчике ошибок шлюза: {e}")
+
+
+async def get_all_values(worksheet) -> List[List[str]]:
+    """Читает все значения листа."""
+    return await _read_shared(worksheet, ('get_all_values',), worksheet.get_all_values)
+
+
+async def col_values(worksheet, col: int) -> List[str]:
+    """Читает значения столбца."""
+    return await _read_shared(worksheet, ('col_values', col), worksheet.col_values, col)
+
+
+async def row_values(worksheet, row: int) -> List[str]:
+    """Читает значения строки."""
+    return await _read_shared(worksheet, ('row_values', row), worksheet.row_values, row)
+
+
+async def batch_get(worksheet, ranges: List[str], **kwargs) -> List[List[List[str]]]:
+    """Читает несколько диапазонов листа одним запросом."""
+    request = ('batch_get', tuple(ranges), repr(sorted(kwargs.items())))
+    return await _read_shared(worksheet, request, worksheet.batch_get, ranges, **kwargs)
+
+
+async def update(worksheet, range_name: str, values: List[List[Any]], **kwargs) -> Any:
+    """Записывает значения в диапазон листа."""
+    return await _write(worksheet, worksheet.update, range_name, values, **kwargs)
+
+
+async def update_cell(worksheet, row: int, col: int, value: Any) -> Any:
+    """Записывает значение в одну ячейку."""
+    return await _write(worksheet, worksheet.update_cell, row, col, value)
+
+
+async def append_row(worksheet, values: List[Any], **kwargs) -> Any:
+    """Добавляет строку в конец листа."""
+    return await _write(worksheet, worksheet.append_row, values, **kwargs)
+
+
+async def append_rows(worksheet, values: List[List[Any]], **kwargs) -> Any:
+    """Добавляет несколько строк в конец листа одним запросом."""
+    return await _write(worksheet, worksheet.append_rows, values, **kwargs)
+
+
+async def batch_update(worksheet, data: List[dict], **kwargs) -> Any:
+    """Записывает несколько диапазонов листа одним запросом."""
+    return await _write(worksheet, worksheet.batch_update, data, **kwargs)
+
+
+def shutdown() -> None:
+    """Останавливает пул потоков шлюза."""
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False)
+        _executor = None
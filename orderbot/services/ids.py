@@ -0,0 +1,112 @@
+"""Локальный счётчик номеров заказов и оплат.
+
+Последние выданные номера хранятся в SQLite рядом с журналом заказов.
+Счётчик один раз сверяется с таблицей при запуске бота, после чего номера
+выдаются без обращения к Google Sheets. Выдача номеров защищена блокировкой
+и транзакцией, поэтому два одновременных заказа не получат один номер.
+"""
+import logging
+import sqlite3
+import threading
+from typing import Callable, Optional
+
+from .. import config
+
+# Названия счётчиков
+ORDERS = 'orders'
+PAYMENTS = 'payments'
+
+
+class IdAllocator:
+    """Монотонный счётчик номеров с сохранением на диск."""
+
+    def __init__(self, path: Optional[str] = None):
+        self._path = path
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            path = self._path or config.ORDER_JOURNAL_PATH
+            conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS counters ('
+                ' name TEXT PRIMARY KEY,'
+                ' value INTEGER NOT NULL)'
+            )
+            self._conn = conn
+        return self._conn
+
+    def current(self, name: str) -> Optional[int]:
+        """Возвращает последний выданный номер или None, если счётчик не заведён."""
+        with self._lock:
+            row = self._connect().execute('SELECT value FROM counters WHERE name = ?', (name,)).fetchone()
+        return row[0] if row else None
+
+    def seed(self, name: str, last_id: int) -> int:
+        """Сверяет счётчик с последним номером в таблице.
+
+        Счётчик никогда не уменьшается: номера, выданные локально, но ещё
+        не записанные в таблицу, не будут выданы повторно.
+
+        Args:
+            name: Название счётчика
+            last_id: Наибольший номер, найденный в таблице
+
+        Returns:
+            int: Последний выданный номер после сверки
+        """
+        with self._lock:
+            conn = self._connect()
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                conn.execute(
+                    'INSERT INTO counters (name, value) VALUES (?, ?) '
+                    'ON CONFLICT(name) DO UPDATE SET value = MAX(value, excluded.value)',
+                    (name, int(last_id))
+                )
+                value = conn.execute('SELECT value FROM counters WHERE name = ?', (name,)).fetchone()[0]
+                conn.execute('COMMIT')
+            except Exception:
+                conn.execute('ROLLBACK')
+                raise
+        return value
+
+    def next_id(self, name: str, seed: Optional[Callable[[], int]] = None) -> str:
+        """Выдаёт следующий номер.
+
+        Args:
+            name: Название счётчика
+            seed: Функция, возвращающая последний номер в таблице. Вызывается
+                только если счётчик ещё не заведён
+
+        Returns:
+            str: Новый номер
+        """
+        if seed is not None and self.current(name) is None:
+            self.seed(name, seed())
+        with self._lock:
+            conn = self._connect()
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                conn.execute(
+                    'INSERT INTO counters (name, value) VALUES (?, 1) '
+                    'ON CONFLICT(name) DO UPDATE SET value = value + 1',
+                    (name,)
+                )
+                value = conn.execute('SELECT value FROM counters WHERE name = ?', (name,)).fetchone()[0]
+                conn.execute('COMMIT')
+            except Exception:
+                conn.execute('ROLLBACK')
+                raise
+        return str(value)
+
+
+def max_numeric_id(values) -> int:
+    """Возвращает наибольший числовой номер из первой колонки листа (без заголовка)."""
+    return max((int(value) for value in list(values)[1:] if str(value).isdigit()), default=0)
+
+
+# Общий счётчик номеров для всего процесса
+id_allocator = IdAllocator()
@@ -0,0 +1,393 @@
+"""Локальный журнал изменений заказов с отложенной записью в Google Sheets.
+
+Создание, редактирование, отмена и смена статуса заказа сначала записываются
+в SQLite-журнал (режим WAL) и сразу применяются к копии листа в памяти.
+Фоновая задача собирает накопившиеся операции и записывает их в таблицу
+пакетно: новые строки одним append_rows, изменения одним batch_update.
+При ошибках таблицы операции остаются в журнале и повторяются позже,
+в том числе после перезапуска бота.
+"""
+import asyncio
+import json
+import logging
+import re
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from .. import config
+from . import gateway
+from .quota import background_task
+from .order_store import order_store, OrderStore
+from .order_record import COL_STATUS
+
+# Типы операций журнала
+OP_CREATE = 'create'   # Новый заказ, payload - полная строка
+OP_UPDATE = 'update'   # Изменённый заказ, payload - полная строка
+OP_STATUS = 'status'   # Смена статуса, payload - новый статус
+OP_FIELD = 'field'     # Изменение одного поля, payload - [номер колонки, значение]
+
+# Пауза перед записью, чтобы собрать операции в один пакет (в секундах)
+FLUSH_DELAY = 1.0
+# Интервал фоновой проверки журнала (в секундах)
+FLUSH_INTERVAL = 30
+# Максимальная пауза между повторами при ошибках таблицы (в секундах)
+MAX_RETRY_DELAY = 300
+
+_COLUMN_LETTERS = 'ABCDEFGHIJKL'
+_UPDATED_RANGE_RE = re.compile(r'![A-Z]+(\d+)')
+
+
+class OrderJournal:
+    """Журнал операций с заказами, ожидающих записи в таблицу."""
+
+    def __init__(self, path: Optional[str] = None):
+        self._path = path
+        self._conn: Optional[sqlite3.Connection] = None
+        self._db_lock = threading.Lock()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._flush_lock: Optional[asyncio.Lock] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._task: Optional[asyncio.Task] = None
+        self._retry_delay = 0.0
+
+    # --- Хранилище ---
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            path = self._path or config.ORDER_JOURNAL_PATH
+            conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS ops ('
+                ' id INTEGER PRIMARY KEY AUTOINCREMENT,'
+                ' created_at REAL NOT NULL,'
+                ' kind TEXT NOT NULL,'
+                ' order_id TEXT NOT NULL,'
+                ' payload TEXT NOT NULL,'
+                ' attempts INTEGER NOT NULL DEFAULT 0,'
+                ' last_error TEXT)'
+            )
+            self._conn = conn
+        return self._conn
+
+    def record(self, kind: str, order_id: str, payload: Any) -> int:
+        """Записывает операцию в журнал и применяет её к копии листа.
+
+        Args:
+            kind: Тип операции (OP_CREATE, OP_UPDATE, OP_STATUS, OP_FIELD)
+            order_id: Номер заказа
+            payload: Данные операции
+
+        Returns:
+            int: Номер операции в журнале
+        """
+        with self._db_lock:
+            cursor = self._connect().execute(
+                'INSERT INTO ops (created_at, kind, order_id, payload) VALUES (?, ?, ?, ?)',
+                (time.time(), kind, str(order_id), json.dumps(payload, ensure_ascii=False))
+            )
+            op_id = cursor.lastrowid
+        _apply_op(order_store, kind, str(order_id), payload)
+        self.notify()
+        return op_id
+
+    def pending(self) -> List[Dict[str, Any]]:
+        """Возвращает незаписанные операции в порядке поступления."""
+        with self._db_lock:
+            rows = self._connect().execute(
+                'SELECT id, kind, order_id, payload, attempts FROM ops ORDER BY id'
+            ).fetchall()
+        return [
+            {'id': op_id, 'kind': kind, 'order_id': order_id, 'payload': json.loads(payload), 'attempts': attempts}
+            for op_id, kind, order_id, payload, attempts in rows
+        ]
+
+    def pending_count(self) -> int:
+        """Возвращает количество незаписанных операций."""
+        with self._db_lock:
+            return self._connect().execute('SELECT COUNT(*) FROM ops').fetchone()[0]
+
+    def max_pending_order_id(self) -> int:
+        """Возвращает наибольший номер заказа среди незаписанных новых заказов."""
+        with self._db_lock:
+            rows = self._connect().execute(
+                'SELECT order_id FROM ops WHERE kind = ?', (OP_CREATE,)
+            ).fetchall()
+        return max((int(order_id) for (order_id,) in rows if order_id.isdigit()), default=0)
+
+    def _delete(self, op_ids: List[int]) -> None:
+        if not op_ids:
+            return
+        with self._db_lock:
+            self._connect().executemany('DELETE FROM ops WHERE id = ?', [(op_id,) for op_id in op_ids])
+
+    def _mark_failed(self, op_ids: List[int], error: str) -> None:
+        with self._db_lock:
+            self._connect().executemany(
+                'UPDATE ops SET attempts = attempts + 1, last_error = ? WHERE id = ?',
+                [(error, op_id) for op_id in op_ids]
+            )
+
+    def rebase_status(self, order_id: str, from_status: str, to_status: str) -> int:
+        """Переносит незаписанные операции заказа на статус, уже записанный в таблицу в обход журнала.
+
+        Операции с полной строкой и смены статуса, которые ещё несут статус
+        from_status, получают статус to_status, чтобы при записи журнала они
+        не вернули прежний статус.
+
+        Returns:
+            int: Количество изменённых операций
+        """
+        updates = []
+        with self._db_lock:
+            conn = self._connect()
+            rows = conn.execute(
+                'SELECT id, kind, payload FROM ops WHERE order_id = ? AND kind IN (?, ?, ?)',
+                (str(order_id), OP_CREATE, OP_UPDATE, OP_STATUS)
+            ).fetchall()
+            for op_id, kind, payload in rows:
+                payload = json.loads(payload)
+                if kind == OP_STATUS:
+                    if payload != from_status:
+                        continue
+                    payload = to_status
+                else:
+                    if payload[COL_STATUS] != from_status:
+                        continue
+                    payload[COL_STATUS] = to_status
+                updates.append((json.dumps(payload, ensure_ascii=False), op_id))
+            if updates:
+                conn.executemany('UPDATE ops SET payload = ? WHERE id = ?', updates)
+        return len(updates)
+
+    def apply_pending(self, store: OrderStore) -> None:
+        """Повторно применяет незаписанные операции к копии листа."""
+        for op in self.pending():
+            _apply_op(store, op['kind'], op['order_id'], op['payload'])
+
+    # --- Запись в таблицу ---
+
+    def _get_flush_lock(self) -> asyncio.Lock:
+        loop = asyncio.get_running_loop()
+        if self._flush_lock is None or self._loop is not loop:
+            self._flush_lock = asyncio.Lock()
+            self._wakeup = asyncio.Event()
+            self._loop = loop
+        return self._flush_lock
+
+    def write_lock(self) -> asyncio.Lock:
+        """Блокировка записи журнала в таблицу.
+
+        Её держат те, кто пишет в лист заказов в обход журнала, чтобы запись
+        журнала не выполнялась одновременно с ними по устаревшим операциям.
+        """
+        return self._get_flush_lock()
+
+    async def flush(self) -> bool:
+        """Записывает накопившиеся операции в таблицу.
+
+        Returns:
+            bool: True, если журнал пуст или все операции записаны
+        """
+        async with self._get_flush_lock():
+            ops = self.pending()
+            if not ops:
+                return True
+            from .sheets import get_orders_sheet
+            orders_sheet = get_orders_sheet()
+
+            # Номера заказов по строкам листа: копия могла устареть (строки
+            # отсортировали или удалили), поэтому строки проверяются по столбцу A
+            rows_by_id = await _read_order_rows(orders_sheet)
+            if rows_by_id is None:
+                self._mark_failed([op['id'] for op in ops], 'не удалось прочитать номера заказов')
+                return False
+
+            # Новые заказы добавляем одним запросом в порядке создания
+            creates = []
+            for op in ops:
+                if op['kind'] != OP_CREATE:
+                    continue
+                existing = rows_by_id.get(op['order_id'])
+                if existing:
+                    # Строка уже добавлена, но операция не успела удалиться из журнала
+                    logging.warning(f"Заказ {op['order_id']} уже есть в строке {existing[-1]}, повторно не добавляется")
+                    current = order_store.get(op['order_id']) or op['payload']
+                    order_store.upsert(current, existing[-1])
+                    self._delete([op['id']])
+                else:
+                    creates.append(op)
+            if creates:
+                rows = [op['payload'] for op in creates]
+                try:
+                    response = await gateway.append_rows(orders_sheet, rows, value_input_option='USER_ENTERED')
+                except Exception as e:
+                    logging.error(f"Ошибка при записи новых заказов из журнала: {e}")
+                    self._mark_failed([op['id'] for op in ops], str(e))
+                    return False
+                first_row = _first_updated_row(response)
+                for offset, op in enumerate(creates):
+                    # В копии может быть более новая версия строки, сохраняем её
+                    current = order_store.get(op['order_id']) or op['payload']
+                    order_store.upsert(current, first_row + offset if first_row else None)
+                    if first_row:
+                        rows_by_id.setdefault(op['order_id'], []).append(first_row + offset)
+                self._delete([op['id'] for op in creates])
+                if first_row is None:
+                    # Номера строк узнаем при следующем чтении листа
+                    await order_store.ensure_fresh(max_age=0)
+                    rows_by_id = await _read_order_rows(orders_sheet)
+                    if rows_by_id is None:
+                        return False
+
+            # Изменения собираем в один batch_update, более поздние перекрывают ранние
+            changes = [op for op in ops if op['kind'] != OP_CREATE]
+            if not changes:
+                return True
+            ranges: Dict[str, List[List[Any]]] = {}
+            written = []
+            dropped = []
+            moved = False
+            for op in changes:
+                order_id = op['order_id']
+                row_number = order_store.row_number(order_id)
+                candidates = rows_by_id.get(order_id, [])
+                if row_number not in candidates:
+                    if len(candidates) == 1:
+                        logging.warning(f"Заказ {order_id} найден в строке {candidates[0]} вместо {row_number}")
+                        row_number = candidates[0]
+                        moved = True
+                    elif not candidates:
+                        logging.warning(f"Заказа {order_id} нет в листе, изменение {op['kind']} не записано")
+                        dropped.append(op['id'])
+                        continue
+                    else:
+                        # Какую из строк менять, решить нельзя; оставляем операцию в журнале
+                        logging.error(f"Заказ {order_id} встречается в строках {candidates}, изменение отложено")
+                        continue
+                range_name, values = _op_range(op['kind'], row_number, op['payload'])
+                ranges.pop(range_name, None)
+                ranges[range_name] = values
+                written.append(op['id'])
+            self._delete(dropped)
+            if moved:
+                # Строки листа сдвинулись, копию нужно перечитать
+                order_store.invalidate()
+            if not ranges:
+                return len(dropped) == len(changes)
+            try:
+                await gateway.batch_update(
+                    orders_sheet,
+                    [{'range': range_name, 'values': values} for range_name, values in ranges.items()],
+                    value_input_option='USER_ENTERED'
+                )
+            except Exception as e:
+                logging.error(f"Ошибка при записи изменений заказов из журнала: {e}")
+                self._mark_failed(written, str(e))
+                return False
+            self._delete(written)
+            logging.info(f"Из журнала записано изменений заказов: {len(written)}")
+            return len(written) + len(dropped) == len(changes)
+
+    def notify(self) -> None:
+        """Сообщает фоновой задаче, что в журнале появились операции."""
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    @background_task
+    async def run_flusher(self) -> None:
+        """Фоновая задача записи журнала в таблицу с повторами при ошибках."""
+        self._get_flush_lock()
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=FLUSH_INTERVAL + self._retry_delay)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            # Даём накопиться операциям, пришедшим почти одновременно
+            await asyncio.sleep(FLUSH_DELAY + self._retry_delay)
+            try:
+                success = await self.flush()
+            except Exception as e:
+                logging.error(f"Ошибка фоновой записи журнала заказов: {e}")
+                success = False
+            if success:
+                self._retry_delay = 0.0
+            else:
+                self._retry_delay = min(max(self._retry_delay * 2, FLUSH_DELAY * 2), MAX_RETRY_DELAY)
+                logging.warning(f"Журнал заказов: повтор записи через {self._retry_delay:.0f} с")
+
+    def start_flusher(self) -> asyncio.Task:
+        """Запускает фоновую запись журнала."""
+        self._get_flush_lock()
+        if self.pending_count():
+            # Операции, оставшиеся после прошлого запуска, записываем сразу
+            self._wakeup.set()
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self.run_flusher())
+        return self._task
+
+    async def stop_flusher(self) -> None:
+        """Останавливает фоновую запись и пытается записать остаток журнала."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        try:
+            await self.flush()
+        except Exception as e:
+            logging.error(f"Не удалось записать журнал заказов при остановке: {e}")
+
+
+def _apply_op(store: OrderStore, kind: str, order_id: str, payload: Any) -> None:
+    """Применяет операцию журнала к копии листа."""
+    if kind in (OP_CREATE, OP_UPDATE):
+        store.upsert(payload)
+    elif kind == OP_STATUS:
+        store.set_status(order_id, payload)
+    elif kind == OP_FIELD:
+        store.set_field(order_id, payload[0], payload[1])
+
+
+def _op_range(kind: str, row_number: int, payload: Any):
+    """Возвращает диапазон и значения для записи операции в таблицу."""
+    if kind == OP_UPDATE:
+        return f'A{row_number}:L{row_number}', [payload]
+    if kind == OP_STATUS:
+        return f'C{row_number}', [[payload]]
+    column, value = payload
+    return f'{_COLUMN_LETTERS[column]}{row_number}', [[value]]
+
+
+async def _read_order_rows(orders_sheet) -> Optional[Dict[str, List[int]]]:
+    """Читает столбец A листа заказов и возвращает номера строк каждого заказа."""
+    try:
+        # Читаем мимо общих снимков шлюза: перед записью нужно состояние листа на сейчас
+        order_ids = await gateway.call(orders_sheet.col_values, 1)
+    except Exception as e:
+        logging.error(f"Ошибка при чтении номеров заказов перед записью журнала: {e}")
+        return None
+    rows_by_id: Dict[str, List[int]] = {}
+    for row_number, order_id in enumerate(order_ids[1:], start=2):
+        if order_id:
+            rows_by_id.setdefault(str(order_id), []).append(row_number)
+    return rows_by_id
+
+
+def _first_updated_row(response) -> Optional[int]:
+    """Извлекает номер первой добавленной строки из ответа append_rows."""
+    try:
+        return int(_UPDATED_RANGE_RE.search(response['updates']['updatedRange']).group(1))
+    except Exception:
+        return None
+
+
+# Общий журнал заказов для всего процесса
+journal = OrderJournal()
+order_store.set_overlay(journal.apply_pending)
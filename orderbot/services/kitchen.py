@@ -1,135 +1,226 @@
-from collections import defaultdict
-from .sheets import orders_sheet
-from datetime import datetime
+"""Сводка заказов для кухни.
+
+Сводка по каждой дате выдачи (порции блюд по приёмам пищи, описания
+заказов, заказы по комнатам) ведётся в памяти по событиям копии листа
+заказов. Заказы на дату принимаются до полуночи перед ней, поэтому
+начиная с даты выдачи её сводка замораживается в неизменяемый снимок:
+повара получают его без обращений к таблице и без повторного подсчёта.
+Редкие поздние изменения (оплата, отмена) заменяют снимок целиком.
+"""
+from collections import Counter
+from datetime import date, datetime, timedelta
+from types import MappingProxyType
+from typing import Dict, Iterable, Mapping, NamedTuple, Optional, Tuple
+
+from ..utils.rendering import escape_fields, escape_markdown_v2
+from .dishes import add_dishes
+from .order_store import order_store
+from .order_record import OrderRecord, OrderStatus, status_values
+
+# Статусы заказов, которые попадают в сводку для кухни
+KITCHEN_STATUSES = ('Принят', 'Ожидает оплаты', 'Оплачен')
+_KITCHEN_STATUS_VALUES = status_values(KITCHEN_STATUSES)
+
+# Приёмы пищи и их ключи в сводке
+MEAL_KEYS = {'Завтрак': 'breakfast', 'Обед': 'lunch', 'Ужин': 'dinner'}
+
+# Сколько прошедших дней хранить в памяти
+KEEP_DAYS = 1
+
+
+class MealSummary(NamedTuple):
+    """Сводка одного приёма пищи."""
+    count: int
+    dishes: Mapping[str, int]
+    orders: Tuple[str, ...]
+
+
+class KitchenSnapshot(NamedTuple):
+    """Неизменяемая сводка для кухни на одну дату выдачи."""
+    day: date
+    total_orders: int
+    meals: Mapping[str, MealSummary]
+    rooms: Mapping[str, Tuple[OrderRecord, ...]]
+    frozen: bool
+
+
+def _describe(order: OrderRecord) -> str:
+    """Описание заказа для сводки в MarkdownV2."""
+    # Добавляем отметку для заказов в зависимости от статуса
+    status_mark = ""
+    if order.status is OrderStatus.AWAITING_PAYMENT:
+        status_mark = "💰 "
+    elif order.status is OrderStatus.PAID:
+        status_mark = "✅ "
+
+    order_id, room, name, wishes = escape_fields(order.order_id, order.room, order.name, order.wishes)
+    order_description = f"{status_mark}Заказ *№{order_id}*\n"
+    order_description += f"🏠 Комната: *{room}*\n"
+    order_description += f"👤 Имя: *{name}*\n"
+    for dish_name, quantity in order.dishes:
+        order_description += f"• {escape_markdown_v2(dish_name)} x{quantity}\n"
+    if order.wishes:
+        order_description += f"Пожелания: *{wishes}*\n"
+    order_description += "─" * 30 # Разделитель между заказами
+    return order_description
+
+
+def _kitchen_key(record: Optional[OrderRecord]) -> Optional[Tuple]:
+    """Поля заказа, от которых зависит сводка; None, если заказ в сводку не попадает."""
+    if record is None or record.delivery_date is None or record.status_text not in _KITCHEN_STATUS_VALUES:
+        return None
+    return (record.delivery_date, record.status, record.meal_type, record.dishes,
+            record.room, record.name, record.wishes)
+
+
+class KitchenDay:
+    """Заказы одной даты выдачи и порции блюд по приёмам пищи."""
+
+    __slots__ = ('orders', 'dishes')
+
+    def __init__(self):
+        # Ключ - OrderRecord.key, чтобы строки с повторяющимся номером заказа не сливались
+        self.orders: Dict[object, OrderRecord] = {}
+        self.dishes: Dict[str, Counter] = {meal: Counter() for meal in MEAL_KEYS}
+
+    def add(self, record: OrderRecord) -> None:
+        self.orders[record.key] = record
+        if record.meal_type in self.dishes:
+            add_dishes(self.dishes[record.meal_type], record.dishes)
+
+    def remove(self, record: OrderRecord) -> None:
+        if self.orders.pop(record.key, None) is not None and record.meal_type in self.dishes:
+            add_dishes(self.dishes[record.meal_type], record.dishes, sign=-1)
+
+    def snapshot(self, day: date, frozen: bool) -> KitchenSnapshot:
+        """Собирает неизменяемую сводку; описания заказов формируются один раз."""
+        orders = sorted(self.orders.values(), key=lambda record: record.row_number or 0)
+        meal_orders: Dict[str, list] = {meal: [] for meal in MEAL_KEYS}
+        rooms: Dict[str, list] = {}
+        for order in orders:
+            if order.meal_type in meal_orders:
+                meal_orders[order.meal_type].append(_describe(order))
+            rooms.setdefault(order.room, []).append(order)
+        meals = {
+            MEAL_KEYS[meal]: MealSummary(len(descriptions), MappingProxyType(dict(self.dishes[meal])), tuple(descriptions))
+            for meal, descriptions in meal_orders.items()
+        }
+        return KitchenSnapshot(
+            day=day,
+            total_orders=len(orders),
+            meals=MappingProxyType(meals),
+            rooms=MappingProxyType({
+                room: tuple(sorted(room_orders, key=lambda record: record.meal_priority))
+                for room, room_orders in rooms.items()
+            }),
+            frozen=frozen,
+        )
+
+
+class KitchenAggregate:
+    """Сводки для кухни по датам выдачи, которые обновляются по событиям копии листа заказов."""
+
+    def __init__(self):
+        self._days: Dict[date, KitchenDay] = {}
+        self._snapshots: Dict[date, KitchenSnapshot] = {}
+        self._loaded = False
+
+    @property
+    def loaded(self) -> bool:
+        return self._loaded
+
+    def _prune(self, today: date) -> None:
+        """Удаляет сводки прошедших дней."""
+        oldest = today - timedelta(days=KEEP_DAYS)
+        for day in [day for day in self._days if day < oldest]:
+            del self._days[day]
+            self._snapshots.pop(day, None)
+
+    def rebuild(self, records: Iterable[OrderRecord]) -> None:
+        """Пересчитывает сводки после полной загрузки листа заказов."""
+        self._days = {}
+        self._snapshots = {}
+        for record in records:
+            if _kitchen_key(record) is not None:
+                self._days.setdefault(record.delivery_date, KitchenDay()).add(record)
+        self._loaded = True
+
+    def apply_change(self, old_record: Optional[OrderRecord], new_record: Optional[OrderRecord]) -> None:
+        """Учитывает изменение заказа; снимок затронутой даты будет собран заново."""
+        old_key, new_key = _kitchen_key(old_record), _kitchen_key(new_record)
+        if old_key == new_key:
+            return
+        if old_key is not None and old_record.delivery_date in self._days:
+            self._days[old_record.delivery_date].remove(old_record)
+            self._snapshots.pop(old_record.delivery_date, None)
+        if new_key is not None:
+            self._days.setdefault(new_record.delivery_date, KitchenDay()).add(new_record)
+            self._snapshots.pop(new_record.delivery_date, None)
+
+    def snapshot(self, day: date) -> KitchenSnapshot:
+        """Возвращает сводку на дату выдачи.
+
+        Сводка даты, заказы на которую больше не принимаются (дата выдачи
+        наступила), хранится как замороженный снимок до следующего изменения
+        её заказов. Сводка будущей даты собирается при каждом обращении.
+        """
+        today = date.today()
+        self._prune(min(today, day))
+        snapshot = self._snapshots.get(day)
+        if snapshot is not None:
+            return snapshot
+        frozen = day <= today
+        snapshot = (self._days.get(day) or KitchenDay()).snapshot(day, frozen)
+        if frozen:
+            self._snapshots[day] = snapshot
+        return snapshot
+
+
+# Общие сводки для кухни для всего процесса
+kitchen_aggregate = KitchenAggregate()
+
+order_store.add_listener(kitchen_aggregate)
+
+
+async def ensure_loaded() -> None:
+    """Загружает лист заказов, только пока сводки ещё не построены."""
+    if not kitchen_aggregate.loaded:
+        await order_store.ensure_fresh()
+
+
+def get_today_snapshot() -> KitchenSnapshot:
+    """Возвращает сводку на сегодня."""
+    return kitchen_aggregate.snapshot(datetime.now().date())
+
 
 def get_dishes_count():
     """
-    Подсчитывает количество каждого блюда во всех принятых заказах на текущий день.
+    Подсчитывает количество порций каждого блюда во всех принятых заказах на текущий день.
     Возвращает словарь, где ключ - название блюда, значение - количество.
     """
-    # Получаем все заказы
-    all_orders = orders_sheet.get_all_values()
-    today = datetime.now().date()
-    
-    # Создаем словарь для подсчета блюд
-    dishes_count = defaultdict(int)
-    
-    # Пропускаем заголовок и обрабатываем каждый заказ
-    for order in all_orders[1:]:
-        # Проверяем, что заказ принят, ожидает оплаты, оплачен и на сегодня
-        if (order[2] == 'Принят' or order[2] == 'Ожидает оплаты' or order[2] == 'Оплачен') and order[11]:
-            try:
-                delivery_date = datetime.strptime(order[11], "%d.%m.%y").date()
-                if delivery_date == today:
-                    # Получаем список блюд из заказа
-                    dishes = [dish.strip() for dish in order[9].split(',')]
-                    # Увеличиваем счетчик для каждого блюда
-                    for dish in dishes:
-                        dishes_count[dish] += 1
-            except ValueError:
-                continue
-    
+    snapshot = get_today_snapshot()
+    dishes_count = Counter()
+    for meal in snapshot.meals.values():
+        dishes_count.update(meal.dishes)
     return dict(dishes_count)
 
+
 def get_orders_summary():
     """
     Возвращает сводку по всем принятым заказам, заказам, ожидающим оплаты, и оплаченным заказам на текущий день, группируя блюда по приемам пищи.
     """
-    # Получаем все заказы
-    all_orders = orders_sheet.get_all_values()
-    today = datetime.now().date()
-    
-    # Создаем словари для подсчета блюд по приемам пищи
-    breakfast_dishes = defaultdict(int)
-    lunch_dishes = defaultdict(int)
-    dinner_dishes = defaultdict(int)
-    
-    # Создаем списки для хранения детальной информации о заказах
-    breakfast_orders = []
-    lunch_orders = []
-    dinner_orders = []
-    
-    total_orders = 0
-    
-    # Пропускаем заголовок и обрабатываем каждый заказ
-    for order in all_orders[1:]:
-        # Проверяем, что заказ принят, ожидает оплаты, оплачен и на сегодня
-        if (order[2] == 'Принят' or order[2] == 'Ожидает оплаты' or order[2] == 'Оплачен') and order[11]:
-            try:
-                delivery_date = datetime.strptime(order[11], "%d.%m.%y").date()
-                if delivery_date == today:
-                    total_orders += 1
-                    
-                    # Получаем тип приема пищи и список блюд
-                    meal_type = order[8]  # Тип еды: Завтрак, Обед или Ужин
-                    dishes = [dish.strip() for dish in order[9].split(',')]
-                    wishes = order[10] if order[10] and order[10] != "—" else None
-                    
-                    # Добавляем отметку для заказов в зависимости от статуса
-                    status_mark = ""
-                    if order[2] == 'Ожидает оплаты':
-                        status_mark = "💰 "
-                    elif order[2] == 'Оплачен':
-                        status_mark = "✅ "
-                    
-                    # Формируем описание заказа
-                    order_description = f"{status_mark}Заказ *№{order[0]}*\n"
-                    order_description += f"🏠 Комната: *{order[6]}*\n"
-                    order_description += f"👤 Имя: *{order[7]}*\n"
-                    for dish in dishes:
-                        order_description += f"• {dish}\n"
-                    if wishes:
-                        order_description += f"Пожелания: *{wishes}*\n"
-                    order_description += "─" * 30 # Разделитель между заказами
-                    
-                    # Добавляем заказ в соответствующий список
-                    if meal_type == 'Завтрак':
-                        breakfast_orders.append(order_description)
-                        for dish in dishes:
-                            # Разбираем строку с блюдом и количеством
-                            if ' x' in dish:
-                                dish_name, quantity = dish.split(' x')
-                                breakfast_dishes[dish_name] += int(quantity)
-                            else:
-                                breakfast_dishes[dish] += 1
-                    elif meal_type == 'Обед':
-                        lunch_orders.append(order_description)
-                        for dish in dishes:
-                            if ' x' in dish:
-                                dish_name, quantity = dish.split(' x')
-                                lunch_dishes[dish_name] += int(quantity)
-                            else:
-                                lunch_dishes[dish] += 1
-                    elif meal_type == 'Ужин':
-                        dinner_orders.append(order_description)
-                        for dish in dishes:
-                            if ' x' in dish:
-                                dish_name, quantity = dish.split(' x')
-                                dinner_dishes[dish_name] += int(quantity)
-                            else:
-                                dinner_dishes[dish] += 1
-            except ValueError:
-                continue
-    
+    snapshot = get_today_snapshot()
+
     # Формируем итоговую сводку
     summary = {
-        'total_orders': total_orders,
-        'date': today.strftime("%d.%m.%Y"),  # Добавляем дату в формате DD.MM.YYYY
-        'breakfast': {
-            'count': len(breakfast_orders),
-            'dishes': dict(breakfast_dishes),
-            'orders': breakfast_orders
-        },
-        'lunch': {
-            'count': len(lunch_orders),
-            'dishes': dict(lunch_dishes),
-            'orders': lunch_orders
-        },
-        'dinner': {
-            'count': len(dinner_orders),
-            'dishes': dict(dinner_dishes),
-            'orders': dinner_orders
-        }
+        'total_orders': snapshot.total_orders,
+        'date': snapshot.day.strftime("%d.%m.%Y"),  # Добавляем дату в формате DD.MM.YYYY
     }
-    
-    return summary 
\ No newline at end of file
+    for key, meal in snapshot.meals.items():
+        summary[key] = {
+            'count': meal.count,
+            'dishes': dict(meal.dishes),
+            'orders': list(meal.orders)
+        }
+
+    return summary
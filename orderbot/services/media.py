@@ -0,0 +1,151 @@
+"""Отправка изображений в Telegram без повторного кодирования и загрузки.
+
+Изображения PNG и JPEG передаются в Telegram как есть, без перекодирования
+через Pillow; Pillow импортируется лишь тогда, когда формат приходится
+преобразовывать. После первой загрузки Telegram возвращает file_id фото,
+и следующие отправки той же статической картинки идут по file_id без
+загрузки файла. QR-коды оплаты одноразовые, поэтому отправляются сразу
+без кэширования.
+"""
+import base64
+import binascii
+import io
+import logging
+import os
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import telegram
+from telegram import InputFile
+
+# Сигнатуры форматов, которые Telegram принимает как фото без преобразования
+PHOTO_SIGNATURES = (b'\x89PNG\r\n\x1a\n', b'\xff\xd8\xff')
+# Фрагменты ошибок Telegram, после которых file_id нужно заменить загрузкой файла
+STALE_FILE_ID_ERRORS = ('wrong file identifier', 'file reference expired')
+
+# Настройка логгера
+logger = logging.getLogger(__name__)
+
+
+def decode_base64_image(content: str) -> bytes:
+    """Декодирует изображение из base64, в том числе из data URI.
+
+    Args:
+        content: Строка base64, возможно с префиксом data:image/png;base64,
+
+    Returns:
+        bytes: Байты изображения
+
+    Raises:
+        ValueError: Если строка не является корректным base64
+    """
+    if ',' in content and content.lstrip().startswith('data:'):
+        content = content.split(',', 1)[1]
+    try:
+        return base64.b64decode(''.join(content.split()), validate=True)
+    except binascii.Error as e:
+        raise ValueError(f"Некорректное изображение в base64: {e}") from e
+
+
+def _pil_image():
+    """Импортирует Pillow только при необходимости преобразования."""
+    from PIL import Image
+    return Image
+
+
+def prepare_photo(data: bytes) -> bytes:
+    """Возвращает байты, которые Telegram примет как фото.
+
+    PNG и JPEG возвращаются без изменений, остальные форматы
+    перекодируются в PNG через Pillow.
+    """
+    if data.startswith(PHOTO_SIGNATURES):
+        return data
+    logger.info("Изображение не в формате PNG/JPEG, выполняется преобразование в PNG")
+    buffer = io.BytesIO()
+    _pil_image().open(io.BytesIO(data)).save(buffer, format='PNG')
+    return buffer.getvalue()
+
+
+async def send_image(bot, chat_id: int, image: bytes, filename: str, **kwargs):
+    """Отправляет изображение из памяти без кэширования file_id.
+
+    Args:
+        bot: Бот Telegram
+        chat_id: Идентификатор чата
+        image: Байты изображения
+        filename: Имя файла для Telegram
+        **kwargs: Параметры send_photo (caption, parse_mode и т.д.)
+
+    Returns:
+        Отправленное сообщение
+    """
+    return await bot.send_photo(chat_id=chat_id, photo=InputFile(prepare_photo(image), filename=filename), **kwargs)
+
+
+class MediaCache:
+    """Кэш file_id изображений, уже загруженных в Telegram."""
+
+    def __init__(self):
+        # Путь файла -> (время изменения файла, file_id)
+        self._files: Dict[str, Tuple[float, str]] = {}
+        self._stats = {'uploads': 0, 'cached': 0}
+
+    async def _send(self, bot, chat_id: int, file_id: Optional[str],
+                    load: Callable[[], bytes], filename: str, **kwargs) -> Tuple[Any, Optional[str]]:
+        """Отправляет фото по file_id, а если его нет или он устарел - загружает байты.
+
+        Returns:
+            Tuple[Any, Optional[str]]: Отправленное сообщение и file_id фото
+        """
+        if file_id:
+            try:
+                message = await bot.send_photo(chat_id=chat_id, photo=file_id, **kwargs)
+                self._stats['cached'] += 1
+                return message, file_id
+            except telegram.error.BadRequest as e:
+                # Ошибки подписи и разметки загрузка файла не исправит
+                if not any(error in str(e).lower() for error in STALE_FILE_ID_ERRORS):
+                    raise
+                logger.warning(f"file_id {file_id} не принят Telegram, изображение будет загружено заново: {e}")
+
+        message = await bot.send_photo(chat_id=chat_id, photo=InputFile(load(), filename=filename), **kwargs)
+        self._stats['uploads'] += 1
+        photo = getattr(message, 'photo', None)
+        return message, (photo[-1].file_id if photo else None)
+
+    async def send_file(self, bot, chat_id: int, path: str, **kwargs):
+        """Отправляет статическое изображение с диска.
+
+        Файл читается и загружается только при первой отправке или после
+        его изменения; дальше используется file_id.
+
+        Args:
+            bot: Бот Telegram
+            chat_id: Идентификатор чата
+            path: Путь к изображению
+            **kwargs: Параметры send_photo (caption, parse_mode и т.д.)
+
+        Returns:
+            Отправленное сообщение
+        """
+        mtime = os.path.getmtime(path)
+        cached_mtime, file_id = self._files.get(path, (None, None))
+        if cached_mtime != mtime:
+            file_id = None
+
+        def load() -> bytes:
+            with open(path, 'rb') as f:
+                return prepare_photo(f.read())
+
+        message, file_id = await self._send(bot, chat_id, file_id, load, os.path.basename(path), **kwargs)
+        if file_id:
+            self._files[path] = (mtime, file_id)
+        return message
+
+    def get_stats(self) -> Dict[str, int]:
+        """Возвращает число загрузок и отправок по file_id."""
+        return dict(self._stats)
+
+
+# Общий кэш изображений для всего процесса
+media_cache = MediaCache()
@@ -0,0 +1,153 @@
+"""Разобранная строка листа заказов.
+
+Строка листа разбирается один раз при попадании в копию листа: дата выдачи
+становится объектом date, статус - значением OrderStatus, сумма - целым
+числом, а блюда - кортежем пар (блюдо, количество) (см. dishes). Сервисы и обработчики
+читают поля записи вместо индексов колонок и повторного разбора строк.
+"""
+import functools
+from datetime import date, datetime
+from enum import Enum
+from typing import Iterable, List, Optional, Set, Union
+
+from .dishes import decode_dishes
+
+# Количество колонок в листе заказов (A:L)
+ORDERS_COLUMNS = 12
+
+# Индексы колонок листа заказов
+COL_ID = 0
+COL_CREATED_AT = 1
+COL_STATUS = 2
+COL_USER_ID = 3
+COL_USERNAME = 4
+COL_TOTAL = 5
+COL_ROOM = 6
+COL_NAME = 7
+COL_MEAL_TYPE = 8
+COL_DISHES = 9
+COL_WISHES = 10
+COL_DELIVERY_DATE = 11
+
+# Форматы даты выдачи: основной DD.MM.YY и встречающиеся в старых строках
+DELIVERY_DATE_FORMATS = ("%d.%m.%y", "%Y-%m-%d", "%d.%m.%Y")
+
+# Формат времени создания заказа
+CREATED_AT_FORMAT = "%d.%m.%Y %H:%M:%S"
+
+# Порядок приёмов пищи в сводках
+MEAL_ORDER = {'Завтрак': 0, 'Обед': 1, 'Ужин': 2}
+
+
+class OrderStatus(str, Enum):
+    """Статус заказа. Значения совпадают с текстом в таблице."""
+    ACTIVE = 'Активен'
+    ACCEPTED = 'Принят'
+    AWAITING_PAYMENT = 'Ожидает оплаты'
+    PAID = 'Оплачен'
+    CANCELLED = 'Отменён'
+
+    @classmethod
+    def parse(cls, value: str) -> Optional['OrderStatus']:
+        """Возвращает статус по тексту из таблицы или None для неизвестного статуса."""
+        try:
+            return cls(value)
+        except ValueError:
+            return None
+
+
+def status_values(statuses: Iterable[Union[str, OrderStatus]]) -> Set[str]:
+    """Возвращает тексты статусов для сравнения со статусом из таблицы."""
+    return {status.value if isinstance(status, OrderStatus) else status for status in statuses}
+
+
+def normalize_row(row: List[str]) -> List[str]:
+    """Дополняет строку пустыми значениями до полного числа колонок."""
+    row = [str(value) for value in row[:ORDERS_COLUMNS]]
+    if len(row) < ORDERS_COLUMNS:
+        row.extend([''] * (ORDERS_COLUMNS - len(row)))
+    return row
+
+
+@functools.lru_cache(maxsize=4096)
+def parse_delivery_date(value: str) -> Optional[date]:
+    """Разбирает дату выдачи; одинаковые строки разбираются один раз."""
+    for fmt in DELIVERY_DATE_FORMATS:
+        try:
+            return datetime.strptime(value, fmt).date()
+        except ValueError:
+            continue
+    return None
+
+
+def parse_total(value: str) -> int:
+    """Переводит сумму заказа в целое число, некорректная сумма считается нулевой."""
+    try:
+        return int(float(value)) if value else 0
+    except ValueError:
+        return 0
+
+
+class OrderRecord:
+    """Заказ с разобранными полями. Исходная строка листа доступна в поле row."""
+
+    __slots__ = ('row', 'row_number', 'order_id', 'status', 'user_id', 'total',
+                 'room', 'name', 'meal_type', 'dishes', 'wishes', 'delivery_date', 'duplicate')
+
+    def __init__(self, row: List[str], row_number: Optional[int] = None, duplicate: bool = False):
+        """
+        Args:
+            row: Строка листа из ORDERS_COLUMNS значений (см. normalize_row)
+            row_number: Номер строки в листе, если заказ уже записан
+            duplicate: Номер заказа встречается в листе больше одного раза
+        """
+        self.row = row
+        self.row_number = row_number
+        self.duplicate = duplicate
+        self.order_id = row[COL_ID]
+        self.status = OrderStatus.parse(row[COL_STATUS])
+        self.user_id = row[COL_USER_ID]
+        self.total = parse_total(row[COL_TOTAL])
+        self.room = row[COL_ROOM]
+        self.name = row[COL_NAME]
+        self.meal_type = row[COL_MEAL_TYPE]
+        self.dishes = decode_dishes(row[COL_DISHES])
+        wishes = row[COL_WISHES]
+        self.wishes = wishes if wishes and wishes != '—' else None
+        self.delivery_date = parse_delivery_date(row[COL_DELIVERY_DATE]) if row[COL_DELIVERY_DATE] else None
+
+    @classmethod
+    def from_row(cls, row: List[str], row_number: Optional[int] = None) -> 'OrderRecord':
+        """Разбирает строку листа произвольной длины."""
+        return cls(normalize_row(row), row_number)
+
+    @property
+    def status_text(self) -> str:
+        """Статус в том виде, в каком он записан в таблице."""
+        return self.row[COL_STATUS]
+
+    @property
+    def username(self) -> str:
+        """Имя пользователя Telegram, оформившего заказ."""
+        return self.row[COL_USERNAME]
+
+    @property
+    def created_at(self) -> Optional[datetime]:
+        """Время создания заказа или None, если оно не разбирается."""
+        try:
+            return datetime.strptime(self.row[COL_CREATED_AT], CREATED_AT_FORMAT)
+        except ValueError:
+            return None
+
+    @property
+    def key(self):
+        """Ключ заказа в сводках: номер заказа, а для повторяющихся номеров - ещё и номер строки."""
+        return (self.order_id, self.row_number) if self.duplicate else self.order_id
+
+    @property
+    def meal_priority(self) -> int:
+        """Порядок приёма пищи для сортировки: завтрак, обед, ужин, остальное."""
+        return MEAL_ORDER.get(self.meal_type, len(MEAL_ORDER))
+
+    def __repr__(self) -> str:
+        return f"<Заказ {self.order_id} {self.row[COL_STATUS]} {self.row[COL_DELIVERY_DATE]}>"
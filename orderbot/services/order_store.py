@@ -0,0 +1,387 @@
+"""Индексированная копия листа Orders в памяти.
+
+Лист загружается один раз, затем дочитываются только новые строки в конце
+листа. Собственные записи бота сразу применяются к копии, поэтому обработчики
+получают заказы по индексам без полной выгрузки листа.
+"""
+import asyncio
+import logging
+import re
+import time
+from collections import defaultdict
+from datetime import date
+from typing import Callable, Dict, Iterable, List, Optional, Set, Union
+
+from . import gateway
+from .order_record import OrderRecord, OrderStatus, normalize_row, parse_delivery_date, status_values, COL_ID, COL_STATUS
+
+# Как часто дочитывать новые строки из таблицы (в секундах)
+REFRESH_INTERVAL = 30
+# Как часто полностью перечитывать лист, чтобы увидеть ручные правки (в секундах)
+FULL_RELOAD_INTERVAL = 600
+
+_UPDATED_RANGE_RE = re.compile(r'![A-Z]+(\d+)')
+
+
+class OrderStore:
+    """Копия листа заказов с индексами по ID, пользователю, статусу, комнате и дате выдачи."""
+
+    def __init__(self):
+        self._rows: Dict[str, List[str]] = {}
+        # Разобранные строки, строка разбирается один раз при попадании в копию
+        self._records: Dict[str, OrderRecord] = {}
+        self._row_numbers: Dict[str, int] = {}
+        self._ids_by_row: Dict[int, str] = {}
+        # Более ранние строки с повторяющимся номером заказа (номер строки -> заказ);
+        # основной считается последняя строка, но в сводках учитывается каждая
+        self._shadowed: Dict[int, OrderRecord] = {}
+        self._duplicate_ids: Set[str] = set()
+        self._by_user: Dict[str, Set[str]] = defaultdict(set)
+        self._by_status: Dict[str, Set[str]] = defaultdict(set)
+        self._by_room: Dict[str, Set[str]] = defaultdict(set)
+        self._by_date: Dict[Optional[date], Set[str]] = defaultdict(set)
+        self._sheet_rows = 0  # Количество строк в листе вместе с заголовком
+        self._loaded = False
+        self._stale = False
+        self._last_refresh = 0.0
+        self._last_full_load = 0.0
+        self._lock: Optional[asyncio.Lock] = None
+        self._lock_loop: Optional[asyncio.AbstractEventLoop] = None
+        # Функция, которая заново применяет ещё не записанные в таблицу изменения
+        self._overlay: Optional[Callable[['OrderStore'], None]] = None
+        # Подписчики на изменения заказов (например, итоги по датам выдачи)
+        self._listeners: List = []
+        self._bulk = False
+
+    def _get_lock(self) -> asyncio.Lock:
+        """Возвращает блокировку, привязанную к текущему event loop."""
+        loop = asyncio.get_running_loop()
+        if self._lock is None or self._lock_loop is not loop:
+            self._lock = asyncio.Lock()
+            self._lock_loop = loop
+        return self._lock
+
+    @staticmethod
+    def _worksheet():
+        """Возвращает лист заказов."""
+        from .sheets import get_orders_sheet
+        return get_orders_sheet()
+
+    # --- Индексы ---
+
+    def _index(self, record: OrderRecord) -> None:
+        order_id = record.order_id
+        self._by_user[record.user_id].add(order_id)
+        self._by_status[record.status_text].add(order_id)
+        self._by_room[record.room].add(order_id)
+        self._by_date[record.delivery_date].add(order_id)
+
+    def _unindex(self, record: OrderRecord) -> None:
+        order_id = record.order_id
+        self._by_user[record.user_id].discard(order_id)
+        self._by_status[record.status_text].discard(order_id)
+        self._by_room[record.room].discard(order_id)
+        self._by_date[record.delivery_date].discard(order_id)
+
+    def _put(self, row_number: Optional[int], row: List[str]) -> None:
+        row = normalize_row(row)
+        order_id = row[COL_ID]
+        if not order_id:
+            return
+        old_record = self._records.get(order_id)
+        if old_record is not None:
+            self._unindex(old_record)
+            old_row_number = old_record.row_number
+            if (row_number is not None and old_row_number is not None and old_row_number != row_number
+                    and self._ids_by_row.get(old_row_number) == order_id):
+                self._shadow(old_record, row_number)
+                old_record = None
+        # Строки, ещё не записанные в таблицу, хранятся без номера строки
+        if row_number is not None:
+            self._row_numbers[order_id] = row_number
+            self._ids_by_row[row_number] = order_id
+            self._sheet_rows = max(self._sheet_rows, row_number)
+        record = OrderRecord(row, self._row_numbers.get(order_id), order_id in self._duplicate_ids)
+        self._rows[order_id] = row
+        self._records[order_id] = record
+        self._index(record)
+        if not self._bulk:
+            self._notify(old_record, record)
+
+    def _shadow(self, record: OrderRecord, row_number: int) -> None:
+        """Откладывает строку заказа, номер которого повторяется в строке row_number."""
+        order_id = record.order_id
+        logging.warning(
+            f"Номер заказа {order_id} повторяется в строках {record.row_number} и {row_number} листа заказов"
+        )
+        self._duplicate_ids.add(order_id)
+        shadow = OrderRecord(record.row, record.row_number, duplicate=True)
+        self._shadowed[record.row_number] = shadow
+        if not self._bulk:
+            # Строка остаётся в сводках, но уже под ключом с номером строки
+            self._notify(record, None)
+            self._notify(None, shadow)
+
+    def _clear(self) -> None:
+        self._rows.clear()
+        self._records.clear()
+        self._row_numbers.clear()
+        self._ids_by_row.clear()
+        self._shadowed.clear()
+        self._duplicate_ids.clear()
+        self._by_user.clear()
+        self._by_status.clear()
+        self._by_room.clear()
+        self._by_date.clear()
+        self._sheet_rows = 0
+
+    # --- Загрузка ---
+
+    async def load(self) -> bool:
+        """Полностью загружает лист заказов.
+
+        Returns:
+            bool: True в случае успешной загрузки, False в противном случае
+        """
+        async with self._get_lock():
+            return await self._load()
+
+    async def _load(self) -> bool:
+        try:
+            self.replace(await gateway.get_all_values(self._worksheet()))
+            return True
+        except Exception as e:
+            logging.error(f"Ошибка при загрузке листа заказов в память: {e}")
+            return False
+
+    def replace(self, all_orders: List[List[str]]) -> None:
+        """Заменяет копию полной выгрузкой листа заказов (вместе с заголовком)."""
+        self._clear()
+        self._bulk = True
+        try:
+            for idx, row in enumerate(all_orders[1:], start=2):
+                self._put(idx, row)
+        finally:
+            self._bulk = False
+        self._sheet_rows = max(self._sheet_rows, len(all_orders))
+        for listener in self._listeners:
+            try:
+                listener.rebuild(self.all_records())
+            except Exception as e:
+                logging.error(f"Ошибка в подписчике на изменения заказов: {e}")
+        self._apply_overlay()
+        self._loaded = True
+        self._stale = False
+        self._last_refresh = self._last_full_load = time.monotonic()
+        logging.info(f"Загружено заказов в память: {len(self._rows)}")
+
+    async def _load_tail(self) -> bool:
+        """Дочитывает строки, добавленные в конец листа после последней загрузки."""
+        try:
+            start = self._sheet_rows + 1
+            new_rows = await gateway.call(self._worksheet().get, f'A{start}:L')
+            for offset, row in enumerate(new_rows or []):
+                self._put(start + offset, row)
+            if new_rows:
+                self._apply_overlay()
+            self._last_refresh = time.monotonic()
+            return True
+        except Exception as e:
+            logging.error(f"Ошибка при дочитывании листа заказов: {e}")
+            return False
+
+    async def ensure_fresh(self, max_age: float = REFRESH_INTERVAL) -> bool:
+        """Актуализирует копию листа перед чтением.
+
+        Args:
+            max_age: Допустимый возраст данных в секундах
+
+        Returns:
+            bool: True, если данные доступны для чтения
+        """
+        now = time.monotonic()
+        if self._loaded and not self._stale and now - self._last_refresh < max_age:
+            return True
+        async with self._get_lock():
+            now = time.monotonic()
+            if not self._loaded or self._stale or now - self._last_full_load >= FULL_RELOAD_INTERVAL:
+                return await self._load()
+            if now - self._last_refresh >= max_age:
+                await self._load_tail()
+            return True
+
+    def add_listener(self, listener) -> None:
+        """Подписывает объект на изменения заказов.
+
+        У подписчика вызывается rebuild(records) после полной загрузки листа
+        и apply_change(old_record, new_record) при каждом изменении заказа.
+        """
+        if listener not in self._listeners:
+            self._listeners.append(listener)
+
+    def _notify(self, old_record: Optional[OrderRecord], new_record: Optional[OrderRecord]) -> None:
+        for listener in self._listeners:
+            try:
+                listener.apply_change(old_record, new_record)
+            except Exception as e:
+                logging.error(f"Ошибка в подписчике на изменения заказов: {e}")
+
+    def set_overlay(self, overlay: Callable[['OrderStore'], None]) -> None:
+        """Задаёт функцию, которая применяет незаписанные изменения после чтения листа."""
+        self._overlay = overlay
+
+    def _apply_overlay(self) -> None:
+        if self._overlay is None:
+            return
+        try:
+            self._overlay(self)
+        except Exception as e:
+            logging.error(f"Ошибка при применении незаписанных изменений заказов: {e}")
+
+    def invalidate(self) -> None:
+        """Помечает копию устаревшей, следующее чтение перезагрузит лист."""
+        self._stale = True
+
+    # --- Чтение ---
+
+    def _collect_records(self, order_ids: Iterable[str],
+                         statuses: Optional[Iterable[Union[str, OrderStatus]]] = None) -> List[OrderRecord]:
+        if statuses is not None:
+            statuses = status_values(statuses)
+        result = [
+            self._records[order_id] for order_id in order_ids
+            if order_id in self._records and (statuses is None or self._records[order_id].status_text in statuses)
+        ]
+        result.sort(key=lambda record: self._sort_key(record.row))
+        return result
+
+    def _collect(self, order_ids: Iterable[str],
+                 statuses: Optional[Iterable[Union[str, OrderStatus]]] = None) -> List[List[str]]:
+        return [record.row for record in self._collect_records(order_ids, statuses)]
+
+    def _sort_key(self, row: List[str]):
+        """Порядок строк листа; незаписанные заказы идут в конце по номеру."""
+        row_number = self._row_numbers.get(row[COL_ID])
+        if row_number is not None:
+            return (0, row_number, 0)
+        return (1, 0, int(row[COL_ID]) if row[COL_ID].isdigit() else 0)
+
+    def get(self, order_id: str) -> Optional[List[str]]:
+        """Возвращает строку заказа по его номеру."""
+        return self._rows.get(str(order_id))
+
+    def row_number(self, order_id: str) -> Optional[int]:
+        """Возвращает номер строки заказа в листе."""
+        return self._row_numbers.get(str(order_id))
+
+    def all(self, statuses: Optional[Iterable[str]] = None) -> List[List[str]]:
+        """Возвращает все заказы в порядке строк листа."""
+        return self._collect(list(self._rows), statuses)
+
+    def all_records(self) -> List[OrderRecord]:
+        """Возвращает по записи на каждую строку, включая строки с повторяющимися номерами заказов."""
+        return list(self._records.values()) + list(self._shadowed.values())
+
+    def numbered_records(self) -> List[OrderRecord]:
+        """Возвращает записанные в таблицу строки заказов в порядке строк листа."""
+        return sorted(
+            (record for record in self.all_records() if record.row_number is not None),
+            key=lambda record: record.row_number
+        )
+
+    def by_user(self, user_id: str, statuses: Optional[Iterable[str]] = None) -> List[List[str]]:
+        """Возвращает заказы пользователя."""
+        return self._collect(list(self._by_user.get(str(user_id), ())), statuses)
+
+    def by_status(self, status: str) -> List[List[str]]:
+        """Возвращает заказы с указанным статусом."""
+        return self._collect(list(self._by_status.get(status, ())))
+
+    def by_room(self, room: str, statuses: Optional[Iterable[str]] = None) -> List[List[str]]:
+        """Возвращает заказы для комнаты."""
+        return self._collect(list(self._by_room.get(str(room), ())), statuses)
+
+    def by_delivery_date(self, delivery_date: str, statuses: Optional[Iterable[str]] = None) -> List[List[str]]:
+        """Возвращает заказы с датой выдачи в формате DD.MM.YY."""
+        return self._collect(list(self._by_date.get(parse_delivery_date(delivery_date), ())), statuses)
+
+    # --- Чтение разобранных записей ---
+
+    def record(self, order_id: str) -> Optional[OrderRecord]:
+        """Возвращает разобранный заказ по его номеру."""
+        return self._records.get(str(order_id))
+
+    def records_by_user(self, user_id: str,
+                        statuses: Optional[Iterable[Union[str, OrderStatus]]] = None) -> List[OrderRecord]:
+        """Возвращает разобранные заказы пользователя."""
+        return self._collect_records(list(self._by_user.get(str(user_id), ())), statuses)
+
+    def records_by_room(self, room: str,
+                        statuses: Optional[Iterable[Union[str, OrderStatus]]] = None) -> List[OrderRecord]:
+        """Возвращает разобранные заказы для комнаты."""
+        return self._collect_records(list(self._by_room.get(str(room), ())), statuses)
+
+    def records_by_delivery_date(self, delivery_date: date,
+                                 statuses: Optional[Iterable[Union[str, OrderStatus]]] = None) -> List[OrderRecord]:
+        """Возвращает разобранные заказы с датой выдачи."""
+        return self._collect_records(list(self._by_date.get(delivery_date, ())), statuses)
+
+    # --- Собственные записи бота ---
+
+    def upsert(self, row: List[str], row_number: Optional[int] = None) -> None:
+        """Применяет к копии записанную ботом строку заказа.
+
+        Args:
+            row: Полная строка заказа
+            row_number: Номер строки в листе, если известен. Строка без номера
+                считается ещё не записанной и получит номер при чтении листа
+        """
+        order_id = str(row[COL_ID])
+        if row_number is None:
+            row_number = self._row_numbers.get(order_id)
+        self._put(row_number, row)
+
+    def max_order_id(self) -> int:
+        """Возвращает наибольший известный номер заказа."""
+        return max((int(order_id) for order_id in self._rows if order_id.isdigit()), default=0)
+
+    def upsert_appended(self, row: List[str], response) -> None:
+        """Применяет строку, добавленную через append_row, по ответу API."""
+        try:
+            updated_range = response['updates']['updatedRange']
+            row_number = int(_UPDATED_RANGE_RE.search(updated_range).group(1))
+        except Exception:
+            row_number = None
+        self.upsert(row, row_number)
+
+    def set_field(self, order_id: str, column: int, value) -> None:
+        """Обновляет одно поле заказа в копии."""
+        order_id = str(order_id)
+        row = self._rows.get(order_id)
+        if row is None:
+            return
+        new_row = list(row)
+        new_row[column] = str(value)
+        self._put(self._row_numbers.get(order_id), new_row)
+
+    def set_status(self, order_id: str, status: str) -> None:
+        """Обновляет статус заказа в копии."""
+        self.set_field(order_id, COL_STATUS, status)
+
+    def set_status_by_row(self, row_number: int, status: str) -> None:
+        """Обновляет статус заказа по номеру строки листа."""
+        shadow = self._shadowed.get(row_number)
+        if shadow is not None:
+            new_row = list(shadow.row)
+            new_row[COL_STATUS] = str(status)
+            record = OrderRecord(new_row, row_number, duplicate=True)
+            self._shadowed[row_number] = record
+            self._notify(shadow, record)
+            return
+        order_id = self._ids_by_row.get(row_number)
+        if order_id is not None:
+            self.set_status(order_id, status)
+
+
+# Общая копия листа заказов для всего процесса
+order_store = OrderStore()
@@ -0,0 +1,228 @@
+"""Общая проверка статусов оплаты по QR-кодам СБП.
+
+Все ожидающие оплаты QR-коды собраны в одном планировщике вместо отдельной
+повторяющейся задачи на каждый чат. За один проход планировщик одновременно
+(не более MAX_CONCURRENT_CHECKS запросов сразу) опрашивает банк по кодам,
+срок проверки которых наступил, и передаёт все завершившиеся оплаты
+обработчику одним пакетом: изменения заказов и оплат уходят в таблицу одной
+записью. Свежие QR-коды проверяются часто, старые - всё реже. Проходы выполняет
+одна повторяющаяся задача job_queue с интервалом TICK_INTERVAL.
+"""
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from . import sbp
+from .quota import background_task
+
+# Интервал проверки в зависимости от возраста QR-кода: (возраст до, интервал) в секундах
+POLL_SCHEDULE = ((60, 5), (180, 10), (600, 30))
+# Расписание, когда об оплатах сообщает банк, а опрос лишь страхует пропущенные уведомления
+FALLBACK_POLL_SCHEDULE = ((180, 30), (600, 60))
+# Время жизни QR-кода в секундах; после него проверка прекращается
+QR_TTL = 600
+# Сколько запросов к банку выполнять одновременно
+MAX_CONCURRENT_CHECKS = 5
+# Интервал общей задачи проверки в секундах; QR-коды с близким сроком проверяются в одном проходе
+TICK_INTERVAL = 5
+
+# Статусы банка, после которых проверка завершена
+FINAL_STATUSES = ('accepted', 'rejected', 'expired')
+# Итог проверки после истечения времени жизни QR-кода, если оплата так и не началась
+STATUS_EXPIRED = 'expired'
+# Итог проверки, если оплата началась, но не подтвердилась за время жизни QR-кода
+STATUS_EXHAUSTED = 'exhausted'
+
+# Настройка логгера
+logger = logging.getLogger(__name__)
+
+
+def poll_interval(age: float, schedule: Tuple[Tuple[int, int], ...] = POLL_SCHEDULE) -> float:
+    """Возвращает интервал до следующей проверки QR-кода заданного возраста."""
+    for limit, interval in schedule:
+        if age < limit:
+            return interval
+    return schedule[-1][1]
+
+
+class PendingPayment:
+    """QR-код, ожидающий оплаты, и данные пользователя, которому он выдан."""
+
+    __slots__ = ('chat_id', 'qrc_id', 'user_data', 'started', 'next_check', 'checks', 'last_status')
+
+    def __init__(self, chat_id: int, qrc_id: str, user_data: Dict[str, Any], now: float):
+        self.chat_id = chat_id
+        self.qrc_id = qrc_id
+        self.user_data = user_data
+        self.started = now
+        self.next_check = now + poll_interval(0)
+        self.checks = 0
+        self.last_status = ''
+
+    @property
+    def payment(self) -> Optional[Dict[str, Any]]:
+        """Данные платежа из контекста пользователя."""
+        return self.user_data.get('payment')
+
+    @property
+    def active(self) -> bool:
+        """Платёж не отменён и не заменён новым."""
+        payment = self.payment
+        return bool(payment) and payment.get('qrc_id') == self.qrc_id
+
+
+# Обработчик завершившихся оплат: получает бота и список пар (платёж, ответ банка)
+ResultHandler = Callable[[Any, List[Tuple[PendingPayment, Dict[str, Any]]]], Awaitable[None]]
+
+
+class PaymentPoller:
+    """Планировщик проверки статусов оплаты всех чатов."""
+
+    def __init__(self, max_concurrent: int = MAX_CONCURRENT_CHECKS, clock: Callable[[], float] = time.monotonic):
+        self._pending: Dict[int, PendingPayment] = {}
+        self._max_concurrent = max_concurrent
+        self._clock = clock
+        self._handler: Optional[ResultHandler] = None
+        self._schedule = POLL_SCHEDULE
+
+    def set_result_handler(self, handler: ResultHandler) -> None:
+        """Задаёт обработчик завершившихся оплат."""
+        self._handler = handler
+
+    def set_schedule(self, schedule: Tuple[Tuple[int, int], ...]) -> None:
+        """Задаёт расписание проверки для новых QR-кодов."""
+        self._schedule = schedule
+
+    def register(self, chat_id: int, user_data: Dict[str, Any]) -> bool:
+        """Ставит QR-код из данных платежа пользователя на проверку.
+
+        Повторная регистрация того же QR-кода сохраняет его расписание,
+        новый QR-код заменяет предыдущий платёж чата.
+
+        Returns:
+            bool: True, если QR-код проверяется
+        """
+        payment = user_data.get('payment') or {}
+        qrc_id = payment.get('qrc_id')
+        if not qrc_id:
+            logger.warning(f"Нет QR-кода для автоматической проверки оплаты в chat_id={chat_id}")
+            return False
+        current = self._pending.get(chat_id)
+        if current is not None and current.qrc_id == qrc_id:
+            current.user_data = user_data
+            return True
+        pending = PendingPayment(chat_id, qrc_id, user_data, self._clock())
+        pending.next_check = pending.started + poll_interval(0, self._schedule)
+        self._pending[chat_id] = pending
+        logger.info(f"QR-код {qrc_id} поставлен на автоматическую проверку для chat_id={chat_id}")
+        return True
+
+    def unregister(self, chat_id: int) -> bool:
+        """Снимает платёж чата с проверки. Возвращает True, если он проверялся."""
+        return self._pending.pop(chat_id, None) is not None
+
+    def find(self, qrc_id: str) -> Optional[PendingPayment]:
+        """Возвращает проверяемый платёж по QR-коду."""
+        for pending in self._pending.values():
+            if pending.qrc_id == qrc_id:
+                return pending
+        return None
+
+    def is_tracking(self, chat_id: int) -> bool:
+        return chat_id in self._pending
+
+    def pending_count(self) -> int:
+        return len(self._pending)
+
+    async def _check(self, pending: PendingPayment, semaphore: asyncio.Semaphore) -> Dict[str, Any]:
+        async with semaphore:
+            try:
+                return await sbp.get_qr_code_status(pending.qrc_id) or {}
+            except Exception as e:
+                logger.error(f"Ошибка при проверке статуса QR-кода {pending.qrc_id}: {e}")
+                return {'error': str(e)}
+
+    async def tick(self, bot=None) -> List[Tuple[PendingPayment, Dict[str, Any]]]:
+        """Проверяет все QR-коды, срок проверки которых наступил.
+
+        Args:
+            bot: Бот, от имени которого обработчик сообщает итоги оплат
+
+        Returns:
+            List[Tuple[PendingPayment, Dict[str, Any]]]: Завершившиеся оплаты и ответы банка
+        """
+        # Отменённые и заменённые платежи больше не проверяем
+        for chat_id in [chat_id for chat_id, pending in self._pending.items() if not pending.active]:
+            del self._pending[chat_id]
+
+        now = self._clock()
+        due = [pending for pending in self._pending.values() if pending.next_check <= now]
+        if not due:
+            return []
+        semaphore = asyncio.Semaphore(self._max_concurrent)
+        responses = await asyncio.gather(*(self._check(pending, semaphore) for pending in due))
+
+        now = self._clock()
+        finished = []
+        for pending, status_data in zip(due, responses):
+            if self._pending.get(pending.chat_id) is not pending:
+                # Оплату уже подтвердило уведомление банка или пользователь её отменил
+                continue
+            pending.checks += 1
+            if 'error' not in status_data:
+                pending.last_status = (status_data.get('status') or '').lower()
+            age = now - pending.started
+            if pending.last_status in FINAL_STATUSES:
+                finished.append((pending, status_data))
+            elif age >= QR_TTL:
+                status = STATUS_EXPIRED if pending.last_status in ('', 'notstarted') else STATUS_EXHAUSTED
+                logger.info(f"Автопроверка QR-кода {pending.qrc_id} завершена по времени: {status}")
+                finished.append((pending, {'status': status, 'message': status_data.get('message', '')}))
+            else:
+                pending.next_check = now + poll_interval(age, self._schedule)
+        for pending, _ in finished:
+            del self._pending[pending.chat_id]
+
+        logger.info(f"Автопроверка оплат: проверено {len(due)}, завершено {len(finished)}, "
+                    f"ожидают {len(self._pending)}")
+        if finished and self._handler is not None:
+            try:
+                await self._handler(bot, finished)
+            except Exception as e:
+                logger.error(f"Ошибка при обработке результатов проверки оплат: {e}")
+        return finished
+
+    async def complete(self, qrc_id: str, status_data: Dict[str, Any], bot=None) -> bool:
+        """Завершает проверку QR-кода по подтверждённому уведомлению банка.
+
+        Args:
+            qrc_id: Идентификатор QR-кода
+            status_data: Статус оплаты, полученный от банка
+            bot: Бот, от имени которого обработчик сообщает итог оплаты
+
+        Returns:
+            bool: True, если платёж проверялся и итог передан обработчику
+        """
+        pending = self.find(qrc_id)
+        if pending is None or not pending.active:
+            return False
+        del self._pending[pending.chat_id]
+        logger.info(f"QR-код {qrc_id} оплачен по уведомлению банка, chat_id={pending.chat_id}")
+        if self._handler is not None:
+            await self._handler(bot, [(pending, status_data)])
+        return True
+
+    @background_task
+    async def run_job(self, context) -> None:
+        """Задача job_queue: один проход проверки оплат всех чатов."""
+        if not self._pending:
+            return
+        try:
+            await self.tick(context.bot)
+        except Exception as e:
+            logger.error(f"Ошибка автоматической проверки оплат: {e}")
+
+
+# Общий планировщик проверки оплат для всего процесса
+payment_poller = PaymentPoller()
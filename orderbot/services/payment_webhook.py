@@ -0,0 +1,98 @@
+"""Приём уведомлений банка об оплате по QR-коду СБП.
+
+В режиме вебхука бот принимает на том же aiohttp-сервере уведомления
+Точка Банка о входящих платежах СБП (тип incomingSbpPayment). Адрес
+уведомлений содержит секрет, известный только банку. Подпись JWT здесь не
+проверяется: получив уведомление, бот одним запросом статуса QR-кода
+убеждается в оплате у самого банка и сразу отмечает заказы и оплату
+оплаченными. Опрос статусов остаётся запасным путём для пропущенных
+уведомлений и выполняется реже.
+"""
+import base64
+import hmac
+import json
+import logging
+from typing import Any, Dict, Optional
+
+from aiohttp import web
+
+from . import sbp
+from .payment_poller import payment_poller
+
+# Путь уведомлений банка на сервере бота
+PAYMENT_WEBHOOK_PATH = '/payment-webhook/{secret}'
+# Тип уведомления о входящем платеже СБП
+INCOMING_SBP_PAYMENT = 'incomingSbpPayment'
+
+# Настройка логгера
+logger = logging.getLogger(__name__)
+
+
+def parse_notification(body: str) -> Optional[Dict[str, Any]]:
+    """Извлекает данные уведомления из тела запроса.
+
+    Банк присылает уведомление в виде JWT; данные берутся из его полезной
+    нагрузки. Тело в формате JSON также принимается.
+
+    Returns:
+        Optional[Dict[str, Any]]: Данные уведомления или None, если тело не разобрано
+    """
+    body = body.strip()
+    try:
+        if body.startswith('{'):
+            data = json.loads(body)
+        else:
+            payload = body.split('.')[1]
+            data = json.loads(base64.urlsafe_b64decode(payload + '=' * (-len(payload) % 4)))
+    except (IndexError, ValueError) as e:
+        logger.warning(f"Не удалось разобрать уведомление банка: {e}")
+        return None
+    return data if isinstance(data, dict) else None
+
+
+class PaymentWebhook:
+    """Обработчик уведомлений банка об оплате."""
+
+    def __init__(self, bot, secret: str):
+        """
+        Args:
+            bot: Бот, от имени которого пользователю сообщается итог оплаты
+            secret: Секрет из адреса уведомлений
+        """
+        self._bot = bot
+        self._secret = secret
+
+    def add_routes(self, app: web.Application) -> None:
+        """Добавляет маршрут уведомлений в веб-приложение."""
+        app.router.add_post(PAYMENT_WEBHOOK_PATH, self.handle)
+
+    async def handle(self, request: web.Request) -> web.Response:
+        """Принимает уведомление банка. Ответ 200 означает, что повторять его не нужно."""
+        if not hmac.compare_digest(request.match_info.get('secret', ''), self._secret):
+            logger.warning("Уведомление об оплате с неверным секретом отклонено")
+            return web.Response(status=403)
+
+        notification = parse_notification(await request.text())
+        if notification is None:
+            return web.Response(status=400)
+        if notification.get('webhookType') != INCOMING_SBP_PAYMENT:
+            logger.info(f"Уведомление банка пропущено: {notification.get('webhookType')}")
+            return web.Response()
+
+        qrc_id = notification.get('qrcId')
+        if not qrc_id or payment_poller.find(qrc_id) is None:
+            # Платёж уже завершён или выдан до перезапуска бота
+            logger.info(f"Уведомление об оплате QR-кода {qrc_id}: ожидающий платёж не найден")
+            return web.Response()
+
+        try:
+            # Убеждаемся в оплате у банка, прежде чем отмечать заказы
+            status_data = await sbp.get_qr_code_status(qrc_id)
+            if (status_data.get('status') or '').lower() != 'accepted':
+                logger.warning(f"Уведомление об оплате QR-кода {qrc_id} не подтверждено банком: {status_data}")
+                return web.Response()
+            await payment_poller.complete(qrc_id, status_data, self._bot)
+        except Exception as e:
+            logger.error(f"Ошибка при обработке уведомления об оплате QR-кода {qrc_id}: {e}")
+            return web.Response(status=500)
+        return web.Response()
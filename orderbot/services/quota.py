@@ -0,0 +1,161 @@
+"""Планировщик запросов к Google Sheets с учётом квоты API.
+
+Google Sheets разрешает около 60 запросов на чтение и 60 на запись в минуту
+на пользователя. Перед каждым запросом шлюз берёт токен из корзины
+соответствующего типа. Запросы пользователей (INTERACTIVE) получают токены
+раньше фоновых задач (BACKGROUND): проверки оплат, пересчёта итогов, записи
+журнала и т.д. После ответа 429 или 5xx планировщик приостанавливает
+выдачу токенов с экспоненциально растущей паузой. Запись повторяется только
+после 429: при ответе 5xx Google мог уже выполнить её, и повтор append_row
+добавил бы строку ещё раз.
+"""
+import asyncio
+import contextvars
+import functools
+import logging
+import random
+import time
+from typing import Callable, Dict, Optional
+
+# Типы запросов
+READ = 'read'
+WRITE = 'write'
+
+# Классы приоритета
+INTERACTIVE = 'interactive'
+BACKGROUND = 'background'
+
+# Запросов в минуту для каждого типа (с запасом относительно квоты 60)
+REQUESTS_PER_MINUTE = 55
+# Сколько запросов можно выполнить подряд без ожидания
+BURST = 15
+# Повторы запроса после ответа 429 или 5xx
+MAX_RETRIES = 4
+BASE_BACKOFF = 1.0
+MAX_BACKOFF = 32.0
+
+RETRYABLE_STATUSES = (429, 500, 502, 503, 504)
+# Для записи повторяем только ответ 429: запрос заведомо не выполнен
+WRITE_RETRYABLE_STATUSES = (429,)
+
+# Приоритет текущей задачи; фоновые задачи помечаются через background_task
+_priority: contextvars.ContextVar[str] = contextvars.ContextVar('sheets_priority', default=INTERACTIVE)
+
+
+class TokenBucket:
+    """Корзина токенов с приоритетной выдачей."""
+
+    def __init__(self, rate_per_minute: float = REQUESTS_PER_MINUTE, burst: int = BURST):
+        self._rate = rate_per_minute / 60.0
+        self._capacity = float(burst)
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._waiting: Dict[str, int] = {INTERACTIVE: 0, BACKGROUND: 0}
+        self._stats = {'granted': 0, 'throttled': 0}
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self._capacity, self._tokens + (now - self._updated) * self._rate)
+        self._updated = now
+
+    async def acquire(self, priority: str = INTERACTIVE) -> None:
+        """Ждёт свободный токен. Фоновые запросы пропускают вперёд запросы пользователей."""
+        self._waiting[priority] += 1
+        throttled = False
+        try:
+            while True:
+                self._refill()
+                now = time.monotonic()
+                if now < self._paused_until:
+                    delay = self._paused_until - now
+                elif self._tokens >= 1 and (priority == INTERACTIVE or self._waiting[INTERACTIVE] == 0):
+                    self._tokens -= 1
+                    self._stats['granted'] += 1
+                    return
+                else:
+                    delay = max((1 - self._tokens) / self._rate, 0.05)
+                if not throttled:
+                    throttled = True
+                    self._stats['throttled'] += 1
+                await asyncio.sleep(delay)
+        finally:
+            self._waiting[priority] -= 1
+
+    def pause(self, delay: float) -> None:
+        """Приостанавливает выдачу токенов, например после ответа 429."""
+        self._paused_until = max(self._paused_until, time.monotonic() + delay)
+
+    def get_stats(self) -> Dict[str, float]:
+        """Возвращает глубину очередей и счётчики корзины."""
+        self._refill()
+        stats = dict(self._stats)
+        stats.update({
+            'tokens': round(self._tokens, 2),
+            'queue_interactive': self._waiting[INTERACTIVE],
+            'queue_background': self._waiting[BACKGROUND],
+        })
+        return stats
+
+
+class QuotaScheduler:
+    """Выполняет запросы к Google Sheets в пределах квоты с повторами при перегрузке."""
+
+    def __init__(self, rate_per_minute: float = REQUESTS_PER_MINUTE, burst: int = BURST):
+        self._buckets = {
+            READ: TokenBucket(rate_per_minute, burst),
+            WRITE: TokenBucket(rate_per_minute, burst),
+        }
+        self._retries = 0
+
+    async def run(self, kind: str, call: Callable, priority: Optional[str] = None):
+        """Выполняет асинхронный вызов после получения токена.
+
+        Args:
+            kind: Тип запроса (READ или WRITE)
+            call: Функция без аргументов, возвращающая корутину запроса
+            priority: Класс приоритета; по умолчанию берётся из текущей задачи
+
+        Returns:
+            Any: Результат запроса
+        """
+        bucket = self._buckets[kind]
+        retryable = WRITE_RETRYABLE_STATUSES if kind == WRITE else RETRYABLE_STATUSES
+        priority = priority or _priority.get()
+        attempt = 0
+        while True:
+            await bucket.acquire(priority)
+            try:
+                return await call()
+            except Exception as e:
+                status = get_status_code(e)
+                if status not in retryable or attempt >= MAX_RETRIES:
+                    raise
+                delay = min(BASE_BACKOFF * 2 ** attempt, MAX_BACKOFF) * random.uniform(0.8, 1.2)
+                attempt += 1
+                self._retries += 1
+                bucket.pause(delay)
+                logging.warning(f"Google Sheets ответил {status}, повтор {attempt}/{MAX_RETRIES} через {delay:.1f} с")
+
+    def get_stats(self) -> Dict[str, Dict[str, float]]:
+        """Возвращает состояние корзин и число повторов."""
+        stats = {kind: bucket.get_stats() for kind, bucket in self._buckets.items()}
+        stats['retries'] = self._retries
+        return stats
+
+
+def get_status_code(error: Exception) -> Optional[int]:
+    """Возвращает HTTP-статус ответа из ошибки gspread, если он есть."""
+    return getattr(getattr(error, 'response', None), 'status_code', None)
+
+
+def background_task(func):
+    """Декоратор для фоновых задач: их запросы к таблице уступают запросам пользователей."""
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        token = _priority.set(BACKGROUND)
+        try:
+            return await func(*args, **kwargs)
+        finally:
+            _priority.reset(token)
+    return wrapper
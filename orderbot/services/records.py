@@ -1,142 +1,75 @@
 from datetime import datetime, date, timedelta
 from .sheets import orders_sheet, rec_sheet, auth_sheet
-from collections import defaultdict
+from . import gateway
+from .quota import background_task
+from .daily_totals import daily_totals, compute, DayTotals, REC_HEADER
+from .order_record import OrderRecord, parse_delivery_date
+from .order_store import order_store
+from typing import Dict, List, Optional
 import logging
 
-def normalize_date(date_str: str) -> str:
-    """
-    Нормализует дату в формат YYYY-MM-DD.
+# Как часто записывать в Rec итоги, изменившиеся после событий заказов (в секундах)
+REC_SYNC_INTERVAL = 300
+
+
+def _find_rec_row(rec_data: List[List[str]], day: date) -> Optional[int]:
+    """Возвращает номер строки Rec для даты."""
+    for idx, row in enumerate(rec_data[1:], start=2):  # Пропускаем заголовок
+        if row and parse_delivery_date(row[0]) == day:
+            return idx
+    return None
+
+
+@background_task
+async def process_daily_orders(verify: bool = False):
+    """Обработка заказов за текущий день и сохранение их в таблицу Rec.
+    
+    Итоги дня берутся из итогов, которые бот ведёт по событиям заказов;
+    лист заказов целиком не выгружается и не пересчитывается. Полный
+    пересчёт по листу выполняет recount_days.
     
     Args:
-        date_str: Дата в одном из форматов: YYYY-MM-DD, DD.MM.YY, DD.MM.YYYY, D.M.YYYY
-        
-    Returns:
-        str: Дата в формате YYYY-MM-DD
+        verify: Сверить итоги дня с пересчётом по копии листа заказов в памяти
     """
-    try:
-        # Пробуем разные форматы даты
-        for fmt in ["%Y-%m-%d", "%d.%m.%y", "%d.%m.%Y", "%d.%m.%Y"]:
-            try:
-                return datetime.strptime(date_str, fmt).strftime("%Y-%m-%d")
-            except ValueError:
-                continue
-        return date_str  # Если ни один формат не подошел, возвращаем исходную строку
-    except Exception:
-        return date_str
-
-async def process_daily_orders():
-    """Обработка заказов за текущий день и сохранение их в таблицу Rec."""
     try:
         logging.info("Начало обработки заказов за день")
         
         # Получаем текущую дату
-        current_date = date.today().strftime("%Y-%m-%d")  # Оставляем для сравнения
-        current_date_formatted = date.today().strftime("%d.%m.%y")  # Для записи в таблицу
+        current_date = date.today()
+        current_date_formatted = current_date.strftime("%d.%m.%y")
         logging.info(f"Обработка заказов за дату: {current_date_formatted}")
         
-        # Получаем все заказы
-        all_orders = orders_sheet.get_all_values()
-        logging.info(f"Всего заказов в таблице: {len(all_orders) - 1}")  # -1 для учета заголовка
+        # Копия листа дочитывает только новые строки; итоги обновляются по её событиям
+        if not await order_store.ensure_fresh() and not daily_totals.loaded:
+            logging.error("Не удалось загрузить заказы для итогов дня")
+            return False
+        totals = daily_totals.get(current_date)
         
-        # Фильтруем заказы за текущий день
-        daily_orders = [
-            order for order in all_orders[1:]  # Пропускаем заголовок
-            if normalize_date(order[11]) == current_date  # Проверяем дату выдачи
-        ]
-        logging.info(f"Заказов за текущий день: {len(daily_orders)}")
+        if verify and daily_totals.verify(order_store.all_records(), [current_date]):
+            logging.warning(f"Итоги за {current_date_formatted} по событиям заказов расходятся с пересчётом")
+            totals = compute(order_store.all_records(), [current_date]).get(current_date) or DayTotals()
+        logging.info(f"Принятых заказов: {totals.orders}, отмененных: {totals.cancelled}, сумма: {totals.amount}")
         
         # Получаем все записи из таблицы Rec
-        rec_data = rec_sheet.get_all_values()
+        rec_data = await gateway.get_all_values(rec_sheet)
         logging.info(f"Текущих записей в таблице Rec: {len(rec_data) - 1}")
         
         # Если лист пустой, добавляем заголовки
         if not rec_data:
             logging.info("Таблица Rec пуста, добавляем заголовки")
-            rec_sheet.append_row([
-                'Дата выдачи',
-                'Количество заказов',
-                'Количество отмен',
-                'Общая сумма',
-                'Завтрак',
-                'Обед',
-                'Ужин'
-            ], value_input_option='USER_ENTERED')
-            rec_data = rec_sheet.get_all_values()
-        
-        # Подсчитываем статистику
-        # Учитываем все заказы, которые были приняты в течение дня
-        accepted_orders = [order for order in daily_orders if order[2] in ["Принят", "Активен"]]
-        cancelled_orders = [order for order in daily_orders if order[2] == "Отменён"]
-        
-        logging.info(f"Принятых заказов: {len(accepted_orders)}")
-        logging.info(f"Отмененных заказов: {len(cancelled_orders)}")
-        
-        total_orders = len(accepted_orders)
-        total_cancelled = len(cancelled_orders)
-        total_amount = sum(float(order[5]) for order in accepted_orders if order[5])
-        logging.info(f"Общая сумма заказов: {total_amount}")
+            await gateway.append_row(rec_sheet, REC_HEADER, value_input_option='USER_ENTERED')
+            rec_data = [REC_HEADER]
         
-        # Собираем блюда по типам приема пищи
-        breakfast_dishes = defaultdict(int)
-        lunch_dishes = defaultdict(int)
-        dinner_dishes = defaultdict(int)
-        
-        for order in accepted_orders:
-            meal_type = order[8]  # Тип еды, берем оригинальное значение (без приведения к нижнему регистру)
-            dishes_str = order[9]  # Строка с блюдами
-            
-            # Парсим строку с блюдами
-            for dish_info in dishes_str.split(', '):
-                if ' x' in dish_info:
-                    dish, quantity = dish_info.split(' x')
-                    quantity = int(quantity)
-                else:
-                    dish = dish_info
-                    quantity = 1
-                
-                # Добавляем блюдо в соответствующий словарь
-                if meal_type == 'Завтрак':
-                    breakfast_dishes[dish] += quantity
-                elif meal_type == 'Обед':
-                    lunch_dishes[dish] += quantity
-                elif meal_type == 'Ужин':
-                    dinner_dishes[dish] += quantity
-        
-        logging.info(f"Блюд на завтрак: {len(breakfast_dishes)}")
-        logging.info(f"Блюд на обед: {len(lunch_dishes)}")
-        logging.info(f"Блюд на ужин: {len(dinner_dishes)}")
-        
-        # Форматируем строки с блюдами
-        breakfast_str = ', '.join(f"{dish} x{quantity}" for dish, quantity in breakfast_dishes.items())
-        lunch_str = ', '.join(f"{dish} x{quantity}" for dish, quantity in lunch_dishes.items())
-        dinner_str = ', '.join(f"{dish} x{quantity}" for dish, quantity in dinner_dishes.items())
-        
-        # Формируем строку данных
-        row_data = [
-            current_date_formatted,  # Используем отформатированную дату
-            str(total_orders),
-            str(total_cancelled),
-            str(int(total_amount)),
-            breakfast_str or '—',
-            lunch_str or '—',
-            dinner_str or '—'
-        ]
+        row_data = totals.to_rec_row(current_date)
         
         # Проверяем, существует ли уже запись за этот день
-        existing_row = None
-        for idx, row in enumerate(rec_data[1:], start=2):  # Пропускаем заголовок
-            if normalize_date(row[0]) == current_date:  # Нормализуем дату для сравнения
-                existing_row = idx
-                break
-        
+        existing_row = _find_rec_row(rec_data, current_date)
         if existing_row:
             logging.info(f"Обновляем существующую запись в строке {existing_row}")
-            # Обновляем существующую запись
-            rec_sheet.update(f'A{existing_row}:G{existing_row}', [row_data], value_input_option='USER_ENTERED')
+            await gateway.update(rec_sheet, f'A{existing_row}:G{existing_row}', [row_data], value_input_option='USER_ENTERED')
         else:
             logging.info("Добавляем новую запись")
-            # Добавляем новую запись
-            rec_sheet.append_row(row_data, value_input_option='USER_ENTERED')
+            await gateway.append_row(rec_sheet, row_data, value_input_option='USER_ENTERED')
         
         logging.info("Обработка заказов успешно завершена")
         return True
@@ -144,135 +77,96 @@ async def process_daily_orders():
         logging.error(f"Ошибка при обработке заказов за день: {e}")
         return False 
 
-async def recount_last_three_days():
-    """Пересчитывает данные в таблице Rec за последние 3 дня.
+async def write_rec_rows(rows_by_date: Dict[date, List[str]]) -> None:
+    """Записывает строки Rec по датам: существующие одним batch_update, новые одним append_rows.
+    
+    Args:
+        rows_by_date: Строки листа Rec по датам
+    """
+    rec_data = await gateway.get_all_values(rec_sheet)
+    if not rec_data:
+        logging.info("Таблица Rec пуста, добавляем заголовки")
+        await gateway.append_row(rec_sheet, REC_HEADER, value_input_option='USER_ENTERED')
+        rec_data = [REC_HEADER]
+    
+    # Номер строки Rec по дате; при повторах даты берём первую строку
+    row_index: Dict[date, int] = {}
+    for idx, row in enumerate(rec_data[1:], start=2):
+        day = parse_delivery_date(row[0]) if row and row[0] else None
+        if day is not None:
+            row_index.setdefault(day, idx)
+    
+    updates = []
+    new_rows = []
+    for day in sorted(rows_by_date):
+        row_number = row_index.get(day)
+        if row_number:
+            updates.append({'range': f'A{row_number}:G{row_number}', 'values': [rows_by_date[day]]})
+        else:
+            new_rows.append(rows_by_date[day])
+    
+    if updates:
+        await gateway.batch_update(rec_sheet, updates, value_input_option='USER_ENTERED')
+    if new_rows:
+        await gateway.append_rows(rec_sheet, new_rows, value_input_option='USER_ENTERED')
+    logging.info(f"Записаны итоги в Rec: обновлено {len(updates)}, добавлено {len(new_rows)}")
+
+@background_task
+async def sync_daily_totals() -> bool:
+    """Записывает в Rec итоги прошедших и текущего дней, изменившиеся после событий заказов.
+    
+    Returns:
+        bool: True в случае успешной записи, False в противном случае
+    """
+    dirty = daily_totals.pop_dirty()
+    today = date.today()
+    # Итоги будущих дней попадут в Rec при обработке заказов в их день
+    due = [day for day in dirty if day <= today]
+    if not due:
+        return True
+    try:
+        await write_rec_rows({day: daily_totals.get(day).to_rec_row(day) for day in due})
+        return True
+    except Exception as e:
+        daily_totals.mark_dirty(due)
+        logging.error(f"Ошибка при записи итогов в Rec: {e}")
+        return False
+
+async def recount_days(start: date, end: date) -> bool:
+    """Пересчитывает данные в таблице Rec за диапазон дат выдачи.
+    
+    Заказы группируются по дате выдачи за один проход по листу, строки Rec
+    находятся по индексу дат, а все строки записываются одним пакетом.
+    
+    Args:
+        start: Первая дата диапазона
+        end: Последняя дата диапазона (включительно)
     
     Returns:
         bool: True в случае успешного пересчета, False в противном случае
     """
     try:
-        logging.info("Начало пересчета данных за последние 3 дня")
-        
-        # Получаем даты за последние 3 дня
-        today = date.today()
-        dates_to_process = []
-        for i in range(3):
-            target_date = today - timedelta(days=i)
-            dates_to_process.append(target_date)
-        
-        logging.info(f"Пересчитываем данные за даты: {[d.strftime('%d.%m.%y') for d in dates_to_process]}")
+        days = [start + timedelta(days=i) for i in range((end - start).days + 1)]
+        logging.info(f"Начало пересчета данных за {start.strftime('%d.%m.%y')} - {end.strftime('%d.%m.%y')} ({len(days)} дн.)")
         
         # Получаем все заказы
-        all_orders = orders_sheet.get_all_values()
+        all_orders = await gateway.get_all_values(orders_sheet)
         logging.info(f"Всего заказов в таблице: {len(all_orders) - 1}")  # -1 для учета заголовка
         
-        # Получаем все записи из таблицы Rec
-        rec_data = rec_sheet.get_all_values()
-        logging.info(f"Текущих записей в таблице Rec: {len(rec_data) - 1}")
-        
-        # Если лист пустой, добавляем заголовки
-        if not rec_data:
-            logging.info("Таблица Rec пуста, добавляем заголовки")
-            rec_sheet.append_row([
-                'Дата выдачи',
-                'Количество заказов',
-                'Количество отмен',
-                'Общая сумма',
-                'Завтрак',
-                'Обед',
-                'Ужин'
-            ], value_input_option='USER_ENTERED')
-            rec_data = rec_sheet.get_all_values()
-        
-        # Обрабатываем каждую дату
-        for target_date in dates_to_process:
-            current_date = target_date.strftime("%Y-%m-%d")  # Для сравнения
-            current_date_formatted = target_date.strftime("%d.%m.%y")  # Для записи в таблицу
-            
-            logging.info(f"Обработка заказов за дату: {current_date_formatted}")
-            
-            # Фильтруем заказы за текущую дату
-            daily_orders = [
-                order for order in all_orders[1:]  # Пропускаем заголовок
-                if normalize_date(order[11]) == current_date  # Проверяем дату выдачи
-            ]
-            logging.info(f"Заказов за {current_date_formatted}: {len(daily_orders)}")
-            
-            # Подсчитываем статистику
-            # Учитываем все заказы, которые были приняты в течение дня
-            accepted_orders = [order for order in daily_orders if order[2] in ["Принят", "Активен", "Ожидает оплаты", "Оплачен"]]
-            cancelled_orders = [order for order in daily_orders if order[2] == "Отменён"]
-            
-            logging.info(f"Принятых заказов за {current_date_formatted}: {len(accepted_orders)}")
-            logging.info(f"Отмененных заказов за {current_date_formatted}: {len(cancelled_orders)}")
-            
-            total_orders = len(accepted_orders)
-            total_cancelled = len(cancelled_orders)
-            total_amount = sum(float(order[5]) for order in accepted_orders if order[5])
-            logging.info(f"Общая сумма заказов за {current_date_formatted}: {total_amount}")
-            
-            # Собираем блюда по типам приема пищи
-            breakfast_dishes = defaultdict(int)
-            lunch_dishes = defaultdict(int)
-            dinner_dishes = defaultdict(int)
-            
-            for order in accepted_orders:
-                meal_type = order[8]  # Тип еды
-                dishes_str = order[9]  # Строка с блюдами
-                
-                # Парсим строку с блюдами
-                for dish_info in dishes_str.split(', '):
-                    if ' x' in dish_info:
-                        dish, quantity = dish_info.split(' x')
-                        quantity = int(quantity)
-                    else:
-                        dish = dish_info
-                        quantity = 1
-                    
-                    # Добавляем блюдо в соответствующий словарь
-                    if meal_type == 'Завтрак':
-                        breakfast_dishes[dish] += quantity
-                    elif meal_type == 'Обед':
-                        lunch_dishes[dish] += quantity
-                    elif meal_type == 'Ужин':
-                        dinner_dishes[dish] += quantity
-            
-            # Форматируем строки с блюдами
-            breakfast_str = ', '.join(f"{dish} x{quantity}" for dish, quantity in breakfast_dishes.items())
-            lunch_str = ', '.join(f"{dish} x{quantity}" for dish, quantity in lunch_dishes.items())
-            dinner_str = ', '.join(f"{dish} x{quantity}" for dish, quantity in dinner_dishes.items())
-            
-            # Формируем строку данных
-            row_data = [
-                current_date_formatted,  # Используем отформатированную дату
-                str(total_orders),
-                str(total_cancelled),
-                str(int(total_amount)),
-                breakfast_str or '—',
-                lunch_str or '—',
-                dinner_str or '—'
-            ]
-            
-            # Проверяем, существует ли уже запись за этот день
-            existing_row = None
-            for idx, row in enumerate(rec_data[1:], start=2):  # Пропускаем заголовок
-                if normalize_date(row[0]) == current_date:  # Нормализуем дату для сравнения
-                    existing_row = idx
-                    break
-            
-            if existing_row:
-                logging.info(f"Обновляем существующую запись в строке {existing_row} для даты {current_date_formatted}")
-                # Обновляем существующую запись
-                rec_sheet.update(f'A{existing_row}:G{existing_row}', [row_data], value_input_option='USER_ENTERED')
-            else:
-                logging.info(f"Добавляем новую запись для даты {current_date_formatted}")
-                # Добавляем новую запись
-                rec_sheet.append_row(row_data, value_input_option='USER_ENTERED')
-                # Обновляем rec_data для следующих итераций
-                rec_data.append(row_data)
+        totals = compute((OrderRecord.from_row(row) for row in all_orders[1:]), days)
+        await write_rec_rows({day: (totals.get(day) or DayTotals()).to_rec_row(day) for day in days})
         
-        logging.info("Пересчет данных за последние 3 дня успешно завершен")
+        logging.info(f"Пересчет данных за {len(days)} дн. успешно завершен")
         return True
     except Exception as e:
-        logging.error(f"Ошибка при пересчете данных за последние 3 дня: {e}")
-        return False 
\ No newline at end of file
+        logging.error(f"Ошибка при пересчете данных за {start} - {end}: {e}")
+        return False
+
+async def recount_last_three_days():
+    """Пересчитывает данные в таблице Rec за последние 3 дня.
+    
+    Returns:
+        bool: True в случае успешного пересчета, False в противном случае
+    """
+    today = date.today()
+    return await recount_days(today - timedelta(days=2), today)
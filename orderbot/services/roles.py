@@ -0,0 +1,102 @@
+"""Справочник ролей пользователей в памяти.
+
+Множества ID авторизованных пользователей, поваров и администраторов
+загружаются из таблицы и обновляются по истечении TTL. Проверка прав
+сводится к поиску в множестве. Устаревшие данные отдаются сразу, а
+обновление выполняется в фоне через шлюз Google Sheets.
+"""
+import asyncio
+import logging
+import time
+from typing import Callable, Dict, FrozenSet, Iterable, Optional, Set
+
+from . import gateway
+from .cache import is_expired
+
+# Названия ролей
+AUTHORIZED = 'authorized'
+COOK = 'cook'
+ADMIN = 'admin'
+
+# Время жизни загруженного списка (в секундах)
+ROLES_TTL = 300
+
+
+class RoleDirectory:
+    """Множества ID пользователей по ролям с обновлением по TTL."""
+
+    def __init__(self, loaders: Dict[str, Callable[[], Iterable[str]]], ttl: float = ROLES_TTL):
+        self._loaders = loaders
+        self._ttl = ttl
+        self._sets: Dict[str, FrozenSet[str]] = {}
+        self._loaded_at: Dict[str, Optional[float]] = {}
+        self._refreshing: Set[str] = set()
+        self._stats = {'hits': 0, 'misses': 0, 'refreshes': 0, 'errors': 0}
+
+    def _load(self, role: str) -> FrozenSet[str]:
+        """Загружает список роли из таблицы."""
+        try:
+            ids = frozenset(str(value).strip() for value in self._loaders[role]() if str(value).strip())
+            self._sets[role] = ids
+            self._loaded_at[role] = time.monotonic()
+            self._stats['refreshes'] += 1
+            return ids
+        except Exception as e:
+            self._stats['errors'] += 1
+            logging.error(f"Ошибка при загрузке списка роли {role}: {e}")
+            return self._sets.get(role, frozenset())
+
+    async def _refresh_in_background(self, role: str) -> None:
+        try:
+            await gateway.call(self._load, role)
+        finally:
+            self._refreshing.discard(role)
+
+    def _schedule_refresh(self, role: str) -> None:
+        if role in self._refreshing:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            # Вне event loop обновляем сразу
+            self._load(role)
+            return
+        self._refreshing.add(role)
+        loop.create_task(self._refresh_in_background(role))
+
+    def members(self, role: str) -> FrozenSet[str]:
+        """Возвращает множество ID пользователей с ролью.
+
+        При первом обращении список загружается сразу, далее устаревший
+        список отдаётся без ожидания и обновляется в фоне.
+        """
+        ids = self._sets.get(role)
+        if ids is None:
+            self._stats['misses'] += 1
+            return self._load(role)
+        self._stats['hits'] += 1
+        if is_expired(self._loaded_at.get(role), self._ttl):
+            self._schedule_refresh(role)
+        return ids
+
+    def has(self, role: str, user_id: str) -> bool:
+        """Проверяет, есть ли у пользователя роль."""
+        return str(user_id) in self.members(role)
+
+    def add(self, role: str, user_id: str) -> None:
+        """Добавляет пользователя в список роли после записи в таблицу."""
+        if role in self._sets:
+            self._sets[role] = self._sets[role] | {str(user_id)}
+
+    def invalidate(self, role: Optional[str] = None) -> None:
+        """Помечает список роли (или все списки) устаревшим."""
+        for name in ([role] if role else list(self._loaded_at)):
+            self._loaded_at[name] = None
+
+    async def refresh_all(self) -> None:
+        """Загружает все списки ролей, например при запуске бота."""
+        await asyncio.gather(*(gateway.call(self._load, role) for role in self._loaders))
+
+    def get_stats(self) -> Dict[str, int]:
+        """Возвращает счётчики обращений к справочнику."""
+        return dict(self._stats)
@@ -1,8 +1,20 @@
-import requests
+"""Клиент API СБП Точка Банка.
+
+Все запросы идут через одну сессию aiohttp с пулом keep-alive соединений,
+поэтому медленный ответ банка не блокирует обработку других пользователей.
+У каждого запроса есть таймаут; после сетевых ошибок, ответов 429 и 5xx
+запрос повторяется с растущей паузой и случайным разбросом. Регистрация
+QR-кода повторяется только если банк запрос точно не принял, чтобы не
+создать второй QR-код. Время ответа по каждой операции попадает в статистику.
+"""
+import asyncio
 import json
 import logging
-from typing import Dict, Optional, Any, List, Tuple, Union
-from datetime import datetime
+import random
+import time
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import aiohttp
 
 from ..config import TOCHKA_JWT_TOKEN, TOCHKA_CLIENT_ID
 
@@ -10,60 +22,189 @@ from ..config import TOCHKA_JWT_TOKEN, TOCHKA_CLIENT_ID
 BASE_URL = 'https://enter.tochka.com/uapi'
 API_VERSION = 'v1.0'
 
+# Таймауты запроса (в секундах)
+REQUEST_TIMEOUT = 15.0
+CONNECT_TIMEOUT = 5.0
+# Размер пула соединений и время жизни простаивающего соединения (в секундах)
+POOL_SIZE = 10
+KEEPALIVE_TIMEOUT = 60.0
+# Повторы запроса после сетевой ошибки, 429 или 5xx
+MAX_RETRIES = 2
+BASE_BACKOFF = 0.5
+MAX_BACKOFF = 4.0
+
+RETRYABLE_STATUSES = (429, 500, 502, 503, 504)
+# Ответы, после которых банк точно не выполнил запрос
+REJECTED_STATUSES = (429, 503)
+
 # Настройка логгера
 logger = logging.getLogger(__name__)
 
-def _get_headers() -> Dict[str, str]:
-    """
-    Возвращает заголовки для запросов к API Точки
-    
-    Returns:
-        Dict[str, str]: Заголовки для запроса
-    """
-    if not TOCHKA_JWT_TOKEN:
-        logger.error("JWT токен не найден в переменных окружения!")
-        return {}
-        
-    return {
-        'Authorization': f'Bearer {TOCHKA_JWT_TOKEN}',
-        'Content-Type': 'application/json'
-    }
 
-def get_customer_info() -> Dict[str, Any]:
+class SbpClient:
+    """Асинхронный клиент API СБП с общим пулом соединений."""
+
+    def __init__(self, base_url: str = BASE_URL, token: Optional[Callable[[], Optional[str]]] = None,
+                 timeout: float = REQUEST_TIMEOUT, max_retries: int = MAX_RETRIES,
+                 base_backoff: float = BASE_BACKOFF):
+        """
+        Args:
+            base_url: Адрес API без завершающего '/'
+            token: Функция, возвращающая JWT токен; по умолчанию токен из конфигурации
+            timeout: Таймаут одного запроса в секундах
+            max_retries: Сколько раз повторять неудачный запрос
+            base_backoff: Пауза перед первым повтором в секундах
+        """
+        self.base_url = base_url
+        self._token = token or (lambda: TOCHKA_JWT_TOKEN)
+        self._timeout = timeout
+        self._max_retries = max_retries
+        self._base_backoff = base_backoff
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._session_loop: Optional[asyncio.AbstractEventLoop] = None
+        self._stats: Dict[str, Dict[str, float]] = {}
+
+    def _get_headers(self) -> Dict[str, str]:
+        """
+        Возвращает заголовки для запросов к API Точки
+
+        Returns:
+            Dict[str, str]: Заголовки для запроса
+        """
+        token = self._token()
+        if not token:
+            logger.error("JWT токен не найден в переменных окружения!")
+            return {}
+
+        return {
+            'Authorization': f'Bearer {token}',
+            'Content-Type': 'application/json'
+        }
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        """Возвращает сессию, привязанную к текущему event loop."""
+        loop = asyncio.get_running_loop()
+        if self._session is None or self._session.closed or self._session_loop is not loop:
+            connector = aiohttp.TCPConnector(limit=POOL_SIZE, keepalive_timeout=KEEPALIVE_TIMEOUT)
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=self._timeout, connect=CONNECT_TIMEOUT)
+            )
+            self._session_loop = loop
+        return self._session
+
+    async def close(self) -> None:
+        """Закрывает сессию и соединения пула."""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+    def _record(self, operation: str, elapsed: float, ok: bool, retries: int) -> None:
+        stats = self._stats.setdefault(operation, {'calls': 0, 'errors': 0, 'retries': 0,
+                                                   'total_time': 0.0, 'max_time': 0.0})
+        stats['calls'] += 1
+        stats['retries'] += retries
+        stats['total_time'] += elapsed
+        stats['max_time'] = max(stats['max_time'], elapsed)
+        if not ok:
+            stats['errors'] += 1
+
+    def _backoff(self, attempt: int) -> float:
+        return min(self._base_backoff * 2 ** attempt, MAX_BACKOFF) * random.uniform(0.5, 1.5)
+
+    async def request(self, method: str, path: str, operation: str, payload: Optional[dict] = None,
+                      idempotent: bool = True) -> Tuple[int, Any]:
+        """Выполняет запрос с таймаутом и повторами.
+
+        Args:
+            method: HTTP метод
+            path: Путь относительно базового адреса
+            operation: Название операции для статистики
+            payload: Тело запроса в формате JSON
+            idempotent: Можно ли повторять запрос, который мог дойти до банка
+
+        Returns:
+            Tuple[int, Any]: Код ответа и тело ответа (JSON или текст)
+        """
+        headers = self._get_headers()
+        if not headers:
+            raise ValueError("JWT токен не настроен")
+        url = f"{self.base_url}{path}"
+        started = time.monotonic()
+        attempt = 0
+        while True:
+            try:
+                session = self._get_session()
+                async with session.request(method, url, headers=headers, json=payload) as response:
+                    try:
+                        body = await response.json(content_type=None)
+                    except ValueError:
+                        body = await response.text()
+                    status = response.status
+                retryable = status in (RETRYABLE_STATUSES if idempotent else REJECTED_STATUSES)
+                if not retryable or attempt >= self._max_retries:
+                    self._record(operation, time.monotonic() - started, status < 400, attempt)
+                    return status, body
+                logger.warning(f"СБП {operation}: ответ {status}, повтор {attempt + 1} из {self._max_retries}")
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                # Без соединения запрос точно не дошёл до банка, его можно повторить всегда
+                retryable = idempotent or isinstance(e, aiohttp.ClientConnectorError)
+                if not retryable or attempt >= self._max_retries:
+                    self._record(operation, time.monotonic() - started, False, attempt)
+                    raise
+                logger.warning(f"СБП {operation}: {type(e).__name__} {e}, повтор {attempt + 1} из {self._max_retries}")
+            await asyncio.sleep(self._backoff(attempt))
+            attempt += 1
+
+    def get_stats(self) -> Dict[str, Dict[str, float]]:
+        """Возвращает статистику запросов по операциям."""
+        return {
+            operation: {**stats, 'avg_time': stats['total_time'] / stats['calls'] if stats['calls'] else 0.0}
+            for operation, stats in self._stats.items()
+        }
+
+    def clear_stats(self) -> None:
+        """Сбрасывает статистику запросов."""
+        self._stats.clear()
+
+
+# Общий клиент для всего процесса
+client = SbpClient()
+
+
+async def get_customer_info() -> Dict[str, Any]:
     """
     Получает информацию о клиенте и его регистрации в СБП
-    
+
     Returns:
         Dict[str, Any]: Информация о клиенте
     """
     try:
-        url = f"{BASE_URL}/sbp/{API_VERSION}/customer/info"
-        headers = _get_headers()
-        
-        if not headers:
-            return {"error": "JWT токен не настроен"}
-            
-        logger.info(f"Отправка запроса на {url}")
-        response = requests.get(url, headers=headers)
-        logger.info(f"Получен ответ: статус {response.status_code}")
-        
-        response.raise_for_status()
-        return response.json()
+        path = f"/sbp/{API_VERSION}/customer/info"
+        logger.info(f"Отправка запроса на {path}")
+        status, body = await client.request('GET', path, 'customer_info')
+        logger.info(f"Получен ответ: статус {status}")
+
+        if status != 200:
+            logger.error(f"Ошибка ответа: {body}")
+            return {}
+        return body
     except Exception as e:
         logger.error(f"Ошибка при получении информации о клиенте: {e}")
         return {}
 
-def register_qr_code(account_id: str, merchant_id: str, amount: int, 
-                    payment_purpose: str = "Оплата заказа в EcoCamp") -> Dict[str, Any]:
+
+async def register_qr_code(account_id: str, merchant_id: str, amount: int,
+                           payment_purpose: str = "Оплата заказа в EcoCamp") -> Dict[str, Any]:
     """
     Регистрирует динамический QR-код для оплаты
-    
+
     Args:
         account_id: Идентификатор счета в формате "номер_счета/БИК"
         merchant_id: Идентификатор торговой точки
         amount: Сумма платежа в копейках
         payment_purpose: Назначение платежа
-        
+
     Returns:
         Dict[str, Any]: Данные созданного QR-кода
     """
@@ -72,20 +213,15 @@ def register_qr_code(account_id: str, merchant_id: str, amount: int,
         if not account_id or not merchant_id:
             logger.error(f"Не указаны обязательные параметры: account_id={account_id}, merchant_id={merchant_id}")
             return {"error": "Не указаны обязательные параметры"}
-        
+
         # Проверка формата account_id (должен быть в формате "номер_счета/БИК")
         if "/" not in account_id:
             logger.error(f"Неверный формат account_id: {account_id}. Должен быть в формате 'номер_счета/БИК'")
             return {"error": "Неверный формат идентификатора счета"}
-            
-        # Формирование URL запроса в соответствии с документацией
-        url = f"{BASE_URL}/sbp/{API_VERSION}/qr-code/merchant/{merchant_id}/{account_id}"
-        
-        # Заголовки запроса
-        headers = _get_headers()
-        if not headers:
-            return {"error": "JWT токен не настроен"}
-        
+
+        # Формирование пути запроса в соответствии с документацией
+        path = f"/sbp/{API_VERSION}/qr-code/merchant/{merchant_id}/{account_id}"
+
         # Формирование тела запроса в соответствии с документацией
         data = {
             "Data": {
@@ -102,86 +238,75 @@ def register_qr_code(account_id: str, merchant_id: str, amount: int,
                 "ttl": 10  # Время жизни QR-кода - 10 минут
             }
         }
-        
-        logger.info(f"Отправка запроса на регистрацию QR-кода: URL={url}")
+
+        logger.info(f"Отправка запроса на регистрацию QR-кода: {path}")
         logger.info(f"Тело запроса: {json.dumps(data)}")
-        
-        response = requests.post(url, headers=headers, json=data)
-        
-        logger.info(f"Получен ответ: статус {response.status_code}")
-        if response.status_code != 200:
-            logger.error(f"Ошибка ответа: {response.text}")
-            
-        response.raise_for_status()
-        response_data = response.json()
-        
+
+        # Регистрацию не повторяем, если банк мог её выполнить: иначе появится второй QR-код
+        status, response_data = await client.request('POST', path, 'register_qr_code', data, idempotent=False)
+
+        logger.info(f"Получен ответ: статус {status}")
+        if status != 200:
+            logger.error(f"Ошибка ответа: {response_data}")
+            return {}
+
         # Проверка структуры ответа
-        if 'Data' not in response_data:
+        if not isinstance(response_data, dict) or 'Data' not in response_data:
             logger.error(f"Неожиданный формат ответа: {response_data}")
             return {"error": "Неожиданный формат ответа"}
-            
+
         return response_data['Data']
     except Exception as e:
         logger.error(f"Ошибка при создании QR-кода: {e}")
         return {}
 
-def get_qr_code_status(qrc_id: str) -> Dict[str, Any]:
+
+async def get_qr_code_status(qrc_id: str) -> Dict[str, Any]:
     """
     Проверяет статус оплаты QR-кода
-    
+
     Args:
         qrc_id: Идентификатор QR-кода
-        
+
     Returns:
         Dict[str, Any]: Статус QR-кода
     """
     try:
-        # Формирование URL запроса в соответствии с документацией
-        url = f"{BASE_URL}/sbp/{API_VERSION}/qr-codes/{qrc_id}/payment-status"
-        
-        headers = _get_headers()
-        if not headers:
-            return {"error": "JWT токен не настроен"}
-            
-        logger.info(f"Отправка запроса на получение статуса: URL={url}")
-        
-        response = requests.get(url, headers=headers)
-        
-        logger.info(f"Получен ответ: статус {response.status_code}")
-        
-        if response.status_code != 200:
-            logger.error(f"Ошибка ответа: {response.text}")
-            return {"error": f"Ошибка API: {response.status_code}", "message": response.text}
-            
-        response.raise_for_status()
-        response_data = response.json()
-        
+        # Формирование пути запроса в соответствии с документацией
+        path = f"/sbp/{API_VERSION}/qr-codes/{qrc_id}/payment-status"
+
+        logger.info(f"Отправка запроса на получение статуса: {path}")
+
+        status, response_data = await client.request('GET', path, 'payment_status')
+
+        logger.info(f"Получен ответ: статус {status}")
+
+        if status != 200:
+            logger.error(f"Ошибка ответа: {response_data}")
+            return {"error": f"Ошибка API: {status}", "message": str(response_data)}
+
         # Подробное логирование ответа для отладки
         logger.info(f"Полный ответ API: {json.dumps(response_data, ensure_ascii=False)}")
-        
+
         # Проверка структуры ответа
-        if 'Data' not in response_data:
+        if not isinstance(response_data, dict) or 'Data' not in response_data:
             logger.error(f"Отсутствует ключ 'Data' в ответе: {response_data}")
             return {"error": "Неожиданный формат ответа: отсутствует ключ 'Data'"}
-            
+
         if 'paymentList' not in response_data['Data']:
             logger.error(f"Отсутствует ключ 'paymentList' в Data: {response_data['Data']}")
             return {"error": "Неожиданный формат ответа: отсутствует ключ 'paymentList'"}
-            
+
         # Получаем статус из первого элемента списка платежей
         payment_list = response_data['Data']['paymentList']
-        
+
         if not payment_list:
             logger.warning(f"Список платежей пуст для QR-кода {qrc_id}")
             return {"status": "unknown", "message": "Платеж не найден"}
-            
-        if len(payment_list) > 0:
-            payment = payment_list[0]
-            logger.info(f"Информация о платеже: {json.dumps(payment, ensure_ascii=False)}")
-            return payment
-        else:
-            logger.warning(f"Список платежей пуст для QR-кода {qrc_id}")
-            return {"status": "unknown", "message": "Платеж не найден"}
+
+        payment = payment_list[0]
+        logger.info(f"Информация о платеже: {json.dumps(payment, ensure_ascii=False)}")
+        return payment
     except Exception as e:
         logger.error(f"Ошибка при получении статуса QR-кода: {e}")
-        return {"error": str(e), "message": "Ошибка при обработке запроса"} 
\ No newline at end of file
+        return {"error": str(e), "message": "Ошибка при обработке запроса"}
@@ -1,19 +1,64 @@
 import gspread
 from .. import config
-from datetime import datetime, timedelta
-from typing import Dict, List, Tuple
-from functools import lru_cache
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+from functools import wraps
 import base64
 import json
 import os
+import asyncio
 import logging
+import threading
 from ..utils.profiler import profile_time
-
-# Подключаемся к Google Sheets
-client = gspread.service_account(filename=config.GOOGLE_CREDENTIALS_FILE)
-
-# Открываем таблицу заказов
-spreadsheet = client.open_by_key(config.ORDERS_SPREADSHEET_ID)
+from . import gateway, ids, roles, transitions
+from .cache import SWRCache
+from .order_store import order_store
+from .dishes import encode_order_dishes
+from .journal import journal, OP_CREATE, OP_STATUS, OP_UPDATE
+
+class _LazyHandle:
+    """Объект gspread, который создаётся при первом обращении к его атрибутам.
+    
+    Позволяет импортировать модуль без сетевых запросов: подключение
+    к Google Sheets выполняется только при первом реальном вызове.
+    """
+    
+    def __init__(self, factory):
+        self._factory = factory
+    
+    def __getattr__(self, name):
+        return getattr(self._factory(), name)
+    
+    def __repr__(self):
+        return f"<ленивый объект {self._factory.__name__}>"
+
+_client = None
+_spreadsheet = None
+_connect_lock = threading.RLock()
+
+def get_client():
+    """Получение клиента Google Sheets, подключение выполняется при первом вызове."""
+    global _client
+    if _client is None:
+        with _connect_lock:
+            if _client is None:
+                new_client = gspread.service_account(filename=config.GOOGLE_CREDENTIALS_FILE)
+                gateway.configure_session(new_client)
+                _client = new_client
+    return _client
+
+def get_spreadsheet():
+    """Получение таблицы заказов, открывается при первом вызове."""
+    global _spreadsheet
+    if _spreadsheet is None:
+        with _connect_lock:
+            if _spreadsheet is None:
+                _spreadsheet = get_client().open_by_key(config.ORDERS_SPREADSHEET_ID)
+    return _spreadsheet
+
+# Подключение к Google Sheets и таблица заказов создаются при первом обращении
+client = _LazyHandle(get_client)
+spreadsheet = _LazyHandle(get_spreadsheet)
 
 # ID листов
 ORDERS_SHEET_ID = 2082646960
@@ -28,7 +73,48 @@ QUESTIONS_SHEET_ID = 1085408822    # ID листа с вопросами
 ADMINS_SHEET_ID = 497772348        # ID листа с администраторами
 PAYMENTS_SHEET_ID = 1774741525     # ID листа с оплатами
 
+# Кэш объектов листов: метаданные таблицы запрашиваются один раз для каждого листа
+_worksheets: Dict[int, "gspread.Worksheet"] = {}
+_menu_spreadsheet = None
+
+def _cached_worksheet(sheet_id: int):
+    """Декоратор, сохраняющий найденный лист до ошибки доступа к нему."""
+    def decorator(func):
+        @wraps(func)
+        def wrapper():
+            worksheet = _worksheets.get(sheet_id)
+            if worksheet is None:
+                worksheet = func()
+                _worksheets[sheet_id] = worksheet
+            return worksheet
+        return wrapper
+    return decorator
+
+def invalidate_worksheets() -> None:
+    """Сбрасывает кэш объектов листов, следующие вызовы найдут листы заново."""
+    global _menu_spreadsheet, _spreadsheet
+    _worksheets.clear()
+    _menu_spreadsheet = None
+    _spreadsheet = None
+
+def _on_sheets_error(error: Exception) -> None:
+    """Сбрасывает кэш листов, если лист удалён или доступ к таблице потерян."""
+    status = getattr(getattr(error, 'response', None), 'status_code', None)
+    if isinstance(error, gspread.WorksheetNotFound) or status in (401, 403, 404):
+        logging.warning(f"Сбрасываем кэш листов после ошибки доступа: {error}")
+        invalidate_worksheets()
+
+gateway.add_error_handler(_on_sheets_error)
+
+def _get_menu_spreadsheet():
+    """Получение таблицы меню."""
+    global _menu_spreadsheet
+    if _menu_spreadsheet is None:
+        _menu_spreadsheet = get_client().open_by_key(config.MENU_SPREADSHEET_ID)
+    return _menu_spreadsheet
+
 @profile_time
+@_cached_worksheet(ORDERS_SHEET_ID)
 def get_orders_sheet():
     """Получение листа заказов."""
     try:
@@ -41,6 +127,7 @@ def get_orders_sheet():
         return sheet
 
 @profile_time
+@_cached_worksheet(USERS_SHEET_ID)
 def get_users_sheet():
     """Получение листа пользователей."""
     try:
@@ -63,6 +150,7 @@ def get_users_sheet():
         raise
 
 @profile_time
+@_cached_worksheet(KITCHEN_SHEET_ID)
 def get_kitchen_sheet():
     """Получение листа кухни."""
     try:
@@ -73,6 +161,7 @@ def get_kitchen_sheet():
         return sheet
 
 @profile_time
+@_cached_worksheet(REC_SHEET_ID)
 def get_rec_sheet():
     """Получение листа записей."""
     try:
@@ -84,6 +173,7 @@ def get_rec_sheet():
         return sheet
 
 @profile_time
+@_cached_worksheet(AUTH_SHEET_ID)
 def get_auth_sheet():
     """Получение листа авторизации."""
     try:
@@ -94,16 +184,25 @@ def get_auth_sheet():
         return sheet
 
 @profile_time
+@_cached_worksheet(MENU_SHEET_ID)
 def get_menu_sheet():
     """Получение листа меню."""
-    return client.open_by_key(config.MENU_SPREADSHEET_ID).get_worksheet_by_id(MENU_SHEET_ID)
+    return _get_menu_spreadsheet().get_worksheet_by_id(MENU_SHEET_ID)
 
 @profile_time
+@_cached_worksheet(COMPOSITION_SHEET_ID)
 def get_composition_sheet():
     """Получение листа с составом блюд."""
-    return client.open_by_key(config.MENU_SPREADSHEET_ID).get_worksheet_by_id(COMPOSITION_SHEET_ID)
+    return _get_menu_spreadsheet().get_worksheet_by_id(COMPOSITION_SHEET_ID)
 
 @profile_time
+@_cached_worksheet(TODAY_MENU_SHEET_ID)
+def get_today_menu_sheet():
+    """Получение листа с меню на сегодня."""
+    return _get_menu_spreadsheet().get_worksheet_by_id(TODAY_MENU_SHEET_ID)
+
+@profile_time
+@_cached_worksheet(QUESTIONS_SHEET_ID)
 def get_questions_sheet():
     """Получение листа вопросов."""
     try:
@@ -114,6 +213,7 @@ def get_questions_sheet():
         return sheet
 
 @profile_time
+@_cached_worksheet(ADMINS_SHEET_ID)
 def get_admins_sheet():
     """Получение листа администраторов."""
     try:
@@ -124,63 +224,78 @@ def get_admins_sheet():
         return sheet
 
 # Кэш для меню
-_menu_cache: Dict[str, List[Tuple[str, str, str]]] = {}
-_last_menu_update = None
 _MENU_CACHE_TTL = 86400  # 24 часа в секундах
+_menu_version = 0  # Номер снимка меню, увеличивается при каждом изменении содержимого
+
+def _menu_column(rows: List[List[str]], index: int) -> List[str]:
+    """Значения одной колонки листа меню без заголовка и пустого хвоста, как в col_values."""
+    values = [row[index] if index < len(row) else '' for row in rows[1:]]
+    while values and not values[-1]:
+        values.pop()
+    return values
 
 @profile_time
-def _update_menu_cache(force=False):
-    """Обновление кэша меню.
+def _load_menu() -> Dict[str, List[Tuple[str, str, str]]]:
+    """Загрузка меню из таблицы.
     
-    Args:
-        force: Если True, принудительно обновляет кэш, игнорируя время последнего обновления.
+    Весь диапазон A:I читается одним запросом.
     """
-    global _last_menu_update
-    current_time = datetime.now().timestamp()
+    global _menu_version
+    column_map = {
+        'Завтрак': (0, 1, 2),  # A, B и C столбцы
+        'Обед': (3, 4, 5),      # D, E и F столбцы
+        'Ужин': (6, 7, 8)      # G, H и I столбцы
+    }
     
-    # Если кэш пустой или устарел, или требуется принудительное обновление
-    if force or not _last_menu_update or (current_time - _last_menu_update) > _MENU_CACHE_TTL:
-        column_map = {
-            'Завтрак': (1, 2, 3),  # A, B и C столбцы
-            'Обед': (4, 5, 6),      # D, E и F столбцы
-            'Ужин': (7, 8, 9)      # G, H и I столбцы
-        }
-        
-        menu_sheet = get_menu_sheet()
-        for meal_type, (dish_col, price_col, weight_col) in column_map.items():
-            dishes = menu_sheet.col_values(dish_col)[1:]
-            prices = menu_sheet.col_values(price_col)[1:]
-            weights = menu_sheet.col_values(weight_col)[1:]
-            _menu_cache[meal_type] = list(zip(dishes, prices, weights))
-        
-        _last_menu_update = current_time
-        logging.info(f"Кэш меню обновлен в {datetime.fromtimestamp(current_time).strftime('%Y-%m-%d %H:%M:%S')}")
+    rows = get_menu_sheet().get('A:I')
+    new_menu = {}
+    for meal_type, (dish_col, price_col, weight_col) in column_map.items():
+        dishes = _menu_column(rows, dish_col)
+        prices = _menu_column(rows, price_col)
+        weights = _menu_column(rows, weight_col)
+        new_menu[meal_type] = list(zip(dishes, prices, weights))
+    
+    if new_menu != menu_cache.peek():
+        _menu_version += 1
+    return new_menu
+
+menu_cache = SWRCache('меню', _load_menu, _MENU_CACHE_TTL)
+
+def get_menu_version() -> int:
+    """Возвращает номер текущего снимка меню.
+    
+    Номер меняется только при изменении содержимого меню, поэтому по нему
+    можно определить, нужно ли перестраивать тексты и клавиатуры.
+    """
+    return _menu_version
 
-@lru_cache(maxsize=100)
 @profile_time
 def get_dishes_for_meal(meal_type: str) -> List[Tuple[str, str, str]]:
     """Получение списка блюд с ценами и весом порций для выбранного типа еды."""
-    _update_menu_cache()
-    return _menu_cache.get(meal_type, [])
+    return menu_cache.get().get(meal_type, [])
+
+def _get_last_order_id() -> int:
+    """Наибольший номер заказа в таблице, журнале и копии листа."""
+    last_id = ids.max_numeric_id(get_orders_sheet().col_values(1))
+    # Учитываем заказы, которые ещё ждут записи в таблицу
+    return max(last_id, journal.max_pending_order_id(), order_store.max_order_id())
 
 def get_next_order_id():
     """Получение следующего ID заказа.
     
+    Номер выдаётся локальным счётчиком без обращения к таблице.
+    
     Returns:
         str: Следующий доступный ID заказа.
     """
-    orders_sheet = get_orders_sheet()
-    all_orders = orders_sheet.get_all_values()
-    if len(all_orders) <= 1:
-        return "1"
-    return str(int(all_orders[-1][0]) + 1)
+    return ids.id_allocator.next_id(ids.ORDERS, seed=_get_last_order_id)
 
 @profile_time
 async def save_order(order_data):
     """Сохраняет новый заказ в таблицу."""
     try:
-        # Получаем следующий ID заказа (без await)
-        next_id = get_next_order_id()
+        # Номер заказа выдаётся заранее, при подтверждении; иначе получаем новый
+        next_id = order_data.get('order_id') or await gateway.call(get_next_order_id)
         
         # Форматируем дату и время
         timestamp = datetime.strptime(order_data['timestamp'], "%Y-%m-%d %H:%M:%S")
@@ -197,13 +312,13 @@ async def save_order(order_data):
             order_data['room'],  # Номер комнаты
             order_data['name'],  # Имя заказчика
             order_data['meal_type'],  # Тип приема пищи
-            ', '.join(f"{dish} x{order_data['quantities'].get(dish, 1)}" for dish in order_data['dishes']),  # Список блюд с количеством
+            encode_order_dishes(order_data['dishes'], order_data['quantities']),  # Список блюд с количеством
             order_data.get('wishes', '—'),  # Пожелания
             order_data.get('delivery_date', '')  # Дата выдачи заказа
         ]
         
-        # Добавляем заказ в таблицу с value_input_option='USER_ENTERED'
-        get_orders_sheet().append_row(row, value_input_option='USER_ENTERED')
+        # Записываем заказ в журнал, в таблицу он попадёт при ближайшей пакетной записи
+        journal.record(OP_CREATE, next_id, row)
         return True
         
     except Exception as e:
@@ -214,12 +329,17 @@ async def save_order(order_data):
 async def update_order(order_id, row_index, order_data):
     """Обновляет существующий заказ в таблице."""
     try:
-        # Получаем текущие данные заказа
-        current_order = get_orders_sheet().row_values(row_index)
+        # Получаем текущие данные заказа из копии листа
+        current_order = order_store.get(order_id)
+        if current_order is None:
+            current_order = await gateway.row_values(get_orders_sheet(), row_index)
+        current_order = list(current_order)
         
         # Обновляем только те поля, которые переданы в order_data
         if 'status' in order_data:
             current_order[2] = order_data['status']
+        if 'total_price' in order_data:
+            current_order[5] = order_data['total_price']
         if 'room' in order_data:
             current_order[6] = order_data['room']
         if 'name' in order_data:
@@ -227,14 +347,14 @@ async def update_order(order_id, row_index, order_data):
         if 'meal_type' in order_data:
             current_order[8] = order_data['meal_type']
         if 'dishes' in order_data:
-            current_order[9] = ', '.join(f"{dish} x{order_data['quantities'].get(dish, 1)}" for dish in order_data['dishes'])
+            current_order[9] = encode_order_dishes(order_data['dishes'], order_data['quantities'])
         if 'wishes' in order_data:
             current_order[10] = order_data.get('wishes', '—')
         if 'delivery_date' in order_data:
             current_order[11] = order_data['delivery_date']
         
-        # Обновляем строку в таблице с value_input_option='USER_ENTERED'
-        get_orders_sheet().update(f'A{row_index}:L{row_index}', [current_order], value_input_option='USER_ENTERED')
+        # Записываем изменённую строку в журнал
+        journal.record(OP_UPDATE, order_id, current_order)
         return True
         
     except Exception as e:
@@ -245,16 +365,24 @@ async def update_order(order_id, row_index, order_data):
 async def get_user_orders(user_id: str) -> List[List[str]]:
     """Получение всех активных заказов пользователя."""
     try:
-        all_orders = get_orders_sheet().get_all_values()
-        return [row for row in all_orders[1:] if row[3] == user_id and row[2] in ['Активен', 'Принят', 'Ожидает оплаты']]
+        await order_store.ensure_fresh()
+        return order_store.by_user(user_id, ['Активен', 'Принят', 'Ожидает оплаты'])
     except Exception as e:
         logging.error(f"Ошибка при получении заказов пользователя: {e}")
         return []
 
-async def update_order_status(order_id: str, row_idx: int, status: str) -> bool:
-    """Обновление статуса заказа."""
+async def update_order_status(order_id: str, status: str) -> bool:
+    """Обновление статуса заказа через журнал записи.
+
+    Строка заказа определяется при сбросе журнала, поэтому статус не
+    затирается ожидающими изменениями того же заказа.
+    """
     try:
-        get_orders_sheet().update_cell(row_idx, 3, status)  # Колонка C содержит статус
+        await order_store.ensure_fresh()
+        if order_store.get(order_id) is None:
+            logging.error(f"Заказ с ID {order_id} не найден")
+            return False
+        journal.record(OP_STATUS, order_id, status)
         return True
     except Exception as e:
         logging.error(f"Ошибка при обновлении статуса заказа: {e}")
@@ -271,13 +399,13 @@ async def save_user_info(user_info: dict):
         
         # Проверяем, существует ли пользователь
         users_sheet = get_users_sheet()
-        users_data = users_sheet.get_all_values()
+        users_data = await gateway.get_all_values(users_sheet)
         logging.info(f"Получено {len(users_data)} строк из листа пользователей")
         
         # Получаем имя из таблицы Auth
         auth_name = '-'
         try:
-            auth_data = get_auth_sheet().get_all_values()
+            auth_data = await gateway.get_all_values(get_auth_sheet())
             for row in auth_data[1:]:  # Пропускаем заголовок
                 if len(row) >= 4 and row[3] == user_id:  # Если находим совпадение по user_id (четвертый столбец)
                     auth_name = row[0] or '-'  # Берем имя из первого столбца
@@ -290,7 +418,7 @@ async def save_user_info(user_info: dict):
             if row[0] == user_id:
                 logging.info(f"Найден существующий пользователь в строке {idx + 1}")
                 # Обновляем существующего пользователя
-                users_sheet.update(f'A{idx+1}:C{idx+1}', 
+                await gateway.update(users_sheet, f'A{idx+1}:C{idx+1}', 
                                  [[user_id, profile_link, auth_name]],
                                  value_input_option='USER_ENTERED')
                 user_exists = True
@@ -317,7 +445,7 @@ async def save_user_info(user_info: dict):
             
             # Используем явное указание диапазона для добавления новой строки
             next_row = len(users_data) + 1
-            users_sheet.update(f'A{next_row}:K{next_row}', [new_user_row], value_input_option='USER_ENTERED')
+            await gateway.update(users_sheet, f'A{next_row}:K{next_row}', [new_user_row], value_input_option='USER_ENTERED')
             logging.info(f"Новый пользователь добавлен в строку {next_row}")
         
         return True
@@ -328,7 +456,7 @@ async def save_user_info(user_info: dict):
 async def get_user_stats(user_id: str):
     """Получение статистики пользователя."""
     try:
-        users_data = get_users_sheet().get_all_values()
+        users_data = await gateway.get_all_values(get_users_sheet())
         for row in users_data[1:]:  # Пропускаем заголовок
             if row[0] == user_id:
                 return {
@@ -343,12 +471,17 @@ async def get_user_stats(user_id: str):
         logging.error(f"Ошибка при получении статистики пользователя: {e}")
         return None
 
+# Справочник ролей: списки ID загружаются из таблицы и хранятся в памяти
+role_directory = roles.RoleDirectory({
+    roles.AUTHORIZED: lambda: get_auth_sheet().col_values(4),
+    roles.COOK: lambda: get_kitchen_sheet().col_values(1),
+    roles.ADMIN: lambda: get_admins_sheet().col_values(1)[1:],
+})
+
 def is_user_cook(user_id: str) -> bool:
     """Проверяет, является ли пользователь поваром."""
     try:
-        # Получаем все ID поваров из первого столбца
-        cook_ids = get_kitchen_sheet().col_values(1)
-        return str(user_id) in cook_ids
+        return role_directory.has(roles.COOK, user_id)
     except Exception as e:
         logging.error(f"Ошибка при проверке доступа повара: {e}")
         return False
@@ -363,9 +496,7 @@ def is_user_admin(user_id: str) -> bool:
         bool: True если пользователь является администратором, False в противном случае
     """
     try:
-        # Получаем все ID администраторов из первого столбца
-        admin_ids = get_admins_ids()
-        return str(user_id) in admin_ids
+        return role_directory.has(roles.ADMIN, user_id)
     except Exception as e:
         logging.error(f"Ошибка при проверке доступа администратора: {e}")
         return False
@@ -381,73 +512,7 @@ def is_order_from_today(order_date_str: str) -> bool:
 
 async def update_orders_status():
     """Обновляет статусы заказов после полуночи."""
-    try:
-        # Получаем все заказы
-        orders_sheet = get_orders_sheet()
-        all_orders = orders_sheet.get_all_values()
-        today = datetime.now().date()
-        
-        # Создаем список для пакетного обновления
-        updates = []
-        
-        # Пропускаем заголовок и обрабатываем каждый заказ
-        for idx, order in enumerate(all_orders[1:], start=2):
-            # Проверяем, что заказ активен
-            if order[2] == 'Активен':
-                # Получаем дату выдачи заказа
-                delivery_date_str = order[11]  # Дата выдачи в последнем столбце
-                if delivery_date_str:  # Проверяем, что дата выдачи указана
-                    try:
-                        # Парсим дату в формате DD.MM.YY
-                        delivery_date = datetime.strptime(delivery_date_str, "%d.%m.%y").date()
-                        # Если заказ на текущий день, добавляем в список для обновления
-                        if delivery_date == today:
-                            updates.append(idx)
-                    except ValueError:
-                        logging.error(f"Ошибка при парсинге даты выдачи заказа {order[0]}: {delivery_date_str}")
-                        continue
-        
-        # Если есть заказы для обновления, выполняем пакетное обновление
-        if updates:
-            # Сортируем индексы строк
-            updates.sort()
-            
-            # Группируем последовательные индексы
-            ranges = []
-            current_range = []
-            
-            for idx in updates:
-                if not current_range or idx == current_range[-1] + 1:
-                    current_range.append(idx)
-                else:
-                    # Если последовательность прервалась, сохраняем текущий диапазон
-                    if len(current_range) == 1:
-                        ranges.append((f'C{current_range[0]}', [['Принят']]))
-                    else:
-                        ranges.append((
-                            f'C{current_range[0]}:C{current_range[-1]}',
-                            [['Принят']] * len(current_range)
-                        ))
-                    current_range = [idx]
-            
-            # Добавляем последний диапазон
-            if current_range:
-                if len(current_range) == 1:
-                    ranges.append((f'C{current_range[0]}', [['Принят']]))
-                else:
-                    ranges.append((
-                        f'C{current_range[0]}:C{current_range[-1]}',
-                        [['Принят']] * len(current_range)
-                    ))
-            
-            # Выполняем пакетное обновление
-            for range_name, values in ranges:
-                orders_sheet.update(range_name, values, value_input_option='USER_ENTERED')
-        
-        return True
-    except Exception as e:
-        logging.error(f"Ошибка при обновлении статусов заказов: {e}")
-        return False
+    return await transitions.run(get_orders_sheet(), transitions.MIDNIGHT_RULES)
 
 async def update_orders_to_awaiting_payment():
     """Обновляет статусы заказов на "Ожидает оплаты" в указанное время дня выдачи.
@@ -457,271 +522,25 @@ async def update_orders_to_awaiting_payment():
     - Заказы обеда: 14:00
     - Заказы ужина: 19:00
     """
-    try:
-        # Получаем текущую дату и время
-        now = datetime.now()
-        today = now.date()
-        current_hour = now.hour
-        
-        # Определяем, какой тип еды нужно проверять в данный момент
-        meal_type_to_check = None
-        if current_hour == 9:
-            meal_type_to_check = "Завтрак"
-        elif current_hour == 14:
-            meal_type_to_check = "Обед"
-        elif current_hour == 19:
-            meal_type_to_check = "Ужин"
-        
-        # Если текущее время не совпадает с временем обновления для какого-либо типа еды, выходим
-        if not meal_type_to_check:
-            logging.info(f"Сейчас не время обновления статусов заказов на 'Ожидает оплаты' ({current_hour}:00)")
-            return True
-        
-        # Получаем все заказы
-        orders_sheet = get_orders_sheet()
-        all_orders = orders_sheet.get_all_values()
-        
-        # Создаем список для пакетного обновления
-        updates = []
-        
-        # Пропускаем заголовок и обрабатываем каждый заказ
-        for idx, order in enumerate(all_orders[1:], start=2):
-            # Проверяем, что заказ имеет статус "Принят" и соответствует нужному типу еды
-            if order[2] == 'Принят' and order[8] == meal_type_to_check:
-                # Получаем дату выдачи заказа
-                delivery_date_str = order[11]  # Дата выдачи в последнем столбце
-                if delivery_date_str:  # Проверяем, что дата выдачи указана
-                    try:
-                        # Парсим дату в формате DD.MM.YY
-                        delivery_date = datetime.strptime(delivery_date_str, "%d.%m.%y").date()
-                        # Если заказ на текущий день, добавляем в список для обновления
-                        if delivery_date == today:
-                            updates.append(idx)
-                            logging.info(f"Заказ {order[0]} ({meal_type_to_check}) будет обновлен до 'Ожидает оплаты'")
-                    except ValueError:
-                        logging.error(f"Ошибка при парсинге даты выдачи заказа {order[0]}: {delivery_date_str}")
-                        continue
-        
-        # Если есть заказы для обновления, выполняем пакетное обновление
-        if updates:
-            # Сортируем индексы строк
-            updates.sort()
-            
-            # Группируем последовательные индексы
-            ranges = []
-            current_range = []
-            
-            for idx in updates:
-                if not current_range or idx == current_range[-1] + 1:
-                    current_range.append(idx)
-                else:
-                    # Если последовательность прервалась, сохраняем текущий диапазон
-                    if len(current_range) == 1:
-                        ranges.append((f'C{current_range[0]}', [['Ожидает оплаты']]))
-                    else:
-                        ranges.append((
-                            f'C{current_range[0]}:C{current_range[-1]}',
-                            [['Ожидает оплаты']] * len(current_range)
-                        ))
-                    current_range = [idx]
-            
-            # Добавляем последний диапазон
-            if current_range:
-                if len(current_range) == 1:
-                    ranges.append((f'C{current_range[0]}', [['Ожидает оплаты']]))
-                else:
-                    ranges.append((
-                        f'C{current_range[0]}:C{current_range[-1]}',
-                        [['Ожидает оплаты']] * len(current_range)
-                    ))
-            
-            # Выполняем пакетное обновление
-            for range_name, values in ranges:
-                orders_sheet.update(range_name, values, value_input_option='USER_ENTERED')
-            
-            logging.info(f"Обновлено {len(updates)} заказов типа {meal_type_to_check} на статус 'Ожидает оплаты'")
-        else:
-            logging.info(f"Нет заказов типа {meal_type_to_check} для обновления на статус 'Ожидает оплаты'")
-        
+    now = datetime.now()
+    if now.hour not in transitions.PAYMENT_HOURS.values():
+        logging.info(f"Сейчас не время обновления статусов заказов на 'Ожидает оплаты' ({now.hour}:00)")
         return True
-    except Exception as e:
-        logging.error(f"Ошибка при обновлении статусов заказов на 'Ожидает оплаты': {e}")
-        return False
+    return await transitions.run(get_orders_sheet(), transitions.PAYMENT_HOUR_RULES, now)
 
 async def check_orders_awaiting_payment_at_startup():
-    """Проверяет и обновляет статусы заказов, требующих смены статуса на 'Ожидает оплаты' при запуске бота.
+    """Догоняет смену статусов, пропущенную, пока бот не работал.
     
-    Функция вызывается после обновления статусов с 'Активен' на 'Принят'.
-    Она проверяет заказы со статусом 'Принят' и:
-    1. Для заказов прошлых дней (до сегодня, но не старше 5 дней) - меняет статус на 'Ожидает оплаты' без дополнительных проверок
-    2. Для заказов сегодняшнего дня - проверяет тип еды и текущее время:
+    Заказы на сегодня из 'Активен' переводятся в 'Принят', а заказы со
+    статусом 'Принят':
+    1. Прошлых дней (не старше 5 дней) - переводятся в 'Ожидает оплаты'
+    2. Сегодняшнего дня - переводятся в 'Ожидает оплаты', если наступило время приёма пищи:
        - Заказы завтрака: после 9:00
        - Заказы обеда: после 14:00
        - Заказы ужина: после 19:00
+    Все изменения записываются одним запросом.
     """
-    try:
-        # Получаем текущую дату и время
-        now = datetime.now()
-        today = now.date()
-        current_hour = now.hour
-        
-        # Рассчитываем дату 5 дней назад
-        five_days_ago = today - timedelta(days=5)
-        
-        logging.info(f"Проверка заказов для обновления до 'Ожидает оплаты'. Текущее время: {now.strftime('%Y-%m-%d %H:%M:%S')}, hour: {current_hour}")
-        logging.info(f"Будут проверены заказы начиная с даты: {five_days_ago.strftime('%d.%m.%y')}")
-        
-        # Получаем все заказы
-        orders_sheet = get_orders_sheet()
-        all_orders = orders_sheet.get_all_values()
-        
-        logging.info(f"Получено {len(all_orders)} строк заказов")
-        
-        # Создаем список для пакетного обновления
-        updates = []
-        
-        # Словарь для определения, какие типы еды нужно обновить в зависимости от времени
-        # Используем русские названия типов еды
-        meal_types_to_check = {
-            "Завтрак": current_hour >= 9,
-            "Обед": current_hour >= 14,
-            "Ужин": current_hour >= 19
-        }
-        
-        logging.info(f"Статусы проверки для типов еды: {meal_types_to_check}")
-        
-        # Проходим по всем заказам и проверяем, нужно ли обновлять их статус
-        for idx, order in enumerate(all_orders[1:], start=2):
-            # Подробный лог для отладки
-            logging.info(f"Проверка заказа {idx}: ID={order[0]}, Статус={order[2]}, Тип={order[8] if len(order) > 8 else 'N/A'}, Дата выдачи={order[11] if len(order) > 11 else 'N/A'}")
-            
-            # Проверяем, что заказ имеет статус "Принят"
-            if order[2] == 'Принят':
-                meal_type = order[8]  # Тип еды в 9-м столбце
-                
-                # Получаем дату выдачи заказа
-                delivery_date_str = order[11]  # Дата выдачи в последнем столбце
-                if delivery_date_str:  # Проверяем, что дата выдачи указана
-                    try:
-                        # Парсим дату в формате DD.MM.YY
-                        delivery_date = datetime.strptime(delivery_date_str, "%d.%m.%y").date()
-                        
-                        # Пропускаем заказы старше 5 дней
-                        if delivery_date < five_days_ago:
-                            logging.info(f"Заказ {order[0]} пропущен: дата выдачи {delivery_date_str} старше 5 дней")
-                            continue
-                        
-                        # Проверяем условия
-                        is_today = delivery_date == today
-                        is_past_day = delivery_date < today and delivery_date >= five_days_ago
-                        is_valid_meal_type = meal_type in meal_types_to_check
-                        is_time_passed = is_valid_meal_type and meal_types_to_check[meal_type]
-                        
-                        logging.info(f"Условия для заказа {order[0]}: is_today={is_today}, is_past_day={is_past_day}, is_valid_meal_type={is_valid_meal_type}, is_time_passed={is_time_passed}")
-                        
-                        # Если заказ на прошлый день (не старше 5 дней) - безусловно обновляем до "Ожидает оплаты"
-                        if is_past_day:
-                            updates.append(idx)
-                            logging.info(f"Заказ {order[0]} (прошлый день: {delivery_date_str}) будет обновлен до 'Ожидает оплаты' при запуске")
-                        # Если заказ на текущий день и время уже прошло порог для этого типа еды
-                        elif is_today and is_valid_meal_type and is_time_passed:
-                            updates.append(idx)
-                            logging.info(f"Заказ {order[0]} ({meal_type}, сегодня) будет обновлен до 'Ожидает оплаты' при запуске")
-                        else:
-                            logging.info(f"Заказ {order[0]} ({meal_type}) не будет обновлен: не соответствует условиям")
-                    except ValueError:
-                        logging.error(f"Ошибка при парсинге даты выдачи заказа {order[0]}: {delivery_date_str}")
-                        continue
-                else:
-                    logging.info(f"Заказ {order[0]} не будет обновлен: отсутствует дата выдачи")
-            else:
-                logging.info(f"Заказ {order[0]} не будет обновлен: статус не 'Принят', а '{order[2]}'")
-        
-        logging.info(f"Заказы для обновления: {updates}")
-        
-        # Если есть заказы для обновления, выполняем обновления по отдельности для каждого заказа
-        if updates:
-            # Обновляем каждый заказ по отдельности для максимальной точности и предсказуемости
-            actual_updates = []
-            for idx in updates:
-                # Проверяем еще раз, чтобы убедиться, что заказ все еще требует обновления
-                try:
-                    # Индекс в списке all_orders
-                    order_idx = idx - 1  # Номер строки - 1
-                    
-                    # Проверяем, что индекс не выходит за границы
-                    if order_idx < 0 or order_idx >= len(all_orders):
-                        logging.error(f"Индекс {order_idx} за пределами массива all_orders (длина {len(all_orders)})")
-                        continue
-                        
-                    order = all_orders[order_idx]
-                    
-                    logging.info(f"Перепроверка заказа {idx} (индекс {order_idx}): {order}")
-                    
-                    # Проверяем статус и тип еды
-                    if len(order) <= 8 or len(order) <= 11:
-                        logging.warning(f"Заказ {idx} (индекс {order_idx}) не имеет достаточно полей: {order}")
-                        continue
-                        
-                    # Проверяем, что это заказ со статусом "Принят"
-                    if order[2] != 'Принят':
-                        logging.warning(f"Заказ {idx} (индекс {order_idx}) имеет статус {order[2]}, а не 'Принят'")
-                        continue
-                        
-                    # Получаем дату выдачи заказа
-                    delivery_date_str = order[11]
-                    if not delivery_date_str:
-                        logging.warning(f"Заказ {idx} (индекс {order_idx}) не имеет даты выдачи")
-                        continue
-                        
-                    # Парсим дату в формате DD.MM.YY
-                    try:
-                        delivery_date = datetime.strptime(delivery_date_str, "%d.%m.%y").date()
-                        
-                        # Еще раз проверяем, что заказ не старше 5 дней
-                        if delivery_date < five_days_ago:
-                            logging.warning(f"Заказ {idx} (индекс {order_idx}) имеет дату {delivery_date_str}, которая старше 5 дней")
-                            continue
-                        
-                        # Для прошлых дней обновляем без дополнительных проверок
-                        if delivery_date < today:
-                            # Если все проверки пройдены, обновляем заказ
-                            logging.info(f"Перепроверка пройдена для заказа {idx} (индекс {order_idx}). Обновляем до 'Ожидает оплаты' (прошлый день)")
-                            orders_sheet.update(f'C{idx}', [['Ожидает оплаты']], value_input_option='USER_ENTERED')
-                            logging.info(f"Заказ в строке {idx} обновлен до 'Ожидает оплаты' при запуске бота (прошлый день)")
-                            actual_updates.append(idx)
-                            continue
-                    except ValueError:
-                        logging.error(f"Ошибка при парсинге даты выдачи заказа {order[0]}: {delivery_date_str}")
-                        continue
-                        
-                    # Для сегодняшних заказов - проверяем тип еды и время
-                    meal_type = order[8]
-                    if meal_type not in meal_types_to_check:
-                        logging.warning(f"Заказ {idx} (индекс {order_idx}) имеет тип {meal_type}, который отсутствует в словаре meal_types_to_check")
-                        continue
-                        
-                    # Проверяем, что для этого типа еды уже пришло время
-                    if not meal_types_to_check[meal_type]:
-                        logging.warning(f"Заказ {idx} (индекс {order_idx}) имеет тип {meal_type}, для которого еще не пришло время ({current_hour}:00)")
-                        continue
-                        
-                    # Если все проверки пройдены, обновляем заказ
-                    logging.info(f"Перепроверка пройдена для заказа {idx} (индекс {order_idx}). Обновляем до 'Ожидает оплаты' (сегодняшний день)")
-                    orders_sheet.update(f'C{idx}', [['Ожидает оплаты']], value_input_option='USER_ENTERED')
-                    logging.info(f"Заказ в строке {idx} обновлен до 'Ожидает оплаты' при запуске бота (сегодняшний день)")
-                    actual_updates.append(idx)
-                except Exception as e:
-                    logging.error(f"Ошибка при перепроверке и обновлении заказа {idx}: {e}")
-            
-            logging.info(f"Обновлено {len(actual_updates)} заказов на статус 'Ожидает оплаты' при запуске бота")
-        else:
-            logging.info("Нет заказов, требующих обновления статуса до 'Ожидает оплаты' при запуске")
-        
-        return True
-    except Exception as e:
-        logging.error(f"Ошибка при проверке заказов на смену статуса до 'Ожидает оплаты' при запуске: {e}")
-        return False
+    return await transitions.run(get_orders_sheet(), transitions.STARTUP_RULES)
 
 def get_credentials():
     # Получаем закодированные credentials из переменной окружения
@@ -746,32 +565,33 @@ def is_user_authorized(user_id: str) -> bool:
         bool: True если пользователь авторизован, False в противном случае
     """
     try:
-        # Получаем все значения из столбца C (user_id)
-        user_ids = get_auth_sheet().col_values(4)
-        return str(user_id) in user_ids
+        return role_directory.has(roles.AUTHORIZED, user_id)
     except Exception as e:
         logging.error(f"Ошибка при проверке авторизации пользователя: {e}")
         return False
 
-def check_phone(phone: str) -> bool:
+async def check_phone(phone: str) -> bool:
     """Проверка наличия телефона в базе."""
     try:
-        # Получаем все значения из столбца A (телефоны)
-        phones = get_auth_sheet().col_values(2)
+        # Получаем все значения из столбца B (телефоны)
+        phones = await gateway.col_values(get_auth_sheet(), 2)
         return phone in phones
     except Exception as e:
         logging.error(f"Ошибка при проверке телефона: {e}")
         return False
 
-def save_user_id(phone: str, user_id: str) -> bool:
+async def save_user_id(phone: str, user_id: str) -> bool:
     """Сохранение user_id рядом с телефоном."""
     try:
-        # Получаем все значения из столбца A (телефоны)
-        phones = get_auth_sheet().col_values(2)
+        # Получаем все значения из столбца B (телефоны)
+        phones = await gateway.col_values(get_auth_sheet(), 2)
         # Ищем индекс строки с нужным телефоном
         row_idx = phones.index(phone) + 1  # +1 потому что в gspread строки начинаются с 1
-        # Обновляем ячейку с user_id (столбец C)
-        get_auth_sheet().update_cell(row_idx, 4, user_id)
+        # Обновляем ячейку с user_id (столбец D); шлюз сам сбросит снимки чтений листа
+        await gateway.update_cell(get_auth_sheet(), row_idx, 4, user_id)
+        # Новый пользователь сразу получает доступ, список перечитается в фоне
+        role_directory.add(roles.AUTHORIZED, user_id)
+        role_directory.invalidate(roles.AUTHORIZED)
         return True
     except Exception as e:
         logging.error(f"Ошибка при сохранении user_id: {e}")
@@ -783,48 +603,33 @@ async def force_update_menu_cache():
     
     Рекомендуется вызывать эту функцию раз в день в полночь.
     """
-    _update_menu_cache(force=True)
-    # Очищаем кэш функции get_dishes_for_meal, если у неё есть метод cache_clear
-    if hasattr(get_dishes_for_meal, 'cache_clear'):
-        get_dishes_for_meal.cache_clear()
+    await menu_cache.refresh()
     return True
 
 # Кэш для составов блюд
-_composition_cache = {}
-_last_composition_update = None
 _COMPOSITION_CACHE_TTL = 86400  # 24 часа в секундах
 
 @profile_time
-def _update_composition_cache(force=False):
-    """Обновление кэша составов блюд.
+def _load_compositions() -> Dict[str, Dict[str, str]]:
+    """Загрузка составов блюд из таблицы."""
+    # Получаем данные из таблицы
+    all_values = get_composition_sheet().get_all_values()
+    compositions = {}
     
-    Args:
-        force: Если True, принудительно обновляет кэш, игнорируя время последнего обновления.
-    """
-    global _last_composition_update
-    current_time = datetime.now().timestamp()
-    
-    # Если кэш пустой или устарел, или требуется принудительное обновление
-    if force or not _last_composition_update or (current_time - _last_composition_update) > _COMPOSITION_CACHE_TTL:
-        composition_sheet = get_composition_sheet()
-        
-        # Получаем данные из таблицы
-        all_values = composition_sheet.get_all_values()
-        
-        # Пропускаем заголовок
-        for row in all_values[1:]:
-            if row and len(row) >= 5:  # Проверяем, что строка не пустая и содержит достаточно столбцов
-                dish_name = row[0].strip()
-                if dish_name:  # Проверяем, что название блюда не пустое
-                    composition = row[3].strip() if len(row) > 3 and row[3] else ""
-                    calories = row[4].strip() if len(row) > 4 and row[4] else ""
-                    _composition_cache[dish_name] = {
-                        "composition": composition,
-                        "calories": calories
-                    }
-        
-        _last_composition_update = current_time
-        logging.info(f"Кэш составов блюд обновлен в {datetime.fromtimestamp(current_time).strftime('%Y-%m-%d %H:%M:%S')}")
+    # Пропускаем заголовок
+    for row in all_values[1:]:
+        if row and len(row) >= 5:  # Проверяем, что строка не пустая и содержит достаточно столбцов
+            dish_name = row[0].strip()
+            if dish_name:  # Проверяем, что название блюда не пустое
+                composition = row[3].strip() if len(row) > 3 and row[3] else ""
+                calories = row[4].strip() if len(row) > 4 and row[4] else ""
+                compositions[dish_name] = {
+                    "composition": composition,
+                    "calories": calories
+                }
+    return compositions
+
+composition_cache = SWRCache('составов блюд', _load_compositions, _COMPOSITION_CACHE_TTL)
 
 def get_dish_composition(dish_name):
     """Получение состава и калорийности блюда по его названию.
@@ -835,102 +640,121 @@ def get_dish_composition(dish_name):
     Returns:
         dict: Словарь с составом и калорийностью блюда, или пустой словарь если блюдо не найдено
     """
-    _update_composition_cache()
-    return _composition_cache.get(dish_name.strip(), {"composition": "", "calories": ""})
+    return composition_cache.get().get(dish_name.strip(), {"composition": "", "calories": ""})
 
 async def force_update_composition_cache():
     """Принудительно обновляет кэш составов блюд.
     
     Рекомендуется вызывать эту функцию вместе с обновлением кэша меню.
     """
-    _update_composition_cache(force=True)
-    # В текущем коде get_dish_composition не использует декоратор lru_cache
-    # Проверку на наличие cache_clear оставляем для будущей совместимости
+    await composition_cache.refresh()
     return True
 
 # Кэш для меню на сегодня
-_today_menu_cache = {}
-_last_today_menu_update = None
 _TODAY_MENU_CACHE_TTL = 86400  # 24 часа в секундах
+_EMPTY_TODAY_MENU = {'Завтрак': [], 'Обед': [], 'Ужин': []}
 
 @profile_time
-def _update_today_menu_cache(force=False):
-    """Обновление кэша меню на сегодня.
+def _load_today_menu() -> dict:
+    """Загрузка меню на сегодня из таблицы.
     
-    Args:
-        force: Если True, принудительно обновляет кэш, игнорируя время последнего обновления.
+    Returns:
+        dict: Дата, за которую собрано меню, и блюда по типам приема пищи
     """
-    global _last_today_menu_update, _today_menu_cache
-    current_time = datetime.now().timestamp()
+    # Получаем текущую дату в формате дд.мм.гг
+    today = datetime.now().strftime("%d.%m.%y")
     
-    # Если кэш пустой или устарел, или требуется принудительное обновление
-    if force or not _last_today_menu_update or (current_time - _last_today_menu_update) > _TODAY_MENU_CACHE_TTL:
-        try:
-            # Получаем листа с меню на сегодня
-            menu_sheet = client.open_by_key(config.MENU_SPREADSHEET_ID).get_worksheet_by_id(TODAY_MENU_SHEET_ID)
-            
-            if not menu_sheet:
-                logging.error("Не удалось получить лист с меню на сегодня")
-                return
-                
-            # Получаем текущую дату в формате дд.мм.гг
-            today = datetime.now().strftime("%d.%m.%y")
-            
-            # Получаем все строки из листа
-            rows = menu_sheet.get_all_values()
-            
-            # Ищем строку с сегодняшней датой
-            today_menu_row = None
-            for row in rows:
-                if row and row[0].strip() == today:
-                    today_menu_row = row
-                    break
-            
-            if today_menu_row:
-                # Получаем названия блюд из диапазона колонок с 3 по 41
-                all_dishes = [dish.strip() for dish in today_menu_row[2:41] if dish.strip()]
-                
-                # Группируем блюда по типам приема пищи
-                grouped_dishes = {
-                    'Завтрак': [],
-                    'Обед': [],
-                    'Ужин': []
-                }
-                
-                current_meal_type = None
-                
-                for dish in all_dishes:
-                    # Проверяем, является ли элемент названием типа приема пищи
-                    if dish in ['Завтрак', 'Обед', 'Ужин']:
-                        current_meal_type = dish
-                    elif current_meal_type and dish:
-                        # Добавляем блюдо к текущему типу приема пищи
-                        grouped_dishes[current_meal_type].append(dish)
-                
-                _today_menu_cache["dishes"] = grouped_dishes
-                _last_today_menu_update = current_time
-                logging.info(f"Кэш меню на сегодня обновлен в {datetime.fromtimestamp(current_time).strftime('%Y-%m-%d %H:%M:%S')}")
-            else:
-                logging.info(f"Меню на сегодня ({today}) не найдено в таблице")
-                _today_menu_cache["dishes"] = {'Завтрак': [], 'Обед': [], 'Ужин': []}
-                _last_today_menu_update = current_time
-        except Exception as e:
-            logging.error(f"Ошибка при обновлении кэша меню на сегодня: {e}")
+    # Получаем все строки из листа с меню на сегодня
+    rows = get_today_menu_sheet().get_all_values()
+    
+    # Ищем строку с сегодняшней датой
+    today_menu_row = None
+    for row in rows:
+        if row and row[0].strip() == today:
+            today_menu_row = row
+            break
+    
+    if not today_menu_row:
+        logging.info(f"Меню на сегодня ({today}) не найдено в таблице")
+        return {'date': today, 'dishes': dict(_EMPTY_TODAY_MENU)}
+    
+    # Получаем названия блюд из диапазона колонок с 3 по 41
+    all_dishes = [dish.strip() for dish in today_menu_row[2:41] if dish.strip()]
+    
+    # Группируем блюда по типам приема пищи
+    grouped_dishes = {
+        'Завтрак': [],
+        'Обед': [],
+        'Ужин': []
+    }
+    
+    current_meal_type = None
+    
+    for dish in all_dishes:
+        # Проверяем, является ли элемент названием типа приема пищи
+        if dish in ['Завтрак', 'Обед', 'Ужин']:
+            current_meal_type = dish
+        elif current_meal_type and dish:
+            # Добавляем блюдо к текущему типу приема пищи
+            grouped_dishes[current_meal_type].append(dish)
+    
+    return {'date': today, 'dishes': grouped_dishes}
 
-def get_today_menu_dishes():
+today_menu_cache = SWRCache('меню на сегодня', _load_today_menu, _TODAY_MENU_CACHE_TTL)
+
+async def get_today_menu_dishes():
     """Получение списка блюд из меню на сегодня, сгруппированных по типам приема пищи.
     
     Returns:
         Dict[str, List[str]]: Словарь с ключами 'Завтрак', 'Обед', 'Ужин' и списками блюд
     """
-    _update_today_menu_cache()
-    return _today_menu_cache.get("dishes", {'Завтрак': [], 'Обед': [], 'Ужин': []})
+    try:
+        # Первая загрузка и перезагрузка идут через шлюз, не блокируя event loop
+        today_menu = await today_menu_cache.aget()
+        # После смены дня меню нужно перечитать сразу, вчерашнее показывать нельзя
+        if today_menu['date'] != datetime.now().strftime("%d.%m.%y"):
+            today_menu = await today_menu_cache.refresh()
+        return today_menu['dishes']
+    except Exception as e:
+        logging.error(f"Ошибка при получении меню на сегодня: {e}")
+        return dict(_EMPTY_TODAY_MENU)
 
 async def force_update_today_menu_cache():
     """Принудительно обновляет кэш меню на сегодня."""
-    _update_today_menu_cache(force=True)
-    # В текущем коде get_today_menu_dishes не использует декоратор lru_cache
-    # Проверку на наличие cache_clear оставляем для будущей совместимости
+    await today_menu_cache.refresh()
+    return True
+
+# Как часто проверять, изменилась ли таблица меню (в секундах)
+MENU_CHANGE_CHECK_INTERVAL = 60
+# Время последнего изменения таблицы меню (modifiedTime из Google Drive) при последней загрузке кэшей
+_menu_modified_time = None
+
+async def refresh_menu_caches_if_changed() -> bool:
+    """Перезагружает кэши меню, составов и меню на сегодня, если таблица меню изменилась.
+    
+    Проверка изменения стоит одного лёгкого запроса к Google Drive,
+    полная загрузка листов выполняется только после правок в таблице.
+    
+    Returns:
+        bool: True, если кэши были перезагружены
+    """
+    global _menu_modified_time
+    try:
+        modified_time = await gateway.call(_get_menu_spreadsheet().get_lastUpdateTime)
+    except Exception as e:
+        logging.error(f"Ошибка при проверке изменений таблицы меню: {e}")
+        return False
+    
+    if modified_time == _menu_modified_time:
+        return False
+    
+    logging.info(f"Таблица меню изменилась ({modified_time}), обновляем кэши")
+    await asyncio.gather(
+        force_update_menu_cache(),
+        force_update_composition_cache(),
+        force_update_today_menu_cache()
+    )
+    _menu_modified_time = modified_time
     return True
 
 def get_admins_ids() -> List[str]:
@@ -940,8 +764,7 @@ def get_admins_ids() -> List[str]:
         List[str]: Список ID администраторов
     """
     try:
-        # Пропускаем заголовок и берем первый столбец
-        return get_admins_sheet().col_values(1)[1:]
+        return sorted(role_directory.members(roles.ADMIN))
     except Exception as e:
         logging.error(f"Ошибка при получении списка администраторов: {e}")
         return []
@@ -949,6 +772,7 @@ def get_admins_ids() -> List[str]:
 
 
 @profile_time
+@_cached_worksheet(PAYMENTS_SHEET_ID)
 def get_payments_sheet():
     """Получение листа оплат."""
     try:
@@ -958,36 +782,44 @@ def get_payments_sheet():
         sheet.update('A1:G1', [['Номер оплаты', 'Дата и время', 'User ID', 'Комментарий', 'Сумма', 'Статус', 'Номер комнаты']])
         return sheet
 
+def _get_last_payment_id() -> int:
+    """Наибольший номер оплаты в таблице."""
+    return ids.max_numeric_id(get_payments_sheet().col_values(1))
+
 def get_next_payment_id() -> str:
     """Получение следующего номера оплаты.
     
+    Номер выдаётся локальным счётчиком без обращения к таблице.
+    
     Returns:
         str: Следующий доступный номер оплаты
     """
+    return ids.id_allocator.next_id(ids.PAYMENTS, seed=_get_last_payment_id)
+
+async def seed_id_counters() -> bool:
+    """Сверяет счётчики номеров заказов и оплат с таблицей при запуске бота.
+    
+    Returns:
+        bool: True в случае успешной сверки, False в противном случае
+    """
     try:
-        payments_sheet = get_payments_sheet()
-        all_payments = payments_sheet.get_all_values()
-        
-        # Если в таблице только заголовок или она пуста
-        if len(all_payments) <= 1:
-            return "1"
-            
-        # Получаем все номера оплат из первого столбца (пропускаем заголовок)
-        payment_ids = [int(row[0]) for row in all_payments[1:] if row[0].isdigit()]
-        
-        # Если нет ни одного номера, начинаем с 1
-        if not payment_ids:
-            return "1"
-            
-        # Возвращаем следующий номер
-        return str(max(payment_ids) + 1)
+        last_order_id = await gateway.call(_get_last_order_id)
+        last_payment_id = await gateway.call(_get_last_payment_id)
+        ids.id_allocator.seed(ids.ORDERS, last_order_id)
+        ids.id_allocator.seed(ids.PAYMENTS, last_payment_id)
+        logging.info(f"Счётчики номеров сверены с таблицей: заказы {last_order_id}, оплаты {last_payment_id}")
+        return True
     except Exception as e:
-        logging.error(f"Ошибка при получении следующего номера оплаты: {e}")
-        return "1"
+        logging.error(f"Ошибка при сверке счётчиков номеров: {e}")
+        return False
 
-async def save_payment_info(user_id: str, amount: float, status: str = "ожидает", room: str = "") -> bool:
+async def save_payment_info(user_id: str, amount: float, status: str = "ожидает", room: str = "") -> Optional[str]:
     """Сохранение информации об оплате в таблицу.
     
+    Строка записывается одним запросом. Колонка комментария (D) передаётся
+    пустым значением (null), которое API пропускает, поэтому её содержимое
+    не затрагивается.
+    
     Args:
         user_id: ID пользователя
         amount: Сумма оплаты
@@ -995,38 +827,33 @@ async def save_payment_info(user_id: str, amount: float, status: str = "ожид
         room: Номер комнаты пользователя
         
     Returns:
-        bool: True в случае успешного сохранения, False в противном случае
+        Optional[str]: Номер сохранённой оплаты или None в случае ошибки
     """
     try:
         # Получаем следующий номер оплаты
-        next_id = get_next_payment_id()
+        next_id = await gateway.call(get_next_payment_id)
         
         # Форматируем текущую дату и время
         now = datetime.now()
         formatted_datetime = now.strftime("%d.%m.%y %H:%M:%S")
         
-        # Получаем таблицу платежей
-        payments_sheet = get_payments_sheet()
-        
-        # Находим первую пустую строку
-        all_payments = payments_sheet.get_all_values()
-        next_row_index = len(all_payments) + 1
-        
-        # Обновляем каждую ячейку отдельно, пропуская колонку комментария (D)
-        payments_sheet.update_cell(next_row_index, 1, next_id)  # A - Номер оплаты
-        payments_sheet.update_cell(next_row_index, 2, formatted_datetime)  # B - Дата и время
-        payments_sheet.update_cell(next_row_index, 3, user_id)  # C - User ID
-        # Колонку D (Комментарий) не трогаем
-        payments_sheet.update_cell(next_row_index, 5, str(amount))  # E - Сумма оплаты
-        payments_sheet.update_cell(next_row_index, 6, status)  # F - Статус оплаты
-        payments_sheet.update_cell(next_row_index, 7, room)  # G - Номер комнаты
+        row = [
+            next_id,  # A - Номер оплаты
+            formatted_datetime,  # B - Дата и время
+            user_id,  # C - User ID
+            None,  # D - Комментарий, не трогаем
+            str(amount),  # E - Сумма оплаты
+            status,  # F - Статус оплаты
+            room  # G - Номер комнаты
+        ]
+        await gateway.append_row(get_payments_sheet(), row, value_input_option='USER_ENTERED', table_range='A1:G1')
         
         logging.info(f"Информация об оплате {next_id} сохранена в таблицу")
-        return True
+        return next_id
         
     except Exception as e:
         logging.error(f"Ошибка при сохранении информации об оплате: {e}")
-        return False
+        return None
 
 async def save_question(user_id: str, question_text: str) -> bool:
     """Сохранение вопроса в таблицу.
@@ -1045,7 +872,7 @@ async def save_question(user_id: str, question_text: str) -> bool:
         phone = '-'
         
         # Находим пользователя в таблице Users
-        users_data = get_users_sheet().get_all_values()
+        users_data = await gateway.get_all_values(get_users_sheet())
         for row in users_data[1:]:  # Пропускаем заголовок
             if row[0] == user_id:
                 profile_link = row[1]  # Profile Link
@@ -1058,7 +885,7 @@ async def save_question(user_id: str, question_text: str) -> bool:
         
         # Сохраняем вопрос
         questions_sheet = get_questions_sheet()
-        questions_sheet.append_row([
+        await gateway.append_row(questions_sheet, [
             formatted_date,  # Дата и время
             profile_link,    # Ссылка на пользователя
             phone,           # Телефон
@@ -1071,8 +898,8 @@ async def save_question(user_id: str, question_text: str) -> bool:
         logging.error(f"Ошибка при сохранении вопроса: {e}")
         return False
 
-# Инициализация листов
-orders_sheet = get_orders_sheet()
-users_sheet = get_users_sheet()
-rec_sheet = get_rec_sheet()
-auth_sheet = get_auth_sheet()
\ No newline at end of file
+# Листы, которые импортируют другие модули; запрашиваются при первом обращении
+orders_sheet = _LazyHandle(get_orders_sheet)
+users_sheet = _LazyHandle(get_users_sheet)
+rec_sheet = _LazyHandle(get_rec_sheet)
+auth_sheet = _LazyHandle(get_auth_sheet)
@@ -0,0 +1,55 @@
+"""Параллельный прогрев кэшей при запуске бота.
+
+Шаги прогрева (кэши меню, справочник ролей, копия листа заказов и т.д.)
+выполняются одновременно, а не друг за другом. По завершении в лог
+выводится отчёт о времени каждого шага и сравнение с бюджетом запуска.
+"""
+import asyncio
+import logging
+import time
+from typing import Awaitable, Callable, Dict
+
+from .quota import background_task
+
+# Бюджет времени на прогрев при запуске (в секундах)
+STARTUP_BUDGET = 10.0
+
+
+async def _run_step(name: str, step: Callable[[], Awaitable]) -> Dict:
+    started = time.monotonic()
+    try:
+        await step()
+        ok = True
+    except Exception as e:
+        logging.error(f"Ошибка на шаге запуска '{name}': {e}")
+        ok = False
+    return {'name': name, 'duration': time.monotonic() - started, 'ok': ok}
+
+
+@background_task
+async def warm_up(steps: Dict[str, Callable[[], Awaitable]], budget: float = STARTUP_BUDGET) -> Dict[str, float]:
+    """Выполняет шаги прогрева параллельно и выводит отчёт о времени запуска.
+
+    Args:
+        steps: Названия шагов и асинхронные функции без аргументов
+        budget: Допустимое время прогрева в секундах
+
+    Returns:
+        Dict[str, float]: Длительность каждого шага и общая длительность (ключ 'total')
+    """
+    started = time.monotonic()
+    results = await asyncio.gather(*(_run_step(name, step) for name, step in steps.items()))
+    total = time.monotonic() - started
+
+    report = [f"Прогрев при запуске: {total:.2f} с из {budget:.0f} с"]
+    for result in sorted(results, key=lambda r: r['duration'], reverse=True):
+        mark = '✓' if result['ok'] else '✗'
+        report.append(f"  {mark} {result['name']}: {result['duration']:.2f} с")
+    if total > budget:
+        logging.warning("\n".join(report) + "\nБюджет времени запуска превышен")
+    else:
+        logging.info("\n".join(report))
+
+    durations = {result['name']: result['duration'] for result in results}
+    durations['total'] = total
+    return durations
@@ -0,0 +1,173 @@
+"""Смена статусов заказов по расписанию.
+
+Переходы статусов описаны правилами: в полночь заказы на сегодня из
+'Активен' становятся 'Принят', в час приёма пищи 'Принят' становится
+'Ожидает оплаты', а при запуске бота пропущенные переходы догоняются.
+Все переходы вычисляются по одной выгрузке листа заказов и записываются
+одним запросом batch_update; незаписанные операции журнала по этим заказам
+переносятся на новый статус, чтобы не вернуть прежний.
+"""
+import logging
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional, Sequence
+
+from . import gateway
+from .order_record import OrderRecord, OrderStatus, COL_DELIVERY_DATE
+from .order_store import order_store
+from .journal import journal
+
+# Статусы заказа
+STATUS_ACTIVE = OrderStatus.ACTIVE.value
+STATUS_ACCEPTED = OrderStatus.ACCEPTED.value
+STATUS_AWAITING_PAYMENT = OrderStatus.AWAITING_PAYMENT.value
+
+# Час, с которого заказы приёма пищи ожидают оплаты
+PAYMENT_HOURS = {
+    'Завтрак': 9,
+    'Обед': 14,
+    'Ужин': 19,
+}
+
+# Заказы старше этого числа дней при запуске не обновляются
+CATCH_UP_DAYS = 5
+
+
+class Rule(NamedTuple):
+    """Правило перехода: статус from_status меняется на to_status, если applies вернула True."""
+    name: str
+    from_status: str
+    to_status: str
+    applies: Callable[[OrderRecord, datetime], bool]
+
+
+class Transition(NamedTuple):
+    """Смена статуса одного заказа."""
+    row_number: int
+    order_id: str
+    from_status: str
+    to_status: str
+
+
+def _delivery_today(record: OrderRecord, now: datetime) -> bool:
+    return record.delivery_date == now.date()
+
+
+def _payment_hour_now(record: OrderRecord, now: datetime) -> bool:
+    return record.delivery_date == now.date() and PAYMENT_HOURS.get(record.meal_type) == now.hour
+
+
+def _payment_hour_passed(record: OrderRecord, now: datetime) -> bool:
+    today = now.date()
+    delivery_date = record.delivery_date
+    if delivery_date < today - timedelta(days=CATCH_UP_DAYS):
+        return False
+    if delivery_date < today:
+        return True
+    hour = PAYMENT_HOURS.get(record.meal_type)
+    return delivery_date == today and hour is not None and now.hour >= hour
+
+
+ACCEPT_TODAY = Rule('Приём заказов на сегодня', STATUS_ACTIVE, STATUS_ACCEPTED, _delivery_today)
+AWAIT_PAYMENT = Rule('Ожидание оплаты в час приёма пищи', STATUS_ACCEPTED, STATUS_AWAITING_PAYMENT, _payment_hour_now)
+CATCH_UP_PAYMENT = Rule('Догоняющее ожидание оплаты', STATUS_ACCEPTED, STATUS_AWAITING_PAYMENT, _payment_hour_passed)
+
+# Наборы правил для полуночи, часа приёма пищи и запуска бота
+MIDNIGHT_RULES = (ACCEPT_TODAY,)
+PAYMENT_HOUR_RULES = (AWAIT_PAYMENT,)
+STARTUP_RULES = (ACCEPT_TODAY, CATCH_UP_PAYMENT)
+
+
+def plan(records: Iterable[OrderRecord], rules: Sequence[Rule], now: datetime) -> List[Transition]:
+    """Вычисляет переходы статусов по заказам листа.
+
+    Правила применяются к заказу по порядку, поэтому один заказ может пройти
+    несколько переходов подряд (например, 'Активен' → 'Принят' → 'Ожидает оплаты').
+
+    Args:
+        records: Заказы с номерами строк
+        rules: Правила перехода
+        now: Текущее время
+
+    Returns:
+        List[Transition]: Переходы в порядке строк листа
+    """
+    statuses = {rule.from_status for rule in rules}
+    transitions = []
+    for record in records:
+        status = record.status_text
+        if status not in statuses or record.row_number is None:
+            continue
+        if record.delivery_date is None:
+            if record.row[COL_DELIVERY_DATE]:
+                logging.error(f"Ошибка при парсинге даты выдачи заказа {record.order_id}: {record.row[COL_DELIVERY_DATE]}")
+            continue
+        new_status = status
+        for rule in rules:
+            if rule.from_status == new_status and rule.applies(record, now):
+                new_status = rule.to_status
+        if new_status != status:
+            transitions.append(Transition(record.row_number, record.order_id, status, new_status))
+    transitions.sort()
+    return transitions
+
+
+def to_batch(transitions: Sequence[Transition]) -> List[dict]:
+    """Собирает данные для batch_update: подряд идущие строки с одним статусом в один диапазон."""
+    data = []
+    start = end = status = None
+    for transition in sorted(transitions):
+        if status == transition.to_status and transition.row_number == end + 1:
+            end = transition.row_number
+            continue
+        if status is not None:
+            data.append(_status_range(start, end, status))
+        start = end = transition.row_number
+        status = transition.to_status
+    if status is not None:
+        data.append(_status_range(start, end, status))
+    return data
+
+
+def _status_range(start: int, end: int, status: str) -> dict:
+    range_name = f'C{start}' if start == end else f'C{start}:C{end}'
+    return {'range': range_name, 'values': [[status]] * (end - start + 1)}
+
+
+async def run(worksheet, rules: Sequence[Rule], now: Optional[datetime] = None) -> bool:
+    """Перечитывает лист заказов и применяет переходы одним запросом.
+
+    Args:
+        worksheet: Лист заказов
+        rules: Правила перехода
+        now: Текущее время, по умолчанию datetime.now()
+
+    Returns:
+        bool: True в случае успешного обновления, False в противном случае
+    """
+    try:
+        now = now or datetime.now()
+        # Журнал не пишет в таблицу, пока статусы меняются в обход него
+        async with journal.write_lock():
+            # Полная выгрузка, чтобы учесть ручные правки статусов в таблице; ею же
+            # обновляется копия листа, а незаписанные изменения журнала накладываются сверху
+            order_store.replace(await gateway.get_all_values(worksheet))
+            transitions = plan(order_store.numbered_records(), rules, now)
+            if not transitions:
+                logging.info(f"Нет заказов для смены статуса ({', '.join(rule.name for rule in rules)})")
+                return True
+
+            await gateway.batch_update(worksheet, to_batch(transitions), value_input_option='USER_ENTERED')
+            for transition in transitions:
+                # Операция журнала с полной строкой иначе записала бы прежний статус поверх нового
+                journal.rebase_status(transition.order_id, transition.from_status, transition.to_status)
+                order_store.set_status_by_row(transition.row_number, transition.to_status)
+
+        counts: Dict[str, int] = {}
+        for transition in transitions:
+            counts[transition.to_status] = counts.get(transition.to_status, 0) + 1
+        summary = ', '.join(f"'{status}': {count}" for status, count in counts.items())
+        logging.info(f"Обновлены статусы {len(transitions)} заказов ({summary})")
+        return True
+    except Exception as e:
+        logging.error(f"Ошибка при смене статусов заказов: {e}")
+        return False
@@ -1,9 +1,35 @@
 import gspread
 from .. import config
 from .sheets import client, orders_sheet, users_sheet, auth_sheet
+from . import gateway
+from .quota import background_task
+from .order_record import OrderStatus, CREATED_AT_FORMAT
+from .order_store import order_store
 from datetime import datetime
 import logging
 
+# Статусы заказов, которые учитываются в количестве и сумме заказов пользователя
+COUNTED_STATUSES = (OrderStatus.ACTIVE, OrderStatus.ACCEPTED, OrderStatus.AWAITING_PAYMENT, OrderStatus.PAID)
+
+
+def _order_stats(records) -> dict:
+    """Считает статистику заказов пользователя по разобранным заказам из копии листа."""
+    stats = {'orders': 0, 'cancelled': 0, 'total': 0, 'unpaid': 0, 'last_order_date': None}
+    for record in records:
+        if record.status in COUNTED_STATUSES:
+            stats['orders'] += 1
+            stats['total'] += record.total
+            # Неоплаченными считаются все учитываемые заказы, кроме оплаченных
+            if record.status is not OrderStatus.PAID:
+                stats['unpaid'] += record.total
+        elif record.status is OrderStatus.CANCELLED:
+            stats['cancelled'] += 1
+        created_at = record.created_at
+        if created_at and (stats['last_order_date'] is None or created_at > stats['last_order_date']):
+            stats['last_order_date'] = created_at
+    return stats
+
+
 async def update_user_info(user):
     """Обновление информации о пользователе."""
     user_id = str(user.id).strip("'")  # Убираем апострофы, если они есть
@@ -13,11 +39,11 @@ async def update_user_info(user):
     
     try:
         # Получаем все записи о пользователях
-        all_users = users_sheet.get_all_values()
+        all_users = await gateway.get_all_values(users_sheet)
         
         # Если лист пустой, добавляем заголовки
         if not all_users:
-            users_sheet.append_row([
+            await gateway.append_row(users_sheet, [
                 'User ID',
                 'Profile Link',
                 'First Name',
@@ -30,7 +56,7 @@ async def update_user_info(user):
                 'Start Time',
                 'Last Order Date'
             ], value_input_option='USER_ENTERED')
-            all_users = users_sheet.get_all_values()
+            all_users = await gateway.get_all_values(users_sheet)
         
         # Получаем имя, номер телефона и номер комнаты из таблицы Auth
         auth_name = '-'
@@ -38,7 +64,7 @@ async def update_user_info(user):
         room_number = ''
         try:
             # Получаем все значения из столбцов таблицы Auth
-            auth_data = auth_sheet.get_all_values()
+            auth_data = await gateway.get_all_values(auth_sheet)
             for row in auth_data[1:]:  # Пропускаем заголовок
                 if len(row) >= 4 and row[3] == user_id:  # Если находим совпадение по user_id (четвертый столбец)
                     auth_name = row[0] or '-'  # Берем имя из первого столбца
@@ -55,18 +81,18 @@ async def update_user_info(user):
         for idx, row in enumerate(all_users[1:], start=2):  # Пропускаем заголовок
             if row[0] == user_id:
                 # Обновляем основную информацию о пользователе, сохраняя текущее значение Room Number
-                users_sheet.update(f'A{idx}:D{idx}', 
+                await gateway.update(users_sheet, f'A{idx}:D{idx}', 
                                 [[user_id, profile_link, auth_name, phone]],
                                 value_input_option='USER_ENTERED')
                 
                 # Обновляем номер комнаты из таблицы Auth, если он есть
                 if room_number:
-                    users_sheet.update_cell(idx, 5, room_number)  # Колонка E (5) - Room Number (сдвинуто влево)
+                    await gateway.update_cell(users_sheet, idx, 5, room_number)  # Колонка E (5) - Room Number (сдвинуто влево)
                     logging.info(f"Номер комнаты {room_number} обновлен для пользователя {user.id}")
                 
                 # Проверяем и обновляем Start Time, только если оно не установлено
                 if not row[9] or row[9] == '':  # Индекс 9 - Start Time (сдвинуто влево)
-                    users_sheet.update_cell(idx, 10, start_time)  # Колонка J (10) - Start Time (сдвинуто влево)
+                    await gateway.update_cell(users_sheet, idx, 10, start_time)  # Колонка J (10) - Start Time (сдвинуто влево)
                 
                 user_found = True
                 break
@@ -88,7 +114,7 @@ async def update_user_info(user):
                 ''              # Last Order Date
             ]
             # Используем явное указание диапазона вместо append_row
-            users_sheet.update(f'A{next_row}:K{next_row}', [new_user_row], value_input_option='USER_ENTERED')
+            await gateway.update(users_sheet, f'A{next_row}:K{next_row}', [new_user_row], value_input_option='USER_ENTERED')
             logging.info(f"Новая запись о пользователе добавлена в строку {next_row}")
             if room_number:
                 logging.info(f"Номер комнаты {room_number} сохранен для нового пользователя {user.id}")
@@ -102,51 +128,31 @@ async def update_user_info(user):
         logging.error(f"Ошибка при обновлении информации о пользователе: {e}")
         return False
 
+@background_task
 async def update_user_totals():
     """Обновление общей суммы заказов пользователей."""
-    # Получаем все заказы
-    all_orders = orders_sheet.get_all_values()
-    
-    # Создаем словарь для хранения сумм по пользователям
-    user_totals = {}
-    user_unpaid = {}  # Новый словарь для неоплаченных сумм
-    
-    # Подсчитываем суммы активных заказов для каждого пользователя
-    for order in all_orders[1:]:  # Пропускаем заголовок
-        if order[2] in ['Активен', 'Принят', 'Ожидает оплаты', 'Оплачен']:  # Проверяем статус заказа
-            user_id = order[3]
-            try:
-                amount = float(order[5]) if order[5] else 0
-                
-                # Общая сумма заказов
-                if user_id not in user_totals:
-                    user_totals[user_id] = 0
-                user_totals[user_id] += amount
-                
-                # Сумма неоплаченных заказов (все кроме оплаченных)
-                if order[2] in ['Активен', 'Принят', 'Ожидает оплаты']:
-                    if user_id not in user_unpaid:
-                        user_unpaid[user_id] = 0
-                    user_unpaid[user_id] += amount
-                
-            except (ValueError, IndexError) as e:
-                logging.error(f"Ошибка при обработке суммы заказа: {e}")
-                continue
+    # Заказы берём из копии листа: в ней уже учтены изменения, ещё не записанные в таблицу
+    await order_store.ensure_fresh()
+    records_by_user = {}
+    for record in order_store.all_records():
+        records_by_user.setdefault(record.user_id, []).append(record)
+    user_stats = {user_id: _order_stats(records) for user_id, records in records_by_user.items()}
     
     # Получаем все записи о пользователях
-    all_users = users_sheet.get_all_values()
+    all_users = await gateway.get_all_values(users_sheet)
     
     # Обновляем суммы в таблице пользователей
     for idx, row in enumerate(all_users[1:], start=2):  # Начинаем с 2, так как пропускаем заголовок
         user_id = row[0]
-        total = user_totals.get(user_id, 0)
-        unpaid = user_unpaid.get(user_id, 0)
+        stats = user_stats.get(user_id)
+        total = stats['total'] if stats else 0
+        unpaid = stats['unpaid'] if stats else 0
         
         # Обновляем общую сумму заказов
-        users_sheet.update_cell(idx, 8, str(int(total)))  # Обновляем столбец H (8) - Total Sum (сдвинуто влево)
+        await gateway.update_cell(users_sheet, idx, 8, str(int(total)))  # Обновляем столбец H (8) - Total Sum (сдвинуто влево)
         
         # Обновляем сумму неоплаченных заказов
-        users_sheet.update_cell(idx, 9, str(int(unpaid)))  # Обновляем столбец I (9) - Unpaid Sum (сдвинуто влево)
+        await gateway.update_cell(users_sheet, idx, 9, str(int(unpaid)))  # Обновляем столбец I (9) - Unpaid Sum (сдвинуто влево)
 
 async def update_user_stats(user_id: str):
     """Обновление статистики пользователя."""
@@ -154,85 +160,29 @@ async def update_user_stats(user_id: str):
         # Логирование входных параметров
         logging.info(f"Вызов update_user_stats с user_id: '{user_id}', тип: {type(user_id)}")
         
-        # Получаем все заказы
-        all_orders = orders_sheet.get_all_values()
-        logging.info(f"Получено {len(all_orders)-1} заказов (без учета заголовка)")
-        
-        # Подсчитываем статистику пользователя
-        active_orders = 0
-        cancelled_orders = 0
-        total_sum = 0
-        unpaid_sum = 0  # Новая переменная для суммы неоплаченных заказов
-        last_order_date = None
-        
-        # Создаем словарь для подсчета статусов
-        status_counts = {}
-        
-        # Подсчитываем заказы пользователя
-        user_orders_count = 0
-        for order in all_orders[1:]:  # Пропускаем заголовок
-            if order[3] == user_id:  # User ID в четвертом столбце
-                user_orders_count += 1
-        
+        # Заказы пользователя берём из копии листа: в ней уже учтены изменения,
+        # которые журнал ещё не записал в таблицу
+        await order_store.ensure_fresh()
+        user_orders = order_store.records_by_user(user_id)
+        user_orders_count = len(user_orders)
         logging.info(f"Найдено {user_orders_count} заказов для пользователя {user_id}")
         
-        for order in all_orders[1:]:  # Пропускаем заголовок
-            order_user_id = order[3]
-            # Логируем информацию для отладки
-            if order_user_id == user_id:
-                logging.info(f"Найден заказ для user_id={user_id}: ID заказа={order[0]}, статус={order[2]}")
-            
-            if order_user_id == user_id:  # User ID в четвертом столбце
-                try:
-                    # Парсим дату в формате DD.MM.YYYY HH:MM:SS
-                    order_date = datetime.strptime(order[1], "%d.%m.%Y %H:%M:%S")
-                    logging.info(f"Обработка заказа от {order_date} для пользователя {user_id}")
-                    
-                    if last_order_date is None or order_date > last_order_date:
-                        logging.info(f"Найден более новый заказ: {order_date} (было {last_order_date})")
-                        last_order_date = order_date
-                except ValueError as e:
-                    logging.error(f"Ошибка при парсинге даты заказа {order[1]}: {e}")
-                    continue
-                
-                # Получаем статус и убираем лишние пробелы
-                status = order[2].strip()
-                logging.info(f"Заказ {order[0]}: статус = '{status}'")
-                
-                # Подсчитываем количество каждого статуса
-                status_counts[status] = status_counts.get(status, 0) + 1
-                
-                # Проверяем статус заказа
-                if status in ['Активен', 'Принят', 'Ожидает оплаты', 'Оплачен']:
-                    active_orders += 1
-                    order_sum = float(order[5]) if order[5] else 0  # Сумма в шестом столбце
-                    total_sum += order_sum
-                    
-                    # Учитываем неоплаченные заказы
-                    if status in ['Активен', 'Принят', 'Ожидает оплаты']:
-                        unpaid_sum += order_sum
-                        
-                    logging.info(f"Заказ {order[0]} со статусом '{status}' учтен в активных заказах")
-                elif status == 'Отменён':
-                    cancelled_orders += 1
-                    logging.info(f"Заказ {order[0]} со статусом '{status}' учтен в отмененных заказах")
-                else:
-                    logging.info(f"Заказ {order[0]} со статусом '{status}' НЕ учтен (неизвестный статус)")
+        stats = _order_stats(user_orders)
+        active_orders = stats['orders']
+        cancelled_orders = stats['cancelled']
+        total_sum = stats['total']
+        unpaid_sum = stats['unpaid']
+        last_order_date = stats['last_order_date']
         
         # Если у пользователя нет заказов, возможно его ID некорректный
         if user_orders_count == 0:
             logging.warning(f"Для пользователя с ID '{user_id}' не найдено ни одного заказа")
         
-        # Логируем статистику по статусам
-        logging.info(f"Статистика по статусам заказов для пользователя {user_id}:")
-        for status, count in status_counts.items():
-            logging.info(f"Статус '{status}': {count} заказов")
-        
         # Дополнительно логируем информацию о неоплаченных заказах
         logging.info(f"Общая сумма неоплаченных заказов для пользователя {user_id}: {unpaid_sum} р.")
         
         # Получаем текущие данные пользователя
-        users_data = users_sheet.get_all_values()
+        users_data = await gateway.get_all_values(users_sheet)
         logging.info(f"Получено {len(users_data)-1} записей пользователей (без учета заголовка)")
         
         # Ищем пользователя по ID
@@ -253,17 +203,15 @@ async def update_user_stats(user_id: str):
             username = '-'
             profile_link = '-'
             
-            # Ищем имя пользователя в заказах
-            for order in all_orders[1:]:
-                if order[3] == user_id:
-                    username = order[4] or '-'  # Username в пятом столбце
-                    break
+            # Берём имя пользователя из его заказов
+            if user_orders:
+                username = user_orders[0].username or '-'
             
             # Проверяем наличие имени пользователя в auth_sheet
             auth_name = '-'
             room_number = ''
             try:
-                auth_data = auth_sheet.get_all_values()
+                auth_data = await gateway.get_all_values(auth_sheet)
                 for row in auth_data[1:]:  # Пропускаем заголовок
                     if len(row) >= 4 and row[3] == user_id:  # Если находим совпадение по user_id (четвертый столбец)
                         auth_name = row[0] or '-'  # Берем имя из первого столбца
@@ -292,11 +240,11 @@ async def update_user_stats(user_id: str):
                 str(int(total_sum)),  # Total Sum
                 str(int(unpaid_sum)),  # Unpaid Sum
                 datetime.now().strftime("%Y-%m-%d %H:%M:%S"),  # Start Time
-                last_order_date.strftime("%d.%m.%Y %H:%M:%S") if last_order_date else ''  # Last Order Date
+                last_order_date.strftime(CREATED_AT_FORMAT) if last_order_date else ''  # Last Order Date
             ]
             
             # Используем явное указание диапазона для добавления новой строки
-            users_sheet.update(f'A{next_row}:K{next_row}', [new_user_row], value_input_option='USER_ENTERED')
+            await gateway.update(users_sheet, f'A{next_row}:K{next_row}', [new_user_row], value_input_option='USER_ENTERED')
             logging.info(f"Новый пользователь {user_id} добавлен в строку {next_row} со статистикой: активных заказов {active_orders}, отмен {cancelled_orders}, сумма {total_sum}, неоплаченная сумма {unpaid_sum}")
             
             # Успешно обновили через создание новой записи
@@ -305,12 +253,12 @@ async def update_user_stats(user_id: str):
         # Пользователь найден, обновляем его данные
         if user_row:
             # Форматируем дату для сохранения в том же формате DD.MM.YYYY HH:MM:SS
-            formatted_date = last_order_date.strftime("%d.%m.%Y %H:%M:%S") if last_order_date else ''
+            formatted_date = last_order_date.strftime(CREATED_AT_FORMAT) if last_order_date else ''
             logging.info(f"Обновление статистики для пользователя {user_id} в строке {user_row}: активных заказов {active_orders}, отмен {cancelled_orders}, общая сумма {total_sum}, неоплаченная сумма {unpaid_sum}, последний заказ {formatted_date}")
             
             # Обновляем статистику (смещено влево из-за удаления колонки Last Name)
             # F-I: Orders Count, Cancellations, Total Sum, Unpaid Sum
-            users_sheet.update(f'F{user_row}:I{user_row}', 
+            await gateway.update(users_sheet, f'F{user_row}:I{user_row}', 
                              [[str(active_orders), 
                                str(cancelled_orders), 
                                str(int(total_sum)),
@@ -320,7 +268,7 @@ async def update_user_stats(user_id: str):
             
             # Отдельно обновляем дату последнего заказа (теперь в столбце K)
             if formatted_date:
-                users_sheet.update_cell(user_row, 11, formatted_date)
+                await gateway.update_cell(users_sheet, user_row, 11, formatted_date)
                 logging.info(f"Ячейка K{user_row} (дата последнего заказа) обновлена на {formatted_date}")
         else:
             logging.error(f"Пользователь с ID '{user_id}' не найден в таблице Users")
@@ -342,15 +290,15 @@ async def update_user_stats(user_id: str):
 async def update_user_info_by_id(user_id: str):
     """Создание базовой записи о пользователе по ID."""
     try:
-        # Получаем информацию о пользователе из заказов
-        all_orders = orders_sheet.get_all_values()
-        user_orders = [order for order in all_orders[1:] if order[3] == user_id]
+        # Получаем информацию о пользователе из заказов в копии листа
+        await order_store.ensure_fresh()
+        user_orders = order_store.records_by_user(user_id)
         
         # Получаем имя и номер комнаты из таблицы Auth
         auth_name = '-'
         room_number = ''
         try:
-            auth_data = auth_sheet.get_all_values()
+            auth_data = await gateway.get_all_values(auth_sheet)
             for row in auth_data[1:]:  # Пропускаем заголовок
                 if len(row) >= 4 and row[3] == user_id:  # Если находим совпадение по user_id (четвертый столбец)
                     auth_name = row[0] or '-'  # Берем имя из первого столбца
@@ -361,12 +309,11 @@ async def update_user_info_by_id(user_id: str):
             logging.error(f"Ошибка при получении данных из таблицы Auth: {e}")
         
         if user_orders:
-            latest_order = user_orders[-1]
-            username = latest_order[4]  # Username в пятом столбце
+            username = user_orders[-1].username
             profile_link = f"t.me/{username}" if username and username != '-' else '-'
             
             # Получаем все записи пользователей
-            users_data = users_sheet.get_all_values()
+            users_data = await gateway.get_all_values(users_sheet)
             next_row = len(users_data) + 1
             
             # Добавляем базовую запись с новой структурой (без Last Name)
@@ -384,7 +331,7 @@ async def update_user_info_by_id(user_id: str):
                 ''            # Last Order Date
             ]
             # Используем явное указание диапазона вместо append_row
-            users_sheet.update(f'A{next_row}:K{next_row}', [new_user_row], value_input_option='USER_ENTERED')
+            await gateway.update(users_sheet, f'A{next_row}:K{next_row}', [new_user_row], value_input_option='USER_ENTERED')
             logging.info(f"Новая базовая запись о пользователе {user_id} добавлена в строку {next_row}")
             if room_number:
                 logging.info(f"Номер комнаты {room_number} сохранен для пользователя {user_id}")
@@ -402,11 +349,11 @@ async def update_user_info_by_id(user_id: str):
 async def save_user_phone(user_id: str, phone: str):
     """Сохранение номера телефона пользователя."""
     try:
-        users_data = users_sheet.get_all_values()
+        users_data = await gateway.get_all_values(users_sheet)
         for idx, row in enumerate(users_data):
             if row[0] == user_id:
                 # Обновляем номер телефона (столбец D) - индекс смещен влево из-за удаления Last Name
-                users_sheet.update(f'D{idx + 1}', [[phone]], value_input_option='USER_ENTERED')
+                await gateway.update(users_sheet, f'D{idx + 1}', [[phone]], value_input_option='USER_ENTERED')
                 logging.info(f"Сохранен номер телефона для пользователя {user_id} в таблице Auth")
                 return True
         return False
@@ -419,7 +366,7 @@ async def create_user_record(user_id: int, username: str, first_name: str, last_
         # Получаем имя из таблицы Auth
         auth_name = '-'
         try:
-            auth_data = auth_sheet.get_all_values()
+            auth_data = await gateway.get_all_values(auth_sheet)
             for row in auth_data[1:]:  # Пропускаем заголовок
                 if len(row) >= 4 and row[3] == str(user_id):  # Если находим совпадение по user_id (четвертый столбец)
                     auth_name = row[0] or '-'  # Берем имя из первого столбца
@@ -432,7 +379,7 @@ async def create_user_record(user_id: int, username: str, first_name: str, last_
         profile_link = f"t.me/{username}" if username and username != '-' else '-'
         
         # Получаем все записи пользователей
-        users_data = users_sheet.get_all_values()
+        users_data = await gateway.get_all_values(users_sheet)
         next_row = len(users_data) + 1
         
         # Добавляем запись с новой структурой
@@ -450,7 +397,7 @@ async def create_user_record(user_id: int, username: str, first_name: str, last_
             ''              # Last Order Date
         ]
         # Используем явное указание диапазона вместо append_row
-        users_sheet.update(f'A{next_row}:K{next_row}', [new_user_row], value_input_option='USER_ENTERED')
+        await gateway.update(users_sheet, f'A{next_row}:K{next_row}', [new_user_row], value_input_option='USER_ENTERED')
         logging.info(f"Создана новая запись о пользователе {user_id} в таблице Users")
         return True
     except Exception as e:
@@ -468,7 +415,7 @@ async def get_user_data(user_id: str) -> dict:
     """
     try:
         # Сначала ищем в таблице пользователей
-        users_data = users_sheet.get_all_values()
+        users_data = await gateway.get_all_values(users_sheet)
         user_info = {'name': '-', 'room': ''}
         
         # Поиск в таблице пользователей
@@ -481,7 +428,7 @@ async def get_user_data(user_id: str) -> dict:
         # Если в таблице пользователей нет имени или комнаты, проверяем Auth таблицу
         if user_info['name'] == '-' or not user_info['room']:
             try:
-                auth_data = auth_sheet.get_all_values()
+                auth_data = await gateway.get_all_values(auth_sheet)
                 for row in auth_data[1:]:  # Пропускаем заголовок
                     if len(row) >= 4 and row[3] == user_id:  # Если находим совпадение по user_id (четвертый столбец)
                         if user_info['name'] == '-':
@@ -10,9 +10,12 @@ from .services.sheets import (
     force_update_composition_cache,
     force_update_today_menu_cache,
     update_orders_to_awaiting_payment,
-    check_orders_awaiting_payment_at_startup
+    check_orders_awaiting_payment_at_startup,
+    refresh_menu_caches_if_changed,
+    MENU_CHANGE_CHECK_INTERVAL
 )
-from .services.records import process_daily_orders
+from .services.records import process_daily_orders, sync_daily_totals, REC_SYNC_INTERVAL
+from .services.quota import background_task
 
 # Глобальная переменная для хранения задачи
 _status_update_task = None
@@ -23,15 +26,13 @@ MOSCOW_TZ = pytz.timezone('Europe/Moscow')
 async def check_orders_status():
     """Проверяет и обновляет статусы заказов при запуске бота."""
     try:
-        await update_orders_status()
-        logging.info("Статусы заказов проверены при запуске бота")
-        
-        # После обновления статусов с "Активен" на "Принят", проверяем, нужно ли обновить до "Ожидает оплаты"
+        # Переходы 'Активен' → 'Принят' → 'Ожидает оплаты' применяются одним запросом
         await check_orders_awaiting_payment_at_startup()
-        logging.info("Проверены заказы, требующие обновления до 'Ожидает оплаты' при запуске")
+        logging.info("Статусы заказов проверены при запуске бота")
     except Exception as e:
         logging.error(f"Ошибка при проверке статусов заказов при запуске: {e}")
 
+@background_task
 async def schedule_status_update():
     """Планирует обновление статусов заказов каждый день в полночь по московскому времени."""
     try:
@@ -98,6 +99,29 @@ async def process_daily_tasks():
     except Exception as e:
         logging.error(f"Ошибка при обработке заказов: {e}")
 
+@background_task
+async def watch_menu_changes():
+    """Периодически проверяет, изменилась ли таблица меню, и обновляет кэши после правок."""
+    logging.info("Запущено отслеживание изменений таблицы меню")
+    while True:
+        await asyncio.sleep(MENU_CHANGE_CHECK_INTERVAL)
+        try:
+            await refresh_menu_caches_if_changed()
+        except Exception as e:
+            logging.error(f"Ошибка при проверке изменений таблицы меню: {e}")
+
+@background_task
+async def watch_daily_totals():
+    """Периодически записывает в Rec итоги, изменившиеся после событий заказов."""
+    logging.info("Запущена запись итогов заказов в Rec")
+    while True:
+        await asyncio.sleep(REC_SYNC_INTERVAL)
+        try:
+            await sync_daily_totals()
+        except Exception as e:
+            logging.error(f"Ошибка при записи итогов заказов в Rec: {e}")
+
+@background_task
 async def schedule_daily_tasks():
     """Планировщик ежедневных задач."""
     logging.info("Запущен планировщик ежедневных задач")
@@ -1,24 +1,6 @@
 """
 Утилиты для работы с Markdown форматированием.
 """
+from .rendering import escape_markdown_v2
 
-def escape_markdown_v2(text):
-    """
-    Экранирует специальные символы Markdown V2 в тексте.
-    
-    Args:
-        text: Исходный текст
-        
-    Returns:
-        str: Текст с экранированными специальными символами
-    """
-    if not text:
-        return ""
-    
-    special_chars = ['_', '*', '[', ']', '(', ')', '~', '`', '>', '#', '+', 
-                    '-', '=', '|', '{', '}', '.', '!']
-    
-    for char in special_chars:
-        text = text.replace(char, f"\\{char}")
-    
-    return text 
\ No newline at end of file
+__all__ = ['escape_markdown_v2']
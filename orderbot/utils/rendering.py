@@ -0,0 +1,201 @@
+"""
+Оформление сообщений с заказами для Telegram.
+
+Экранирование MarkdownV2 выполняется за один проход таблицей str.translate,
+карточки заказов собираются по заранее подготовленным шаблонам, а готовые
+карточки упаковываются в как можно меньшее число сообщений.
+"""
+import logging
+from typing import Iterable, Iterator, List
+
+from .. import translations
+from ..services.dishes import EMPTY
+from ..services.order_record import OrderRecord
+
+# Наибольшая длина сообщения с запасом к ограничению Telegram в 4096 символов
+MESSAGE_LIMIT = 4000
+
+# Символы, которые MarkdownV2 требует экранировать
+MARKDOWN_V2_SPECIAL_CHARS = '\\_*[]()~`>#+-=|{}.!'
+_MARKDOWN_V2_TABLE = str.maketrans({char: '\\' + char for char in MARKDOWN_V2_SPECIAL_CHARS})
+# Разделитель полей при экранировании карточки одним вызовом; сам не экранируется
+_FIELD_SEPARATOR = '\x00'
+# Маркеры форматирования MarkdownV2, которые закрываются и открываются заново при разрезе строки;
+# двойные маркеры проверяются раньше одинарных
+_ENTITY_MARKERS = ('||', '__', '*', '_', '~')
+
+# Шаблоны карточки заказа; постоянные части уже экранированы для MarkdownV2
+_render_card = (
+    "{emoji} Заказ *{order_id}* \\({status}\\)\n"
+    "{guest}"
+    "🍽 Время дня: {meal_type}\n"
+    "🍲 Блюда:\n"
+    "{dishes}"
+    "📝 Пожелания: {wishes}\n"
+    "💰 Сумма заказа: {order_sum} р\\.\n"
+    "{separator}"
+).format
+_render_guest = "🏠 Комната: {}\n👤 Имя: {}\n".format
+_render_dish = "  • {} x{}\n".format
+
+# Настройка логгера
+logger = logging.getLogger(__name__)
+
+
+def escape_markdown_v2(text):
+    """
+    Экранирует специальные символы Markdown V2 в тексте.
+
+    Args:
+        text: Исходный текст
+
+    Returns:
+        str: Текст с экранированными специальными символами
+    """
+    if not text:
+        return ""
+    return str(text).translate(_MARKDOWN_V2_TABLE)
+
+
+def escape_fields(*fields: str) -> List[str]:
+    """Экранирует несколько полей одним проходом по общей строке."""
+    joined = _FIELD_SEPARATOR.join('' if field is None else str(field) for field in fields)
+    return joined.translate(_MARKDOWN_V2_TABLE).split(_FIELD_SEPARATOR)
+
+
+def render_dishes(order: OrderRecord) -> str:
+    """Формирует экранированный список блюд заказа с количествами, по блюду в строке."""
+    escaped = escape_fields(*(dish for dish, _ in order.dishes))
+    return ''.join(_render_dish(dish, quantity) for dish, (_, quantity) in zip(escaped, order.dishes))
+
+
+def render_order_card(order: OrderRecord, emoji: str, with_guest: bool = False) -> str:
+    """Формирует карточку заказа в MarkdownV2.
+
+    Args:
+        order: Разобранный заказ
+        emoji: Значок статуса заказа
+        with_guest: Показывать комнату и имя гостя
+
+    Returns:
+        str: Карточка заказа с разделителем в конце
+    """
+    meal_type = translations.get_meal_type(order.meal_type)
+    if order.delivery_date:
+        meal_type = f"{meal_type} ({order.delivery_date.strftime('%d.%m.%y')})"
+    order_id, status, room, name, meal, wishes, total = escape_fields(
+        order.order_id, order.status_text, order.room, order.name, meal_type, order.wishes or EMPTY, order.total
+    )
+    return _render_card(
+        emoji=emoji,
+        order_id=order_id,
+        status=status,
+        guest=_render_guest(room, name) if with_guest else '',
+        meal_type=meal,
+        dishes=render_dishes(order),
+        wishes=wishes,
+        order_sum=total,
+        separator=translations.get_message('active_orders_separator'),
+    )
+
+
+def _open_entities(text: str) -> List[str]:
+    """Возвращает незакрытые маркеры форматирования MarkdownV2 в порядке открытия."""
+    opened = []
+    i = 0
+    while i < len(text):
+        if text[i] == '\\':
+            i += 2
+            continue
+        for marker in _ENTITY_MARKERS:
+            if text.startswith(marker, i):
+                if marker in opened:
+                    # Закрываем последнее открытое выделение с этим маркером
+                    del opened[len(opened) - 1 - opened[::-1].index(marker)]
+                else:
+                    opened.append(marker)
+                i += len(marker)
+                break
+        else:
+            i += 1
+    return opened
+
+
+def _cut_position(line: str, limit: int) -> int:
+    """Находит место разреза строки не дальше limit, не разрывая экранирование и двойные маркеры."""
+    cut = limit
+    # Не отрываем экранирующую обратную косую черту от символа: при нечётном
+    # числе черт подряд перед разрезом последняя из них экранирует следующий символ
+    run = 0
+    while run < cut and line[cut - 1 - run] == '\\':
+        run += 1
+    if run % 2 and cut > 1:
+        cut -= 1
+    elif not run and cut > 1 and line[cut - 1] == line[cut] and line[cut] in '_|':
+        # Не делим маркеры __ и || пополам
+        cut -= 1
+    return cut
+
+
+def _split_block(block: str, limit: int) -> Iterator[str]:
+    """Делит слишком длинный блок по строкам, а слишком длинные строки - по длине.
+
+    Если разрез строки приходится внутрь выделения, выделение закрывается в
+    конце одной части и открывается заново в начале следующей.
+    """
+    if len(block) <= limit:
+        yield block
+        return
+    current = ''
+    for line in block.splitlines(keepends=True):
+        while len(line) > limit:
+            cut = _cut_position(line, limit)
+            opened = _open_entities(line[:cut])
+            # Оставляем место для закрывающих маркеров
+            while opened and cut + len(''.join(opened)) > limit and cut > 1:
+                cut = _cut_position(line, cut - 1)
+                opened = _open_entities(line[:cut])
+            if current:
+                yield current
+                current = ''
+            yield line[:cut] + ''.join(reversed(opened))
+            line = ''.join(opened) + line[cut:]
+        if current and len(current) + len(line) > limit:
+            yield current
+            current = line
+        else:
+            current += line
+    if current:
+        yield current
+
+
+def pack_messages(blocks: Iterable[str], limit: int = MESSAGE_LIMIT, header: str = '') -> List[str]:
+    """Упаковывает блоки текста в как можно меньшее число сообщений.
+
+    Блоки не разрываются между сообщениями, пока помещаются в одно сообщение;
+    блок длиннее ограничения делится по строкам. Текст должен быть в MarkdownV2
+    с уже экранированными пользовательскими данными: строка длиннее ограничения
+    режется между экранированными символами, а незакрытые выделения *, _, __,
+    ~ и || закрываются в месте разреза и открываются в следующей части.
+    Выделения, переходящие на другую строку, не поддерживаются.
+
+    Args:
+        blocks: Блоки текста (заголовки, карточки заказов, итоги) по порядку
+        limit: Наибольшая длина сообщения
+        header: Заголовок, с которого начинается каждое сообщение
+
+    Returns:
+        List[str]: Тексты сообщений
+    """
+    messages = []
+    current = header
+    for block in blocks:
+        for piece in _split_block(block, limit - len(header)):
+            if len(current) + len(piece) > limit and current != header:
+                messages.append(current)
+                current = header + piece
+            else:
+                current += piece
+    if current != header:
+        messages.append(current)
+    return messages
@@ -23,6 +23,7 @@ if TYPE_CHECKING:
 mock_config = MagicMock()
 mock_config.BOT_TOKEN = 'fake_token'
 mock_config.GOOGLE_CREDENTIALS_FILE = 'fake_credentials.json'
+mock_config.ORDER_JOURNAL_PATH = ':memory:'
 sys.modules['orderbot.config'] = mock_config
 
 # Мокаем gspread
@@ -101,12 +102,18 @@ mock_tasks = MagicMock()
 mock_tasks.start_status_update_task = MagicMock()
 mock_tasks.stop_status_update_task = MagicMock()
 mock_tasks.schedule_daily_tasks = AsyncMock(return_value=True)
+mock_tasks.watch_menu_changes = AsyncMock(return_value=True)
+mock_tasks.watch_daily_totals = AsyncMock(return_value=True)
 sys.modules['orderbot.tasks'] = mock_tasks
 
 @pytest.fixture(scope="session")
 def event_loop_policy() -> Generator[asyncio.AbstractEventLoopPolicy, None, None]:
     """Фикстура для настройки политики event loop."""
-    policy = asyncio.WindowsSelectorEventLoopPolicy()
+    # WindowsSelectorEventLoopPolicy есть только в Windows
+    if sys.platform == 'win32':
+        policy = asyncio.WindowsSelectorEventLoopPolicy()
+    else:
+        policy = asyncio.DefaultEventLoopPolicy()
     asyncio.set_event_loop_policy(policy)
     yield policy
 
@@ -22,6 +22,8 @@ def mock_update():
 def mock_context():
     """Создает мок объекта Context."""
     context = MagicMock(spec=ContextTypes.DEFAULT_TYPE)
+    context.bot = MagicMock()
+    context.bot.set_my_commands = AsyncMock()
     return context
 
 @pytest.mark.asyncio
@@ -58,8 +60,8 @@ async def test_handle_phone_valid(mock_update, mock_context):
     contact.phone_number = "79123456789"
     mock_update.message.contact = contact
     
-    with patch('orderbot.handlers.auth.check_phone', return_value=True), \
-         patch('orderbot.handlers.auth.save_user_id', return_value=True), \
+    with patch('orderbot.handlers.auth.check_phone', new_callable=AsyncMock, return_value=True), \
+         patch('orderbot.handlers.auth.save_user_id', new_callable=AsyncMock, return_value=True), \
          patch('orderbot.handlers.auth.update_user_info', new_callable=AsyncMock):
         
         result = await handle_phone(mock_update, mock_context)
@@ -77,7 +79,7 @@ async def test_handle_phone_invalid(mock_update, mock_context):
     contact.phone_number = "79123456789"
     mock_update.message.contact = contact
     
-    with patch('orderbot.handlers.auth.check_phone', return_value=False), \
+    with patch('orderbot.handlers.auth.check_phone', new_callable=AsyncMock, return_value=False), \
          patch('orderbot.handlers.auth.update_user_info', new_callable=AsyncMock):
         
         result = await handle_phone(mock_update, mock_context)
@@ -3,7 +3,10 @@ import pytest
 from unittest.mock import AsyncMock, MagicMock, patch
 from telegram import Update, User, Message
 from telegram.ext import ContextTypes
-from orderbot.handlers.kitchen import kitchen_summary
+from telegram.ext import ConversationHandler
+from orderbot.handlers.kitchen import kitchen_summary, search_orders_by_number, handle_order_number_input
+from orderbot.handlers.states import KITCHEN_ORDER_NUMBER
+from orderbot.services.order_record import OrderRecord
 
 @pytest.fixture
 def mock_update():
@@ -46,7 +49,8 @@ def mock_orders_summary():
 @pytest.mark.asyncio
 async def test_kitchen_summary_unauthorized(mock_update, mock_context):
     """Тест сводки по заказам для неавторизованного пользователя."""
-    with patch('orderbot.handlers.kitchen.is_user_cook', return_value=False):
+    with patch('orderbot.handlers.kitchen.is_user_cook', return_value=False), \
+         patch('orderbot.handlers.kitchen.is_user_admin', return_value=False):
         await kitchen_summary(mock_update, mock_context)
         
         # Проверяем, что был вызван метод reply_text с сообщением об ошибке
@@ -56,12 +60,13 @@ async def test_kitchen_summary_unauthorized(mock_update, mock_context):
 async def test_kitchen_summary_authorized(mock_update, mock_context, mock_orders_summary):
     """Тест сводки по заказам для авторизованного пользователя."""
     with patch('orderbot.handlers.kitchen.is_user_cook', return_value=True), \
+         patch('orderbot.handlers.kitchen.ensure_loaded', new_callable=AsyncMock), \
          patch('orderbot.handlers.kitchen.get_orders_summary', return_value=mock_orders_summary):
         
         await kitchen_summary(mock_update, mock_context)
         
-        # Проверяем, что метод reply_text был вызван 4 раза (общая информация + 3 приема пищи)
-        assert mock_update.message.reply_text.call_count == 4
+        # Проверяем, что метод reply_text был вызван 5 раз (общая информация + 3 приема пищи + поиск заказов)
+        assert mock_update.message.reply_text.call_count == 5
         
         # Проверяем содержимое сообщений
         calls = mock_update.message.reply_text.call_args_list
@@ -83,6 +88,9 @@ async def test_kitchen_summary_authorized(mock_update, mock_context, mock_orders
         assert "Ужин" in calls[3].args[0]
         assert "Рыба: 1" in calls[3].args[0]
         assert "Салат: 1" in calls[3].args[0]
+        
+        # Последним идёт сообщение с кнопками поиска заказов
+        assert calls[4].args[0] == "Найти заказы"
 
 @pytest.mark.asyncio
 async def test_kitchen_summary_no_orders(mock_update, mock_context):
@@ -96,12 +104,13 @@ async def test_kitchen_summary_no_orders(mock_update, mock_context):
     }
     
     with patch('orderbot.handlers.kitchen.is_user_cook', return_value=True), \
+         patch('orderbot.handlers.kitchen.ensure_loaded', new_callable=AsyncMock), \
          patch('orderbot.handlers.kitchen.get_orders_summary', return_value=empty_summary):
         
         await kitchen_summary(mock_update, mock_context)
         
-        # Проверяем, что метод reply_text был вызван 4 раза
-        assert mock_update.message.reply_text.call_count == 4
+        # Проверяем, что метод reply_text был вызван 5 раз
+        assert mock_update.message.reply_text.call_count == 5
         
         # Проверяем содержимое сообщений
         calls = mock_update.message.reply_text.call_args_list
@@ -111,4 +120,111 @@ async def test_kitchen_summary_no_orders(mock_update, mock_context):
         
         # Проверяем, что для каждого приема пищи показано "Нет заказов"
         for i in range(1, 4):
-            assert "Нет заказов" in calls[i].args[0] 
\ No newline at end of file
+            assert "Нет заказов" in calls[i].args[0] 
+
+
+@pytest.mark.asyncio
+async def test_search_by_number_enters_conversation_state(mock_update, mock_context):
+    """Тест перехода в состояние ожидания номера заказа."""
+    mock_update.callback_query = AsyncMock()
+
+    with patch('orderbot.handlers.kitchen.is_user_cook', return_value=True), \
+         patch('orderbot.handlers.kitchen.is_user_admin', return_value=False):
+        result = await search_orders_by_number(mock_update, mock_context)
+
+    assert result == KITCHEN_ORDER_NUMBER
+    mock_update.callback_query.edit_message_text.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_order_number_input_uses_id_index(mock_update, mock_context):
+    """Тест поиска заказа по индексу номеров без чтения листа."""
+    mock_update.message.text = '42'
+    mock_update.message.reply_text = AsyncMock()
+    record = OrderRecord.from_row(['42', '01.04.2025 10:00:00', 'Принят', '1', 'user', '200', '5', 'John',
+                                   'Обед', 'Борщ x1', '—', '01.04.25'])
+    store = MagicMock()
+    store.record.return_value = record
+    store.ensure_fresh = AsyncMock()
+
+    with patch('orderbot.handlers.kitchen.is_user_cook', return_value=True), \
+         patch('orderbot.handlers.kitchen.is_user_admin', return_value=False), \
+         patch('orderbot.handlers.kitchen.order_store', store):
+        result = await handle_order_number_input(mock_update, mock_context)
+
+    assert result == ConversationHandler.END
+    store.record.assert_called_once_with('42')
+    store.ensure_fresh.assert_not_awaited()
+    assert 'Заказ №*42*' in mock_update.message.reply_text.call_args[0][0]
+
+
+@pytest.mark.asyncio
+async def test_unknown_order_number_refreshes_once(mock_update, mock_context):
+    """Тест дочитывания листа, только если номера нет в копии."""
+    mock_update.message.text = '999'
+    mock_update.message.reply_text = AsyncMock()
+    store = MagicMock()
+    store.record.return_value = None
+    store.ensure_fresh = AsyncMock()
+
+    with patch('orderbot.handlers.kitchen.is_user_cook', return_value=True), \
+         patch('orderbot.handlers.kitchen.is_user_admin', return_value=False), \
+         patch('orderbot.handlers.kitchen.order_store', store):
+        result = await handle_order_number_input(mock_update, mock_context)
+
+    assert result == ConversationHandler.END
+    store.ensure_fresh.assert_awaited_once()
+    assert 'не найден' in mock_update.message.reply_text.call_args[0][0]
+
+@pytest.mark.asyncio
+async def test_kitchen_summary_splits_long_meal_list(mock_update, mock_context, mock_orders_summary):
+    """Тест деления длинного списка заказов приёма пищи на сообщения до 4096 символов."""
+    mock_update.message.reply_text = AsyncMock()
+    order = "Заказ *№1*\n🏠 Комната: *5*\n👤 Имя: *Иван*\n• Каша x1\n" + "─" * 30
+    mock_orders_summary['breakfast']['orders'] = [order] * 200
+    with patch('orderbot.handlers.kitchen.is_user_cook', return_value=True), \
+         patch('orderbot.handlers.kitchen.ensure_loaded', new_callable=AsyncMock), \
+         patch('orderbot.handlers.kitchen.get_orders_summary', return_value=mock_orders_summary):
+        await kitchen_summary(mock_update, mock_context)
+
+    texts = [call.args[0] for call in mock_update.message.reply_text.call_args_list]
+    breakfast = [text for text in texts if order in text]
+    assert len(breakfast) > 1
+    assert all(len(text) <= 4096 for text in texts)
+    assert sum(text.count(order) for text in breakfast) == 200
+
+@pytest.mark.asyncio
+async def test_kitchen_command_ends_order_number_search(mock_update, mock_context):
+    """Тест завершения диалога поиска по номеру командой /kitchen."""
+    from orderbot.handlers.kitchen import restart_kitchen_summary
+
+    with patch('orderbot.handlers.kitchen.kitchen_summary', new_callable=AsyncMock) as summary:
+        result = await restart_kitchen_summary(mock_update, mock_context)
+
+    summary.assert_awaited_once_with(mock_update, mock_context)
+    assert result == ConversationHandler.END
+
+@pytest.mark.asyncio
+async def test_order_card_escapes_user_fields(mock_update, mock_context):
+    """Тест экранирования данных гостя в карточке заказа для MarkdownV2."""
+    from telegram.constants import ParseMode
+
+    mock_update.message.text = '42'
+    mock_update.message.reply_text = AsyncMock()
+    record = OrderRecord.from_row(['42', '01.04.2025 10:00:00', 'Принят', '1', 'user', '200', '5', 'J.R._Smith',
+                                   'Обед', 'Борщ (большой) x1', 'без_соли *острое*', '01.04.25'])
+    store = MagicMock()
+    store.record.return_value = record
+    store.ensure_fresh = AsyncMock()
+
+    with patch('orderbot.handlers.kitchen.is_user_cook', return_value=True), \
+         patch('orderbot.handlers.kitchen.is_user_admin', return_value=False), \
+         patch('orderbot.handlers.kitchen.order_store', store):
+        await handle_order_number_input(mock_update, mock_context)
+
+    call = mock_update.message.reply_text.call_args
+    assert call.kwargs['parse_mode'] == ParseMode.MARKDOWN_V2
+    text = call.args[0]
+    assert '👤 Имя: *J\\.R\\.\\_Smith*' in text
+    assert 'Пожелания: *без\\_соли \\*острое\\**' in text
+    assert '\\- Борщ \\(большой\\) x1' in text
@@ -4,7 +4,8 @@ import logging
 from unittest.mock import AsyncMock, MagicMock, patch
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import CallbackContext
-from orderbot.handlers.payment import auto_check_payment_status, check_payment_status
+from orderbot.handlers.payment import apply_payment_results, check_payment_status
+from orderbot.services.payment_poller import PendingPayment
 
 # Настройка логгера для тестов
 logger = logging.getLogger(__name__)
@@ -31,10 +32,14 @@ def mock_context():
     context.job_queue.get_jobs_by_name = MagicMock(return_value=[])
     return context
 
+def make_pending(user_data, chat_id=123):
+    """Создает платеж, поставленный на автоматическую проверку."""
+    return PendingPayment(chat_id, user_data['payment']['qrc_id'], user_data, now=0.0)
+
 @pytest.mark.asyncio
-async def test_auto_check_payment_status_exists():
-    """Тест проверяет существование функции auto_check_payment_status."""
-    assert callable(auto_check_payment_status)
+async def test_apply_payment_results_exists():
+    """Тест проверяет существование функции apply_payment_results."""
+    assert callable(apply_payment_results)
 
 @pytest.mark.asyncio
 async def test_check_payment_status_exists():
@@ -42,17 +47,13 @@ async def test_check_payment_status_exists():
     assert callable(check_payment_status)
 
 @pytest.mark.asyncio
-async def test_auto_check_payment_status_handles_success():
-    """Тест проверяет обработку успешного платежа в auto_check_payment_status."""
-    # Создаем мок для контекста
-    mock_context = MagicMock()
-    mock_context.bot = MagicMock()
-    mock_context.bot.edit_message_text = AsyncMock()
-    mock_context.bot.delete_message = AsyncMock()
-    mock_context.bot.send_message = AsyncMock()
+async def test_apply_payment_results_handles_success():
+    """Тест проверяет обработку успешного платежа в apply_payment_results."""
+    # Создаем мок для бота
+    bot = MagicMock()
+    bot.edit_message_text = AsyncMock()
+    bot.delete_message = AsyncMock()
     
-    # Создаем мок для job
-    job = MagicMock()
     user_data = {
         'payment': {
             'qrc_id': 'test_qrc_id',
@@ -60,28 +61,24 @@ async def test_auto_check_payment_status_handles_success():
             'orders': ['1', '2'],
             'buttons_message_id': 789,
             'qr_message_id': 101,
-            'status_checks': 0,
             'payment_id': '1'
         }
     }
-    job.data = {
-        'chat_id': 123,
-        'user_data': user_data
-    }
-    mock_context.job = job
+    results = [(make_pending(user_data), {'status': 'Accepted', 'message': 'Payment successful'})]
     
     # Мокаем все внешние функции
-    with patch('orderbot.services.sbp.get_qr_code_status', return_value={'status': 'accepted', 'message': 'Payment successful'}):
-        # Мокаем таблицы и другие внешние зависимости
-        with patch('orderbot.services.sheets.get_orders_sheet'):
-            with patch('orderbot.services.sheets.get_payments_sheet'):
-                with patch('orderbot.handlers.payment.update_payment_status'):
-                    with patch('orderbot.services.user.update_user_stats'):
-                        # Вызываем функцию
-                        await auto_check_payment_status(mock_context)
-                        
-                        # Проверяем, что оповещение об успешной оплате было отправлено
-                        assert mock_context.bot.edit_message_text.called or mock_context.bot.send_message.called
+    with patch('orderbot.handlers.payment.mark_orders_paid') as mock_mark_orders_paid:
+        with patch('orderbot.handlers.payment.update_payment_statuses') as mock_update_statuses:
+            with patch('orderbot.handlers.payment.update_user_stats', return_value=True):
+                # Вызываем функцию
+                await apply_payment_results(bot, results)
+                
+                # Проверяем, что заказы и оплата обновлены, а пользователь оповещен
+                mock_mark_orders_paid.assert_called_once_with(['1', '2'])
+                assert mock_update_statuses.call_args[0][1] == {'1': 'оплачено'}
+                bot.delete_message.assert_called_once_with(chat_id=123, message_id=101)
+                assert bot.edit_message_text.called
+                assert 'payment' not in user_data
 
 @pytest.mark.asyncio
 async def test_check_payment_status_handles_accepted_payment():
@@ -122,17 +119,13 @@ async def test_check_payment_status_handles_accepted_payment():
                             assert mock_context.bot.edit_message_text.called
 
 @pytest.mark.asyncio
-async def test_auto_check_payment_status_handles_rejected():
-    """Тест проверяет обработку отклоненного платежа в auto_check_payment_status."""
-    # Создаем мок для контекста
-    mock_context = MagicMock()
-    mock_context.bot = MagicMock()
-    mock_context.bot.edit_message_text = AsyncMock()
-    mock_context.bot.delete_message = AsyncMock()
-    mock_context.bot.send_message = AsyncMock()
+async def test_apply_payment_results_handles_rejected():
+    """Тест проверяет обработку отклоненного платежа в apply_payment_results."""
+    # Создаем мок для бота
+    bot = MagicMock()
+    bot.edit_message_text = AsyncMock()
+    bot.delete_message = AsyncMock()
     
-    # Создаем мок для job
-    job = MagicMock()
     user_data = {
         'payment': {
             'qrc_id': 'test_qrc_id',
@@ -140,27 +133,22 @@ async def test_auto_check_payment_status_handles_rejected():
             'orders': ['1', '2'],
             'buttons_message_id': 789,
             'qr_message_id': 101,
-            'status_checks': 0,
             'payment_id': '1'
         }
     }
-    job.data = {
-        'chat_id': 123,
-        'user_data': user_data
-    }
-    mock_context.job = job
+    results = [(make_pending(user_data), {'status': 'rejected', 'message': 'Payment rejected'})]
     
     # Мокаем все внешние функции
-    with patch('orderbot.services.sbp.get_qr_code_status', return_value={'status': 'rejected', 'message': 'Payment rejected'}):
-        # Мокаем таблицы и другие внешние зависимости
-        with patch('orderbot.services.sheets.get_orders_sheet'):
-            with patch('orderbot.services.sheets.get_payments_sheet'):
-                with patch('orderbot.handlers.payment.update_payment_status'):
-                    # Вызываем функцию
-                    await auto_check_payment_status(mock_context)
-                    
-                    # Проверяем, что сообщение об отклонении было отправлено
-                    assert mock_context.bot.edit_message_text.called or mock_context.bot.send_message.called
+    with patch('orderbot.handlers.payment.mark_orders_paid') as mock_mark_orders_paid:
+        with patch('orderbot.handlers.payment.update_payment_statuses') as mock_update_statuses:
+            # Вызываем функцию
+            await apply_payment_results(bot, results)
+            
+            # Проверяем, что сообщение об отклонении было отправлено, а заказы не оплачены
+            assert not mock_mark_orders_paid.called
+            assert mock_update_statuses.call_args[0][1] == {'1': 'отклонено'}
+            assert 'Payment rejected' in bot.edit_message_text.call_args.kwargs['text']
+            assert 'payment' not in user_data
 
 @pytest.mark.asyncio
 async def test_check_payment_status_handles_expired_payment():
@@ -247,77 +235,71 @@ async def test_update_user_stats_is_called_after_successful_payment():
         }
     }
     
-    # Создаем мок для update_user_stats
-    with patch('orderbot.services.user.update_user_stats') as mock_update_user_stats:
+    # Создаем мок для update_user_stats; обработчик импортирует функцию в свой модуль
+    with patch('orderbot.handlers.payment.update_user_stats', new_callable=AsyncMock) as mock_update_user_stats:
         # Настраиваем mock_update_user_stats.return_value
         mock_update_user_stats.return_value = True
         
-        # Мокаем остальные внешние функции
+        # Мокаем остальные внешние функции; статусы заказов пишутся через журнал
         with patch('orderbot.services.sbp.get_qr_code_status', return_value={'status': 'accepted', 'message': 'Payment successful'}):
-            with patch('orderbot.services.sheets.get_orders_sheet'):
-                with patch('orderbot.services.sheets.get_payments_sheet'):
-                    with patch('orderbot.handlers.payment.update_payment_status'):
+            with patch('orderbot.handlers.payment.mark_orders_paid', new_callable=AsyncMock) as mock_mark_orders_paid:
+                with patch('orderbot.handlers.payment.get_payments_sheet'):
+                    with patch('orderbot.handlers.payment.update_payment_status', new_callable=AsyncMock):
                         with patch('orderbot.handlers.payment.stop_auto_check_payment'):
                             # Вызываем функцию
                             await check_payment_status(mock_update, mock_context)
                             
                             # Проверяем, что update_user_stats была вызвана с правильным user_id
                             mock_update_user_stats.assert_called_once_with(test_user_id)
+                            mock_mark_orders_paid.assert_awaited_once_with(['1', '2'])
 
 @pytest.mark.asyncio
-async def test_update_user_stats_is_called_in_auto_check_after_successful_payment():
-    """Тест проверяет вызов update_user_stats в auto_check_payment_status после успешной оплаты."""
-    # Создаем мок для контекста
-    mock_context = MagicMock()
-    mock_context.bot = MagicMock()
-    mock_context.bot.edit_message_text = AsyncMock()
-    mock_context.bot.delete_message = AsyncMock()
-    mock_context.bot.send_message = AsyncMock()
+async def test_apply_payment_results_batches_several_payments():
+    """Тест проверяет, что итоги нескольких оплат записываются одним пакетом."""
+    bot = MagicMock()
+    bot.edit_message_text = AsyncMock()
+    bot.delete_message = AsyncMock()
     
-    # Создаем данные платежа с тестовым user_id
-    test_user_id = '456'
-    user_data = {
-        'payment': {
-            'qrc_id': 'test_qrc_id',
-            'user_id': test_user_id,
-            'orders': ['1', '2'],
-            'buttons_message_id': 789,
-            'qr_message_id': 101,
-            'status_checks': 0,
-            'payment_id': '1'
-        }
-    }
+    def payment(qrc_id, payment_id, user_id, orders):
+        return {'payment': {'qrc_id': qrc_id, 'user_id': user_id, 'orders': orders,
+                            'buttons_message_id': 789, 'payment_id': payment_id}}
     
-    # Создаем мок для job
-    job = MagicMock()
-    job.data = {
-        'chat_id': 123,
-        'user_data': user_data
-    }
-    mock_context.job = job
-    mock_context.job_queue = MagicMock()
-    mock_context.job_queue.get_jobs_by_name = MagicMock(return_value=[MagicMock()])
+    first, second, third = payment('qr1', '1', '456', ['1']), payment('qr2', '2', '457', ['2', '3']), payment('qr3', '3', '458', ['4'])
+    pending_third = make_pending(third, chat_id=3)
+    third['payment']['qrc_id'] = 'qr_new'  # Пользователь успел создать новый QR-код
+    results = [
+        (make_pending(first, chat_id=1), {'status': 'accepted'}),
+        (make_pending(second, chat_id=2), {'status': 'accepted'}),
+        (pending_third, {'status': 'accepted'}),
+    ]
     
-    # Создаем мок для update_user_stats
-    with patch('orderbot.services.user.update_user_stats') as mock_update_user_stats:
-        # Настраиваем mock_update_user_stats.return_value
-        mock_update_user_stats.return_value = True
-        
-        # Мокаем остальные внешние функции
-        with patch('orderbot.services.sbp.get_qr_code_status', return_value={'status': 'accepted', 'message': 'Payment successful'}):
-            with patch('orderbot.services.sheets.get_orders_sheet'):
-                with patch('orderbot.services.sheets.get_payments_sheet'):
-                    with patch('orderbot.handlers.payment.update_payment_status'):
-                        # Вызываем функцию
-                        await auto_check_payment_status(mock_context)
-                        
-                        # Проверяем, что update_user_stats была вызвана с правильным user_id
-                        mock_update_user_stats.assert_called_once_with(test_user_id)
+    with patch('orderbot.handlers.payment.mark_orders_paid') as mock_mark_orders_paid:
+        with patch('orderbot.handlers.payment.update_payment_statuses') as mock_update_statuses:
+            with patch('orderbot.handlers.payment.update_user_stats', return_value=True) as mock_update_user_stats:
+                await apply_payment_results(bot, results)
+                
+                mock_mark_orders_paid.assert_called_once_with(['1', '2', '3'])
+                mock_update_statuses.assert_called_once()
+                assert mock_update_statuses.call_args[0][1] == {'1': 'оплачено', '2': 'оплачено'}
+                assert [call.args[0] for call in mock_update_user_stats.call_args_list] == ['456', '457']
+                # Новый платеж третьего пользователя не затронут
+                assert third['payment']['qrc_id'] == 'qr_new'
+
+@pytest.fixture
+def real_user_module(monkeypatch):
+    """Настоящий модуль services.user вместо мока из conftest."""
+    import importlib
+    import sys
+    import orderbot.services as services
+    
+    monkeypatch.delitem(sys.modules, 'orderbot.services.user')
+    monkeypatch.setattr(services, 'user', None, raising=False)
+    return importlib.import_module('orderbot.services.user')
 
 @pytest.mark.asyncio
-async def test_update_user_stats_updates_user_data_properly():
+async def test_update_user_stats_updates_user_data_properly(real_user_module, monkeypatch):
     """Тест проверяет правильность обновления данных пользователя в функции update_user_stats."""
-    from orderbot.services.user import update_user_stats
+    from orderbot.services.order_store import OrderStore
     
     # Тестовый ID пользователя
     test_user_id = '456'
@@ -337,51 +319,47 @@ async def test_update_user_stats_updates_user_data_properly():
         [test_user_id, 't.me/user1', 'Test User', '123456789', '101', '1', '0', '0', '0', '01.01.2023 10:00:00', '']
     ]
     
-    # Создаем патчи для внешних зависимостей
-    with patch('orderbot.services.user.orders_sheet.get_all_values', return_value=mock_orders):
-        with patch('orderbot.services.user.users_sheet.get_all_values', return_value=mock_users):
-            with patch('orderbot.services.user.users_sheet.update') as mock_sheet_update:
-                with patch('orderbot.services.user.users_sheet.update_cell') as mock_update_cell:
-                    with patch('orderbot.services.user.logging.info') as mock_logging:
-                        # Вызываем функцию
-                        result = await update_user_stats(test_user_id)
-                        
-                        # Проверяем, что функция возвращает True
-                        assert result is True
-                        
-                        # Проверяем, что была вызвана функция обновления ячеек с правильными параметрами
-                        # Ожидаем, что update вызван со следующими параметрами:
-                        # - строка: 2 (вторая строка в таблице)
-                        # - диапазон: F2:I2 (столбцы F-I, строка 2)
-                        # - значения: [['3', '1', '600', '500']] 
-                        #   (3 активных заказа, 1 отмена, 600 общая сумма, 500 неоплаченная сумма)
-                        mock_sheet_update.assert_called_once()
-                        args, kwargs = mock_sheet_update.call_args
-                        assert 'F2:I2' in args[0]  # Проверяем диапазон
-                        assert len(args[1][0]) == 4  # Проверяем, что передано 4 значения
-                        
-                        # Проверяем правильные значения
-                        values = args[1][0]
-                        assert values[0] == '3'  # Активные заказы
-                        assert values[1] == '1'  # Отмены
-                        assert values[2] == '600'  # Общая сумма
-                        assert values[3] == '500'  # Неоплаченная сумма
-                        
-                        # Проверяем, что была вызвана функция обновления даты последнего заказа
-                        mock_update_cell.assert_called()
-                        
-                        # Проверяем логирование
-                        mock_logging.assert_any_call(f"Обновлена статистика пользователей в таблице Users")
+    # Заказы берутся из копии листа заказов, а запись в лист Users идёт через шлюз
+    orders_sheet = MagicMock()
+    orders_sheet.get_all_values.return_value = mock_orders
+    orders_sheet.get.return_value = []
+    store = OrderStore()
+    monkeypatch.setattr(store, '_worksheet', lambda: orders_sheet)
+    monkeypatch.setattr(real_user_module, 'order_store', store)
+    gateway = MagicMock()
+    gateway.get_all_values = AsyncMock(return_value=mock_users)
+    gateway.update = AsyncMock()
+    gateway.update_cell = AsyncMock()
+    monkeypatch.setattr(real_user_module, 'gateway', gateway)
+    
+    with patch.object(real_user_module.logging, 'info') as mock_logging:
+        # Вызываем функцию
+        result = await real_user_module.update_user_stats(test_user_id)
+    
+    # Проверяем, что функция возвращает True
+    assert result is True
+    
+    # Проверяем, что лист Users прочитан один раз, а статистика записана в диапазон F2:I2:
+    # 3 активных заказа, 1 отмена, 600 общая сумма, 500 неоплаченная сумма
+    gateway.get_all_values.assert_awaited_once_with(real_user_module.users_sheet)
+    gateway.update.assert_awaited_once()
+    args, kwargs = gateway.update.call_args
+    assert args[0] is real_user_module.users_sheet
+    assert args[1] == 'F2:I2'
+    assert args[2] == [['3', '1', '600', '500']]
+    
+    # Проверяем, что дата последнего заказа записана в столбец K
+    gateway.update_cell.assert_awaited_once_with(real_user_module.users_sheet, 2, 11, '04.01.2023 15:00:00')
+    
+    # Проверяем логирование
+    mock_logging.assert_any_call(f"Обновлена статистика пользователей в таблице Users")
 
 @pytest.mark.asyncio
-async def test_auto_check_payment_status_recovers_missing_user_id():
+async def test_apply_payment_results_recovers_missing_user_id():
     """Тест проверяет восстановление отсутствующего user_id из данных заказа."""
-    # Создаем мок для контекста
-    mock_context = MagicMock()
-    mock_context.bot = MagicMock()
-    mock_context.bot.edit_message_text = AsyncMock()
-    mock_context.bot.delete_message = AsyncMock()
-    mock_context.bot.send_message = AsyncMock()
+    bot = MagicMock()
+    bot.edit_message_text = AsyncMock()
+    bot.delete_message = AsyncMock()
     
     # Тестовый ID пользователя, который будет восстановлен из заказа
     test_user_id = '456'
@@ -393,50 +371,22 @@ async def test_auto_check_payment_status_recovers_missing_user_id():
             'orders': ['1', '2'],  # Список ID заказов
             'buttons_message_id': 789,
             'qr_message_id': 101,
-            'status_checks': 0,
             'payment_id': '1'
             # user_id отсутствует
         }
     }
+    pending = make_pending(user_data)
+    payment = user_data['payment']
+    order = MagicMock(order_id='1', user_id=test_user_id)
     
-    # Создаем мок для job
-    job = MagicMock()
-    job.data = {
-        'chat_id': 123,
-        'user_data': user_data
-    }
-    mock_context.job = job
-    mock_context.job_queue = MagicMock()
-    mock_context.job_queue.get_jobs_by_name = MagicMock(return_value=[MagicMock()])
-    
-    # Мок заказов для восстановления user_id
-    mock_orders = [
-        ['id', 'date', 'status', 'user_id', 'username', 'sum'],  # Заголовок
-        ['1', '01.01.2023 12:00:00', 'Принят', test_user_id, 'user1', '100'],  # Первый заказ с нужным ID
-        ['2', '02.01.2023 13:00:00', 'Активен', test_user_id, 'user1', '200']  # Второй заказ с нужным ID
-    ]
-    
-    # Создаем мок для update_user_stats
-    with patch('orderbot.services.user.update_user_stats') as mock_update_user_stats:
-        # Настраиваем mock_update_user_stats.return_value
-        mock_update_user_stats.return_value = True
-        
-        # Мокаем получение заказов для восстановления user_id
-        with patch('orderbot.services.sheets.get_orders_sheet') as mock_get_orders_sheet:
-            mock_orders_sheet = MagicMock()
-            mock_orders_sheet.get_all_values.return_value = mock_orders
-            mock_get_orders_sheet.return_value = mock_orders_sheet
-            
-            # Мокаем остальные внешние функции
-            with patch('orderbot.services.sbp.get_qr_code_status', return_value={'status': 'accepted', 'message': 'Payment successful'}):
-                with patch('orderbot.services.sheets.get_payments_sheet'):
-                    with patch('orderbot.handlers.payment.update_payment_status'):
-                        # Вызываем функцию
-                        await auto_check_payment_status(mock_context)
-                        
-                        # Проверяем, что user_id был восстановлен и добавлен в данные платежа
-                        assert 'user_id' in user_data['payment']
-                        assert user_data['payment']['user_id'] == test_user_id
-                        
-                        # Проверяем, что update_user_stats была вызвана с восстановленным user_id
-                        mock_update_user_stats.assert_called_once_with(test_user_id) 
\ No newline at end of file
+    with patch('orderbot.handlers.payment.order_store') as mock_store:
+        mock_store.ensure_fresh = AsyncMock()
+        mock_store.record.return_value = order
+        with patch('orderbot.handlers.payment.mark_orders_paid'):
+            with patch('orderbot.handlers.payment.update_payment_statuses'):
+                with patch('orderbot.handlers.payment.update_user_stats', return_value=True) as mock_update_user_stats:
+                    await apply_payment_results(bot, [(pending, {'status': 'accepted'})])
+                    
+                    # Проверяем, что user_id был восстановлен и update_user_stats вызвана с ним
+                    assert payment['user_id'] == test_user_id
+                    mock_update_user_stats.assert_called_once_with(test_user_id)
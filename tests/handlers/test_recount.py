@@ -0,0 +1,24 @@
+"""Тесты для обработчика команды /recount."""
+from datetime import date
+
+from orderbot.handlers.recount import parse_recount_range
+
+TODAY = date(2025, 4, 10)
+
+
+def test_default_range_is_last_three_days():
+    """Тест диапазона по умолчанию."""
+    assert parse_recount_range([], TODAY) == (date(2025, 4, 8), TODAY)
+
+
+def test_single_date_and_month_range():
+    """Тест одной даты и диапазона за месяц."""
+    assert parse_recount_range(['01.04.25'], TODAY) == (date(2025, 4, 1), date(2025, 4, 1))
+    assert parse_recount_range(['30.06.2025', '01.06.25'], TODAY) == (date(2025, 6, 1), date(2025, 6, 30))
+
+
+def test_invalid_arguments():
+    """Тест неверных аргументов."""
+    assert parse_recount_range(['вчера'], TODAY) is None
+    assert parse_recount_range(['01.04.25', '02.04.25', '03.04.25'], TODAY) is None
+    assert parse_recount_range(['01.01.23', '01.01.25'], TODAY) is None
@@ -0,0 +1,107 @@
+"""Тесты для кэша с фоновым обновлением."""
+import asyncio
+import threading
+import time
+import pytest
+from unittest.mock import MagicMock
+
+from orderbot.services.cache import SWRCache
+
+
+def test_first_get_loads_value():
+    """Тест загрузки значения при первом обращении."""
+    loader = MagicMock(return_value={'Завтрак': []})
+    cache = SWRCache('тест', loader, ttl=60)
+
+    assert cache.get() == {'Завтрак': []}
+    assert cache.get() == {'Завтрак': []}
+
+    loader.assert_called_once()
+    stats = cache.get_stats()
+    assert stats['misses'] == 1
+    assert stats['hits'] == 1
+
+
+@pytest.mark.asyncio
+async def test_stale_value_is_served_while_refreshing():
+    """Тест выдачи прежнего значения во время фонового обновления."""
+    release = threading.Event()
+    values = iter(['old', 'new'])
+
+    def loader():
+        value = next(values)
+        if value == 'new':
+            release.wait(1)
+        return value
+
+    cache = SWRCache('тест', loader, ttl=60)
+    assert cache.get() == 'old'
+    cache.invalidate()
+
+    assert cache.get() == 'old'
+    release.set()
+    assert await cache.refresh() == 'new'
+    assert cache.get() == 'new'
+
+
+@pytest.mark.asyncio
+async def test_concurrent_refreshes_share_one_load():
+    """Тест объединения одновременных обновлений в одну загрузку."""
+    calls = 0
+
+    def loader():
+        nonlocal calls
+        calls += 1
+        time.sleep(0.05)
+        return calls
+
+    cache = SWRCache('тест', loader, ttl=60)
+
+    results = await asyncio.gather(*(cache.refresh() for _ in range(5)))
+
+    assert calls == 1
+    assert results == [1] * 5
+
+
+def test_concurrent_misses_share_one_load():
+    """Тест одной загрузки при одновременных промахах из разных потоков."""
+    loader = MagicMock(side_effect=lambda: time.sleep(0.05) or 'value')
+    cache = SWRCache('тест', loader, ttl=60)
+
+    threads = [threading.Thread(target=cache.get) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    loader.assert_called_once()
+
+
+def test_failed_refresh_keeps_previous_value():
+    """Тест сохранения прежнего значения при ошибке загрузки."""
+    loader = MagicMock(return_value='old')
+    cache = SWRCache('тест', loader, ttl=60)
+    cache.get()
+    loader.side_effect = Exception('API error')
+    cache.invalidate()
+
+    assert cache.get() == 'old'
+    assert cache.get_stats()['errors'] == 1
+
+
+def test_invalidate_marks_value_stale_with_production_ttl(monkeypatch):
+    """Тест сброса значения сразу после загрузки при суточном TTL."""
+    # Хост работает меньше TTL: monotonic() отсчитывает секунды с загрузки системы
+    monkeypatch.setattr(time, 'monotonic', lambda: 100.0)
+    loader = MagicMock(side_effect=['old', 'new'])
+    cache = SWRCache('тест', loader, ttl=86400)
+    cache.get()
+    assert cache.is_stale() is False
+
+    cache.invalidate()
+
+    assert cache.is_stale() is True
+    # Вне event loop устаревшее значение перечитывается сразу
+    cache.get()
+    assert cache.get() == 'new'
+    assert cache.is_stale() is False
@@ -0,0 +1,89 @@
+"""Тесты для итогов заказов по датам выдачи."""
+from datetime import date
+from unittest.mock import MagicMock
+
+from orderbot.services.daily_totals import DailyTotals, compute
+from orderbot.services.order_record import OrderRecord
+from orderbot.services.order_store import OrderStore
+
+HEADER = ['ID заказа', 'Время', 'Статус', 'User ID', 'Username', 'Сумма заказа',
+          'Номер комнаты', 'Имя', 'Тип еды', 'Блюда', 'Пожелания', 'Дата выдачи']
+
+
+def row(order_id, status, total, meal_type, dishes, delivery_date='01.04.25'):
+    """Создаёт строку заказа."""
+    return [order_id, '01.04.2025 10:00:00', status, '123', 'user1', total, '5', 'John',
+            meal_type, dishes, '—', delivery_date]
+
+
+def order(*args, **kwargs):
+    """Создаёт разобранный заказ."""
+    return OrderRecord.from_row(row(*args, **kwargs))
+
+
+DAY = date(2025, 4, 1)
+NEXT_DAY = date(2025, 4, 2)
+
+
+ORDERS = [
+    order('1', 'Принят', '200', 'Завтрак', 'Каша x2'),
+    order('2', 'Оплачен', '300', 'Обед', 'Борщ x1, Салат x2', '2025-04-01'),
+    order('3', 'Отменён', '100', 'Завтрак', 'Каша x1'),
+    order('4', 'Активен', '150', 'Ужин', 'Рыба x1', '02.04.25'),
+]
+
+
+def test_compute_groups_by_date():
+    """Тест полного пересчёта итогов по датам."""
+    totals = compute(ORDERS)
+
+    day = totals[DAY]
+    assert (day.orders, day.cancelled, day.amount) == (2, 1, 500)
+    assert day.to_rec_row(DAY) == ['01.04.25', '2', '1', '500', 'Каша x2', 'Борщ x1, Салат x2', '—']
+    assert totals[NEXT_DAY].orders == 1
+
+
+def test_changes_update_only_their_date():
+    """Тест пересчёта итогов по событиям заказов."""
+    totals = DailyTotals()
+    totals.rebuild(ORDERS)
+
+    cancelled = order('1', 'Отменён', '200', 'Завтрак', 'Каша x2')
+    totals.apply_change(ORDERS[0], cancelled)
+    totals.apply_change(None, order('5', 'Активен', '50', 'Завтрак', 'Чай x1'))
+
+    day = totals.get(DAY)
+    assert (day.orders, day.cancelled, day.amount) == (2, 2, 350)
+    assert dict(day.dishes['Завтрак']) == {'Чай': 1}
+    assert totals.pop_dirty() == {DAY}
+    assert totals.verify(ORDERS[1:] + [cancelled, order('5', 'Активен', '50', 'Завтрак', 'Чай x1')],
+                         [DAY, NEXT_DAY]) == []
+
+
+def test_unchanged_row_is_not_dirty():
+    """Тест отсутствия пересчёта при изменении полей, не влияющих на итоги."""
+    totals = DailyTotals()
+    totals.rebuild(ORDERS)
+    paid = row('2', 'Оплачен', '300', 'Обед', 'Борщ x1, Салат x2', '2025-04-01')
+    paid[10] = 'Без лука'
+    paid = OrderRecord.from_row(paid)
+
+    totals.apply_change(ORDERS[1], paid)
+
+    assert totals.pop_dirty() == set()
+
+
+def test_order_store_feeds_totals():
+    """Тест обновления итогов по событиям копии листа заказов."""
+    sheet = MagicMock()
+    store = OrderStore()
+    store._worksheet = lambda: sheet
+    totals = DailyTotals()
+    store.add_listener(totals)
+
+    store.replace([HEADER] + [record.row for record in ORDERS])
+    assert totals.pop_dirty() == set()
+    store.set_status('1', 'Отменён')
+
+    assert totals.get(DAY).cancelled == 2
+    assert totals.pop_dirty() == {DAY}
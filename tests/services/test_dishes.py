@@ -0,0 +1,76 @@
+"""Тесты для строки блюд заказа."""
+from collections import Counter
+from datetime import date, datetime
+from unittest.mock import patch
+
+from orderbot.services import kitchen
+from orderbot.services.daily_totals import compute
+from orderbot.services.dishes import (
+    add_dishes, decode_dishes, encode_dishes, encode_order_dishes, split_quantities
+)
+from orderbot.services.order_store import OrderStore
+
+HEADER = ['ID заказа', 'Время', 'Статус', 'User ID', 'Username', 'Сумма заказа',
+          'Номер комнаты', 'Имя', 'Тип еды', 'Блюда', 'Пожелания', 'Дата выдачи']
+
+
+def test_encode_and_decode_round_trip():
+    """Тест сборки и разбора строки блюд с количествами."""
+    line = encode_order_dishes(['Каша', 'Чай'], {'Каша': 2})
+
+    assert line == 'Каша x2, Чай x1'
+    assert decode_dishes(line) == (('Каша', 2), ('Чай', 1))
+    assert encode_dishes(decode_dishes(line)) == line
+
+
+def test_decode_tolerates_legacy_lines():
+    """Тест разбора строк без количества, пустых значений и имён с 'x'."""
+    assert decode_dishes('Чай,Омлет x3') == (('Чай', 1), ('Омлет', 3))
+    assert decode_dishes('Суп xарчо') == (('Суп xарчо', 1),)
+    assert decode_dishes('—') == ()
+    assert decode_dishes('') == ()
+
+
+def test_decode_is_memoized():
+    """Тест повторного использования результата для одинаковых строк."""
+    assert decode_dishes('Борщ x1, Салат x2') is decode_dishes('Борщ x1, Салат x2')
+
+
+def test_split_quantities_merges_duplicates():
+    """Тест перевода в список блюд и количеств для редактирования заказа."""
+    assert split_quantities((('Каша', 1), ('Чай', 2), ('Каша', 1))) == (['Каша', 'Чай'], {'Каша': 2, 'Чай': 2})
+
+
+def test_add_dishes_removes_zero_counts():
+    """Тест вычитания порций до нуля."""
+    counter = Counter({'Каша': 2})
+
+    add_dishes(counter, (('Каша', 2), ('Чай', 1)), sign=-1)
+    add_dishes(counter, (('Чай', 1),))
+
+    assert counter == Counter()
+
+
+def test_kitchen_and_rec_count_quantities_alike():
+    """Тест совпадения количеств блюд в сводке для кухни и в итогах для Rec."""
+    store = OrderStore()
+    aggregate = kitchen.KitchenAggregate()
+    store.add_listener(aggregate)
+    store.replace([
+        HEADER,
+        ['1', '', 'Принят', '1', '', '200', '5', 'John', 'Завтрак', 'Каша x2, Чай x1', '—', '01.04.25'],
+        ['2', '', 'Оплачен', '2', '', '100', '6', 'Mike', 'Завтрак', 'Каша x3', '—', '01.04.25'],
+        ['3', '', 'Ожидает оплаты', '3', '', '300', '7', 'Sam', 'Ужин', 'Рыба x2', '—', '01.04.25'],
+        ['4', '', 'Отменён', '4', '', '100', '8', 'Ann', 'Завтрак', 'Каша x5', '—', '01.04.25'],
+    ])
+
+    with patch.object(kitchen, 'kitchen_aggregate', aggregate), \
+         patch('orderbot.services.kitchen.datetime') as mock_datetime:
+        mock_datetime.now.return_value = datetime(2025, 4, 1, 8, 0)
+        summary = kitchen.get_orders_summary()
+        dishes_count = kitchen.get_dishes_count()
+
+    rec = compute(store.numbered_records())[date(2025, 4, 1)]
+    assert summary['breakfast']['dishes'] == dict(rec.dishes['Завтрак']) == {'Каша': 5, 'Чай': 1}
+    assert summary['dinner']['dishes'] == dict(rec.dishes['Ужин']) == {'Рыба': 2}
+    assert dishes_count == {'Каша': 5, 'Чай': 1, 'Рыба': 2}
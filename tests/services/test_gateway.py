@@ -0,0 +1,141 @@
+"""Тесты для асинхронного шлюза Google Sheets."""
+import asyncio
+import threading
+import time
+import pytest
+from unittest.mock import MagicMock
+
+from orderbot.services import gateway
+
+
+@pytest.mark.asyncio
+async def test_call_runs_outside_event_loop_thread():
+    """Тест выполнения синхронного вызова в отдельном потоке."""
+    main_thread = threading.get_ident()
+    result = await gateway.call(threading.get_ident)
+    assert result != main_thread
+
+
+@pytest.mark.asyncio
+async def test_get_all_values_proxies_worksheet():
+    """Тест проксирования чтения листа."""
+    sheet = MagicMock()
+    sheet.get_all_values.return_value = [['ID'], ['1']]
+
+    result = await gateway.get_all_values(sheet)
+
+    assert result == [['ID'], ['1']]
+    sheet.get_all_values.assert_called_once_with()
+
+
+@pytest.mark.asyncio
+async def test_update_passes_arguments():
+    """Тест передачи аргументов при записи диапазона."""
+    sheet = MagicMock()
+
+    await gateway.update(sheet, 'A2:B2', [['1', '2']], value_input_option='USER_ENTERED')
+
+    sheet.update.assert_called_once_with('A2:B2', [['1', '2']], value_input_option='USER_ENTERED')
+
+
+@pytest.mark.asyncio
+async def test_concurrency_is_bounded(monkeypatch):
+    """Тест ограничения числа одновременных запросов."""
+    import asyncio
+
+    monkeypatch.setattr(gateway, 'MAX_CONCURRENT_REQUESTS', 2)
+    monkeypatch.setattr(gateway, '_semaphore', None)
+    active = 0
+    peak = 0
+    lock = threading.Lock()
+
+    def slow_call():
+        nonlocal active, peak
+        with lock:
+            active += 1
+            peak = max(peak, active)
+        time.sleep(0.05)
+        with lock:
+            active -= 1
+
+    await asyncio.gather(*(gateway.call(slow_call) for _ in range(6)))
+
+    assert peak <= 2
+
+
+@pytest.mark.asyncio
+async def test_error_handlers_receive_failures(monkeypatch):
+    """Тест передачи ошибок вызова зарегистрированным обработчикам."""
+    monkeypatch.setattr(gateway, '_error_handlers', [])
+    handler = MagicMock()
+    gateway.add_error_handler(handler)
+    sheet = MagicMock()
+    error = Exception('API error')
+    sheet.get_all_values.side_effect = error
+
+    with pytest.raises(Exception):
+        await gateway.get_all_values(sheet)
+
+    handler.assert_called_once_with(error)
+
+
+@pytest.mark.asyncio
+async def test_concurrent_reads_share_one_request():
+    """Тест объединения одновременных чтений одного листа."""
+    sheet = MagicMock()
+    sheet.get_all_values.side_effect = lambda: time.sleep(0.05) or [['ID'], ['1']]
+
+    results = await asyncio.gather(*(gateway.get_all_values(sheet) for _ in range(5)))
+
+    assert all(result == [['ID'], ['1']] for result in results)
+    sheet.get_all_values.assert_called_once_with()
+    # Каждый читатель получает свою копию
+    results[0][1][0] = '2'
+    assert results[1][1][0] == '1'
+
+
+@pytest.mark.asyncio
+async def test_write_invalidates_read_snapshot():
+    """Тест сброса снимка чтения после записи в лист."""
+    sheet = MagicMock()
+    sheet.col_values.return_value = ['ID', '1']
+
+    await gateway.col_values(sheet, 1)
+    await gateway.col_values(sheet, 1)
+    assert sheet.col_values.call_count == 1
+
+    await gateway.update_cell(sheet, 3, 1, '2')
+    sheet.col_values.return_value = ['ID', '1', '2']
+
+    assert await gateway.col_values(sheet, 1) == ['ID', '1', '2']
+    assert sheet.col_values.call_count == 2
+
+
+@pytest.mark.asyncio
+async def test_snapshot_expires(monkeypatch):
+    """Тест повторного чтения после истечения срока снимка."""
+    monkeypatch.setattr(gateway, 'READ_SNAPSHOT_TTL', 0)
+    sheet = MagicMock()
+    sheet.row_values.return_value = ['1']
+
+    await gateway.row_values(sheet, 2)
+    await gateway.row_values(sheet, 2)
+
+    assert sheet.row_values.call_count == 2
+
+
+@pytest.mark.asyncio
+async def test_cancelled_owner_does_not_fail_joined_reads():
+    """Тест отмены начавшего чтение обработчика: присоединившиеся читатели получают ответ."""
+    sheet = MagicMock()
+    sheet.get_all_values.side_effect = lambda: time.sleep(0.05) or [['ID'], ['1']]
+
+    owner = asyncio.create_task(gateway.get_all_values(sheet))
+    await asyncio.sleep(0)
+    joined = asyncio.create_task(gateway.get_all_values(sheet))
+    await asyncio.sleep(0)
+    owner.cancel()
+
+    assert await joined == [['ID'], ['1']]
+    assert owner.cancelled()
+    sheet.get_all_values.assert_called_once_with()
@@ -0,0 +1,60 @@
+"""Тесты для локального счётчика номеров."""
+import threading
+from unittest.mock import MagicMock
+
+from orderbot.services.ids import IdAllocator, max_numeric_id, ORDERS, PAYMENTS
+
+
+def test_next_id_seeds_once_from_sheet(tmp_path):
+    """Тест однократной сверки счётчика с таблицей."""
+    allocator = IdAllocator(str(tmp_path / 'ids.sqlite3'))
+    seed = MagicMock(return_value=41)
+
+    assert allocator.next_id(ORDERS, seed=seed) == '42'
+    assert allocator.next_id(ORDERS, seed=seed) == '43'
+    seed.assert_called_once()
+
+
+def test_counter_survives_restart(tmp_path):
+    """Тест сохранения счётчика между запусками."""
+    path = str(tmp_path / 'ids.sqlite3')
+    IdAllocator(path).next_id(PAYMENTS, seed=lambda: 9)
+
+    allocator = IdAllocator(path)
+
+    assert allocator.current(PAYMENTS) == 10
+    assert allocator.next_id(PAYMENTS) == '11'
+
+
+def test_seed_never_moves_counter_back(tmp_path):
+    """Тест сверки, которая не уменьшает счётчик."""
+    allocator = IdAllocator(str(tmp_path / 'ids.sqlite3'))
+    allocator.seed(ORDERS, 50)
+
+    assert allocator.seed(ORDERS, 45) == 50
+    assert allocator.seed(ORDERS, 60) == 60
+
+
+def test_concurrent_allocation_is_unique(tmp_path):
+    """Тест выдачи уникальных номеров из нескольких потоков."""
+    allocator = IdAllocator(str(tmp_path / 'ids.sqlite3'))
+    allocator.seed(ORDERS, 0)
+    issued = []
+
+    def worker():
+        for _ in range(50):
+            issued.append(allocator.next_id(ORDERS))
+
+    threads = [threading.Thread(target=worker) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sorted(issued, key=int) == [str(i) for i in range(1, 201)]
+
+
+def test_max_numeric_id_skips_header_and_garbage():
+    """Тест поиска наибольшего номера в колонке."""
+    assert max_numeric_id(['ID заказа', '3', '', '12', 'abc', '7']) == 12
+    assert max_numeric_id(['ID заказа']) == 0
@@ -0,0 +1,157 @@
+"""Тесты для журнала заказов с отложенной записью."""
+import sys
+import pytest
+from unittest.mock import MagicMock
+
+from orderbot.services import journal as journal_module
+from orderbot.services.journal import OrderJournal, OP_CREATE, OP_STATUS, OP_UPDATE
+from orderbot.services.order_store import OrderStore
+
+HEADER = ['ID заказа', 'Время', 'Статус', 'User ID', 'Username', 'Сумма заказа',
+          'Номер комнаты', 'Имя', 'Тип еды', 'Блюда', 'Пожелания', 'Дата выдачи']
+ROW_1 = ['1', '01.04.2025 10:00:00', 'Активен', '123', 'user1', '200', '5', 'John', 'Завтрак', 'Каша x2', '—', '02.04.25']
+
+
+def make_row(order_id, status='Активен'):
+    """Создаёт строку заказа."""
+    return [order_id, '01.04.2025 11:00:00', status, '456', 'user2', '300', '7', 'Mike', 'Обед', 'Борщ x1', '—', '02.04.25']
+
+
+@pytest.fixture
+def orders_sheet():
+    """Фикстура листа заказов."""
+    sheet = MagicMock()
+    sheet.get_all_values.return_value = [HEADER, ROW_1]
+    sheet.get.return_value = []
+    sheet.col_values.return_value = ['ID заказа', '1']
+    sheet.append_rows.return_value = {'updates': {'updatedRange': 'Orders!A3:L4'}}
+    return sheet
+
+
+@pytest.fixture
+def store(orders_sheet, monkeypatch):
+    """Фикстура копии листа заказов."""
+    store = OrderStore()
+    monkeypatch.setattr(store, '_worksheet', lambda: orders_sheet)
+    monkeypatch.setattr(journal_module, 'order_store', store)
+    return store
+
+
+@pytest.fixture
+def journal(tmp_path, store, orders_sheet, monkeypatch):
+    """Фикстура журнала во временном файле."""
+    journal = OrderJournal(str(tmp_path / 'journal.sqlite3'))
+    store.set_overlay(journal.apply_pending)
+    sheets = MagicMock()
+    sheets.get_orders_sheet.return_value = orders_sheet
+    monkeypatch.setitem(sys.modules, 'orderbot.services.sheets', sheets)
+    return journal
+
+
+@pytest.mark.asyncio
+async def test_record_applies_to_store_immediately(store, journal, orders_sheet):
+    """Тест мгновенного применения операции без записи в таблицу."""
+    await store.ensure_fresh()
+
+    journal.record(OP_CREATE, '2', make_row('2'))
+    journal.record(OP_STATUS, '1', 'Отменён')
+
+    assert store.get('2')[2] == 'Активен'
+    assert store.row_number('2') is None
+    assert store.get('1')[2] == 'Отменён'
+    assert journal.pending_count() == 2
+    assert journal.max_pending_order_id() == 2
+    orders_sheet.append_rows.assert_not_called()
+    orders_sheet.batch_update.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_flush_batches_creates_and_updates(store, journal, orders_sheet):
+    """Тест пакетной записи новых заказов и изменений."""
+    await store.ensure_fresh()
+    journal.record(OP_CREATE, '2', make_row('2'))
+    journal.record(OP_CREATE, '3', make_row('3'))
+    journal.record(OP_STATUS, '1', 'Принят')
+    journal.record(OP_STATUS, '1', 'Отменён')
+    journal.record(OP_STATUS, '3', 'Оплачен')
+
+    assert await journal.flush() is True
+
+    orders_sheet.append_rows.assert_called_once()
+    assert [row[0] for row in orders_sheet.append_rows.call_args[0][0]] == ['2', '3']
+    orders_sheet.batch_update.assert_called_once()
+    data = orders_sheet.batch_update.call_args[0][0]
+    assert data == [
+        {'range': 'C2', 'values': [['Отменён']]},
+        {'range': 'C4', 'values': [['Оплачен']]},
+    ]
+    assert store.row_number('3') == 4
+    assert store.get('3')[2] == 'Оплачен'
+    assert journal.pending_count() == 0
+
+
+@pytest.mark.asyncio
+async def test_failed_flush_keeps_operations(store, journal, orders_sheet):
+    """Тест сохранения операций в журнале при ошибке таблицы."""
+    await store.ensure_fresh()
+    orders_sheet.batch_update.side_effect = Exception('API error')
+    journal.record(OP_UPDATE, '1', ROW_1[:5] + ['250'] + ROW_1[6:])
+
+    assert await journal.flush() is False
+
+    assert journal.pending_count() == 1
+    assert journal.pending()[0]['attempts'] == 1
+
+
+@pytest.mark.asyncio
+async def test_pending_operations_survive_reload(store, journal):
+    """Тест повторного применения незаписанных операций после перечитывания листа."""
+    await store.ensure_fresh()
+    journal.record(OP_CREATE, '2', make_row('2'))
+    journal.record(OP_STATUS, '1', 'Отменён')
+
+    store.invalidate()
+    await store.ensure_fresh()
+
+    assert store.get('1')[2] == 'Отменён'
+    assert [row[0] for row in store.by_user('456')] == ['2']
+
+
+@pytest.mark.asyncio
+async def test_flush_does_not_append_existing_order_again(store, journal, orders_sheet):
+    """Тест повтора добавления заказа, который уже записан в лист."""
+    await store.ensure_fresh()
+    journal.record(OP_CREATE, '2', make_row('2'))
+    orders_sheet.col_values.return_value = ['ID заказа', '1', '2']
+
+    assert await journal.flush() is True
+
+    orders_sheet.append_rows.assert_not_called()
+    assert store.row_number('2') == 3
+    assert journal.pending_count() == 0
+
+
+@pytest.mark.asyncio
+async def test_flush_writes_to_row_found_in_sheet(store, journal, orders_sheet):
+    """Тест записи изменения в строку, куда заказ переместился после сортировки листа."""
+    await store.ensure_fresh()
+    journal.record(OP_STATUS, '1', 'Отменён')
+    orders_sheet.col_values.return_value = ['ID заказа', '5', '1']
+
+    assert await journal.flush() is True
+
+    assert orders_sheet.batch_update.call_args[0][0] == [{'range': 'C3', 'values': [['Отменён']]}]
+    assert journal.pending_count() == 0
+
+
+@pytest.mark.asyncio
+async def test_flush_drops_changes_of_deleted_order(store, journal, orders_sheet):
+    """Тест отказа от записи изменения заказа, строку которого удалили из листа."""
+    await store.ensure_fresh()
+    journal.record(OP_STATUS, '1', 'Отменён')
+    orders_sheet.col_values.return_value = ['ID заказа', '5']
+
+    assert await journal.flush() is True
+
+    orders_sheet.batch_update.assert_not_called()
+    assert journal.pending_count() == 0
@@ -0,0 +1,83 @@
+"""Тесты для сводки заказов для кухни."""
+from datetime import date, timedelta
+
+from orderbot.services.kitchen import KitchenAggregate
+from orderbot.services.order_store import OrderStore
+
+HEADER = ['ID заказа', 'Время', 'Статус', 'User ID', 'Username', 'Сумма заказа',
+          'Номер комнаты', 'Имя', 'Тип еды', 'Блюда', 'Пожелания', 'Дата выдачи']
+
+TODAY = date.today()
+TOMORROW = TODAY + timedelta(days=1)
+
+
+def order(order_id, status, room, meal_type, dishes, day=TODAY):
+    """Создаёт строку заказа."""
+    return [order_id, '', status, '1', '', '100', room, 'John', meal_type, dishes, '—', day.strftime('%d.%m.%y')]
+
+
+def make_store():
+    """Создаёт копию листа заказов с подписанной сводкой для кухни."""
+    store = OrderStore()
+    aggregate = KitchenAggregate()
+    store.add_listener(aggregate)
+    store.replace([
+        HEADER,
+        order('1', 'Принят', '5', 'Ужин', 'Рыба x1'),
+        order('2', 'Оплачен', '5', 'Завтрак', 'Каша x2'),
+        order('3', 'Активен', '6', 'Обед', 'Борщ x1'),
+        order('4', 'Активен', '6', 'Обед', 'Борщ x3', TOMORROW),
+    ])
+    return store, aggregate
+
+
+def test_snapshot_groups_meals_and_rooms():
+    """Тест сводки по приёмам пищи и комнатам без заказов не для кухни."""
+    _, aggregate = make_store()
+
+    snapshot = aggregate.snapshot(TODAY)
+
+    assert snapshot.frozen is True
+    assert snapshot.total_orders == 2
+    assert dict(snapshot.meals['breakfast'].dishes) == {'Каша': 2}
+    assert snapshot.meals['lunch'].count == 0
+    assert snapshot.meals['breakfast'].orders[0].startswith('✅ Заказ *№2*')
+    assert [record.order_id for record in snapshot.rooms['5']] == ['2', '1']
+    assert '6' not in snapshot.rooms
+
+
+def test_frozen_snapshot_is_reused_until_change():
+    """Тест повторного использования замороженного снимка и его замены при изменении заказа."""
+    store, aggregate = make_store()
+    first = aggregate.snapshot(TODAY)
+
+    assert aggregate.snapshot(TODAY) is first
+    store.set_status('3', 'Принят')
+    second = aggregate.snapshot(TODAY)
+
+    assert second is not first
+    assert dict(second.meals['lunch'].dishes) == {'Борщ': 1}
+    assert first.meals['lunch'].count == 0
+
+
+def test_future_day_is_not_frozen():
+    """Тест сводки на дату, заказы на которую ещё принимаются."""
+    store, aggregate = make_store()
+    store.set_status('4', 'Принят')
+
+    snapshot = aggregate.snapshot(TOMORROW)
+
+    assert snapshot.frozen is False
+    assert dict(snapshot.meals['lunch'].dishes) == {'Борщ': 3}
+
+
+def test_cancelled_order_leaves_summary():
+    """Тест удаления отменённого заказа из сводки."""
+    store, aggregate = make_store()
+    aggregate.snapshot(TODAY)
+
+    store.set_status('1', 'Отменён')
+
+    snapshot = aggregate.snapshot(TODAY)
+    assert snapshot.total_orders == 1
+    assert dict(snapshot.meals['dinner'].dishes) == {}
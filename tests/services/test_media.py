@@ -0,0 +1,122 @@
+"""Тесты для отправки изображений с кэшированием file_id."""
+import base64
+import sys
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+import telegram
+
+from orderbot.services.media import MediaCache, decode_base64_image, prepare_photo, send_image
+
+PNG = b'\x89PNG\r\n\x1a\n' + b'\x00' * 16
+
+
+def make_bot():
+    """Создаёт бота, возвращающего сообщение с новым file_id на каждую загрузку."""
+    bot = MagicMock()
+    uploads = []
+
+    async def send_photo(chat_id, photo, **kwargs):
+        message = MagicMock()
+        if isinstance(photo, str):
+            file_id = photo
+        else:
+            uploads.append(photo.input_file_content)
+            file_id = f'file{len(uploads)}'
+        message.photo = [MagicMock(file_id='thumb'), MagicMock(file_id=file_id)]
+        return message
+
+    bot.send_photo = AsyncMock(side_effect=send_photo)
+    return bot, uploads
+
+
+def test_decode_base64_image_keeps_bytes():
+    """Тест декодирования data URI без перекодирования изображения."""
+    content = 'data:image/png;base64,' + base64.b64encode(PNG).decode()
+
+    assert decode_base64_image(content) == PNG
+    assert prepare_photo(PNG) is PNG
+    with pytest.raises(ValueError):
+        decode_base64_image('data:image/png;base64,@@@')
+
+
+def test_prepare_photo_imports_pillow_only_for_conversion(monkeypatch):
+    """Тест преобразования через Pillow только для неподдерживаемых форматов."""
+    monkeypatch.delitem(sys.modules, 'PIL.Image', raising=False)
+    prepare_photo(PNG)
+    assert 'PIL.Image' not in sys.modules
+
+    from PIL import Image
+    import io
+    buffer = io.BytesIO()
+    Image.new('RGB', (2, 2)).save(buffer, format='BMP')
+
+    assert prepare_photo(buffer.getvalue()).startswith(b'\x89PNG')
+
+
+@pytest.mark.asyncio
+async def test_static_file_uploaded_once(tmp_path):
+    """Тест однократной загрузки статического изображения."""
+    path = tmp_path / 'question.png'
+    path.write_bytes(PNG)
+    cache = MediaCache()
+    bot, uploads = make_bot()
+
+    for admin_id in (1, 2, 3):
+        await cache.send_file(bot, admin_id, str(path), caption='Вопрос')
+
+    assert uploads == [PNG]
+    assert bot.send_photo.call_args.kwargs['photo'] == 'file1'
+    assert bot.send_photo.call_args.kwargs['caption'] == 'Вопрос'
+    assert cache.get_stats() == {'uploads': 1, 'cached': 2}
+
+
+@pytest.mark.asyncio
+async def test_stale_file_id_is_reuploaded(tmp_path):
+    """Тест повторной загрузки, если Telegram не принял file_id."""
+    path = tmp_path / 'question.png'
+    path.write_bytes(PNG)
+    cache = MediaCache()
+    bot, uploads = make_bot()
+    await cache.send_file(bot, 1, str(path))
+
+    send_photo = bot.send_photo.side_effect
+
+    async def reject_file_id(chat_id, photo, **kwargs):
+        if isinstance(photo, str):
+            raise telegram.error.BadRequest('Wrong file identifier')
+        return await send_photo(chat_id, photo, **kwargs)
+
+    bot.send_photo.side_effect = reject_file_id
+    await cache.send_file(bot, 2, str(path))
+
+    assert len(uploads) == 2
+    assert cache._files[str(path)][1] == 'file2'
+
+
+@pytest.mark.asyncio
+async def test_caption_error_is_not_retried_as_upload(tmp_path):
+    """Тест отсутствия повторной загрузки при ошибке разметки подписи."""
+    path = tmp_path / 'question.png'
+    path.write_bytes(PNG)
+    cache = MediaCache()
+    bot, uploads = make_bot()
+    await cache.send_file(bot, 1, str(path))
+    bot.send_photo.side_effect = telegram.error.BadRequest("Can't parse entities")
+
+    with pytest.raises(telegram.error.BadRequest):
+        await cache.send_file(bot, 2, str(path), caption='*', parse_mode='Markdown')
+
+    assert uploads == [PNG]
+    assert bot.send_photo.call_count == 2
+
+
+@pytest.mark.asyncio
+async def test_qr_code_sent_without_caching():
+    """Тест отправки QR-кода сразу из памяти."""
+    bot, uploads = make_bot()
+
+    await send_image(bot, 1, PNG, 'QR1.png', caption='Оплата')
+
+    assert uploads == [PNG]
+    assert bot.send_photo.call_args.kwargs['caption'] == 'Оплата'
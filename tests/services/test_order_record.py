@@ -0,0 +1,60 @@
+"""Тесты для разобранной строки листа заказов."""
+from datetime import date
+
+from orderbot.services.order_record import OrderRecord, OrderStatus, status_values
+from orderbot.services.order_store import OrderStore
+
+HEADER = ['ID заказа', 'Время', 'Статус', 'User ID', 'Username', 'Сумма заказа',
+          'Номер комнаты', 'Имя', 'Тип еды', 'Блюда', 'Пожелания', 'Дата выдачи']
+
+
+def test_record_parses_fields_once():
+    """Тест разбора полей строки заказа."""
+    record = OrderRecord.from_row(
+        ['7', '01.04.2025 10:00:00', 'Оплачен', '123', 'user1', '450.0', '5', 'John',
+         'Обед', 'Борщ x1, Салат x2', '—', '01.04.25'],
+        row_number=8
+    )
+
+    assert record.order_id == '7'
+    assert record.row_number == 8
+    assert record.status is OrderStatus.PAID
+    assert record.total == 450
+    assert record.dishes == (('Борщ', 1), ('Салат', 2))
+    assert record.wishes is None
+    assert record.delivery_date == date(2025, 4, 1)
+    assert record.meal_priority == 1
+
+
+def test_record_tolerates_short_and_bad_rows():
+    """Тест разбора неполных строк и некорректных значений."""
+    record = OrderRecord.from_row(['8', '', 'Неизвестно', '1', '', 'abc'])
+
+    assert record.status is None
+    assert record.status_text == 'Неизвестно'
+    assert record.total == 0
+    assert record.dishes == ()
+    assert record.delivery_date is None
+    assert len(record.row) == len(HEADER)
+
+
+def test_status_values_accepts_enum_and_text():
+    """Тест сравнения статусов из перечисления и текста таблицы."""
+    assert status_values([OrderStatus.ACCEPTED, 'Оплачен']) == {'Принят', 'Оплачен'}
+
+
+def test_store_returns_records_by_date():
+    """Тест выборки разобранных заказов по дате выдачи из копии листа."""
+    store = OrderStore()
+    store.replace([
+        HEADER,
+        ['1', '', 'Принят', '123', 'user1', '200', '5', 'John', 'Ужин', 'Каша x2', '—', '01.04.25'],
+        ['2', '', 'Оплачен', '123', 'user1', '300', '5', 'John', 'Завтрак', 'Борщ x1', '—', '2025-04-01'],
+        ['3', '', 'Отменён', '456', 'user2', '100', '7', 'Mike', 'Обед', 'Рыба x1', '—', '01.04.25'],
+    ])
+
+    records = store.records_by_delivery_date(date(2025, 4, 1), [OrderStatus.ACCEPTED, OrderStatus.PAID])
+
+    assert [record.order_id for record in records] == ['1', '2']
+    assert store.record('2').row_number == 3
+    assert [record.order_id for record in store.numbered_records()] == ['1', '2', '3']
@@ -0,0 +1,139 @@
+"""Тесты для копии листа заказов в памяти."""
+import pytest
+from unittest.mock import MagicMock
+
+from orderbot.services.order_store import OrderStore
+
+HEADER = ['ID заказа', 'Время', 'Статус', 'User ID', 'Username', 'Сумма заказа',
+          'Номер комнаты', 'Имя', 'Тип еды', 'Блюда', 'Пожелания', 'Дата выдачи']
+
+
+@pytest.fixture
+def orders_sheet():
+    """Фикстура листа заказов."""
+    sheet = MagicMock()
+    sheet.get_all_values.return_value = [
+        HEADER,
+        ['1', '01.04.2025 10:00:00', 'Активен', '123', 'user1', '200', '5', 'John', 'Завтрак', 'Каша x2', '—', '02.04.25'],
+        ['2', '01.04.2025 11:00:00', 'Принят', '123', 'user1', '300', '5', 'John', 'Обед', 'Борщ x1', '—', '01.04.25'],
+        ['3', '01.04.2025 12:00:00', 'Отменён', '456', 'user2', '100', '7', 'Mike', 'Ужин', 'Рыба x1', '—', '01.04.25'],
+    ]
+    sheet.get.return_value = []
+    return sheet
+
+
+@pytest.fixture
+def store(orders_sheet, monkeypatch):
+    """Фикстура копии листа заказов."""
+    store = OrderStore()
+    monkeypatch.setattr(store, '_worksheet', lambda: orders_sheet)
+    return store
+
+
+@pytest.mark.asyncio
+async def test_load_builds_indexes(store):
+    """Тест построения индексов при загрузке."""
+    assert await store.ensure_fresh() is True
+
+    assert store.get('2')[2] == 'Принят'
+    assert store.row_number('3') == 4
+    assert [row[0] for row in store.by_user('123')] == ['1', '2']
+    assert [row[0] for row in store.by_user('123', ['Принят'])] == ['2']
+    assert [row[0] for row in store.by_room('7')] == ['3']
+    assert [row[0] for row in store.by_delivery_date('01.04.25', ['Принят', 'Отменён'])] == ['2', '3']
+
+
+@pytest.mark.asyncio
+async def test_fresh_store_is_not_reloaded(store, orders_sheet):
+    """Тест повторного чтения без обращения к таблице."""
+    await store.ensure_fresh()
+    await store.ensure_fresh()
+
+    orders_sheet.get_all_values.assert_called_once()
+
+
+@pytest.mark.asyncio
+async def test_set_status_moves_order_between_indexes(store):
+    """Тест обновления индекса статусов при смене статуса."""
+    await store.ensure_fresh()
+
+    store.set_status('1', 'Отменён')
+
+    assert store.by_status('Активен') == []
+    assert [row[0] for row in store.by_status('Отменён')] == ['1', '3']
+
+
+@pytest.mark.asyncio
+async def test_upsert_appended_uses_updated_range(store):
+    """Тест добавления строки по ответу append_row."""
+    await store.ensure_fresh()
+    row = ['4', '01.04.2025 13:00:00', 'Активен', '789', 'user3', '150', '9', 'Anna', 'Обед', 'Суп x1', '—', '02.04.25']
+
+    store.upsert_appended(row, {'updates': {'updatedRange': 'Orders!A5:L5'}})
+
+    assert store.row_number('4') == 5
+    assert [r[0] for r in store.by_room('9')] == ['4']
+
+
+@pytest.mark.asyncio
+async def test_tail_refresh_reads_only_new_rows(store, orders_sheet):
+    """Тест дочитывания только новых строк листа."""
+    await store.ensure_fresh()
+    orders_sheet.get.return_value = [
+        ['4', '01.04.2025 13:00:00', 'Активен', '789', 'user3', '150', '9', 'Anna', 'Обед', 'Суп x1']
+    ]
+
+    await store.ensure_fresh(max_age=0)
+
+    orders_sheet.get.assert_called_once_with('A5:L')
+    assert store.get('4')[11] == ''
+    orders_sheet.get_all_values.assert_called_once()
+
+
+def test_duplicate_ids_keep_every_row_in_aggregates():
+    """Тест учёта каждой строки с повторяющимся номером заказа в итогах и сводке для кухни."""
+    from datetime import date
+    from orderbot.services.daily_totals import DailyTotals
+    from orderbot.services.kitchen import KitchenAggregate
+
+    store = OrderStore()
+    totals, aggregate = DailyTotals(), KitchenAggregate()
+    store.add_listener(totals)
+    store.add_listener(aggregate)
+    day = date.today().strftime('%d.%m.%y')
+    store.replace([
+        HEADER,
+        ['7', '', 'Принят', '123', '', '200', '5', 'John', 'Обед', 'Борщ x1', '—', day],
+        ['7', '', 'Принят', '456', '', '300', '6', 'Mike', 'Обед', 'Суп x2', '—', day],
+    ])
+
+    assert store.row_number('7') == 3
+    assert [record.row_number for record in store.numbered_records()] == [2, 3]
+    assert totals.get(date.today()).orders == 2
+    assert totals.get(date.today()).amount == 500
+    assert aggregate.snapshot(date.today()).total_orders == 2
+
+    store.set_status_by_row(2, 'Отменён')
+    assert totals.get(date.today()).orders == 1
+    assert totals.get(date.today()).cancelled == 1
+    assert aggregate.snapshot(date.today()).total_orders == 1
+    assert store.get('7')[2] == 'Принят'
+
+
+@pytest.mark.asyncio
+async def test_duplicate_id_in_tail_is_counted(store, orders_sheet):
+    """Тест дочитывания строки с уже известным номером заказа."""
+    from orderbot.services.daily_totals import DailyTotals
+
+    totals = DailyTotals()
+    store.add_listener(totals)
+    await store.ensure_fresh()
+    orders_sheet.get.return_value = [
+        ['2', '01.04.2025 13:00:00', 'Принят', '789', 'user3', '150', '9', 'Anna', 'Обед', 'Суп x1', '—', '01.04.25']
+    ]
+
+    await store.ensure_fresh(max_age=0)
+
+    assert store.row_number('2') == 5
+    assert [record.row_number for record in store.numbered_records()] == [2, 3, 4, 5]
+    assert totals.get(store.record('2').delivery_date).orders == 2
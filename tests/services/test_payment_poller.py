@@ -0,0 +1,162 @@
+"""Тесты для общей проверки статусов оплаты."""
+import asyncio
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from orderbot.services import payment_poller as poller_module
+from orderbot.services.payment_poller import PaymentPoller, poll_interval, QR_TTL
+
+
+class Clock:
+    """Управляемые часы для планировщика."""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def make_user_data(qrc_id):
+    return {'payment': {'qrc_id': qrc_id, 'orders': ['1'], 'payment_id': '1'}}
+
+
+def test_poll_interval_slows_down_with_age():
+    """Тест адаптивного расписания: свежие QR-коды проверяются чаще."""
+    assert poll_interval(0) < poll_interval(120) < poll_interval(400)
+    assert poll_interval(10 * QR_TTL) == poll_interval(QR_TTL - 1)
+
+
+@pytest.mark.asyncio
+async def test_tick_checks_due_payments_concurrently_with_limit():
+    """Тест одновременной проверки QR-кодов с ограничением числа запросов."""
+    clock = Clock()
+    poller = PaymentPoller(max_concurrent=2, clock=clock)
+    for chat_id in range(5):
+        poller.register(chat_id, make_user_data(f'qr{chat_id}'))
+    active = 0
+    peak = 0
+
+    async def get_status(qrc_id):
+        nonlocal active, peak
+        active += 1
+        peak = max(peak, active)
+        await asyncio.sleep(0.01)
+        active -= 1
+        return {'status': 'NotStarted'}
+
+    with patch.object(poller_module.sbp, 'get_qr_code_status', side_effect=get_status) as mock_status:
+        assert await poller.tick() == []
+        assert mock_status.call_count == 0  # Срок первой проверки ещё не наступил
+
+        clock.now = poll_interval(0)
+        await poller.tick()
+
+    assert mock_status.call_count == 5
+    assert peak == 2
+    assert poller.pending_count() == 5
+
+
+@pytest.mark.asyncio
+async def test_finished_payments_reach_handler_in_one_batch():
+    """Тест передачи всех завершившихся оплат обработчику одним пакетом."""
+    clock = Clock()
+    poller = PaymentPoller(clock=clock)
+    handler = AsyncMock()
+    poller.set_result_handler(handler)
+    statuses = {'qr1': 'Accepted', 'qr2': 'Rejected', 'qr3': 'Pending'}
+    for chat_id, qrc_id in enumerate(statuses):
+        poller.register(chat_id, make_user_data(qrc_id))
+    # Отменённый пользователем платёж больше не проверяется
+    cancelled = make_user_data('qr4')
+    poller.register(4, cancelled)
+    del cancelled['payment']
+
+    clock.now = poll_interval(0)
+    with patch.object(poller_module.sbp, 'get_qr_code_status',
+                      side_effect=lambda qrc_id: {'status': statuses[qrc_id]}) as mock_status:
+        await poller.tick()
+
+    assert mock_status.call_count == 3
+    handler.assert_called_once()
+    finished = handler.call_args[0][1]
+    assert sorted(pending.qrc_id for pending, _ in finished) == ['qr1', 'qr2']
+    assert poller.is_tracking(2) and not poller.is_tracking(0)
+
+
+@pytest.mark.asyncio
+async def test_payment_expires_after_qr_ttl():
+    """Тест завершения проверки после истечения времени жизни QR-кода."""
+    clock = Clock()
+    poller = PaymentPoller(clock=clock)
+    handler = AsyncMock()
+    poller.set_result_handler(handler)
+    poller.register(1, make_user_data('qr1'))
+    poller.register(2, make_user_data('qr2'))
+    statuses = {'qr1': 'NotStarted', 'qr2': 'Pending'}
+
+    with patch.object(poller_module.sbp, 'get_qr_code_status',
+                      side_effect=lambda qrc_id: {'status': statuses[qrc_id]}):
+        clock.now = QR_TTL
+        await poller.tick()
+
+    finished = {pending.qrc_id: status_data['status'] for pending, status_data in handler.call_args[0][1]}
+    assert finished == {'qr1': poller_module.STATUS_EXPIRED, 'qr2': poller_module.STATUS_EXHAUSTED}
+    assert poller.pending_count() == 0
+
+
+def test_register_same_qr_keeps_schedule():
+    """Тест повторной регистрации того же QR-кода."""
+    clock = Clock()
+    poller = PaymentPoller(clock=clock)
+    user_data = make_user_data('qr1')
+    poller.register(1, user_data)
+    clock.now = 3.0
+    poller.register(1, user_data)
+
+    assert poller._pending[1].started == 0.0
+    assert not poller.register(2, {})
+
+
+@pytest.mark.asyncio
+async def test_run_job_reports_results_with_job_bot():
+    """Тест задачи job_queue: итоги оплат сообщаются от имени бота из контекста."""
+    clock = Clock()
+    poller = PaymentPoller(clock=clock)
+    handler = AsyncMock()
+    poller.set_result_handler(handler)
+    context = MagicMock()
+
+    with patch.object(poller_module.sbp, 'get_qr_code_status', new=AsyncMock()) as mock_status:
+        await poller.run_job(context)  # Проверять нечего - банк не вызывается
+        assert not mock_status.called
+
+        poller.register(1, make_user_data('qr1'))
+        mock_status.return_value = {'status': 'Accepted'}
+        clock.now = poll_interval(0)
+        await poller.run_job(context)
+
+    assert handler.call_args[0][0] is context.bot
+
+
+@pytest.mark.asyncio
+async def test_payment_completed_during_tick_is_applied_once():
+    """Тест оплаты, подтверждённой уведомлением банка во время прохода опроса."""
+    clock = Clock()
+    poller = PaymentPoller(clock=clock)
+    poller.set_schedule(poller_module.FALLBACK_POLL_SCHEDULE)
+    handler = AsyncMock()
+    poller.set_result_handler(handler)
+    poller.register(1, make_user_data('qr1'))
+
+    async def get_status(qrc_id):
+        # Пока банк отвечает на опрос, приходит уведомление об оплате
+        await poller.complete(qrc_id, {'status': 'Accepted'})
+        return {'status': 'Accepted'}
+
+    clock.now = poll_interval(0, poller_module.FALLBACK_POLL_SCHEDULE)
+    with patch.object(poller_module.sbp, 'get_qr_code_status', side_effect=get_status):
+        assert await poller.tick() == []
+
+    handler.assert_called_once()
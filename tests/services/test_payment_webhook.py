@@ -0,0 +1,100 @@
+"""Тесты для приёма уведомлений банка об оплате."""
+import base64
+import json
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestClient, TestServer
+
+from orderbot.services import payment_webhook
+from orderbot.services.payment_poller import PaymentPoller
+from orderbot.services.payment_webhook import PaymentWebhook, parse_notification
+
+SECRET = 'bank-secret'
+
+
+def make_jwt(payload):
+    """Собирает JWT с заданной полезной нагрузкой (подпись не проверяется)."""
+    def encode(data):
+        return base64.urlsafe_b64encode(json.dumps(data).encode()).rstrip(b'=').decode()
+    return f"{encode({'alg': 'RS256'})}.{encode(payload)}.signature"
+
+
+@pytest.fixture
+async def webhook(monkeypatch):
+    """Поднимает сервер с маршрутом уведомлений и отдельным планировщиком оплат."""
+    poller = PaymentPoller()
+    handler = AsyncMock()
+    poller.set_result_handler(handler)
+    monkeypatch.setattr(payment_webhook, 'payment_poller', poller)
+    bot = MagicMock()
+    app = web.Application()
+    PaymentWebhook(bot, SECRET).add_routes(app)
+    client = TestClient(TestServer(app))
+    await client.start_server()
+    yield client, poller, handler, bot
+    await client.close()
+
+
+def test_parse_notification_accepts_jwt_and_json():
+    """Тест разбора уведомления в виде JWT и JSON."""
+    data = {'webhookType': 'incomingSbpPayment', 'qrcId': 'QR1'}
+
+    assert parse_notification(make_jwt(data)) == data
+    assert parse_notification(json.dumps(data)) == data
+    assert parse_notification('garbage') is None
+
+
+@pytest.mark.asyncio
+async def test_notification_confirms_payment_immediately(webhook):
+    """Тест подтверждения оплаты по уведомлению банка без ожидания опроса."""
+    client, poller, handler, bot = webhook
+    user_data = {'payment': {'qrc_id': 'QR1', 'orders': ['1'], 'payment_id': '1'}}
+    poller.register(123, user_data)
+
+    with patch.object(payment_webhook.sbp, 'get_qr_code_status',
+                      new=AsyncMock(return_value={'qrcId': 'QR1', 'status': 'Accepted'})) as mock_status:
+        response = await client.post(f'/payment-webhook/{SECRET}',
+                                     data=make_jwt({'webhookType': 'incomingSbpPayment', 'qrcId': 'QR1'}))
+
+    assert response.status == 200
+    mock_status.assert_called_once_with('QR1')
+    handler.assert_called_once()
+    assert handler.call_args[0][0] is bot
+    assert handler.call_args[0][1][0][0].chat_id == 123
+    assert not poller.is_tracking(123)
+
+
+@pytest.mark.asyncio
+async def test_notification_requires_secret_and_bank_confirmation(webhook):
+    """Тест отклонения уведомлений без секрета и не подтверждённых банком."""
+    client, poller, handler, _ = webhook
+    poller.register(123, {'payment': {'qrc_id': 'QR1', 'orders': ['1']}})
+    body = json.dumps({'webhookType': 'incomingSbpPayment', 'qrcId': 'QR1'})
+
+    with patch.object(payment_webhook.sbp, 'get_qr_code_status',
+                      new=AsyncMock(return_value={'qrcId': 'QR1', 'status': 'NotStarted'})) as mock_status:
+        forbidden = await client.post('/payment-webhook/wrong', data=body)
+        unconfirmed = await client.post(f'/payment-webhook/{SECRET}', data=body)
+
+    assert forbidden.status == 403
+    assert unconfirmed.status == 200
+    assert mock_status.call_count == 1
+    assert not handler.called
+    # Платёж остаётся на запасной проверке опросом
+    assert poller.is_tracking(123)
+
+
+@pytest.mark.asyncio
+async def test_notification_for_unknown_qr_is_acknowledged(webhook):
+    """Тест уведомления о QR-коде, который бот не ожидает."""
+    client, _, handler, _ = webhook
+
+    with patch.object(payment_webhook.sbp, 'get_qr_code_status', new=AsyncMock()) as mock_status:
+        response = await client.post(f'/payment-webhook/{SECRET}',
+                                     data=json.dumps({'webhookType': 'incomingSbpPayment', 'qrcId': 'QR9'}))
+
+    assert response.status == 200
+    assert not mock_status.called
+    assert not handler.called
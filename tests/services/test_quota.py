@@ -0,0 +1,115 @@
+"""Тесты для планировщика квоты запросов к Google Sheets."""
+import asyncio
+import pytest
+from unittest.mock import MagicMock
+
+from orderbot.services import quota
+from orderbot.services.quota import (
+    QuotaScheduler, TokenBucket, READ, WRITE, INTERACTIVE, BACKGROUND, background_task
+)
+
+
+def api_error(status):
+    """Создаёт ошибку API с указанным HTTP-статусом."""
+    error = Exception(f'HTTP {status}')
+    error.response = MagicMock(status_code=status)
+    return error
+
+
+@pytest.mark.asyncio
+async def test_burst_is_granted_without_waiting():
+    """Тест выдачи токенов без ожидания в пределах запаса."""
+    bucket = TokenBucket(rate_per_minute=60, burst=3)
+
+    await asyncio.wait_for(asyncio.gather(*(bucket.acquire() for _ in range(3))), timeout=0.1)
+
+    assert bucket.get_stats()['granted'] == 3
+
+
+@pytest.mark.asyncio
+async def test_interactive_requests_go_before_background():
+    """Тест приоритета запросов пользователей над фоновыми."""
+    bucket = TokenBucket(rate_per_minute=600, burst=1)
+    await bucket.acquire()
+    order = []
+
+    async def take(priority):
+        await bucket.acquire(priority)
+        order.append(priority)
+
+    background = asyncio.create_task(take(BACKGROUND))
+    await asyncio.sleep(0)
+    interactive = asyncio.create_task(take(INTERACTIVE))
+    await asyncio.sleep(0)
+
+    assert bucket.get_stats()['queue_background'] == 1
+    assert bucket.get_stats()['queue_interactive'] == 1
+    await asyncio.gather(background, interactive)
+    assert order == [INTERACTIVE, BACKGROUND]
+
+
+@pytest.mark.asyncio
+async def test_rate_limit_error_is_retried(monkeypatch):
+    """Тест повтора запроса после ответа 429."""
+    monkeypatch.setattr(quota, 'BASE_BACKOFF', 0.01)
+    scheduler = QuotaScheduler()
+    attempts = 0
+
+    async def request():
+        nonlocal attempts
+        attempts += 1
+        if attempts < 3:
+            raise api_error(429)
+        return 'ok'
+
+    assert await scheduler.run(READ, request) == 'ok'
+    assert attempts == 3
+    assert scheduler.get_stats()['retries'] == 2
+
+
+@pytest.mark.asyncio
+async def test_client_error_is_not_retried():
+    """Тест отсутствия повторов для ошибок, не связанных с перегрузкой."""
+    scheduler = QuotaScheduler()
+    request = MagicMock(side_effect=api_error(400))
+
+    async def call():
+        return request()
+
+    with pytest.raises(Exception):
+        await scheduler.run(READ, call)
+
+    request.assert_called_once()
+
+
+@pytest.mark.asyncio
+async def test_write_is_retried_only_after_rate_limit(monkeypatch):
+    """Тест повторов записи: 429 повторяется, 5xx - нет, запись могла выполниться."""
+    monkeypatch.setattr(quota, 'BASE_BACKOFF', 0.01)
+    scheduler = QuotaScheduler()
+    errors = [api_error(429), api_error(503)]
+    attempts = 0
+
+    async def append():
+        nonlocal attempts
+        attempts += 1
+        raise errors[attempts - 1]
+
+    with pytest.raises(Exception, match='503'):
+        await scheduler.run(WRITE, append)
+    assert attempts == 2
+
+
+@pytest.mark.asyncio
+async def test_background_task_marks_priority():
+    """Тест пометки запросов фоновой задачи."""
+    seen = []
+
+    @background_task
+    async def job():
+        seen.append(quota._priority.get())
+
+    await job()
+
+    assert seen == [BACKGROUND]
+    assert quota._priority.get() == INTERACTIVE
@@ -28,10 +28,10 @@ def mock_sheets(mock_gspread):
         # Настраиваем мок для orders_sheet
         mock_orders.get_all_values.return_value = [
             ['ID', 'Время', 'Статус', 'User ID', 'Username', 'Сумма', 'Комната', 'Имя', 'Тип еды', 'Блюда', 'Пожелания', 'Дата выдачи'],
-            ['1', '01.04.2025', 'Принят', '123', 'user1', '200', '1', 'John', 'breakfast', 'Каша x2', '-', '2025-04-01'],
-            ['2', '01.04.2025', 'Принят', '124', 'user2', '200', '2', 'Mike', 'lunch', 'Борщ x1', '-', '2025-04-01'],
-            ['3', '01.04.2025', 'Принят', '125', 'user3', '200', '3', 'Alex', 'dinner', 'Рыба x1', '-', '2025-04-01'],
-            ['4', '01.04.2025', 'Отменён', '126', 'user4', '200', '4', 'Sam', 'breakfast', 'Каша x1', '-', '2025-04-01']
+            ['1', '01.04.2025', 'Принят', '123', 'user1', '200', '1', 'John', 'Завтрак', 'Каша x2', '-', '2025-04-01'],
+            ['2', '01.04.2025', 'Принят', '124', 'user2', '200', '2', 'Mike', 'Обед', 'Борщ x1', '-', '2025-04-01'],
+            ['3', '01.04.2025', 'Принят', '125', 'user3', '200', '3', 'Alex', 'Ужин', 'Рыба x1', '-', '2025-04-01'],
+            ['4', '01.04.2025', 'Отменён', '126', 'user4', '200', '4', 'Sam', 'Завтрак', 'Каша x1', '-', '2025-04-01']
         ]
         
         # Настраиваем мок для rec_sheet
@@ -39,10 +39,19 @@ def mock_sheets(mock_gspread):
             ['Дата выдачи', 'Количество заказов', 'Количество отмен', 'Общая сумма', 'Завтрак', 'Обед', 'Ужин']
         ]
         
-        yield {
-            'orders': mock_orders,
-            'rec': mock_rec
-        }
+        # Копия листа заказов и итоги по датам читают тот же мок листа заказов
+        from orderbot.services.daily_totals import DailyTotals
+        from orderbot.services.order_store import OrderStore
+        store = OrderStore()
+        store._worksheet = lambda: mock_orders
+        totals = DailyTotals()
+        store.add_listener(totals)
+        with patch('orderbot.services.records.order_store', store), \
+             patch('orderbot.services.records.daily_totals', totals):
+            yield {
+                'orders': mock_orders,
+                'rec': mock_rec
+            }
 
 @pytest.mark.asyncio
 async def test_process_daily_orders_success(mock_sheets: dict[str, MagicMock]):
@@ -89,14 +98,18 @@ async def test_process_daily_orders_no_orders(mock_sheets: dict[str, MagicMock])
     ]
     
     # Вызываем тестируемую функцию
-    result = await process_daily_orders()
+    with patch('orderbot.services.records.date') as mock_date:
+        mock_date.today.return_value = date(2025, 4, 1)
+        result = await process_daily_orders()
     
     # Проверяем, что функция завершилась без ошибок
-    assert result is None
+    assert result is True
     
-    # Проверяем, что не было попыток обновить таблицу
+    # Проверяем, что за день без заказов записана строка с нулевыми итогами
     assert not mock_sheets['rec'].update.called
-    assert not mock_sheets['rec'].append_row.called
+    mock_sheets['rec'].append_row.assert_called_once_with(
+        ['01.04.25', '0', '0', '0', '—', '—', '—'], value_input_option='USER_ENTERED'
+    )
 
 @pytest.mark.asyncio
 async def test_process_daily_orders_error_handling(mock_sheets: dict[str, MagicMock]):
@@ -184,9 +197,9 @@ async def test_process_daily_orders_different_date_formats(mock_sheets: dict[str
     # Устанавливаем заказы с разными форматами дат
     mock_sheets['orders'].get_all_values.return_value = [
         ['ID', 'Время', 'Статус', 'User ID', 'Username', 'Сумма', 'Комната', 'Имя', 'Тип еды', 'Блюда', 'Пожелания', 'Дата выдачи'],
-        ['1', '01.04.2025', 'Принят', '123', 'user1', '100', '1', 'John', 'breakfast', 'Каша x2', '-', '2025-04-01'],
-        ['2', '01.04.2025', 'Принят', '124', 'user2', '150', '2', 'Mike', 'lunch', 'Суп x1', '-', '01.04.25'],
-        ['3', '01.04.2025', 'Принят', '125', 'user3', '200', '3', 'Alex', 'dinner', 'Рыба x1', '-', '1.4.2025']
+        ['1', '01.04.2025', 'Принят', '123', 'user1', '100', '1', 'John', 'Завтрак', 'Каша x2', '-', '2025-04-01'],
+        ['2', '01.04.2025', 'Принят', '124', 'user2', '150', '2', 'Mike', 'Обед', 'Суп x1', '-', '01.04.25'],
+        ['3', '01.04.2025', 'Принят', '125', 'user3', '200', '3', 'Alex', 'Ужин', 'Рыба x1', '-', '1.4.2025']
     ]
     
     # Устанавливаем фиксированную дату
@@ -219,10 +232,10 @@ async def test_process_daily_orders_meal_counting(mock_sheets: dict[str, MagicMo
     # Устанавливаем тестовые данные с разными типами еды
     mock_sheets['orders'].get_all_values.return_value = [
         ['ID', 'Время', 'Статус', 'User ID', 'Username', 'Сумма', 'Комната', 'Имя', 'Тип еды', 'Блюда', 'Пожелания', 'Дата выдачи'],
-        ['1', '01.04.2025', 'Принят', '123', 'user1', '100', '1', 'John', 'breakfast', 'Каша x2, Яйца x1', '-', '2025-04-01'],
-        ['2', '01.04.2025', 'Принят', '124', 'user2', '150', '2', 'Mike', 'lunch', 'Суп x1, Салат x2', '-', '01.04.25'],
-        ['3', '01.04.2025', 'Принят', '125', 'user3', '200', '3', 'Alex', 'dinner', 'Рыба x1, Гарнир x2', '-', '1.4.2025'],
-        ['4', '01.04.2025', 'Отменён', '126', 'user4', '100', '4', 'Sam', 'breakfast', 'Каша x1', '-', '2025-04-01']
+        ['1', '01.04.2025', 'Принят', '123', 'user1', '100', '1', 'John', 'Завтрак', 'Каша x2, Яйца x1', '-', '2025-04-01'],
+        ['2', '01.04.2025', 'Принят', '124', 'user2', '150', '2', 'Mike', 'Обед', 'Суп x1, Салат x2', '-', '01.04.25'],
+        ['3', '01.04.2025', 'Принят', '125', 'user3', '200', '3', 'Alex', 'Ужин', 'Рыба x1, Гарнир x2', '-', '1.4.2025'],
+        ['4', '01.04.2025', 'Отменён', '126', 'user4', '100', '4', 'Sam', 'Завтрак', 'Каша x1', '-', '2025-04-01']
     ]
     
     # Устанавливаем фиксированную дату
@@ -260,17 +273,15 @@ async def test_process_daily_orders_at_midnight(mock_sheets: dict[str, MagicMock
     """Тест обработки заказов в полночь."""
     from orderbot.services.records import process_daily_orders
     
-    # Мокаем datetime.now() чтобы имитировать полночь
-    mock_now = MagicMock()
-    mock_now.return_value = datetime(2024, 4, 8, 0, 0, 0)
+    # Обработка запускается в полночь, дата дня берётся из date.today()
     
     # Настраиваем мок для orders_sheet
     mock_sheets['orders'].get_all_values.return_value = [
         ['ID заказа', 'Время', 'Статус', 'User ID', 'Username', 'Сумма', 'Комната', 'Имя', 'Тип еды', 'Блюда', 'Пожелания', 'Дата выдачи'],
-        ['1', '10:00', 'Активен', '123', 'user1', '1000', '101', 'Иван', 'breakfast', 'Омлет x2, Кофе x1', '', '2024-04-07'],
-        ['2', '11:00', 'Принят', '456', 'user2', '1500', '102', 'Петр', 'lunch', 'Суп x1, Стейк x1', '', '2024-04-07'],
-        ['3', '12:00', 'Отменён', '789', 'user3', '2000', '103', 'Сергей', 'dinner', 'Салат x1, Рыба x1', '', '2024-04-07'],
-        ['4', '13:00', 'Активен', '321', 'user4', '1200', '104', 'Анна', 'breakfast', 'Блинчики x2, Чай x1', '', '2024-04-08']
+        ['1', '10:00', 'Активен', '123', 'user1', '1000', '101', 'Иван', 'Завтрак', 'Омлет x2, Кофе x1', '', '2024-04-07'],
+        ['2', '11:00', 'Принят', '456', 'user2', '1500', '102', 'Петр', 'Обед', 'Суп x1, Стейк x1', '', '2024-04-07'],
+        ['3', '12:00', 'Отменён', '789', 'user3', '2000', '103', 'Сергей', 'Ужин', 'Салат x1, Рыба x1', '', '2024-04-07'],
+        ['4', '13:00', 'Активен', '321', 'user4', '1200', '104', 'Анна', 'Завтрак', 'Блинчики x2, Чай x1', '', '2024-04-08']
     ]
     
     # Настраиваем мок для rec_sheet
@@ -279,9 +290,8 @@ async def test_process_daily_orders_at_midnight(mock_sheets: dict[str, MagicMock
         ['07.04.24', '2', '1', '2500', 'Омлет x2, Кофе x1', 'Суп x1, Стейк x1', '—']
     ]
     
-    with patch('orderbot.services.records.datetime') as mock_datetime:
-        mock_datetime.now = mock_now
-        mock_datetime.today.return_value = datetime(2024, 4, 8).date()
+    with patch('orderbot.services.records.date') as mock_date:
+        mock_date.today.return_value = date(2024, 4, 8)
         
         # Запускаем обработку заказов
         result = await process_daily_orders()
@@ -316,21 +326,24 @@ async def test_process_daily_orders_with_status_change(mock_sheets: dict[str, Ma
     """Тест обработки заказов с изменением статуса."""
     from orderbot.services.records import process_daily_orders
     
-    # Мокаем datetime.now() чтобы имитировать полночь
-    mock_now = MagicMock()
-    mock_now.return_value = datetime(2024, 4, 7, 0, 0, 0)
+    # Обработка запускается в полночь, дата дня берётся из date.today()
     
     # Настраиваем мок для orders_sheet
     mock_sheets['orders'].get_all_values.return_value = [
         ['ID заказа', 'Время', 'Статус', 'User ID', 'Username', 'Сумма', 'Комната', 'Имя', 'Тип еды', 'Блюда', 'Пожелания', 'Дата выдачи'],
-        ['1', '10:00', 'Активен', '123', 'user1', '1000', '101', 'Иван', 'breakfast', 'Омлет x2, Кофе x1', '', '2024-04-07'],
-        ['2', '11:00', 'Принят', '456', 'user2', '1500', '102', 'Петр', 'lunch', 'Суп x1, Стейк x1', '', '2024-04-07'],
-        ['3', '12:00', 'Отменён', '789', 'user3', '2000', '103', 'Сергей', 'dinner', 'Салат x1, Рыба x1', '', '2024-04-07']
+        ['1', '10:00', 'Активен', '123', 'user1', '1000', '101', 'Иван', 'Завтрак', 'Омлет x2, Кофе x1', '', '2024-04-07'],
+        ['2', '11:00', 'Принят', '456', 'user2', '1500', '102', 'Петр', 'Обед', 'Суп x1, Стейк x1', '', '2024-04-07'],
+        ['3', '12:00', 'Отменён', '789', 'user3', '2000', '103', 'Сергей', 'Ужин', 'Салат x1, Рыба x1', '', '2024-04-07']
+    ]
+    
+    # Запись за день уже есть в Rec, она была сделана до отмены заказа
+    mock_sheets['rec'].get_all_values.return_value = [
+        ['Дата выдачи', 'Количество заказов', 'Количество отмен', 'Общая сумма', 'Завтрак', 'Обед', 'Ужин'],
+        ['07.04.24', '3', '0', '4500', 'Омлет x2, Кофе x1', 'Суп x1, Стейк x1', 'Салат x1, Рыба x1']
     ]
     
-    with patch('orderbot.services.records.datetime') as mock_datetime:
-        mock_datetime.now = mock_now
-        mock_datetime.today.return_value = datetime(2024, 4, 7).date()
+    with patch('orderbot.services.records.date') as mock_date:
+        mock_date.today.return_value = date(2024, 4, 7)
         
         # Запускаем обработку заказов
         result = await process_daily_orders()
@@ -351,6 +364,7 @@ async def test_process_daily_orders_with_status_change(mock_sheets: dict[str, Ma
         call_args = mock_sheets['rec'].update.call_args
         range_name = call_args[0][0]
         row_data = call_args[0][1][0]
+        assert range_name == 'A2:G2'
         
         # Проверяем содержимое обновленной записи
         assert row_data[0] == '07.04.24'  # Дата
@@ -359,4 +373,67 @@ async def test_process_daily_orders_with_status_change(mock_sheets: dict[str, Ma
         assert row_data[3] == '2500'  # Общая сумма (1000 + 1500)
         assert row_data[4] == 'Омлет x2, Кофе x1'  # Завтрак
         assert row_data[5] == 'Суп x1, Стейк x1'  # Обед
-        assert row_data[6] == '—'  # Ужин (отменен) 
\ No newline at end of file
+        assert row_data[6] == '—'  # Ужин (отменен) 
+@pytest.mark.asyncio
+async def test_sync_daily_totals_writes_one_batch(mock_sheets: dict[str, MagicMock]):
+    """Тест записи изменившихся итогов в Rec одним запросом."""
+    from orderbot.services.records import sync_daily_totals
+    from orderbot.services import records
+
+    totals = MagicMock()
+    totals.pop_dirty.return_value = {date(2025, 4, 1), date(2025, 4, 2), date(2099, 1, 1)}
+    totals.get.return_value.to_rec_row.side_effect = lambda day: [day.strftime('%d.%m.%y'), '1', '0', '100', '—', '—', '—']
+    mock_sheets['rec'].get_all_values.return_value = [
+        ['Дата выдачи', 'Количество заказов', 'Количество отмен', 'Общая сумма', 'Завтрак', 'Обед', 'Ужин'],
+        ['01.04.25', '2', '0', '400', 'Каша x1', '—', '—']
+    ]
+
+    with patch.object(records, 'daily_totals', totals), \
+         patch('orderbot.services.records.date') as mock_date:
+        mock_date.today.return_value = date(2025, 4, 2)
+        result = await sync_daily_totals()
+
+    assert result is True
+    mock_sheets['rec'].batch_update.assert_called_once()
+    assert mock_sheets['rec'].batch_update.call_args[0][0][0]['range'] == 'A2:G2'
+    mock_sheets['rec'].append_rows.assert_called_once()
+    assert [row[0] for row in mock_sheets['rec'].append_rows.call_args[0][0]] == ['02.04.25']
+    mock_sheets['rec'].update.assert_not_called()
+
+@pytest.mark.asyncio
+async def test_recount_days_writes_range_in_one_batch(mock_sheets: dict[str, MagicMock]):
+    """Тест пересчета диапазона дат за один проход с пакетной записью."""
+    from orderbot.services.records import recount_days
+
+    mock_sheets['rec'].get_all_values.return_value = [
+        ['Дата выдачи', 'Количество заказов', 'Количество отмен', 'Общая сумма', 'Завтрак', 'Обед', 'Ужин'],
+        ['31.03.25', '5', '0', '1000', '—', '—', '—'],
+        ['01.04.25', '2', '0', '400', 'Каша x1', '—', '—']
+    ]
+
+    result = await recount_days(date(2025, 3, 31), date(2025, 4, 2))
+
+    assert result is True
+    mock_sheets['orders'].get_all_values.assert_called_once()
+    updates = mock_sheets['rec'].batch_update.call_args[0][0]
+    assert [item['range'] for item in updates] == ['A2:G2', 'A3:G3']
+    assert updates[0]['values'][0][:4] == ['31.03.25', '0', '0', '0']
+    assert updates[1]['values'][0][:4] == ['01.04.25', '3', '1', '600']
+    new_rows = mock_sheets['rec'].append_rows.call_args[0][0]
+    assert [row[0] for row in new_rows] == ['02.04.25']
+    mock_sheets['rec'].update.assert_not_called()
+    mock_sheets['rec'].append_row.assert_not_called()
+
+@pytest.mark.asyncio
+async def test_process_daily_orders_uses_incremental_totals(mock_sheets: dict[str, MagicMock]):
+    """Тест записи итогов дня без повторной выгрузки листа заказов."""
+    from orderbot.services import records
+
+    with patch('orderbot.services.records.date') as mock_date:
+        mock_date.today.return_value = date(2025, 4, 1)
+        assert await records.process_daily_orders() is True
+        assert await records.process_daily_orders(verify=True) is True
+
+    mock_sheets['orders'].get_all_values.assert_called_once()
+    row_data = mock_sheets['rec'].append_row.call_args[0][0]
+    assert row_data[:4] == ['01.04.25', '3', '1', '600']
@@ -0,0 +1,100 @@
+"""Тесты для справочника ролей."""
+import pytest
+from unittest.mock import MagicMock
+
+from orderbot.services.roles import RoleDirectory, AUTHORIZED, ADMIN
+
+
+@pytest.fixture
+def loaders():
+    """Фикстура функций загрузки списков."""
+    return {
+        AUTHORIZED: MagicMock(return_value=['User ID', '111', '222', '']),
+        ADMIN: MagicMock(return_value=['333']),
+    }
+
+
+def test_first_check_loads_then_hits_memory(loaders):
+    """Тест однократной загрузки списка при повторных проверках."""
+    directory = RoleDirectory(loaders)
+
+    assert directory.has(AUTHORIZED, '111') is True
+    assert directory.has(AUTHORIZED, 999) is False
+    assert directory.has(AUTHORIZED, 222) is True
+
+    loaders[AUTHORIZED].assert_called_once()
+    stats = directory.get_stats()
+    assert stats['misses'] == 1
+    assert stats['hits'] == 2
+
+
+def test_added_user_is_authorized_immediately(loaders):
+    """Тест доступа сразу после сохранения user_id."""
+    directory = RoleDirectory(loaders)
+    directory.has(AUTHORIZED, '111')
+
+    directory.add(AUTHORIZED, '444')
+
+    assert directory.has(AUTHORIZED, '444') is True
+
+
+def test_expired_list_is_reloaded_outside_loop(loaders):
+    """Тест перечитывания списка после истечения TTL."""
+    directory = RoleDirectory(loaders)
+    directory.has(ADMIN, '333')
+    loaders[ADMIN].return_value = ['555']
+
+    directory.invalidate(ADMIN)
+
+    # Вне event loop устаревший список перечитывается сразу
+    assert directory.has(ADMIN, '333') is True
+    assert directory.has(ADMIN, '555') is True
+    assert loaders[ADMIN].call_count == 2
+
+
+@pytest.mark.asyncio
+async def test_expired_list_refreshes_in_background(loaders):
+    """Тест фонового обновления устаревшего списка в event loop."""
+    import asyncio
+
+    directory = RoleDirectory(loaders)
+    await directory.refresh_all()
+    loaders[ADMIN].return_value = ['555']
+    directory.invalidate(ADMIN)
+
+    # Пока список обновляется, проверка использует прежние данные
+    assert directory.has(ADMIN, '333') is True
+    for _ in range(50):
+        if directory.has(ADMIN, '555'):
+            break
+        await asyncio.sleep(0.01)
+
+    assert directory.has(ADMIN, '555') is True
+
+
+def test_load_error_keeps_previous_list(loaders):
+    """Тест сохранения прежнего списка при ошибке таблицы."""
+    directory = RoleDirectory(loaders)
+    directory.has(AUTHORIZED, '111')
+    loaders[AUTHORIZED].side_effect = Exception('API error')
+    directory.invalidate()
+
+    assert directory.has(AUTHORIZED, '111') is True
+    assert directory.get_stats()['errors'] == 1
+
+
+def test_invalidate_reloads_before_ttl_after_boot(loaders, monkeypatch):
+    """Тест перечитывания списка после сброса, пока хост работает меньше TTL."""
+    import time
+
+    # monotonic() отсчитывает секунды с загрузки системы
+    monkeypatch.setattr(time, 'monotonic', lambda: 10.0)
+    directory = RoleDirectory(loaders)
+    directory.has(AUTHORIZED, '111')
+    loaders[AUTHORIZED].return_value = ['111', '444']
+
+    directory.invalidate(AUTHORIZED)
+    directory.has(AUTHORIZED, '111')
+
+    assert directory.has(AUTHORIZED, '444') is True
+    assert loaders[AUTHORIZED].call_count == 2
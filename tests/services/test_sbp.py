@@ -0,0 +1,122 @@
+"""Тесты для клиента API СБП на локальном сервере-заглушке."""
+import asyncio
+
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from orderbot.services import sbp
+
+
+class StubBank:
+    """Заглушка API СБП: регистрация QR-кода и статус оплаты."""
+
+    def __init__(self):
+        self.failures = []  # Коды ответов перед успешным ответом
+        self.delay = 0.0
+        self.calls = 0
+        self.peers = set()
+        self.headers = []
+
+    async def _prepare(self, request):
+        self.calls += 1
+        self.peers.add(request.transport.get_extra_info('peername'))
+        self.headers.append(request.headers.get('Authorization'))
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        if self.failures:
+            return web.Response(status=self.failures.pop(0), text='unavailable')
+        return None
+
+    async def register(self, request):
+        failure = await self._prepare(request)
+        if failure is not None:
+            return failure
+        body = await request.json()
+        return web.json_response({'Data': {
+            'qrcId': 'QR1',
+            'payload': f"https://qr.nspk.ru/QR1?sum={body['Data']['amount']}",
+            'accountId': request.match_info['account'],
+        }})
+
+    async def payment_status(self, request):
+        failure = await self._prepare(request)
+        if failure is not None:
+            return failure
+        return web.json_response({'Data': {'paymentList': [
+            {'qrcId': request.match_info['qrc_id'], 'status': 'Accepted'}
+        ]}})
+
+    def app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_post('/sbp/v1.0/qr-code/merchant/{merchant}/{account:.+}', self.register)
+        app.router.add_get('/sbp/v1.0/qr-codes/{qrc_id}/payment-status', self.payment_status)
+        return app
+
+
+@pytest.fixture
+async def bank(monkeypatch):
+    """Запускает заглушку и подключает к ней клиент СБП."""
+    stub = StubBank()
+    server = TestServer(stub.app())
+    await server.start_server()
+    client = sbp.SbpClient(base_url=str(server.make_url('')).rstrip('/'), token=lambda: 'token',
+                           timeout=0.5, base_backoff=0.01)
+    monkeypatch.setattr(sbp, 'client', client)
+    yield stub
+    await client.close()
+    await server.close()
+
+
+@pytest.mark.asyncio
+async def test_register_qr_code(bank):
+    """Тест регистрации QR-кода."""
+    data = await sbp.register_qr_code('40702810/044525104', 'MF1', 25000)
+
+    assert data['qrcId'] == 'QR1'
+    assert data['accountId'] == '40702810/044525104'
+    assert bank.headers == ['Bearer token']
+
+
+@pytest.mark.asyncio
+async def test_status_retries_server_errors(bank):
+    """Тест повторов проверки статуса после ответов 5xx."""
+    bank.failures = [503, 502]
+
+    payment = await sbp.get_qr_code_status('QR1')
+
+    assert payment['status'] == 'Accepted'
+    assert bank.calls == 3
+    stats = sbp.client.get_stats()['payment_status']
+    assert (stats['calls'], stats['retries'], stats['errors']) == (1, 2, 0)
+
+
+@pytest.mark.asyncio
+async def test_register_is_not_retried_after_ambiguous_error(bank):
+    """Тест отсутствия повтора регистрации, которую банк мог выполнить."""
+    bank.failures = [500]
+
+    assert await sbp.register_qr_code('40702810/044525104', 'MF1', 25000) == {}
+    assert bank.calls == 1
+
+
+@pytest.mark.asyncio
+async def test_status_timeout_returns_error(bank):
+    """Тест таймаута запроса статуса."""
+    bank.delay = 1.0
+
+    payment = await sbp.get_qr_code_status('QR1')
+
+    assert 'error' in payment
+    assert bank.calls == sbp.MAX_RETRIES + 1
+    assert sbp.client.get_stats()['payment_status']['errors'] == 1
+
+
+@pytest.mark.asyncio
+async def test_connections_are_reused(bank):
+    """Тест повторного использования соединения пула."""
+    for _ in range(3):
+        await sbp.get_qr_code_status('QR1')
+
+    assert bank.calls == 3
+    assert len(bank.peers) == 1
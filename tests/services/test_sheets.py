@@ -34,7 +34,8 @@ mock_config.MENU_SHEET_ID = 'menu_sheet_id'
 sys.modules['gspread'] = mock_gspread
 sys.modules['config'] = mock_config
 
-# Теперь импортируем наш модуль
+# Теперь импортируем наш модуль. conftest подменяет orderbot.services.sheets
+# в sys.modules, поэтому атрибуты модуля патчим через patch.object(sheets, ...)
 from orderbot.services import sheets
 
 # Фикстура для сброса состояния моков перед каждым тестом
@@ -56,7 +57,7 @@ def mock_orders_sheet():
     mock.append_row.return_value = None
     
     # Патчим функцию get_orders_sheet, чтобы она возвращала наш мок
-    with patch('orderbot.services.sheets.get_orders_sheet', return_value=mock):
+    with patch.object(sheets, 'get_orders_sheet', return_value=mock):
         yield mock
 
 # Фикстура для мока users_sheet
@@ -68,7 +69,7 @@ def mock_users_sheet():
     mock.update.return_value = None
     
     # Патчим функцию get_users_sheet
-    with patch('orderbot.services.sheets.get_users_sheet', return_value=mock):
+    with patch.object(sheets, 'get_users_sheet', return_value=mock):
         yield mock
 
 @pytest.fixture
@@ -78,7 +79,7 @@ def mock_kitchen_sheet():
     mock.get_all_values.return_value = []
     
     # Патчим функцию get_kitchen_sheet
-    with patch('orderbot.services.sheets.get_kitchen_sheet', return_value=mock):
+    with patch.object(sheets, 'get_kitchen_sheet', return_value=mock):
         yield mock
 
 @pytest.fixture
@@ -89,7 +90,7 @@ def mock_rec_sheet():
     mock.update.return_value = None
     
     # Патчим функцию get_rec_sheet
-    with patch('orderbot.services.sheets.get_rec_sheet', return_value=mock):
+    with patch.object(sheets, 'get_rec_sheet', return_value=mock):
         yield mock
 
 @pytest.fixture
@@ -99,7 +100,7 @@ def mock_auth_sheet():
     mock.get_all_values.return_value = []
     
     # Патчим функцию get_auth_sheet
-    with patch('orderbot.services.sheets.get_auth_sheet', return_value=mock):
+    with patch.object(sheets, 'get_auth_sheet', return_value=mock):
         yield mock
 
 @pytest.fixture
@@ -109,7 +110,7 @@ def mock_menu_sheet():
     mock.col_values.return_value = []
     
     # Патчим функцию get_menu_sheet
-    with patch('orderbot.services.sheets.get_menu_sheet', return_value=mock):
+    with patch.object(sheets, 'get_menu_sheet', return_value=mock):
         yield mock
 
 @pytest.mark.asyncio
@@ -156,12 +157,12 @@ async def test_update_orders_status_batch_update():
             ('C4', [['Принят']]),  # Третий заказ
         ]
         
-        # Проверяем, что update был вызван с правильными параметрами
-        assert mock_sheet.update.call_count == len(expected_updates)
-        for call, expected in zip(mock_sheet.update.call_args_list, expected_updates):
-            assert call[0][0] == expected[0]  # Проверяем диапазон
-            assert call[0][1] == expected[1]  # Проверяем значения
-            assert call[1]['value_input_option'] == 'USER_ENTERED'  # Проверяем опции
+        # Проверяем, что все обновления записаны одним запросом batch_update
+        mock_sheet.batch_update.assert_called_once()
+        call = mock_sheet.batch_update.call_args
+        assert [(item['range'], item['values']) for item in call[0][0]] == expected_updates
+        assert call[1]['value_input_option'] == 'USER_ENTERED'  # Проверяем опции
+        mock_sheet.update.assert_not_called()
     finally:
         # Восстанавливаем оригинальную функцию
         sheets.get_orders_sheet = original_get_orders_sheet
@@ -201,9 +202,11 @@ async def test_update_orders_status_consecutive_rows():
         assert result is True
         
         # Проверяем, что было выполнено одно обновление для всех трех строк
-        mock_sheet.update.assert_called_once_with(
-            'C2:C4',  # Диапазон из трех последовательных строк
-            [['Принят'], ['Принят'], ['Принят']],  # Значения для каждой строки
+        mock_sheet.batch_update.assert_called_once_with(
+            [{
+                'range': 'C2:C4',  # Диапазон из трех последовательных строк
+                'values': [['Принят'], ['Принят'], ['Принят']],  # Значения для каждой строки
+            }],
             value_input_option='USER_ENTERED'
         )
     finally:
@@ -245,7 +248,7 @@ async def test_update_orders_to_awaiting_payment_breakfast():
     
     try:
         # Устанавливаем текущее время на 9:00
-        with patch('orderbot.services.sheets.datetime') as mock_dt:
+        with patch.object(sheets, 'datetime') as mock_dt:
             # Фиксируем дату и время
             fixed_date = datetime.now().date()
             test_time = datetime.combine(fixed_date, datetime.min.time().replace(hour=9))
@@ -261,12 +264,12 @@ async def test_update_orders_to_awaiting_payment_breakfast():
             # Проверяем результат
             assert result is True
             
-            # Проверяем, что был выполнен только один вызов update для заказа завтрака на сегодня
-            mock_sheet.update.assert_called_once_with(
-                'C2',  # Только строка с завтраком
-                [['Ожидает оплаты']],  # Новый статус
+            # Проверяем, что был выполнен только один вызов batch_update для заказа завтрака на сегодня
+            mock_sheet.batch_update.assert_called_once_with(
+                [{'range': 'C2', 'values': [['Ожидает оплаты']]}],  # Только строка с завтраком
                 value_input_option='USER_ENTERED'
             )
+            mock_sheet.update.assert_not_called()
     finally:
         # Восстанавливаем оригинальную функцию
         sheets.get_orders_sheet = original_get_orders_sheet
@@ -306,7 +309,7 @@ async def test_update_orders_to_awaiting_payment_lunch():
     
     try:
         # Устанавливаем текущее время на 14:00
-        with patch('orderbot.services.sheets.datetime') as mock_dt:
+        with patch.object(sheets, 'datetime') as mock_dt:
             # Фиксируем дату и время
             fixed_date = datetime.now().date()
             test_time = datetime.combine(fixed_date, datetime.min.time().replace(hour=14))
@@ -322,12 +325,12 @@ async def test_update_orders_to_awaiting_payment_lunch():
             # Проверяем результат
             assert result is True
             
-            # Проверяем, что был выполнен только один вызов update для заказа обеда на сегодня
-            mock_sheet.update.assert_called_once_with(
-                'C3',  # Только строка с обедом
-                [['Ожидает оплаты']],  # Новый статус
+            # Проверяем, что был выполнен только один вызов batch_update для заказа обеда на сегодня
+            mock_sheet.batch_update.assert_called_once_with(
+                [{'range': 'C3', 'values': [['Ожидает оплаты']]}],  # Только строка с обедом
                 value_input_option='USER_ENTERED'
             )
+            mock_sheet.update.assert_not_called()
     finally:
         # Восстанавливаем оригинальную функцию
         sheets.get_orders_sheet = original_get_orders_sheet
@@ -367,7 +370,7 @@ async def test_update_orders_to_awaiting_payment_dinner():
     
     try:
         # Устанавливаем текущее время на 19:00
-        with patch('orderbot.services.sheets.datetime') as mock_dt:
+        with patch.object(sheets, 'datetime') as mock_dt:
             # Фиксируем дату и время
             fixed_date = datetime.now().date()
             test_time = datetime.combine(fixed_date, datetime.min.time().replace(hour=19))
@@ -383,12 +386,12 @@ async def test_update_orders_to_awaiting_payment_dinner():
             # Проверяем результат
             assert result is True
             
-            # Проверяем, что был выполнен только один вызов update для заказа ужина на сегодня
-            mock_sheet.update.assert_called_once_with(
-                'C4',  # Только строка с ужином
-                [['Ожидает оплаты']],  # Новый статус
+            # Проверяем, что был выполнен только один вызов batch_update для заказа ужина на сегодня
+            mock_sheet.batch_update.assert_called_once_with(
+                [{'range': 'C4', 'values': [['Ожидает оплаты']]}],  # Только строка с ужином
                 value_input_option='USER_ENTERED'
             )
+            mock_sheet.update.assert_not_called()
     finally:
         # Восстанавливаем оригинальную функцию
         sheets.get_orders_sheet = original_get_orders_sheet
@@ -414,7 +417,7 @@ async def test_update_orders_to_awaiting_payment_wrong_time(mock_orders_sheet: M
     mock_orders_sheet.get_all_values.return_value = test_orders
     
     # Устанавливаем текущее время на 12:00 (не соответствует времени обновления)
-    with patch('orderbot.services.sheets.datetime') as mock_dt:
+    with patch.object(sheets, 'datetime') as mock_dt:
         mock_dt.now.return_value = datetime.combine(today, datetime.min.time().replace(hour=12))
         
         # Вызываем тестируемую функцию
@@ -449,7 +452,7 @@ async def test_update_orders_to_awaiting_payment_multiple_orders(mock_orders_she
     mock_orders_sheet.get_all_values.return_value = test_orders
     
     # Устанавливаем текущее время на 9:00
-    with patch('orderbot.services.sheets.datetime') as mock_dt:
+    with patch.object(sheets, 'datetime') as mock_dt:
         mock_dt.now.return_value = datetime.combine(today, datetime.min.time().replace(hour=9))
         mock_dt.strptime.side_effect = lambda *args, **kw: datetime.strptime(*args, **kw)
         
@@ -459,47 +462,41 @@ async def test_update_orders_to_awaiting_payment_multiple_orders(mock_orders_she
         # Проверяем результат
         assert result is True
         
-        # Проверяем, что был выполнен один вызов update для всех трех заказов завтрака
-        mock_orders_sheet.update.assert_called_once_with(
-            'C2:C4',  # Диапазон для трех последовательных заказов завтрака
-            [['Ожидает оплаты'], ['Ожидает оплаты'], ['Ожидает оплаты']],  # Новые статусы
+        # Проверяем, что был выполнен один вызов batch_update для всех трех заказов завтрака
+        mock_orders_sheet.batch_update.assert_called_once_with(
+            [{'range': 'C2:C4', 'values': [['Ожидает оплаты'], ['Ожидает оплаты'], ['Ожидает оплаты']]}],  # Диапазон для трех последовательных заказов завтрака
             value_input_option='USER_ENTERED'
         )
+        mock_orders_sheet.update.assert_not_called()
 
 def test_get_orders_sheet(mock_orders_sheet):
     """Тест получения листа заказов."""
-    from orderbot.services.sheets import get_orders_sheet
-    sheet = get_orders_sheet()
+    sheet = sheets.get_orders_sheet()
     assert sheet == mock_orders_sheet
 
 def test_get_users_sheet(mock_users_sheet):
     """Тест получения листа пользователей."""
-    from orderbot.services.sheets import get_users_sheet
-    sheet = get_users_sheet()
+    sheet = sheets.get_users_sheet()
     assert sheet == mock_users_sheet
 
 def test_get_kitchen_sheet(mock_kitchen_sheet):
     """Тест получения листа кухни."""
-    from orderbot.services.sheets import get_kitchen_sheet
-    sheet = get_kitchen_sheet()
+    sheet = sheets.get_kitchen_sheet()
     assert sheet == mock_kitchen_sheet
 
 def test_get_rec_sheet(mock_rec_sheet):
     """Тест получения листа рекомендаций."""
-    from orderbot.services.sheets import get_rec_sheet
-    sheet = get_rec_sheet()
+    sheet = sheets.get_rec_sheet()
     assert sheet == mock_rec_sheet
 
 def test_get_auth_sheet(mock_auth_sheet):
     """Тест получения листа авторизации."""
-    from orderbot.services.sheets import get_auth_sheet
-    sheet = get_auth_sheet()
+    sheet = sheets.get_auth_sheet()
     assert sheet == mock_auth_sheet
 
 def test_get_menu_sheet(mock_menu_sheet):
     """Тест получения листа меню."""
-    from orderbot.services.sheets import get_menu_sheet
-    sheet = get_menu_sheet()
+    sheet = sheets.get_menu_sheet()
     assert sheet == mock_menu_sheet
 
 @pytest.mark.asyncio
@@ -520,10 +517,16 @@ async def test_get_user_orders_with_all_statuses(mock_orders_sheet: MagicMock):
     
     # Настраиваем мок для get_all_values
     mock_orders_sheet.get_all_values.return_value = test_orders
+    mock_orders_sheet.get.return_value = []
+    
+    # Заказы пользователя берутся из копии листа заказов
+    from orderbot.services.order_store import OrderStore
+    store = OrderStore()
+    store._worksheet = lambda: mock_orders_sheet
     
     # Вызываем тестируемую функцию
-    from orderbot.services.sheets import get_user_orders
-    result = await get_user_orders('123')
+    with patch.object(sheets, 'order_store', store):
+        result = await sheets.get_user_orders('123')
     
     # Проверяем результат
     assert len(result) == 3  # Должны быть возвращены только заказы со статусами 'Активен', 'Принят' и 'Ожидает оплаты'
@@ -570,60 +573,40 @@ async def test_check_orders_awaiting_payment_at_startup():
     original_get_orders_sheet = sheets.get_orders_sheet
     sheets.get_orders_sheet = lambda: mock_sheet
     
-    # Используем наш собственный механизм для отслеживания обновлений
-    updates_tracker = []
-    
     try:
-        # Устанавливаем текущее время на 14:30
-        with patch('orderbot.services.sheets.datetime') as mock_dt:
+        # Устанавливаем текущее время на 14:30; переходы статусов берут время в модуле transitions
+        with patch.object(sheets.transitions, 'datetime') as mock_dt:
             # Фиксируем дату и время
             fixed_date = datetime.now().date()
             test_time = datetime.combine(fixed_date, datetime.min.time().replace(hour=14, minute=30))
             
             # Настраиваем мок datetime
             mock_dt.now.return_value = test_time
-            mock_dt.strptime = datetime.strptime
-            mock_dt.combine = datetime.combine
-            
-            # Создаем функцию-шпион для метода update
-            original_update = mock_sheet.update
-            def mock_update(cell_range, values, value_input_option):
-                # Извлекаем номер строки из диапазона
-                if ':' in cell_range:
-                    row_start = int(cell_range.split(':')[0][1:])
-                    row_end = int(cell_range.split(':')[1][1:])
-                    rows = list(range(row_start, row_end + 1))
-                else:
-                    rows = [int(cell_range[1:])]
-                
-                # Добавляем обновляемые строки в трекер
-                updates_tracker.extend(rows)
-                
-                # Вызываем оригинальный метод
-                return original_update(cell_range, values, value_input_option)
-            
-            # Заменяем метод update на наш
-            mock_sheet.update = mock_update
             
             # Вызываем функцию
             result = await sheets.check_orders_awaiting_payment_at_startup()
             
-            # Возвращаем оригинальный метод
-            mock_sheet.update = original_update
-            
-            # Выводим информацию для отладки
-            print(f"Обновленные строки: {updates_tracker}")
-            
             # Проверяем успешное выполнение
             assert result is True
             
+            # Все изменения записаны одним запросом batch_update; собираем новый статус каждой строки
+            mock_sheet.batch_update.assert_called_once()
+            mock_sheet.update.assert_not_called()
+            updated = {}
+            for item in mock_sheet.batch_update.call_args[0][0]:
+                start_cell, _, end_cell = item['range'].partition(':')
+                rows = range(int(start_cell[1:]), int((end_cell or start_cell)[1:]) + 1)
+                for row, values in zip(rows, item['values']):
+                    updated[row] = values[0]
+            
             # Проверяем, что были обновлены строки 2 и 3 (Завтрак и Обед)
-            assert 2 in updates_tracker, "Строка 2 (Завтрак) должна быть обновлена"
-            assert 3 in updates_tracker, "Строка 3 (Обед) должна быть обновлена"
+            assert updated.get(2) == 'Ожидает оплаты', "Строка 2 (Завтрак) должна быть обновлена"
+            assert updated.get(3) == 'Ожидает оплаты', "Строка 3 (Обед) должна быть обновлена"
             
             # Проверяем, что строка 4 (Ужин) не была обновлена
-            assert 4 not in updates_tracker, "Строка 4 (Ужин со статусом Принят) не должна быть обновлена"
-            assert 5 not in updates_tracker, "Строка 5 (Ужин со статусом Активен) не должна быть обновлена"
+            assert 4 not in updated, "Строка 4 (Ужин со статусом Принят) не должна быть обновлена"
+            # Пропущенный полуночный переход: активный заказ на сегодня становится принятым
+            assert updated.get(5) == 'Принят', "Строка 5 (Ужин со статусом Активен) должна стать принятой"
     finally:
         # Восстанавливаем оригинальную функцию
         sheets.get_orders_sheet = original_get_orders_sheet
@@ -664,27 +647,47 @@ async def test_update_orders_status_non_consecutive_rows():
         # Проверяем результат
         assert result is True
         
-        # Проверяем, что были выполнены обновления для каждой активной строки по отдельности
-        assert mock_sheet.update.call_count == 3
-        
-        # Проверяем вызовы обновления для каждой строки
-        mock_sheet.update.assert_any_call(
-            'C2:C2',  # Строка 2
-            [['Принят']],
-            value_input_option='USER_ENTERED'
-        )
-        
-        mock_sheet.update.assert_any_call(
-            'C4:C4',  # Строка 4
-            [['Принят']],
-            value_input_option='USER_ENTERED'
-        )
-        
-        mock_sheet.update.assert_any_call(
-            'C6:C6',  # Строка 6
-            [['Принят']],
+        # Проверяем, что непоследовательные строки записаны отдельными диапазонами одного batch_update
+        mock_sheet.batch_update.assert_called_once_with(
+            [
+                {'range': 'C2', 'values': [['Принят']]},  # Строка 2
+                {'range': 'C4', 'values': [['Принят']]},  # Строка 4
+                {'range': 'C6', 'values': [['Принят']]},  # Строка 6
+            ],
             value_input_option='USER_ENTERED'
         )
+        mock_sheet.update.assert_not_called()
     finally:
         # Восстанавливаем оригинальную функцию
-        sheets.get_orders_sheet = original_get_orders_sheet 
\ No newline at end of file
+        sheets.get_orders_sheet = original_get_orders_sheet 
+
+@pytest.mark.asyncio
+async def test_update_order_status_goes_through_journal():
+    """Тест записи статуса заказа через журнал, а не напрямую в ячейку."""
+    async def fresh():
+        return None
+
+    with patch.object(sheets.order_store, 'ensure_fresh', side_effect=fresh), \
+         patch.object(sheets.order_store, 'get', return_value=['1', '', 'Активен']), \
+         patch.object(sheets.journal, 'record') as mock_record, \
+         patch.object(sheets.gateway, 'update_cell') as mock_update_cell:
+        result = await sheets.update_order_status('1', 'Принят')
+
+    assert result is True
+    mock_record.assert_called_once_with(sheets.OP_STATUS, '1', 'Принят')
+    mock_update_cell.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_update_order_status_unknown_order():
+    """Тест отказа при обновлении статуса несуществующего заказа."""
+    async def fresh():
+        return None
+
+    with patch.object(sheets.order_store, 'ensure_fresh', side_effect=fresh), \
+         patch.object(sheets.order_store, 'get', return_value=None), \
+         patch.object(sheets.journal, 'record') as mock_record:
+        result = await sheets.update_order_status('404', 'Принят')
+
+    assert result is False
+    mock_record.assert_not_called()
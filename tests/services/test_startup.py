@@ -0,0 +1,46 @@
+"""Тесты для параллельного прогрева при запуске."""
+import asyncio
+import logging
+import pytest
+
+from orderbot.services.startup import warm_up
+
+
+@pytest.mark.asyncio
+async def test_steps_run_concurrently():
+    """Тест одновременного выполнения шагов прогрева."""
+    async def slow_step():
+        await asyncio.sleep(0.1)
+
+    durations = await warm_up({'a': slow_step, 'b': slow_step, 'c': slow_step})
+
+    assert durations['total'] < 0.25
+    assert set(durations) == {'a', 'b', 'c', 'total'}
+
+
+@pytest.mark.asyncio
+async def test_failed_step_does_not_stop_others():
+    """Тест продолжения прогрева при ошибке одного шага."""
+    done = []
+
+    async def failing_step():
+        raise Exception('API error')
+
+    async def good_step():
+        done.append(True)
+
+    await warm_up({'bad': failing_step, 'good': good_step})
+
+    assert done == [True]
+
+
+@pytest.mark.asyncio
+async def test_budget_overrun_is_reported(caplog):
+    """Тест предупреждения о превышении бюджета запуска."""
+    async def slow_step():
+        await asyncio.sleep(0.05)
+
+    with caplog.at_level(logging.WARNING):
+        await warm_up({'slow': slow_step}, budget=0.01)
+
+    assert 'Бюджет времени запуска превышен' in caplog.text
@@ -0,0 +1,118 @@
+"""Тесты для смены статусов заказов по правилам."""
+import pytest
+from datetime import datetime
+from unittest.mock import MagicMock
+
+from orderbot.services import transitions
+from orderbot.services.order_record import OrderRecord
+from orderbot.services.order_store import OrderStore
+
+HEADER = ['ID заказа', 'Время', 'Статус', 'User ID', 'Username', 'Сумма заказа',
+          'Номер комнаты', 'Имя', 'Тип еды', 'Блюда', 'Пожелания', 'Дата выдачи']
+
+
+def order(order_id, status, meal_type, delivery_date):
+    """Создаёт строку заказа."""
+    return [order_id, '01.04.2025 10:00:00', status, '123', 'user1', '200', '5', 'John',
+            meal_type, 'Каша x1', '—', delivery_date]
+
+
+ROWS = [
+    (2, order('1', 'Активен', 'Завтрак', '10.04.25')),
+    (3, order('2', 'Активен', 'Ужин', '10.04.25')),
+    (4, order('3', 'Активен', 'Обед', '11.04.25')),
+    (5, order('4', 'Принят', 'Обед', '08.04.25')),
+    (6, order('5', 'Принят', 'Обед', '01.04.25')),
+    (7, order('6', 'Отменён', 'Обед', '10.04.25')),
+    (8, order('7', 'Принят', 'Обед', 'вчера')),
+]
+RECORDS = [OrderRecord.from_row(row, row_number) for row_number, row in ROWS]
+
+
+def test_midnight_accepts_today_orders():
+    """Тест перевода заказов на сегодня в статус 'Принят'."""
+    planned = transitions.plan(RECORDS, transitions.MIDNIGHT_RULES, datetime(2025, 4, 10, 0, 0))
+
+    assert [(t.order_id, t.to_status) for t in planned] == [('1', 'Принят'), ('2', 'Принят')]
+
+
+def test_payment_hour_moves_only_its_meal():
+    """Тест перевода в 'Ожидает оплаты' только заказов текущего приёма пищи."""
+    records = [
+        OrderRecord.from_row(order('1', 'Принят', 'Завтрак', '10.04.25'), 2),
+        OrderRecord.from_row(order('2', 'Принят', 'Обед', '10.04.25'), 3),
+    ]
+
+    planned = transitions.plan(records, transitions.PAYMENT_HOUR_RULES, datetime(2025, 4, 10, 9, 0))
+
+    assert [t.order_id for t in planned] == ['1']
+
+
+def test_startup_catches_up_chained_transitions():
+    """Тест догоняющей смены статусов при запуске."""
+    planned = transitions.plan(RECORDS, transitions.STARTUP_RULES, datetime(2025, 4, 10, 10, 0))
+
+    assert [(t.order_id, t.from_status, t.to_status) for t in planned] == [
+        ('1', 'Активен', 'Ожидает оплаты'),
+        ('2', 'Активен', 'Принят'),
+        ('4', 'Принят', 'Ожидает оплаты'),
+    ]
+
+
+def test_to_batch_merges_consecutive_rows():
+    """Тест объединения подряд идущих строк с одним статусом в диапазон."""
+    planned = [
+        transitions.Transition(2, '1', 'Активен', 'Принят'),
+        transitions.Transition(3, '2', 'Активен', 'Принят'),
+        transitions.Transition(4, '3', 'Принят', 'Ожидает оплаты'),
+        transitions.Transition(7, '6', 'Активен', 'Принят'),
+    ]
+
+    assert transitions.to_batch(planned) == [
+        {'range': 'C2:C3', 'values': [['Принят'], ['Принят']]},
+        {'range': 'C4', 'values': [['Ожидает оплаты']]},
+        {'range': 'C7', 'values': [['Принят']]},
+    ]
+
+
+@pytest.mark.asyncio
+async def test_run_writes_one_batch(monkeypatch):
+    """Тест записи всех переходов одним запросом."""
+    sheet = MagicMock()
+    sheet.get_all_values.return_value = [HEADER] + [row for _, row in ROWS]
+    store = OrderStore()
+    monkeypatch.setattr(transitions, 'order_store', store)
+
+    assert await transitions.run(sheet, transitions.STARTUP_RULES, datetime(2025, 4, 10, 10, 0)) is True
+
+    sheet.batch_update.assert_called_once()
+    assert [item['range'] for item in sheet.batch_update.call_args[0][0]] == ['C2', 'C3', 'C5']
+    assert store.get('1')[2] == 'Ожидает оплаты'
+    assert store.get('2')[2] == 'Принят'
+    sheet.update.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_run_rebases_pending_journal_operations(monkeypatch, tmp_path):
+    """Тест переноса незаписанных изменений заказа на новый статус."""
+    from orderbot.services import journal as journal_module
+    from orderbot.services.journal import OrderJournal, OP_UPDATE
+
+    sheet = MagicMock()
+    sheet.get_all_values.return_value = [HEADER] + [row for _, row in ROWS]
+    store = OrderStore()
+    journal = OrderJournal(str(tmp_path / 'journal.sqlite3'))
+    store.set_overlay(journal.apply_pending)
+    monkeypatch.setattr(transitions, 'order_store', store)
+    monkeypatch.setattr(transitions, 'journal', journal)
+    monkeypatch.setattr(journal_module, 'order_store', store)
+    edited = order('2', 'Активен', 'Ужин', '10.04.25')
+    edited[10] = 'Без лука'
+    journal.record(OP_UPDATE, '2', edited)
+
+    assert await transitions.run(sheet, transitions.MIDNIGHT_RULES, datetime(2025, 4, 10, 0, 0)) is True
+
+    pending = journal.pending()
+    assert pending[0]['payload'][2] == 'Принят'
+    assert pending[0]['payload'][10] == 'Без лука'
+    assert store.get('2')[2] == 'Принят'
@@ -100,6 +100,31 @@ sys.modules['handlers.menu'] = mock_menu
 
 from orderbot import main
 
+@pytest.fixture(autouse=True)
+def main_dependencies(mocker: 'MockerFixture') -> MagicMock:
+    """Подменяем зависимости, которые main импортирует из пакета orderbot."""
+    # main импортирует задачи и сервисы из пакета, а не по верхнеуровневым именам модулей
+    mocker.patch.object(main, 'start_status_update_task', mock_tasks.start_status_update_task)
+    mocker.patch.object(main, 'stop_status_update_task', mock_tasks.stop_status_update_task)
+    mocker.patch.object(main, 'schedule_daily_tasks', mock_tasks.schedule_daily_tasks)
+    mocker.patch.object(main, 'watch_menu_changes', AsyncMock())
+    mocker.patch.object(main, 'watch_daily_totals', AsyncMock())
+    mocker.patch.object(main, 'process_daily_orders', mock_records.process_daily_orders)
+    mocker.patch.object(main, 'setup_commands_for_user', AsyncMock())
+    mock_journal = mocker.patch.object(main, 'journal')
+    mock_journal.stop_flusher = AsyncMock()
+    mock_sbp = mocker.patch.object(main, 'sbp')
+    mock_sbp.client.close = AsyncMock()
+    mock_startup = mocker.patch.object(main, 'startup')
+    mock_startup.warm_up = AsyncMock()
+    return mock_startup
+
+def assert_daily_orders_warmed_up(mock_startup: MagicMock) -> None:
+    """Проверяем, что обработка заказов за день передана в прогрев при запуске."""
+    mock_startup.warm_up.assert_called_once()
+    steps = mock_startup.warm_up.call_args.args[0]
+    assert steps['Обработка заказов за день'] is mock_records.process_daily_orders
+
 @pytest.fixture
 def mock_env_vars(monkeypatch: 'MonkeyPatch') -> None:
     """Фикстура для установки переменных окружения."""
@@ -257,6 +282,7 @@ async def test_main_with_webhook(
     mock_web_app: MagicMock,
     mock_runner: MagicMock,
     mock_site: MagicMock,
+    main_dependencies: MagicMock,
     mocker: 'MockerFixture'
 ) -> None:
     """Тест функции main с использованием webhook."""
@@ -291,7 +317,7 @@ async def test_main_with_webhook(
     mock_tasks.start_status_update_task.assert_called_once()
     mock_application.add_handler.assert_called()
     mock_tasks.schedule_daily_tasks.assert_called_once()
-    mock_records.process_daily_orders.assert_called_once()
+    assert_daily_orders_warmed_up(main_dependencies)
     mock_application.bot.set_webhook.assert_called_once_with(
         url="https://test-bot.example.com/webhook",
         secret_token="test-secret-token"
@@ -306,6 +332,7 @@ async def test_main_with_webhook(
 async def test_main_without_webhook(
     monkeypatch: 'MonkeyPatch',
     mock_application: MagicMock,
+    main_dependencies: MagicMock,
     mocker: 'MockerFixture'
 ) -> None:
     """Тест функции main без использования webhook."""
@@ -323,7 +350,7 @@ async def test_main_without_webhook(
     mock_tasks.start_status_update_task.assert_called_once()
     mock_application.add_handler.assert_called()
     mock_tasks.schedule_daily_tasks.assert_called_once()
-    mock_records.process_daily_orders.assert_called_once()
+    assert_daily_orders_warmed_up(main_dependencies)
     mock_application.run_polling.assert_called_once_with(allowed_updates=Update.ALL_TYPES)
 
 @pytest.mark.asyncio
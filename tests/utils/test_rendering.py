@@ -0,0 +1,99 @@
+"""Тесты для оформления сообщений с заказами."""
+from unittest.mock import patch
+
+from orderbot.services.order_record import OrderRecord
+from orderbot.utils import rendering
+from orderbot.utils.markdown_utils import escape_markdown_v2 as legacy_escape
+from orderbot.utils.rendering import escape_fields, escape_markdown_v2, pack_messages, render_order_card
+
+
+def make_order(order_id, dishes='Каша, Суп x2', wishes='Без соли!'):
+    return OrderRecord.from_row([order_id, '14.03.25 10:00', 'Активен', '1', '@test', '350.0', '101', 'Анна-Мария',
+                                 'Завтрак', dishes, wishes, '15.03.25'])
+
+
+def test_escape_markdown_v2_single_pass():
+    """Тест экранирования всех специальных символов MarkdownV2."""
+    assert escape_markdown_v2('a_b*c[d](e)~`>#+-=|{}.!') == 'a\\_b\\*c\\[d\\]\\(e\\)\\~\\`\\>\\#\\+\\-\\=\\|\\{\\}\\.\\!'
+    assert escape_markdown_v2('C:\\temp') == 'C:\\\\temp'
+    assert escape_markdown_v2(None) == ''
+    assert legacy_escape is escape_markdown_v2
+    assert escape_fields('1.5', None, 0, 'a-b') == ['1\\.5', '', '0', 'a\\-b']
+
+
+def test_render_order_card():
+    """Тест карточки заказа по шаблону с экранированными полями."""
+    with patch.object(rendering.translations, 'get_meal_type', return_value='Завтрак'), \
+         patch.object(rendering.translations, 'get_message', return_value='---\n'):
+        card = render_order_card(make_order('12.1'), '✏️', with_guest=True)
+
+    assert card == (
+        "✏️ Заказ *12\\.1* \\(Активен\\)\n"
+        "🏠 Комната: 101\n"
+        "👤 Имя: Анна\\-Мария\n"
+        "🍽 Время дня: Завтрак \\(15\\.03\\.25\\)\n"
+        "🍲 Блюда:\n"
+        "  • Каша x1\n"
+        "  • Суп x2\n"
+        "📝 Пожелания: Без соли\\!\n"
+        "💰 Сумма заказа: 350 р\\.\n"
+        "---\n"
+    )
+
+
+def test_pack_messages_fills_messages():
+    """Тест упаковки 200 карточек в наименьшее число сообщений."""
+    with patch.object(rendering.translations, 'get_message', return_value='➖➖➖\n'):
+        cards = [render_order_card(make_order(str(i)), '✅') for i in range(200)]
+    blocks = ['Заголовок\n\n'] + cards
+
+    messages = pack_messages(blocks)
+
+    assert ''.join(messages) == ''.join(blocks)
+    assert all(len(message) <= rendering.MESSAGE_LIMIT for message in messages)
+    # Каждое сообщение, кроме последнего, заполнено настолько, что следующая карточка не помещается
+    assert all(len(message) + len(cards[0]) > rendering.MESSAGE_LIMIT for message in messages[:-1])
+    assert len(messages) < 10
+
+
+def test_pack_messages_splits_long_block_and_repeats_header():
+    """Тест деления слишком длинного блока по строкам и повтора заголовка."""
+    long_block = ''.join(f"- блюдо {i}\n" for i in range(100))
+
+    messages = pack_messages(['Заказ\n', long_block], limit=200, header='# ')
+
+    assert all(len(message) <= 200 and message.startswith('# ') for message in messages)
+    assert ''.join(message[2:] for message in messages) == 'Заказ\n' + long_block
+    assert all(message.endswith('\n') for message in messages)
+    assert pack_messages([], header='# ') == []
+
+
+def test_split_block_keeps_escapes_whole():
+    """Тест разреза длинной строки только между парами обратных косых черт."""
+    pieces = list(rendering._split_block('ab\\\\\\.cd', 5))
+    assert pieces == ['ab\\\\', '\\.cd']
+
+    pieces = list(rendering._split_block('abc\\\\d', 5))
+    assert pieces == ['abc\\\\', 'd']
+
+
+def test_split_block_reopens_entity_at_cut():
+    """Тест закрытия и повторного открытия выделения при разрезе строки внутри *жирного*."""
+    line = 'Пожелания: *' + escape_markdown_v2('без_соли. ' * 5) + '*\n'
+
+    pieces = list(rendering._split_block(line, 30))
+
+    assert all(len(piece) <= 30 for piece in pieces)
+    assert all(not rendering._open_entities(piece) for piece in pieces)
+    assert pieces[0].startswith('Пожелания: *') and pieces[0].endswith('*')
+    assert all(piece.startswith('*') for piece in pieces[1:])
+    # Без добавленных маркеров части складываются в исходную строку
+    joined = pieces[0][:-1] + ''.join(piece[1:-1] for piece in pieces[1:-1]) + pieces[-1][1:]
+    assert joined == line
+
+
+def test_split_block_keeps_double_markers_whole():
+    """Тест разреза строки не между символами маркера __."""
+    pieces = list(rendering._split_block('abcd__ef__', 5))
+
+    assert pieces == ['abcd', '__e__', '__f__']